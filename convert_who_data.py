@@ -4,8 +4,12 @@ This script processes all WHO reference data files and creates structured JSON o
 """
 
 import json
+import os
 import re
 
+# WHO tables live with the server so the growth standards engine can load them
+WHO_DATA_DIR = os.path.join('server', 'data', 'who')
+
 def parse_standard_file(filename, has_lms=False):
     """
     Parse WHO data file and convert to structured JSON
@@ -100,7 +104,7 @@ def convert_all_who_files():
         all_data[chart_type] = {}
         for gender, (filename, has_lms) in genders.items():
             print(f"Processing {filename}...")
-            data = parse_standard_file(filename, has_lms)
+            data = parse_standard_file(os.path.join(WHO_DATA_DIR, filename), has_lms)
             all_data[chart_type][gender] = data
             print(f"  - Parsed {len(data)} data points")
 
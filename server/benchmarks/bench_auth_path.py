@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request overhead of @require_auth.
+
+Compares the previous hot path (GET session, GET + SETEX again to touch
+activity, create_client per request) with the current one (single GET,
+debounced touch, per-token client reuse) on a trivial authenticated view.
+
+Redis is replaced by an in-memory client that counts commands and round trips
+(a pipeline/MULTI counts as one round trip) and sleeps for a simulated
+network latency per round trip. Supabase clients are real objects pointed at
+an unused local URL; no request ever leaves the process.
+
+Usage:
+    python benchmarks/bench_auth_path.py
+    python benchmarks/bench_auth_path.py --requests 2000 --latency-ms 0.5
+"""
+
+import argparse
+import os
+import sys
+import time
+from functools import wraps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+
+JWT_SECRET = 'bench-secret-bench-secret-bench-secret'
+
+
+def _token(role, ttl=3600):
+    now = int(time.time())
+    return jwt.encode({'sub': role, 'role': role, 'iat': now, 'exp': now + ttl}, JWT_SECRET, algorithm='HS256')
+
+
+# config.settings builds its global clients at import time
+os.environ['SUPABASE_URL'] = 'http://127.0.0.1:54321'
+os.environ['SUPABASE_KEY'] = _token('anon')
+os.environ['SUPABASE_SERVICE_ROLE_KEY'] = _token('service_role')
+os.environ['SUPABASE_JWT_SECRET'] = JWT_SECRET
+
+from flask import Flask, g, jsonify, request
+from supabase import create_client
+
+import config.settings as settings
+import utils.sessions as sessions
+from utils.access_control import require_auth
+from utils.token_utils import verify_supabase_jwt
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self, **_kwargs):
+        self.redis.round_trip()
+        return [self.redis.run(name, args) for name, args, _ in self.commands]
+
+
+class CountingRedis:
+    """Minimal in-memory Redis that counts commands and round trips."""
+
+    def __init__(self, latency_s):
+        self.data = {}
+        self.latency_s = latency_s
+        self.round_trips = 0
+        self.commands = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def run(self, name, args):
+        self.commands += 1
+        if name == 'get':
+            return self.data.get(args[0])
+        if name == 'setex':
+            self.data[args[0]] = args[2]
+            return True
+        if name == 'delete':
+            return sum(1 for k in args if self.data.pop(k, None) is not None)
+        return 1  # index bookkeeping (zadd/hset/sadd/expire/...) is not inspected
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def __getattr__(self, name):
+        def command(*args, **_kwargs):
+            self.round_trip()
+            return self.run(name, args)
+        return command
+
+
+def legacy_require_auth(f):
+    """The previous require_auth hot path, kept here for comparison."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        session_id = request.cookies.get('session_id')
+        session_data = sessions.get_session_data(session_id)
+        if not session_data:
+            return jsonify({"error": "Invalid or expired session"}), 401
+
+        verify_supabase_jwt(session_data['access_token'])
+        sessions.update_session_activity(session_id)
+
+        client = create_client(settings.url, settings.key)
+        client.postgrest.auth(session_data['access_token'])
+        g.supabase_auth_client = client
+        return f(*args, **kwargs)
+    return decorated
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/legacy')
+    @legacy_require_auth
+    def legacy_view():
+        return 'ok'
+
+    @app.route('/current')
+    @require_auth
+    def current_view():
+        return 'ok'
+
+    return app
+
+
+def run(app, redis, path, count):
+    sessions.redis_client = redis
+    sessions.store_session_data('bench-session', {
+        'id': 'bench-user', 'email': 'bench@example.com', 'role': 'doctor',
+        'access_token': _token('authenticated'), 'refresh_token': 'unused',
+    })
+    redis.round_trips = redis.commands = 0
+
+    client = app.test_client()
+    client.set_cookie('session_id', 'bench-session')
+
+    start = time.perf_counter()
+    for _ in range(count):
+        resp = client.get(path)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{path} returned {resp.status_code}: {resp.get_data(as_text=True)}")
+    elapsed = time.perf_counter() - start
+
+    return elapsed / count * 1e6, redis.round_trips / count, redis.commands / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=0.3, help='simulated Redis round trip')
+    args = parser.parse_args()
+
+    app = make_app()
+    latency_s = args.latency_ms / 1000
+
+    print(f"{args.requests} requests, simulated Redis round trip {args.latency_ms} ms")
+    print(f"{'path':>8} | {'us/request':>10} | {'redis trips':>11} | {'redis cmds':>10}")
+    print("-" * 50)
+
+    results = {}
+    for name in ('legacy', 'current'):
+        us, trips, cmds = run(app, CountingRedis(latency_s), f'/{name}', args.requests)
+        results[name] = us
+        print(f"{name:>8} | {us:>10.1f} | {trips:>11.2f} | {cmds:>10.2f}")
+
+    print(f"\nSpeedup: {results['legacy'] / results['current']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
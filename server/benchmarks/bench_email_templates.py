@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark email rendering for bulk sends (e.g. an announcement mailed to every
+user of a facility).
+
+"before" rebuilds each message the way the f-string templates did: the whole
+base layout and content are assembled on every send, then the plain-text part
+is produced by regex-stripping the HTML (EmailService.send_email's fallback).
+"after" renders through the compiled templates, whose plain-text part is
+precompiled, with the render cache in front.
+
+Two workloads per size: every recipient distinct (cache misses only), and
+the same message rendered for every recipient of a facility (--distinct
+inputs repeated across the batch, mostly cache hits).
+
+Usage:
+    python benchmarks/bench_email_templates.py
+    python benchmarks/bench_email_templates.py --recipients 1000 10000 --distinct 20
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.email_templates as templates
+from utils.email_templates import EmailTemplates
+
+
+def render_before(recipient_email, year):
+    """Assemble the full source and fill every slot on each call, then strip tags for the text part."""
+    spec = templates._TEMPLATES['password_reset_blocked']
+    source = templates._BASE_LAYOUT.replace('{{content}}', spec['source'])
+    values = {**EmailTemplates.BRAND, **spec['constants'], 'year': str(year), 'recipient_email': recipient_email}
+    body_html = templates._SLOT_RE.sub(lambda m: values[m.group(1)], source)
+    body_text = re.sub('<[^<]+?>', '', body_html)
+    return body_html, body_text
+
+
+def render_after(recipient_email, _year):
+    rendered = EmailTemplates.password_reset_blocked(recipient_email)
+    return rendered, rendered.text
+
+
+def run(render, emails, year):
+    start = time.perf_counter()
+    results = [render(email, year) for email in emails]
+    return (time.perf_counter() - start) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--distinct', type=int, default=10, help='distinct messages in the repeated workload')
+    args = parser.parse_args()
+
+    year = time.localtime().tm_year
+    print(f"{'workload':>10} {'emails':>7} | {'before ms':>10} | {'after ms':>9} | {'speedup':>7}")
+    print("-" * 56)
+
+    for count in args.recipients:
+        workloads = {
+            'distinct': [f"user{i}@example.com" for i in range(count)],
+            'repeated': [f"facility{i % args.distinct}@example.com" for i in range(count)],
+        }
+        for workload, emails in workloads.items():
+            templates._render_cached.cache_clear()
+            before_ms, before = run(render_before, emails, year)
+            after_ms, after = run(render_after, emails, year)
+
+            if [html for html, _ in before] != [html for html, _ in after]:
+                print(f"HTML mismatch for {workload} at {count} emails")
+                return 1
+
+            print(f"{workload:>10} {count:>7} | {before_ms:>10.1f} | {after_ms:>9.1f} | {before_ms / after_ms:>6.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
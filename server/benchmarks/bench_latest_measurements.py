@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark the growth section of the doctor report build: one latest-measurement
+query per patient (old N+1 loop) versus the bulk get_latest_measurements path.
+
+Supabase is replaced by an in-memory client that sleeps for a fixed simulated
+network round trip on every execute(), so the numbers show how build time
+scales with patient count rather than real database speed. Like PostgREST,
+it returns at most MAX_ROWS rows per response, RPCs included, so a lookup
+that relies on one unpaged call loses patients and fails the comparison.
+
+Usage:
+    python benchmarks/bench_latest_measurements.py
+    python benchmarks/bench_latest_measurements.py --latency-ms 10 --patients 100 500 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.growth_standards import batch_percentiles, age_in_months, to_optional, load_growth_standards
+from utils.measurements import get_latest_measurements
+
+# PostgREST's default max-rows
+MAX_ROWS = 1000
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Just enough of the PostgREST query builder for the report queries."""
+
+    def __init__(self, client):
+        self.client = client
+        self.rows = []
+        self.limit_n = None
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    # Filters use a patient_id index so the fake itself doesn't skew timings
+    def eq(self, _column, value):
+        self.rows = list(self.client.by_patient.get(value, []))
+        return self
+
+    def in_(self, _column, values):
+        self.rows = [r for pid in values for r in self.client.by_patient.get(pid, [])]
+        return self
+
+    def order(self, column, desc=False):
+        self.rows = sorted(self.rows, key=lambda r: r[column], reverse=desc)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        self.client.round_trip()
+        rows = self.rows[:self.limit_n] if self.limit_n else self.rows
+        return _Response(rows[:MAX_ROWS])
+
+
+class _RPC:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+
+    def execute(self):
+        self.client.round_trip()
+        return _Response(self.rows[:MAX_ROWS])
+
+
+class FakeSupabase:
+    def __init__(self, measurements, latency_s):
+        self.by_patient = {}
+        for row in measurements:
+            self.by_patient.setdefault(row['patient_id'], []).append(row)
+        self.latency_s = latency_s
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency_s)
+
+    def table(self, _name):
+        return _Query(self)
+
+    def rpc(self, _name, params):
+        latest = [
+            max(self.by_patient[pid], key=lambda r: (r['measurement_date'], r['recorded_at']))
+            for pid in params['p_patient_ids'] if pid in self.by_patient
+        ]
+        return _RPC(self, latest)
+
+
+def make_dataset(patient_count, per_patient=6):
+    today = date.today()
+    patients, measurements = [], []
+    for _ in range(patient_count):
+        pid = str(uuid.uuid4())
+        dob = today - timedelta(days=random.randint(30, 1800))
+        patients.append({'patient_id': pid, 'date_of_birth': dob.isoformat(), 'sex': random.choice(['male', 'female'])})
+        for i in range(per_patient):
+            measured = dob + timedelta(days=int((today - dob).days * (i + 1) / per_patient))
+            measurements.append({
+                'patient_id': pid,
+                'weight': round(random.uniform(3, 20), 1),
+                'height': round(random.uniform(50, 110), 1),
+                'head_circumference': None,
+                'measurement_date': measured.isoformat(),
+                'recorded_at': measured.isoformat(),
+            })
+    return patients, measurements
+
+
+def score(patients, latest):
+    rows = [(p, latest[p['patient_id']]) for p in patients if p['patient_id'] in latest]
+    return to_optional(batch_percentiles(
+        'height',
+        [p['sex'] for p, _ in rows],
+        [age_in_months(p['date_of_birth'], m['measurement_date']) for p, m in rows],
+        [m['height'] for _, m in rows],
+    ))
+
+
+def build_before(client, patients):
+    latest = {}
+    for patient in patients:
+        resp = client.table('anthropometric_measurements')\
+            .select('weight, height, measurement_date')\
+            .eq('patient_id', patient['patient_id'])\
+            .order('measurement_date', desc=True)\
+            .limit(1)\
+            .execute()
+        if resp.data:
+            latest[patient['patient_id']] = resp.data[0]
+    return score(patients, latest)
+
+
+def build_after(client, patients):
+    latest = get_latest_measurements(client, [p['patient_id'] for p in patients])
+    return score(patients, latest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated round trip per query')
+    parser.add_argument('--patients', type=int, nargs='+', default=[50, 200, 500, 1000, 2000])
+    args = parser.parse_args()
+
+    random.seed(42)
+    load_growth_standards()
+
+    print(f"Simulated round trip: {args.latency_ms} ms")
+    print(f"{'patients':>8} | {'before ms':>10} {'trips':>6} | {'after ms':>9} {'trips':>6} | {'speedup':>7}")
+    print("-" * 62)
+
+    for count in args.patients:
+        patients, measurements = make_dataset(count)
+
+        before_client = FakeSupabase(measurements, args.latency_ms / 1000)
+        start = time.perf_counter()
+        before = build_before(before_client, patients)
+        before_ms = (time.perf_counter() - start) * 1000
+
+        after_client = FakeSupabase(measurements, args.latency_ms / 1000)
+        start = time.perf_counter()
+        after = build_after(after_client, patients)
+        after_ms = (time.perf_counter() - start) * 1000
+
+        if before != after:
+            print(f"Result mismatch at {count} patients")
+            return 1
+
+        print(f"{count:>8} | {before_ms:>10.1f} {before_client.round_trips:>6} | "
+              f"{after_ms:>9.1f} {after_client.round_trips:>6} | {before_ms / after_ms:>6.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark QR scan patient data assembly: the previous sequential section
+queries versus the concurrent, cached get_patient_data_by_scope path.
+
+Supabase is replaced by an in-memory client that sleeps for a simulated
+network round trip on every execute() and, like PostgREST, rejects selects
+naming a column the table does not have. Redis is replaced by a dict.
+
+Besides timing, the run fails if the two paths return different data, if a
+scope's snapshot was not cached (a loader failing on a bad column makes the
+snapshot partial, and partial snapshots are never cached), or if a warm scan
+still queries the database.
+
+Usage:
+    python benchmarks/bench_qr_snapshot.py
+    python benchmarks/bench_qr_snapshot.py --latency-ms 10 --scans 50
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.settings builds its global clients at import time
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench')
+
+from flask import Flask
+
+import utils.patient_snapshot as snapshot
+
+# Columns of the tables the QR loaders read (see the routes writing them)
+SCHEMA = {
+    'patients': ['patient_id', 'firstname', 'lastname', 'middlename', 'date_of_birth', 'sex', 'bloodtype'],
+    'allergies': ['allergy_id', 'patient_id', 'allergen', 'reaction_type', 'severity', 'date_identified',
+                  'notes', 'recorded_by'],
+    'prescriptions': ['rx_id', 'patient_id', 'doctor_id', 'facility_id', 'prescription_date', 'doctor', 'facility'],
+    'prescription_medications': ['med_id', 'rx_id', 'medication_name', 'dosage'],
+    'vaccinations': ['vax_id', 'patient_id', 'vaccine_name', 'dose_number', 'administered_date', 'administered_by',
+                     'manufacturer', 'lot_number', 'administration_site', 'next_dose_due', 'notes', 'is_deleted'],
+    'appointments': ['appointment_id', 'patient_id', 'doctor_id', 'facility_id', 'appointment_date',
+                     'appointment_time', 'appointment_type', 'status', 'reason', 'notes', 'updated_at'],
+    'anthropometric_measurements': ['am_id', 'patient_id', 'measurement_date', 'height', 'weight',
+                                    'head_circumference', 'chest_circumference', 'abdominal_circumference',
+                                    'recorded_by', 'recorded_at'],
+}
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Just enough of the PostgREST query builder for the QR loaders."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.rows = list(client.tables[table])
+        self.columns = None
+        self.limit_n = None
+        self.one = False
+
+    def select(self, columns, **_kwargs):
+        # Embedded resources (alias:table!fkey(...)) are resolved by the fake data itself
+        top_level = re.sub(r'\([^)]*\)', '', columns)
+        names = [c.strip().split(':')[0].split('!')[0] for c in top_level.split(',') if c.strip()]
+        if '*' not in names:
+            missing = [c for c in names if c not in SCHEMA[self.table]]
+            if missing:
+                self.error = f"column {self.table}.{missing[0]} does not exist"
+            self.columns = names
+        return self
+
+    def eq(self, column, value):
+        self.rows = [r for r in self.rows if r.get(column) == value]
+        return self
+
+    def in_(self, column, values):
+        self.rows = [r for r in self.rows if r.get(column) in values]
+        return self
+
+    def order(self, column, desc=False, nullsfirst=None):
+        self.rows = sorted(self.rows, key=lambda r: r.get(column) or '', reverse=desc)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    def execute(self):
+        self.client.round_trip()
+        if getattr(self, 'error', None):
+            raise Exception(self.error)
+        rows = self.rows[:self.limit_n] if self.limit_n else self.rows
+        if self.columns:
+            rows = [{c: r.get(c) for c in self.columns} for r in rows]
+        else:
+            rows = [dict(r) for r in rows]
+        return _Response(rows[0] if self.one else rows)
+
+
+class FakeSupabase:
+    def __init__(self, tables, latency_s):
+        self.tables = tables
+        self.latency_s = latency_s
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency_s)
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+class DictCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, data, ttl=None, **_tags):
+        self.entries[key] = data
+        return True
+
+
+def make_patient():
+    patient_id = str(uuid.uuid4())
+    rx_ids = [str(uuid.uuid4()) for _ in range(4)]
+    tables = {
+        'patients': [{'patient_id': patient_id, 'firstname': 'Ana', 'lastname': 'Cruz', 'middlename': None,
+                      'date_of_birth': '2024-03-01', 'sex': 'female', 'bloodtype': 'O+'}],
+        'allergies': [{'allergy_id': str(uuid.uuid4()), 'patient_id': patient_id, 'allergen': f'Allergen {i}',
+                       'reaction_type': 'rash', 'severity': 'mild', 'date_identified': '2025-01-01', 'notes': None}
+                      for i in range(3)],
+        'prescriptions': [{'rx_id': rx_id, 'patient_id': patient_id, 'prescription_date': f'2025-0{i + 1}-01',
+                           'doctor': {'firstname': 'Jose', 'lastname': 'Reyes'},
+                           'facility': {'facility_name': 'Clinic', 'address': '1 Main St', 'city': 'Cebu'}}
+                          for i, rx_id in enumerate(rx_ids)],
+        'prescription_medications': [{'med_id': str(uuid.uuid4()), 'rx_id': rx_id, 'medication_name': 'Paracetamol',
+                                      'dosage': '5 ml'} for rx_id in rx_ids for _ in range(2)],
+        'vaccinations': [{'vax_id': str(uuid.uuid4()), 'patient_id': patient_id, 'vaccine_name': 'BCG',
+                          'dose_number': i + 1, 'administered_date': f'2024-0{i + 3}-01', 'administered_by': None,
+                          'next_dose_due': None, 'notes': None, 'is_deleted': i == 4} for i in range(5)],
+        'appointments': [{'appointment_id': str(uuid.uuid4()), 'patient_id': patient_id, 'doctor_id': None,
+                          'facility_id': None, 'appointment_date': f'2025-0{i + 1}-15', 'appointment_time': '09:00',
+                          'appointment_type': 'checkup', 'status': 'completed', 'reason': None, 'notes': None,
+                          'updated_at': None} for i in range(6)],
+        'anthropometric_measurements': [{'am_id': str(uuid.uuid4()), 'patient_id': patient_id,
+                                         'measurement_date': f'2025-0{i + 1}-10', 'height': 70 + i, 'weight': 8 + i,
+                                         'head_circumference': 44, 'chest_circumference': None,
+                                         'abdominal_circumference': None, 'recorded_by': None,
+                                         'recorded_at': f'2025-0{i + 1}-10T00:00:00+00:00'} for i in range(8)],
+    }
+    return patient_id, tables
+
+
+def assemble_before(client, patient_id, scope):
+    """The previous assembly: patient row, then one section after another."""
+    result = snapshot._load_patient(client, patient_id)
+    for section in snapshot.plan_sections(scope):
+        try:
+            result[section] = snapshot.SECTION_LOADERS[section](client, patient_id)
+        except Exception:
+            result[section] = []
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round trip per query')
+    parser.add_argument('--scans', type=int, default=20, help='scans of the same code per scope')
+    args = parser.parse_args()
+
+    patient_id, tables = make_patient()
+    client = FakeSupabase(tables, args.latency_ms / 1000)
+    cache = DictCache()
+    snapshot.supabase_service_role_client = lambda: client
+    snapshot.cache_get = cache.get
+    snapshot.cache_set = cache.set
+
+    app = Flask(__name__)
+    scopes = [['view_only'], ['allergies'], ['vaccinations'], ['vitals'], ['prescriptions', 'appointments'],
+              ['full_access']]
+
+    print(f"Simulated round trip: {args.latency_ms} ms, {args.scans} scans per scope")
+    print(f"{'scope':>26} | {'before ms':>9} {'trips':>6} | {'after ms':>8} {'trips':>6} | {'speedup':>7}")
+    print("-" * 78)
+
+    with app.app_context():
+        for scope in scopes:
+            client.round_trips = 0
+            start = time.perf_counter()
+            before = [assemble_before(client, patient_id, scope) for _ in range(args.scans)]
+            before_ms = (time.perf_counter() - start) * 1000
+            before_trips = client.round_trips
+
+            client.round_trips = 0
+            start = time.perf_counter()
+            after = [snapshot.get_patient_data_by_scope(patient_id, scope) for _ in range(args.scans)]
+            after_ms = (time.perf_counter() - start) * 1000
+            after_trips = client.round_trips
+
+            if before != after:
+                print(f"Result mismatch for scope {scope}")
+                return 1
+            if cache.get(snapshot._snapshot_key(patient_id, snapshot.plan_sections(scope))) is None:
+                print(f"Snapshot for scope {scope} was not cached (a section failed to load)")
+                return 1
+            client.round_trips = 0
+            snapshot.get_patient_data_by_scope(patient_id, scope)
+            if client.round_trips:
+                print(f"Warm scan for scope {scope} still made {client.round_trips} round trips")
+                return 1
+
+            label = ','.join(scope)
+            print(f"{label:>26} | {before_ms:>9.1f} {before_trips:>6} | {after_ms:>8.1f} {after_trips:>6} | "
+                  f"{before_ms / after_ms:>6.1f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,10 +17,10 @@ logger = logging.getLogger(__name__)
 class EmailConfig:
     """Gmail SMTP configuration for sending emails"""
 
-    # Gmail SMTP settings
-    SMTP_SERVER = "smtp.gmail.com"
-    SMTP_PORT = 587  # TLS port
-    SMTP_USE_TLS = True
+    # Gmail SMTP settings (overridable, e.g. to point at utils/local_smtp.py in development)
+    SMTP_SERVER = os.environ.get('SMTP_SERVER', "smtp.gmail.com")
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))  # TLS port
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'True').lower() == 'true'
 
     # Email credentials from environment variables
     SMTP_EMAIL = os.environ.get('SMTP_EMAIL', '')
@@ -190,5 +190,5 @@ If Gmail doesn't work, you can use:
 - AWS SES: email-smtp.us-east-1.amazonaws.com:587
 - Mailgun: smtp.mailgun.org:587
 
-Just update SMTP_SERVER and SMTP_PORT in this file.
+Just set SMTP_SERVER and SMTP_PORT in your .env file.
 """
@@ -3,7 +3,13 @@ load_dotenv()
 
 from flask import Blueprint, g
 from supabase import create_client, Client
+from postgrest import SyncPostgrestClient
+from collections import OrderedDict
+import hashlib
+import httpx
 import os
+import threading
+import time
 
 settings_bp = Blueprint('settings', __name__)
 url = os.environ.get("SUPABASE_URL")
@@ -14,6 +20,111 @@ service_role = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 anon_client = create_client(url, key)
 sr_client = create_client(url, service_role)
 
+# Authenticated (per-token) clients. Each is only a PostgREST client bound to
+# one access token; all of them share a single keep-alive HTTP connection pool.
+AUTH_CLIENT_CACHE_SIZE = int(os.environ.get('AUTH_CLIENT_CACHE_SIZE', 256))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('SUPABASE_HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('SUPABASE_HTTP_MAX_KEEPALIVE', 20))
+HTTP_TIMEOUT = float(os.environ.get('SUPABASE_HTTP_TIMEOUT', 120))
+
+rest_url = f"{url.rstrip('/')}/rest/v1" if url else None
+
+_pool_stats = {
+    'hits': 0,
+    'misses': 0,
+    'evictions': 0,
+    'construct_ms_total': 0.0,
+    'http_requests': 0,
+    'connections_opened': 0,
+}
+_pool_stats_lock = threading.Lock()
+
+
+def _count(stat: str, amount=1):
+    with _pool_stats_lock:
+        _pool_stats[stat] += amount
+
+
+def _trace_connections(event_name, info):
+    # httpcore trace hook: only fires when a new TCP connection is opened
+    if event_name == 'connection.connect_tcp.complete':
+        _count('connections_opened')
+
+
+def _on_http_request(request):
+    _count('http_requests')
+    request.extensions['trace'] = _trace_connections
+
+
+_http_client = httpx.Client(
+    timeout=HTTP_TIMEOUT,
+    follow_redirects=True,
+    http2=True,
+    limits=httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    ),
+    event_hooks={'request': [_on_http_request]},
+)
+
+
+class AuthenticatedClient:
+    """PostgREST client bound to one user's access token.
+
+    Exposes the query surface routes use on ``get_authenticated_client()``
+    (``table``, ``from_``, ``rpc``, ``schema``, ``postgrest``). Anything else
+    (storage, auth, functions) is served by the anon client, exactly as with
+    the full client that used to be built per request, whose token was only
+    ever applied to PostgREST.
+    """
+
+    __slots__ = ('postgrest',)
+
+    def __init__(self, access_token: str):
+        self.postgrest = SyncPostgrestClient(
+            rest_url,
+            headers={'apiKey': key, 'Authorization': f"Bearer {access_token}"},
+            http_client=_http_client,
+        )
+
+    def table(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def from_(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def rpc(self, fn: str, params=None, **kwargs):
+        return self.postgrest.rpc(fn, params or {}, **kwargs)
+
+    def schema(self, schema: str):
+        return self.postgrest.schema(schema)
+
+    def __getattr__(self, name):
+        return getattr(anon_client, name)
+
+
+_auth_clients: "OrderedDict[str, AuthenticatedClient]" = OrderedDict()
+_auth_clients_lock = threading.Lock()
+
+
+def get_client_pool_stats() -> dict:
+    """Per-process metrics of the authenticated client pool and its HTTP connections."""
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    with _auth_clients_lock:
+        stats['size'] = len(_auth_clients)
+    stats['max_size'] = AUTH_CLIENT_CACHE_SIZE
+
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    stats['avg_construct_ms'] = round(stats['construct_ms_total'] / stats['misses'], 3) if stats['misses'] else None
+    stats['construct_ms_total'] = round(stats['construct_ms_total'], 3)
+    stats['connection_reuse_rate'] = (
+        round(1 - stats['connections_opened'] / stats['http_requests'], 4)
+        if stats['http_requests'] else None
+    )
+    return stats
+
 def supabase_anon_client() -> Client:
     """Returns the anonymous Supabase client (no user context)"""
     return anon_client
@@ -40,22 +151,44 @@ def get_authenticated_client() -> Client:
 
 def set_authenticated_client(access_token: str) -> Client:
     """
-    Creates and stores an authenticated Supabase client for the current request.
+    Stores an authenticated Supabase client for the current request.
     Called by @require_auth decorator after validating the session.
 
+    Clients come from a bounded LRU keyed by a hash of the token, so the
+    requests of one session reuse the same client until the token is
+    refreshed. A miss only builds a lightweight PostgREST client on the shared
+    HTTP connection pool instead of a full Supabase client.
+
     Args:
         access_token: The user's JWT access token from Supabase Auth
 
     Returns:
-        The authenticated Supabase client
+        The authenticated client (PostgREST with the user's JWT, so auth.uid()
+        works in RLS policies)
     """
-    # Create a standard client with the anon key
-    # Then use postgrest.auth() to set the JWT token for RLS policies
-    # This is the recommended approach that works across supabase-py versions
-    auth_client = create_client(url, key)
-
-    # Set the JWT token for PostgREST requests - this enables auth.uid() in RLS
-    auth_client.postgrest.auth(access_token)
+    token_key = hashlib.sha256(access_token.encode()).hexdigest()
+
+    with _auth_clients_lock:
+        auth_client = _auth_clients.get(token_key)
+        if auth_client is not None:
+            _auth_clients.move_to_end(token_key)
+
+    if auth_client is not None:
+        _count('hits')
+    else:
+        started = time.perf_counter()
+        auth_client = AuthenticatedClient(access_token)
+        _count('misses')
+        _count('construct_ms_total', (time.perf_counter() - started) * 1000)
+
+        evicted = 0
+        with _auth_clients_lock:
+            _auth_clients[token_key] = auth_client
+            while len(_auth_clients) > AUTH_CLIENT_CACHE_SIZE:
+                _auth_clients.popitem(last=False)
+                evicted += 1
+        if evicted:
+            _count('evictions', evicted)
 
     # Store in Flask's g object for request-scoped access
     g.supabase_auth_client = auth_client
@@ -11,6 +11,9 @@ from config.settings import settings_bp
 from config.settings import supabase_anon_client
 from utils.audit_logger import configure_audit_logger
 from utils.redis_client import get_redis_client, clear_corrupted_sessions
+from utils.growth_standards import load_growth_standards
+from utils.sessions import ensure_session_index
+from utils.write_behind import start_worker as start_write_behind_worker
 
 from routes.auth_routes import auth_bp
 from routes.admin_routes import admin_bp
@@ -64,6 +67,26 @@ try:
 except Exception as e:
     print(f"[WARNING] Could not clear corrupted sessions: {e}")
 
+# Index sessions created before the per-user session index existed (runs once per Redis)
+try:
+    indexed_count = ensure_session_index()
+    if indexed_count > 0:
+        print(f"[OK] Indexed {indexed_count} existing sessions")
+except Exception as e:
+    print(f"[WARNING] Could not build session index: {e}")
+
+# Reclaim write-behind entries (audit log rows included) left pending by a deploy or crash
+try:
+    start_write_behind_worker(app)
+except Exception as e:
+    print(f"[WARNING] Could not start write-behind worker: {e}")
+
+# Load WHO growth standard tables once so report requests never parse them
+try:
+    load_growth_standards()
+except Exception as e:
+    print(f"[WARNING] Could not load WHO growth standards: {e}")
+
 # Initializing google OAuth w/ error handling
 try:
     init_google_oauth(app)
@@ -0,0 +1,185 @@
+-- ============================================================================
+-- ADMIN REPORT AGGREGATES - KEEPSAKE Healthcare
+-- ============================================================================
+-- Grouped counts behind the admin reports (routes/admin/admin_reports.py).
+-- The reports used to download every row of users and audit_logs and bucket
+-- them in Python; these functions return the already-bucketed day/role
+-- counts, so payload size stays constant as the tables grow (the same
+-- approach as count_patients_by_facility for the facility stats).
+--
+-- Date ranges are [p_start, p_end): callers pass the day after end_date.
+-- Days are taken from the stored timestamps as-is (UTC on Supabase), which is
+-- what slicing the ISO strings with [:10] did before.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_users_last_sign_in_at ON users(last_sign_in_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action_timestamp ON audit_logs(action_timestamp);
+
+-- ----------------------------------------------------------------------------
+-- Registrations, active users and logins per day.
+--   p_start/p_end         optional created_at window for the users counted
+--   p_same_day_logins     FALSE: logins are bucketed by last_sign_in_at day
+--                         TRUE:  a login only counts on the user's creation day
+--                                (the /admin/reports/user-activity semantics)
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION report_user_activity_by_day(
+    p_start DATE DEFAULT NULL,
+    p_end DATE DEFAULT NULL,
+    p_same_day_logins BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    day DATE,
+    registrations BIGINT,
+    active_users BIGINT,
+    logins BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    WITH scoped AS (
+        SELECT u.created_at, u.last_sign_in_at, u.is_active
+        FROM users u
+        WHERE (p_start IS NULL OR u.created_at >= p_start)
+          AND (p_end IS NULL OR u.created_at < p_end)
+    ),
+    created AS (
+        SELECT
+            created_at::date AS day,
+            COUNT(*) AS registrations,
+            COUNT(*) FILTER (WHERE is_active) AS active_users,
+            COUNT(*) FILTER (WHERE last_sign_in_at::date = created_at::date) AS same_day_logins
+        FROM scoped
+        WHERE created_at IS NOT NULL
+        GROUP BY 1
+    ),
+    signed_in AS (
+        SELECT last_sign_in_at::date AS day, COUNT(*) AS logins
+        FROM scoped
+        WHERE last_sign_in_at IS NOT NULL
+          AND NOT p_same_day_logins
+        GROUP BY 1
+    )
+    SELECT
+        COALESCE(c.day, s.day) AS day,
+        COALESCE(c.registrations, 0) AS registrations,
+        COALESCE(c.active_users, 0) AS active_users,
+        CASE WHEN p_same_day_logins THEN COALESCE(c.same_day_logins, 0)
+             ELSE COALESCE(s.logins, 0) END AS logins
+    FROM created c
+    FULL OUTER JOIN signed_in s ON s.day = c.day
+    ORDER BY 1;
+$$;
+
+-- ----------------------------------------------------------------------------
+-- Users per role, optionally restricted to active/inactive users.
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION report_user_role_counts(p_is_active BOOLEAN DEFAULT NULL)
+RETURNS TABLE (
+    role TEXT,
+    user_count BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT u.role::TEXT, COUNT(*) AS user_count
+    FROM users u
+    WHERE p_is_active IS NULL OR u.is_active = p_is_active
+    GROUP BY u.role;
+$$;
+
+-- ----------------------------------------------------------------------------
+-- Audit log usage categories within [p_start, p_end).
+-- Categories are exclusive and evaluated in order: view, report, export.
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION report_audit_usage(
+    p_start DATE DEFAULT NULL,
+    p_end DATE DEFAULT NULL
+)
+RETURNS TABLE (
+    total BIGINT,
+    views BIGINT,
+    reports_generated BIGINT,
+    data_exports BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE a.action_type = 'VIEW') AS views,
+        COUNT(*) FILTER (
+            WHERE a.action_type IS DISTINCT FROM 'VIEW'
+              AND a.action_type = 'CREATE'
+              AND a.table_name ILIKE '%report%'
+        ) AS reports_generated,
+        COUNT(*) FILTER (
+            WHERE a.action_type IS DISTINCT FROM 'VIEW'
+              AND NOT (a.action_type IS NOT DISTINCT FROM 'CREATE' AND COALESCE(a.table_name, '') ILIKE '%report%')
+              AND a.table_name ILIKE '%export%'
+        ) AS data_exports
+    FROM audit_logs a
+    WHERE (p_start IS NULL OR a.action_timestamp >= p_start)
+      AND (p_end IS NULL OR a.action_timestamp < p_end);
+$$;
+
+-- ----------------------------------------------------------------------------
+-- Headline counts for the summary metrics, in one round trip.
+--   p_recent_since    logins on/after this day count as recent (last 7 days)
+--   p_previous_since  logins in [p_previous_since, p_recent_since) are the
+--                     previous period (days 8-14)
+--   p_api_since       audit log entries on/after this day count as API calls
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION report_summary_counts(
+    p_recent_since DATE,
+    p_previous_since DATE,
+    p_api_since DATE
+)
+RETURNS TABLE (
+    total_users BIGINT,
+    active_users BIGINT,
+    recent_logins BIGINT,
+    previous_logins BIGINT,
+    total_facilities BIGINT,
+    active_facilities BIGINT,
+    total_appointments BIGINT,
+    api_calls BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT
+        u.total_users,
+        u.active_users,
+        u.recent_logins,
+        u.previous_logins,
+        f.total_facilities,
+        f.active_facilities,
+        (SELECT COUNT(*) FROM appointments) AS total_appointments,
+        (SELECT COUNT(*) FROM audit_logs WHERE action_timestamp >= p_api_since) AS api_calls
+    FROM (
+        SELECT
+            COUNT(*) AS total_users,
+            COUNT(*) FILTER (WHERE is_active) AS active_users,
+            COUNT(*) FILTER (WHERE last_sign_in_at >= p_recent_since) AS recent_logins,
+            COUNT(*) FILTER (WHERE last_sign_in_at >= p_previous_since
+                               AND last_sign_in_at < p_recent_since) AS previous_logins
+        FROM users
+    ) u
+    CROSS JOIN (
+        SELECT
+            COUNT(*) AS total_facilities,
+            COUNT(*) FILTER (WHERE deleted_at IS NULL) AS active_facilities
+        FROM healthcare_facilities
+    ) f;
+$$;
+
+-- Reports run with the service role client
+GRANT EXECUTE ON FUNCTION report_user_activity_by_day(DATE, DATE, BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION report_user_role_counts(BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION report_audit_usage(DATE, DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION report_summary_counts(DATE, DATE, DATE) TO service_role;
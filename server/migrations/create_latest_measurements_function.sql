@@ -0,0 +1,43 @@
+-- ============================================================================
+-- LATEST ANTHROPOMETRIC MEASUREMENT PER PATIENT - KEEPSAKE Healthcare
+-- ============================================================================
+-- Returns the most recent anthropometric measurement for every patient in a
+-- list in a single call, so facility reports no longer issue one
+-- "ORDER BY measurement_date DESC LIMIT 1" query per patient.
+--
+-- SECURITY INVOKER keeps RLS in force for the calling user.
+-- ============================================================================
+
+-- Supports both the DISTINCT ON scan below and per-patient history lookups.
+-- The NULLS LAST ordering has to match the ORDER BY for the scan to use it.
+DROP INDEX IF EXISTS idx_anthropometric_patient_date;
+CREATE INDEX idx_anthropometric_patient_date
+    ON anthropometric_measurements(patient_id, measurement_date DESC NULLS LAST, recorded_at DESC NULLS LAST);
+
+CREATE OR REPLACE FUNCTION get_latest_measurements(p_patient_ids UUID[])
+RETURNS TABLE (
+    patient_id UUID,
+    weight NUMERIC,
+    height NUMERIC,
+    head_circumference NUMERIC,
+    measurement_date DATE,
+    recorded_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT DISTINCT ON (am.patient_id)
+        am.patient_id,
+        am.weight,
+        am.height,
+        am.head_circumference,
+        am.measurement_date,
+        am.recorded_at
+    FROM anthropometric_measurements am
+    WHERE am.patient_id = ANY(p_patient_ids)
+    ORDER BY am.patient_id, am.measurement_date DESC NULLS LAST, am.recorded_at DESC NULLS LAST;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_latest_measurements(UUID[]) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_latest_measurements(UUID[]) TO service_role;
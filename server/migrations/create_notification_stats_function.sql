@@ -0,0 +1,58 @@
+-- ============================================================================
+-- NOTIFICATION STATS - KEEPSAKE Healthcare
+-- ============================================================================
+-- Per-type counts of one user's notifications, used to seed and reconcile the
+-- Redis stats counters in utils/notification_stats.py. The counters are kept
+-- up to date by the notification routes; this function is only called when a
+-- user's counters are missing or have expired, so the full history is
+-- grouped in the database instead of being downloaded row by row.
+--
+-- Every row also carries the (created_at, notification_id) of the user's
+-- newest notification, read in the same statement as the counts, so the
+-- counters can skip inserts they already include when those rows are
+-- published later.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type
+    ON notifications(user_id, notification_type);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created
+    ON notifications(user_id, created_at DESC, notification_id DESC);
+
+-- The result columns changed, which CREATE OR REPLACE cannot do
+DROP FUNCTION IF EXISTS get_notification_stats(UUID);
+
+CREATE FUNCTION get_notification_stats(p_user_id UUID)
+RETURNS TABLE (
+    notification_type TEXT,
+    total BIGINT,
+    unread BIGINT,
+    archived BIGINT,
+    newest_created_at TIMESTAMPTZ,
+    newest_id TEXT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    WITH newest AS (
+        SELECT created_at, notification_id::TEXT AS notification_id
+        FROM notifications
+        WHERE user_id = p_user_id
+        ORDER BY created_at DESC, notification_id DESC
+        LIMIT 1
+    )
+    SELECT
+        n.notification_type::TEXT,
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE NOT n.is_read) AS unread,
+        COUNT(*) FILTER (WHERE n.is_archived) AS archived,
+        (SELECT created_at FROM newest) AS newest_created_at,
+        (SELECT notification_id FROM newest) AS newest_id
+    FROM notifications n
+    WHERE n.user_id = p_user_id
+    GROUP BY n.notification_type;
+$$;
+
+-- Stats are read with the service role client
+GRANT EXECUTE ON FUNCTION get_notification_stats(UUID) TO service_role;
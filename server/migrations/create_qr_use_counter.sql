@@ -0,0 +1,35 @@
+-- ============================================================================
+-- ATOMIC QR USE COUNTER - KEEPSAKE Healthcare
+-- ============================================================================
+-- Consumes one use of a QR code in a single statement: the limit check and
+-- the increment happen in the same row update, so concurrent scans can never
+-- push use_count past max_uses.
+--
+-- The scan endpoints count uses in Redis (utils/qr_tokens.py) and only call
+-- this when Redis is unavailable. max_uses NULL or 0 means unlimited, the
+-- same as the Python check it replaces.
+--
+-- Returns the new use_count, or NULL when the code is inactive or exhausted.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION consume_qr_use(
+    p_qr_id UUID,
+    p_accessed_by UUID DEFAULT NULL
+)
+RETURNS INTEGER
+LANGUAGE sql
+VOLATILE
+SECURITY INVOKER
+AS $$
+    UPDATE qr_codes
+    SET use_count = COALESCE(use_count, 0) + 1,
+        last_accessed_at = NOW(),
+        last_accessed_by = COALESCE(p_accessed_by, last_accessed_by)
+    WHERE qr_id = p_qr_id
+      AND is_active
+      AND (max_uses IS NULL OR max_uses = 0 OR COALESCE(use_count, 0) < max_uses)
+    RETURNING use_count;
+$$;
+
+-- Scans run with the service role client
+GRANT EXECUTE ON FUNCTION consume_qr_use(UUID, UUID) TO service_role;
@@ -0,0 +1,14 @@
+-- ============================================================================
+-- EXPORT KEYSET INDEXES - KEEPSAKE Healthcare
+-- ============================================================================
+-- The audit log and parent subscription CSV exports (utils/csv_export.py)
+-- read newest rows first, one page at a time. Each page continues after the
+-- last (timestamp, id) pair it saw. These indexes match that order, so every
+-- page is an index range scan, however deep into the export it is.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_audit_logs_export_keyset
+    ON audit_logs (action_timestamp DESC, log_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_parent_subscriptions_export_keyset
+    ON parent_subscriptions (created_at DESC, subscription_id DESC);
@@ -0,0 +1,68 @@
+-- ============================================================================
+-- APPOINTMENT LIST WINDOWS - KEEPSAKE Healthcare
+-- ============================================================================
+-- Supports the windowed appointment lists in
+-- routes/pediapro/doctor_appointments.py:
+--
+--   ?from=&to=          appointment_date range
+--   ?limit=&cursor=     keyset pages ordered by (appointment_date, appointment_id) DESC
+--   ?updated_since=     delta sync on updated_at
+--
+-- The composite indexes match each list's filter column followed by the page
+-- order, so a page is an index range scan instead of a sort of the whole
+-- facility/doctor/patient history.
+--
+-- patient_name and doctor_name are written with the appointment since the
+-- scheduling and update endpoints started storing them; the backfill below
+-- fills rows created before that so reads never have to rebuild the names.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_appointments_facility_date
+    ON appointments(facility_id, appointment_date DESC, appointment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date
+    ON appointments(doctor_id, appointment_date DESC, appointment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_patient_date
+    ON appointments(patient_id, appointment_date DESC, appointment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_date
+    ON appointments(appointment_date DESC, appointment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_appointments_updated_at ON appointments(updated_at);
+
+-- ----------------------------------------------------------------------------
+-- Keep updated_at current for every writer (API, triggers, manual fixes) and
+-- set it on insert too, so ?updated_since= needs only one column
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION touch_appointment_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_touch_appointment_updated_at ON appointments;
+CREATE TRIGGER trigger_touch_appointment_updated_at
+    BEFORE INSERT OR UPDATE ON appointments
+    FOR EACH ROW
+    EXECUTE FUNCTION touch_appointment_updated_at();
+
+-- ----------------------------------------------------------------------------
+-- Backfill updated_at and the denormalized names. The trigger stamps every
+-- backfilled row with NOW(), so delta clients re-read those rows once.
+-- ----------------------------------------------------------------------------
+UPDATE appointments
+SET updated_at = NOW()
+WHERE updated_at IS NULL;
+
+UPDATE appointments a
+SET patient_name = CONCAT_WS(' ', p.firstname, NULLIF(p.middlename, ''), p.lastname)
+FROM patients p
+WHERE a.patient_id = p.patient_id
+  AND a.patient_name IS NULL;
+
+UPDATE appointments a
+SET doctor_name = CONCAT_WS(' ', u.firstname, u.lastname)
+FROM users u
+WHERE a.doctor_id = u.user_id
+  AND a.doctor_name IS NULL;
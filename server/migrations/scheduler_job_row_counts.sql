@@ -0,0 +1,125 @@
+-- ============================================================================
+-- SCHEDULED JOB ROW COUNTS - KEEPSAKE Healthcare
+-- ============================================================================
+-- The notification scheduler (schedulers/notification_scheduler.py) records
+-- how many rows each run processed. The two database jobs it calls used to
+-- return void; they now return the number of notifications created/deleted.
+-- Their behaviour is otherwise unchanged from
+-- create_automatic_notifications_system.sql.
+--
+-- The return type changes, so the functions are dropped and re-created and
+-- their grants re-applied.
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS create_upcoming_appointment_notifications();
+DROP FUNCTION IF EXISTS cleanup_expired_notifications();
+
+-- ----------------------------------------------------------------------------
+-- 24-hour upcoming appointment notifications; returns notifications created
+-- ----------------------------------------------------------------------------
+CREATE FUNCTION create_upcoming_appointment_notifications()
+RETURNS INTEGER AS $$
+DECLARE
+    appointment_record RECORD;
+    patient_record RECORD;
+    user_prefs RECORD;
+    created_count INTEGER := 0;
+BEGIN
+    -- Loop through appointments in the next 24-25 hours
+    FOR appointment_record IN
+        SELECT * FROM appointments
+        WHERE status = 'confirmed'
+        AND appointment_date BETWEEN NOW() + INTERVAL '24 hours' AND NOW() + INTERVAL '25 hours'
+    LOOP
+        -- Get patient information
+        SELECT * INTO patient_record
+        FROM patients
+        WHERE patient_id = appointment_record.patient_id;
+
+        -- Get user preferences
+        SELECT * INTO user_prefs
+        FROM notification_preferences
+        WHERE user_id = patient_record.parent_guardian_id
+        AND upcoming_appointment_enabled = true;
+
+        -- If user has disabled upcoming appointment notifications, skip
+        IF user_prefs IS NOT NULL THEN
+            -- Check if notification already exists for this appointment
+            IF NOT EXISTS (
+                SELECT 1 FROM notifications
+                WHERE related_appointment_id = appointment_record.appointment_id
+                AND notification_type = 'upcoming_appointment'
+                AND created_at > NOW() - INTERVAL '23 hours'
+            ) THEN
+                -- Insert upcoming appointment notification
+                INSERT INTO notifications (
+                    user_id,
+                    notification_type,
+                    title,
+                    message,
+                    priority,
+                    facility_id,
+                    action_url,
+                    metadata,
+                    related_appointment_id,
+                    related_patient_id,
+                    expires_at
+                ) VALUES (
+                    patient_record.parent_guardian_id,
+                    'upcoming_appointment',
+                    'Appointment Tomorrow',
+                    format('%s has an appointment tomorrow at %s',
+                        patient_record.first_name || ' ' || patient_record.last_name,
+                        TO_CHAR(appointment_record.appointment_date, 'HH12:MI AM')
+                    ),
+                    'normal',
+                    appointment_record.facility_id,
+                    '/appointments/' || appointment_record.appointment_id,
+                    jsonb_build_object(
+                        'appointment_id', appointment_record.appointment_id,
+                        'patient_name', patient_record.first_name || ' ' || patient_record.last_name,
+                        'appointment_date', appointment_record.appointment_date
+                    ),
+                    appointment_record.appointment_id,
+                    appointment_record.patient_id,
+                    appointment_record.appointment_date + INTERVAL '1 day'
+                );
+                created_count := created_count + 1;
+            END IF;
+        END IF;
+    END LOOP;
+
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ----------------------------------------------------------------------------
+-- Expired and old archived notification cleanup; returns rows deleted
+-- ----------------------------------------------------------------------------
+CREATE FUNCTION cleanup_expired_notifications()
+RETURNS INTEGER AS $$
+DECLARE
+    archived_count INTEGER;
+    expired_count INTEGER;
+BEGIN
+    -- Delete archived notifications older than 30 days
+    DELETE FROM notifications
+    WHERE is_archived = true
+    AND archived_at < NOW() - INTERVAL '30 days';
+    GET DIAGNOSTICS archived_count = ROW_COUNT;
+
+    -- Delete expired notifications
+    DELETE FROM notifications
+    WHERE expires_at IS NOT NULL
+    AND expires_at < NOW()
+    AND is_archived = false;
+    GET DIAGNOSTICS expired_count = ROW_COUNT;
+
+    RETURN archived_count + expired_count;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION create_upcoming_appointment_notifications() TO authenticated;
+GRANT EXECUTE ON FUNCTION cleanup_expired_notifications() TO authenticated;
+GRANT EXECUTE ON FUNCTION create_upcoming_appointment_notifications() TO service_role;
+GRANT EXECUTE ON FUNCTION cleanup_expired_notifications() TO service_role;
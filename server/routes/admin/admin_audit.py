@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request, current_app
 from utils.access_control import require_auth, require_role
 from config.settings import supabase
+from utils.csv_export import keyset_rows, stream_csv
 from datetime import datetime, timedelta
 
 audit_bp = Blueprint('audit', __name__)
@@ -297,104 +298,83 @@ def get_auditable_tables():
 @require_auth
 @require_role('admin')
 def export_audit_logs():
-    """Export audit logs to CSV format"""
+    """Export audit logs to CSV format, streamed in keyset-paginated chunks"""
     try:
-        from flask import make_response
-        import csv
-        from io import StringIO
-
         # Get query parameters for filtering
         action_type = request.args.get('action_type')
         table_name = request.args.get('table_name')
         user_id = request.args.get('user_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-
-        # Build query
-        query = supabase.table('audit_logs').select(
-            '''
-            log_id,
-            action_timestamp,
-            action_type,
-            table_name,
-            record_id,
-            ip_address,
-            session_id,
-            old_values,
-            new_values,
-            users!audit_logs_user_id_fkey(
-                user_id,
-                email,
-                firstname,
-                lastname,
-                role
-            )
-            '''
-        )
-
-        # Apply filters
-        if action_type:
-            query = query.eq('action_type', action_type)
-        if table_name:
-            query = query.eq('table_name', table_name)
-        if user_id:
-            query = query.eq('user_id', user_id)
-        if start_date:
-            query = query.gte('action_timestamp', start_date)
+        end_before = None
         if end_date:
             end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            end_datetime = end_datetime + timedelta(days=1)
-            query = query.lt('action_timestamp', end_datetime.isoformat())
-
-        # Order by most recent first
-        query = query.order('action_timestamp', desc=True)
-
-        # Execute query
-        response = query.execute()
-
-        if getattr(response, 'error', None):
-            current_app.logger.error(f"Failed to fetch audit logs for export: {response.error}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch audit logs for export"
-            }), 500
-
-        logs = response.data
+            end_before = (end_datetime + timedelta(days=1)).isoformat()
+
+        def build_query():
+            query = supabase.table('audit_logs').select(
+                '''
+                log_id,
+                action_timestamp,
+                action_type,
+                table_name,
+                record_id,
+                ip_address,
+                session_id,
+                old_values,
+                new_values,
+                users!audit_logs_user_id_fkey(
+                    user_id,
+                    email,
+                    firstname,
+                    lastname,
+                    role
+                )
+                '''
+            )
 
-        # Create CSV
-        si = StringIO()
-        fieldnames = [
-            'Log ID', 'Timestamp', 'User Email', 'User Name', 'User Role',
-            'Action Type', 'Table Name', 'Record ID', 'IP Address',
-            'Session ID', 'Old Values', 'New Values'
-        ]
-        writer = csv.DictWriter(si, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for log in logs:
+            # Apply filters
+            if action_type:
+                query = query.eq('action_type', action_type)
+            if table_name:
+                query = query.eq('table_name', table_name)
+            if user_id:
+                query = query.eq('user_id', user_id)
+            if start_date:
+                query = query.gte('action_timestamp', start_date)
+            if end_before:
+                query = query.lt('action_timestamp', end_before)
+            return query
+
+        def to_row(log):
             user = log.get('users', {}) or {}
-            writer.writerow({
-                'Log ID': log.get('log_id', ''),
-                'Timestamp': log.get('action_timestamp', ''),
-                'User Email': user.get('email', ''),
-                'User Name': f"{user.get('firstname', '')} {user.get('lastname', '')}".strip(),
-                'User Role': user.get('role', ''),
-                'Action Type': log.get('action_type', ''),
-                'Table Name': log.get('table_name', ''),
-                'Record ID': log.get('record_id', ''),
-                'IP Address': log.get('ip_address', ''),
-                'Session ID': log.get('session_id', ''),
-                'Old Values': str(log.get('old_values', '')),
-                'New Values': str(log.get('new_values', ''))
-            })
-
-        output = make_response(si.getvalue())
-        output.headers["Content-Disposition"] = f"attachment; filename=audit_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        output.headers["Content-type"] = "text/csv"
-
-        current_app.logger.info(f"Admin exported {len(logs)} audit log entries")
-
-        return output
+            return [
+                log.get('log_id', ''),
+                log.get('action_timestamp', ''),
+                user.get('email', ''),
+                f"{user.get('firstname', '')} {user.get('lastname', '')}".strip(),
+                user.get('role', ''),
+                log.get('action_type', ''),
+                log.get('table_name', ''),
+                log.get('record_id', ''),
+                log.get('ip_address', ''),
+                log.get('session_id', ''),
+                str(log.get('old_values', '')),
+                str(log.get('new_values', ''))
+            ]
+
+        current_app.logger.info("Admin started an audit log export")
+
+        # Most recent first, like the audit log list
+        return stream_csv(
+            'audit_logs',
+            header=[
+                'Log ID', 'Timestamp', 'User Email', 'User Name', 'User Role',
+                'Action Type', 'Table Name', 'Record ID', 'IP Address',
+                'Session ID', 'Old Values', 'New Values'
+            ],
+            rows=(to_row(log) for log in keyset_rows(build_query, 'action_timestamp', 'log_id'))
+        )
 
     except Exception as e:
         current_app.logger.error(f"Error exporting audit logs: {str(e)}")
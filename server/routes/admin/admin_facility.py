@@ -2,9 +2,9 @@ from flask import Blueprint, jsonify, request, current_app
 from utils.access_control import require_auth, require_role
 from config.settings import supabase, supabase_service_role_client
 from utils.redis_client import get_redis_client
-from utils.invalidate_cache import invalidate_caches
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
+from utils.access_scope import invalidate_user_scope
 from utils.sanitize import sanitize_request_data
-import json
 import datetime
 from postgrest.exceptions import APIError as AuthApiError
 
@@ -31,10 +31,9 @@ def list_facilities():
 
         # If we have cached data, return it
         if not bust_cache:
-            cached = redis_client.get(FACILITY_CACHE_KEY)
+            cached_data = cache_get(FACILITY_CACHE_KEY)
 
-            if cached:
-                cached_data = json.loads(cached)
+            if cached_data is not None:
                 current_app.logger.debug(f"Returning cached facilities data ({len(cached_data)} facilities)")
                 return jsonify({
                     "status": "success",
@@ -58,7 +57,7 @@ def list_facilities():
             }), 400
 
         # Store fresh copy in Redis (5-minute TTL)
-        redis_client.setex(FACILITY_CACHE_KEY, 300, json.dumps(resp.data))
+        cache_set(FACILITY_CACHE_KEY, resp.data, 300, cache_type='facility')
         current_app.logger.info(f"Fetched {len(resp.data)} active facilities from database")
 
         return jsonify({
@@ -428,6 +427,7 @@ def assign_user_to_facility(facility_id):
                 current_app.logger.info(f"AUDIT: Successfully assigned {email} to facility {facility_id} as {role} by admin {current_user.get('email')}")
                 
                 invalidate_caches('facility_users', facility_id)
+                invalidate_user_scope(user_id)
                 
                 return jsonify({
                     "status": "success",
@@ -636,6 +636,7 @@ def update_facility_user(facility_id, user_id):
         # Invalidate caches after user update
         invalidate_caches('users', user_id)
         invalidate_caches('facility_users', facility_id)
+        invalidate_user_scope(user_id)
 
         # Audit logging is handled automatically by the database trigger
         current_app.logger.info(f"AUDIT: Successfully updated user {user_id} in facility {facility_id} by {current_user.get('email', 'unknown')}")
@@ -676,6 +677,7 @@ def delete_facility_user(facility_id, user_id):
         # Invalidate caches after removing user from facility
         invalidate_caches('users', user_id)
         invalidate_caches('facility_users', facility_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"AUDIT: Successfully removed user {user_id} from facility {facility_id} by {current_user.get('email', 'unknown')}")
         return jsonify({
@@ -882,9 +884,8 @@ def get_all_facility_users():
         # Check cache first
         cache_key = f"{FACILITY_USERS_CACHE_PREFIX}all"
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
+            cached_data = cache_get(cache_key)
+            if cached_data is not None:
                 return jsonify({
                     "status": "success",
                     "data": cached_data,
@@ -931,7 +932,7 @@ def get_all_facility_users():
             })
 
         # Cache the result for 5 minutes
-        redis_client.setex(cache_key, 300, json.dumps(facility_users))
+        cache_set(cache_key, facility_users, 300, cache_type='facility_users')
         current_app.logger.info(f"Fetched {len(facility_users)} facility user assignments from database")
 
         return jsonify({
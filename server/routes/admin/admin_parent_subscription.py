@@ -6,6 +6,7 @@ System admin endpoints for managing and viewing parent subscriptions
 from flask import Blueprint, jsonify, request, current_app
 from utils.access_control import require_auth, require_role
 from config.settings import sr_client
+from utils.csv_export import keyset_rows, stream_csv
 from datetime import datetime, timezone, timedelta
 
 admin_parent_subscription_bp = Blueprint('admin_parent_subscription', __name__)
@@ -363,10 +364,12 @@ def list_all_payments():
 @require_role('admin')
 def export_subscriptions():
     """
-    Export all parent subscriptions data (CSV format)
+    Export all parent subscriptions data
 
     Query Parameters:
-        format (str, optional): Export format (csv/json) - default: csv
+        format (str, optional): Export format (csv/json) - default: json
+
+    CSV exports are streamed in keyset-paginated chunks.
 
     Returns:
         200: Exported data
@@ -375,24 +378,41 @@ def export_subscriptions():
     try:
         export_format = request.args.get('format', 'json').lower()
 
-        # Get all subscriptions with user details
-        resp = sr_client.table('parent_subscriptions')\
-            .select('*, users(first_name, last_name, email, phone_number)')\
-            .execute()
-
-        subscriptions = resp.data or []
+        def build_query():
+            return sr_client.table('parent_subscriptions')\
+                .select('*, users(first_name, last_name, email, phone_number)')
 
         if export_format == 'json':
+            # Get all subscriptions with user details
+            resp = build_query().execute()
             return jsonify({
                 "status": "success",
-                "data": subscriptions
+                "data": resp.data or []
             }), 200
-        else:
-            # TODO: Implement CSV export
-            return jsonify({
-                "status": "error",
-                "message": "CSV export not yet implemented"
-            }), 501
+
+        def to_row(sub):
+            user = sub.get('users') or {}
+            return [
+                sub.get('subscription_id', ''),
+                sub.get('user_id', ''),
+                f"{user.get('first_name') or ''} {user.get('last_name') or ''}".strip(),
+                user.get('email', ''),
+                user.get('phone_number', ''),
+                sub.get('plan_type', ''),
+                sub.get('status', ''),
+                sub.get('current_period_end', ''),
+                sub.get('cancel_at_period_end', ''),
+                sub.get('created_at', '')
+            ]
+
+        return stream_csv(
+            'parent_subscriptions',
+            header=[
+                'Subscription ID', 'User ID', 'Parent Name', 'Email', 'Phone',
+                'Plan Type', 'Status', 'Current Period End', 'Cancel At Period End', 'Created At'
+            ],
+            rows=(to_row(sub) for sub in keyset_rows(build_query, 'created_at', 'subscription_id'))
+        )
 
     except Exception as e:
         current_app.logger.error(f"Error exporting subscriptions: {str(e)}")
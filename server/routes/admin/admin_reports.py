@@ -3,8 +3,12 @@ from utils.access_control import require_auth, require_role
 from config.settings import supabase_service_role_client
 from datetime import datetime, timedelta
 from utils.redis_client import get_redis_client
+from concurrent.futures import ThreadPoolExecutor
 import json
 import hashlib
+import os
+import time
+import uuid
 
 reports_bp = Blueprint('reports', __name__)
 redis_client = get_redis_client()
@@ -94,10 +98,218 @@ def set_cache_data(cache_key, data):
     except Exception as e:
         current_app.logger.error(f"Error caching data: {str(e)}")
 
+# ============================================================================
+# STALE-WHILE-REVALIDATE CACHE
+# Entries are stored as {"data", "built_at"} and kept for CACHE_TTL + STALE_TTL.
+# Within CACHE_TTL they are fresh; after that they are still served while one
+# background rebuild, guarded by a Redis lock shared by all gunicorn workers,
+# replaces them.
+# ============================================================================
+
+STALE_TTL = int(os.environ.get('REPORTS_STALE_TTL', 3600))  # serve stale data for up to 1 hour
+REBUILD_LOCK_TTL = int(os.environ.get('REPORTS_REBUILD_LOCK_TTL', 120))  # longest expected rebuild
+COLD_WAIT_TIMEOUT = float(os.environ.get('REPORTS_COLD_WAIT_TIMEOUT', 30))
+COLD_WAIT_INTERVAL = 0.25
+
+# Compare-and-delete so a rebuild that outlived its lock never frees another worker's lock
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_rebuild_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reports-rebuild')
+
+def _acquire_rebuild_lock(cache_key):
+    token = uuid.uuid4().hex
+    if redis_client.set(f"lock:{cache_key}", token, nx=True, ex=REBUILD_LOCK_TTL):
+        return token
+    return None
+
+def _release_rebuild_lock(cache_key, token):
+    try:
+        redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{cache_key}", token)
+    except Exception as e:
+        current_app.logger.warning(f"Could not release rebuild lock for {cache_key}: {str(e)}")
+
+def _read_swr_entry(cache_key):
+    cached = redis_client.get(cache_key)
+    if not cached:
+        return None
+    try:
+        entry = json.loads(cached)
+        return entry if 'built_at' in entry else None
+    except Exception as e:
+        current_app.logger.error(f"Error parsing cached data: {str(e)}")
+        return None
+
+def _store_swr_entry(cache_key, data):
+    try:
+        entry = {'data': data, 'built_at': time.time()}
+        redis_client.setex(cache_key, CACHE_TTL + STALE_TTL, json.dumps(entry))
+    except Exception as e:
+        current_app.logger.error(f"Error caching data: {str(e)}")
+
+def _rebuild_in_background(app, cache_key, builder, token):
+    with app.app_context():
+        try:
+            _store_swr_entry(cache_key, builder())
+            app.logger.info(f"Background rebuild of {cache_key} finished")
+        except Exception as e:
+            app.logger.error(f"Background rebuild of {cache_key} failed: {str(e)}")
+        finally:
+            _release_rebuild_lock(cache_key, token)
+
+def _swr_response(entry, stale):
+    age = time.time() - entry['built_at']
+    return {
+        "data": entry['data'],
+        "cached": True,
+        "stale": stale,
+        "cache_expires_in": max(int(CACHE_TTL - age), 0)
+    }
+
+def get_swr_data(cache_key, builder, bust_cache=False):
+    """Return report data for *cache_key*, rebuilding it with *builder* at most once at a time.
+
+    Args:
+        cache_key: Redis key of the report bundle.
+        builder: Zero-argument callable that runs the report queries.
+        bust_cache: Rebuild synchronously and return fresh data.
+
+    Returns:
+        dict: ``data``, ``cached``, ``stale`` and ``cache_expires_in`` for the response.
+    """
+    entry = None if bust_cache else _read_swr_entry(cache_key)
+
+    if entry is not None:
+        if time.time() - entry['built_at'] < CACHE_TTL:
+            return _swr_response(entry, stale=False)
+
+        # Expired: serve it now, refresh in the background (one worker only)
+        token = _acquire_rebuild_lock(cache_key)
+        if token:
+            app = current_app._get_current_object()
+            _rebuild_executor.submit(_rebuild_in_background, app, cache_key, builder, token)
+        return _swr_response(entry, stale=True)
+
+    # Cold cache (or bust): the lock holder builds, everyone else waits for its result
+    token = _acquire_rebuild_lock(cache_key)
+    if not token and not bust_cache:
+        deadline = time.monotonic() + COLD_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(COLD_WAIT_INTERVAL)
+            entry = _read_swr_entry(cache_key)
+            if entry is not None:
+                return _swr_response(entry, stale=False)
+            if not redis_client.exists(f"lock:{cache_key}"):
+                # The holder failed without storing anything; take over
+                token = _acquire_rebuild_lock(cache_key)
+                if token:
+                    break
+        else:
+            current_app.logger.warning(f"Timed out waiting for rebuild of {cache_key}, building directly")
+
+    try:
+        data = builder()
+        _store_swr_entry(cache_key, data)
+    finally:
+        if token:
+            _release_rebuild_lock(cache_key, token)
+
+    return {"data": data, "cached": False, "stale": False, "cache_expires_in": CACHE_TTL}
+
 # ============================================================================
 # HELPER FUNCTIONS FOR REPORT CALCULATIONS
 # ============================================================================
 
+ROLE_DISPLAY_NAMES = {
+    'doctor': 'Doctors',
+    'nurse': 'Nurses',
+    'admin': 'Admins',
+    'parent': 'Parents',
+    'guardian': 'Parents',  # Group guardians with parents
+    'facility_admin': 'Facility Admins',
+    'staff': 'Staff'
+}
+
+ROLE_COLORS = {
+    'Doctors': '#3B82F6',
+    'Nurses': '#10B981',
+    'Admins': '#F59E0B',
+    'Parents': '#8B5CF6',
+    'Facility Admins': '#EF4444',
+    'Staff': '#6366F1'
+}
+
+def _exclusive_end(end_date):
+    """Day after *end_date* (YYYY-MM-DD) so the range includes end_date, or None"""
+    if not end_date:
+        return None
+    return (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+# Aggregations run in the database (migrations/create_admin_report_aggregates.sql)
+# so only already-bucketed rows cross the wire, however large users/audit_logs get.
+
+def fetch_user_activity_by_day(start_date=None, end_date=None, same_day_logins=False):
+    """Daily registrations, active users and logins as report rows sorted by date"""
+    resp = admin_supabase.rpc('report_user_activity_by_day', {
+        'p_start': start_date,
+        'p_end': _exclusive_end(end_date),
+        'p_same_day_logins': same_day_logins
+    }).execute()
+
+    return [{
+        'date': row['day'],
+        'logins': row['logins'],
+        'registrations': row['registrations'],
+        'active_users': row['active_users']
+    } for row in (resp.data or [])]
+
+def fetch_role_counts(is_active=None):
+    """User count per raw role value"""
+    resp = admin_supabase.rpc('report_user_role_counts', {'p_is_active': is_active}).execute()
+    return {row['role']: row['user_count'] for row in (resp.data or [])}
+
+def fetch_audit_usage(start_date=None, end_date=None):
+    """Audit log totals per usage category within the date range"""
+    resp = admin_supabase.rpc('report_audit_usage', {
+        'p_start': start_date,
+        'p_end': _exclusive_end(end_date)
+    }).execute()
+    rows = resp.data or []
+    return rows[0] if rows else {'total': 0, 'views': 0, 'reports_generated': 0, 'data_exports': 0}
+
+def fetch_summary_counts():
+    """Headline user/facility/appointment/audit counts in one round trip"""
+    now = datetime.now()
+    resp = admin_supabase.rpc('report_summary_counts', {
+        'p_recent_since': (now - timedelta(days=7)).strftime('%Y-%m-%d'),
+        'p_previous_since': (now - timedelta(days=14)).strftime('%Y-%m-%d'),
+        'p_api_since': (now - timedelta(days=30)).strftime('%Y-%m-%d')
+    }).execute()
+    rows = resp.data or []
+    if not rows:
+        raise RuntimeError("report_summary_counts returned no rows")
+    return rows[0]
+
+def calculate_system_health(counts, infrastructure_health):
+    """Combined business metrics (40%) + infrastructure health (60%)
+
+    20% from user activity + 20% from facility activity + 60% from
+    infrastructure - matches the dashboard calculation exactly.
+    """
+    total_users = counts['total_users']
+    total_facilities = counts['total_facilities']
+    user_health = (counts['active_users'] / total_users * 20) if total_users > 0 else 0
+    facility_health = (counts['active_facilities'] / total_facilities * 20) if total_facilities > 0 else 0
+    infrastructure_score = (infrastructure_health['overall'] * 0.6)
+    system_health = round(user_health + facility_health + infrastructure_score, 1)
+
+    current_app.logger.info(f"Reports System Health Calculation: user_health={user_health}, facility_health={facility_health}, infrastructure_score={infrastructure_score}, total={system_health}")
+    return system_health
+
 def get_current_year_month():
     """Get current year and month"""
     now = datetime.now()
@@ -174,10 +386,16 @@ def calculate_monthly_active_users(year, month):
         current_app.logger.error(f"Error calculating MAU: {str(e)}")
         return None
 
-def calculate_user_activity_metrics(user_activity, users_data):
-    """Calculate metrics specific to user activity report"""
+def calculate_user_activity_metrics(user_activity, recent_active, previous_active):
+    """Calculate metrics specific to user activity report
+
+    Args:
+        user_activity: Daily activity rows.
+        recent_active: Users who signed in within the last 7 days.
+        previous_active: Users whose last sign-in was 8-14 days ago.
+    """
     try:
-        current_app.logger.info(f"Calculating user activity metrics: {len(user_activity)} activity records, {len(users_data)} users")
+        current_app.logger.info(f"Calculating user activity metrics: {len(user_activity)} activity records")
 
         if not user_activity or len(user_activity) == 0:
             current_app.logger.warning("No user activity data available")
@@ -198,15 +416,7 @@ def calculate_user_activity_metrics(user_activity, users_data):
         peak_activity = max(user_activity, key=lambda x: x.get('logins', 0)) if user_activity else {}
         peak_date = peak_activity.get('date', 'N/A')
 
-        # Calculate active users in last 7 days vs previous 7 days for change %
-        now = datetime.now()
-        seven_days_ago = (now - timedelta(days=7)).strftime('%Y-%m-%d')
-        fourteen_days_ago = (now - timedelta(days=14)).strftime('%Y-%m-%d')
-
-        recent_active = sum(1 for u in users_data if u.get('last_sign_in_at', '') and u.get('last_sign_in_at', '') >= seven_days_ago)
-        previous_active = sum(1 for u in users_data
-                             if u.get('last_sign_in_at', '') and fourteen_days_ago <= u.get('last_sign_in_at', '') < seven_days_ago)
-
+        # Active users in last 7 days vs previous 7 days for change %
         if previous_active > 0:
             active_change = round(((recent_active - previous_active) / previous_active) * 100, 1)
         else:
@@ -326,7 +536,13 @@ def calculate_system_metrics(system_usage, all_logs_count=0):
 @require_auth
 @require_role('admin')
 def get_all_reports():
-    """Get all report data in a single optimized request - FAST & EFFICIENT"""
+    """Get all report data in a single optimized request - FAST & EFFICIENT
+
+    Served stale-while-revalidate: an expired bundle is returned immediately
+    while one background rebuild (guarded by a Redis lock across workers)
+    refreshes it, and concurrent requests on a cold cache wait for a single
+    rebuild instead of each running the full set of queries.
+    """
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -336,213 +552,159 @@ def get_all_reports():
 
         filters = {'start_date': start_date, 'end_date': end_date, 'role': role_filter, 'selected_month': selected_month}
         cache_key = get_cache_key('all_reports', filters)
-        cached_result = get_cached_data(cache_key, bust_cache)
 
-        if cached_result:
-            return jsonify({"status": "success", **cached_result}), 200
+        result = get_swr_data(cache_key, lambda: build_all_reports(**filters), bust_cache)
+        return jsonify({"status": "success", **result}), 200
 
-        end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
-
-        # Fetch ALL users data (NO DATE FILTERING - we'll filter on frontend)
-        # This gives accurate totals and allows frontend filtering without backend calls
-        all_users_query = admin_supabase.table('users').select('user_id, created_at, last_sign_in_at, is_active, role')
-        users = all_users_query.execute().data or []
-
-        # USER ACTIVITY
-        activity_by_date = {}
-
-        # Track registrations and active users by creation date
-        for user in users:
-            if user.get('created_at'):
-                date_str = user['created_at'][:10]
-                if date_str not in activity_by_date:
-                    activity_by_date[date_str] = {'date': date_str, 'logins': 0, 'registrations': 0, 'active_users': 0}
-                activity_by_date[date_str]['registrations'] += 1
-                if user.get('is_active'):
-                    activity_by_date[date_str]['active_users'] += 1
+    except Exception as e:
+        current_app.logger.error(f"Error fetching reports: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        # Track logins separately by last_sign_in_at date (FIXED!)
-        for user in users:
-            if user.get('last_sign_in_at'):
-                login_date = user['last_sign_in_at'][:10]
-                if login_date not in activity_by_date:
-                    activity_by_date[login_date] = {'date': login_date, 'logins': 0, 'registrations': 0, 'active_users': 0}
-                activity_by_date[login_date]['logins'] += 1
 
-        user_activity = sorted(activity_by_date.values(), key=lambda x: x['date'])
+def build_all_reports(start_date=None, end_date=None, role=None, selected_month=None):
+    """Run every query behind the consolidated reports bundle and return its data"""
+    role_filter = role
 
-        current_app.logger.info(f"User activity calculated: {len(user_activity)} days of activity, total logins across all days: {sum(d['logins'] for d in user_activity)}")
+    end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
 
-        # FACILITY STATS - OPTIMIZED with batched queries
-        # Performance improvement: 3n queries → 3 queries (where n = number of facilities)
-        facilities = admin_supabase.table('healthcare_facilities').select('facility_id, facility_name').execute().data or []
-        facility_ids = [f['facility_id'] for f in facilities]
+    # USER ACTIVITY - registrations/active users by creation day, logins by
+    # last_sign_in_at day, over ALL users (the frontend filters dates)
+    user_activity = fetch_user_activity_by_day()
 
-        if facility_ids:
-            # Batch query 1: All patients grouped by facility
-            patients_result = admin_supabase.rpc('count_patients_by_facility', {
-                'facility_ids': facility_ids
-            }).execute()
-            patients_by_fid = {row['facility_id']: row['count'] for row in (patients_result.data or [])}
-
-            # Batch query 2: All appointments grouped by facility (with optional date filtering)
-            appts_result = admin_supabase.rpc('count_appointments_by_facility', {
-                'facility_ids': facility_ids,
-                'start_date': start_date,
-                'end_date': end_datetime.strftime('%Y-%m-%d') if end_datetime else None
-            }).execute()
-            appts_by_fid = {row['facility_id']: row['count'] for row in (appts_result.data or [])}
-
-            # Batch query 3: All staff grouped by facility
-            staff_result = admin_supabase.rpc('count_staff_by_facility', {
-                'facility_ids': facility_ids
-            }).execute()
-            staff_by_fid = {row['facility_id']: row['count'] for row in (staff_result.data or [])}
-
-            # Build facility stats from aggregated data
-            facility_stats = []
-            for facility in facilities:
-                fid = facility['facility_id']
-                facility_stats.append({
-                    'facility': facility['facility_name'],
-                    'facility_id': fid,
-                    'patients': patients_by_fid.get(fid, 0),
-                    'appointments': appts_by_fid.get(fid, 0),
-                    'staff': staff_by_fid.get(fid, 0)
-                })
-        else:
-            facility_stats = []
-
-        # SYSTEM USAGE
-        audit_q = admin_supabase.table('audit_logs').select('action_type, table_name')
-        if start_date:
-            audit_q = audit_q.gte('action_timestamp', start_date)
-        if end_datetime:
-            audit_q = audit_q.lt('action_timestamp', end_datetime.strftime('%Y-%m-%d'))
-        logs = audit_q.execute().data or []
-        usage = {'Dashboard Views': 0, 'Reports Generated': 0, 'Data Exports': 0, 'User Logins': 0, 'API Calls': len(logs)}
-        for log in logs:
-            if log.get('action_type') == 'VIEW':
-                usage['Dashboard Views'] += 1
-        system_usage = [{'category': k, 'value': v} for k, v in usage.items()]
-
-        # USER ROLE DISTRIBUTION
-        role_users = admin_supabase.table('users').select('role').execute().data or []
-        if role_filter and role_filter != 'all':
-            role_users = [u for u in role_users if u.get('role') == role_filter]
-        role_counts = {}
-        for u in role_users:
-            role_display = {'doctor': 'Doctors', 'nurse': 'Nurses', 'admin': 'Admins', 'parent': 'Parents', 'guardian': 'Parents', 'facility_admin': 'Facility Admins', 'staff': 'Staff'}.get(u.get('role', ''), 'Other')
-            role_counts[role_display] = role_counts.get(role_display, 0) + 1
-        colors = {'Doctors': '#3B82F6', 'Nurses': '#10B981', 'Admins': '#F59E0B', 'Parents': '#8B5CF6', 'Facility Admins': '#EF4444', 'Staff': '#6366F1'}
-        user_role_distribution = sorted([{'name': n, 'value': c, 'color': colors.get(n, '#6B7280')} for n, c in role_counts.items()], key=lambda x: x['value'], reverse=True)
-
-        # SUMMARY METRICS - Get ALL data (no filtering) - MATCH DASHBOARD CALCULATION EXACTLY
-        # Get ALL users (including admin role - match dashboard)
-        all_users_response = admin_supabase.table('users').select('user_id, is_active').execute()
-        all_users_data = all_users_response.data or []
-        total_users = len(all_users_data)
-        active_users_count = len([u for u in all_users_data if u.get('is_active')])
-
-        # Get ALL facilities (match dashboard)
-        all_facilities_response = admin_supabase.table('healthcare_facilities').select('facility_id, deleted_at').execute()
-        all_facilities_data = all_facilities_response.data or []
-        total_facilities_count = len(all_facilities_data)
-        active_facilities_count = len([f for f in all_facilities_data if not f.get('deleted_at')])
-
-        # Other metrics
-        total_appts = admin_supabase.table('appointments').select('appointment_id', count='exact').execute()
-        recent_act = admin_supabase.table('users').select('user_id', count='exact').gte('last_sign_in_at', (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')).execute()
-        api_calls = admin_supabase.table('audit_logs').select('log_id', count='exact').gte('action_timestamp', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')).execute()
+    current_app.logger.info(f"User activity calculated: {len(user_activity)} days of activity, total logins across all days: {sum(d['logins'] for d in user_activity)}")
 
-        # Get Supabase infrastructure health
-        infrastructure_health = get_supabase_infrastructure_health()
+    # FACILITY STATS - OPTIMIZED with batched queries
+    # Performance improvement: 3n queries → 3 queries (where n = number of facilities)
+    facilities = admin_supabase.table('healthcare_facilities').select('facility_id, facility_name').execute().data or []
+    facility_ids = [f['facility_id'] for f in facilities]
 
-        current_app.logger.info(f"All Reports Infrastructure Health: {infrastructure_health}")
-
-        # Calculate system health: combined business metrics (40%) + infrastructure health (60%)
-        # 20% from user activity + 20% from facility activity + 60% from infrastructure
-        # MATCH DASHBOARD CALCULATION EXACTLY
-        user_health = (active_users_count / total_users * 20) if total_users > 0 else 0
-        facility_health = (active_facilities_count / total_facilities_count * 20) if total_facilities_count > 0 else 0
-        infrastructure_score = (infrastructure_health['overall'] * 0.6)
-        system_health = round(user_health + facility_health + infrastructure_score, 1)
-
-        current_app.logger.info(f"All Reports System Health: user_health={user_health}, facility_health={facility_health}, infrastructure_score={infrastructure_score}, total={system_health}")
-
-        summary_metrics = {
-            'totalUsers': total_users,  # ALL users including admin
-            'activeFacilities': active_facilities_count,  # Non-deleted facilities
-            'totalAppointments': getattr(total_appts, 'count', len(total_appts.data or [])),
-            'systemHealth': system_health,  # Matches dashboard calculation
-            'infrastructureHealth': infrastructure_health,  # Include infrastructure health
-            'recentActivity': getattr(recent_act, 'count', len(recent_act.data or [])),
-            'apiCalls': getattr(api_calls, 'count', len(api_calls.data or []))
-        }
-
-        # Calculate report-specific metrics
-        current_app.logger.info(f"=== Starting Metric Calculations ===")
-        current_app.logger.info(f"Input data: {len(user_activity)} user activity days, {len(users)} users, {len(facility_stats)} facilities, {len(system_usage)} system usage items")
-
-        user_activity_metrics = calculate_user_activity_metrics(user_activity, users)
-        current_app.logger.info(f"User activity metrics calculated: {user_activity_metrics}")
-
-        facility_metrics = calculate_facility_metrics(facility_stats)
-        current_app.logger.info(f"Facility metrics calculated: {facility_metrics}")
-
-        system_metrics = calculate_system_metrics(system_usage, len(logs))
-        current_app.logger.info(f"System metrics calculated: {system_metrics}")
+    if facility_ids:
+        # Batch query 1: All patients grouped by facility
+        patients_result = admin_supabase.rpc('count_patients_by_facility', {
+            'facility_ids': facility_ids
+        }).execute()
+        patients_by_fid = {row['facility_id']: row['count'] for row in (patients_result.data or [])}
 
-        # Calculate Monthly Active Users (MAU) if selected_month provided
-        monthly_active_users = None
-        try:
-            if selected_month:
-                try:
-                    year, month = map(int, selected_month.split('-'))
-                    current_app.logger.info(f"Calculating MAU for selected month: {year}-{month}")
-                    monthly_active_users = calculate_monthly_active_users(year, month)
-                except ValueError as ve:
-                    current_app.logger.warning(f"Invalid selected_month format: {selected_month}, error: {str(ve)}")
-            else:
-                # Default to current month
-                current_year, current_month = get_current_year_month()
-                current_app.logger.info(f"Calculating MAU for current month: {current_year}-{current_month}")
-                monthly_active_users = calculate_monthly_active_users(current_year, current_month)
-
-            if monthly_active_users:
-                current_app.logger.info(f"MAU calculation successful: {monthly_active_users.get('total', 0)} users")
-            else:
-                current_app.logger.warning("MAU calculation returned None")
-        except Exception as mau_error:
-            current_app.logger.error(f"Error in MAU calculation wrapper: {str(mau_error)}")
-            import traceback
-            current_app.logger.error(f"Traceback: {traceback.format_exc()}")
+        # Batch query 2: All appointments grouped by facility (with optional date filtering)
+        appts_result = admin_supabase.rpc('count_appointments_by_facility', {
+            'facility_ids': facility_ids,
+            'start_date': start_date,
+            'end_date': end_datetime.strftime('%Y-%m-%d') if end_datetime else None
+        }).execute()
+        appts_by_fid = {row['facility_id']: row['count'] for row in (appts_result.data or [])}
 
-        data = {
-            'userActivity': user_activity,
-            'facilityStats': facility_stats,
-            'systemUsage': system_usage,
-            'userRoleDistribution': user_role_distribution,
-            'summaryMetrics': summary_metrics,
-            'userActivityMetrics': user_activity_metrics,
-            'facilityMetrics': facility_metrics,
-            'systemMetrics': system_metrics,
-            'monthlyActiveUsers': monthly_active_users
-        }
+        # Batch query 3: All staff grouped by facility
+        staff_result = admin_supabase.rpc('count_staff_by_facility', {
+            'facility_ids': facility_ids
+        }).execute()
+        staff_by_fid = {row['facility_id']: row['count'] for row in (staff_result.data or [])}
 
-        # Final verification log
-        current_app.logger.info(f"=== Final Response Data ===")
-        current_app.logger.info(f"userActivityMetrics keys: {list(user_activity_metrics.keys())}")
-        current_app.logger.info(f"facilityMetrics keys: {list(facility_metrics.keys())}")
-        current_app.logger.info(f"systemMetrics keys: {list(system_metrics.keys())}")
-        current_app.logger.info(f"MAU data present: {monthly_active_users is not None}")
+        # Build facility stats from aggregated data
+        facility_stats = []
+        for facility in facilities:
+            fid = facility['facility_id']
+            facility_stats.append({
+                'facility': facility['facility_name'],
+                'facility_id': fid,
+                'patients': patients_by_fid.get(fid, 0),
+                'appointments': appts_by_fid.get(fid, 0),
+                'staff': staff_by_fid.get(fid, 0)
+            })
+    else:
+        facility_stats = []
+
+    # SYSTEM USAGE
+    audit_usage = fetch_audit_usage(start_date, end_date)
+    usage = {'Dashboard Views': audit_usage['views'], 'Reports Generated': 0, 'Data Exports': 0, 'User Logins': 0, 'API Calls': audit_usage['total']}
+    system_usage = [{'category': k, 'value': v} for k, v in usage.items()]
+
+    # USER ROLE DISTRIBUTION
+    role_counts = {}
+    for role_name, count in fetch_role_counts().items():
+        if role_filter and role_filter != 'all' and role_name != role_filter:
+            continue
+        role_display = ROLE_DISPLAY_NAMES.get(role_name or '', 'Other')
+        role_counts[role_display] = role_counts.get(role_display, 0) + count
+    user_role_distribution = sorted([{'name': n, 'value': c, 'color': ROLE_COLORS.get(n, '#6B7280')} for n, c in role_counts.items()], key=lambda x: x['value'], reverse=True)
+
+    # SUMMARY METRICS - ALL users (including admin role) and facilities - MATCH DASHBOARD CALCULATION EXACTLY
+    counts = fetch_summary_counts()
+
+    # Get Supabase infrastructure health
+    infrastructure_health = get_supabase_infrastructure_health()
+
+    current_app.logger.info(f"All Reports Infrastructure Health: {infrastructure_health}")
+
+    system_health = calculate_system_health(counts, infrastructure_health)
+
+    summary_metrics = {
+        'totalUsers': counts['total_users'],  # ALL users including admin
+        'activeFacilities': counts['active_facilities'],  # Non-deleted facilities
+        'totalAppointments': counts['total_appointments'],
+        'systemHealth': system_health,  # Matches dashboard calculation
+        'infrastructureHealth': infrastructure_health,  # Include infrastructure health
+        'recentActivity': counts['recent_logins'],
+        'apiCalls': counts['api_calls']
+    }
+
+    # Calculate report-specific metrics
+    current_app.logger.info(f"=== Starting Metric Calculations ===")
+    current_app.logger.info(f"Input data: {len(user_activity)} user activity days, {counts['total_users']} users, {len(facility_stats)} facilities, {len(system_usage)} system usage items")
+
+    user_activity_metrics = calculate_user_activity_metrics(user_activity, counts['recent_logins'], counts['previous_logins'])
+    current_app.logger.info(f"User activity metrics calculated: {user_activity_metrics}")
+
+    facility_metrics = calculate_facility_metrics(facility_stats)
+    current_app.logger.info(f"Facility metrics calculated: {facility_metrics}")
+
+    system_metrics = calculate_system_metrics(system_usage, audit_usage['total'])
+    current_app.logger.info(f"System metrics calculated: {system_metrics}")
+
+    # Calculate Monthly Active Users (MAU) if selected_month provided
+    monthly_active_users = None
+    try:
+        if selected_month:
+            try:
+                year, month = map(int, selected_month.split('-'))
+                current_app.logger.info(f"Calculating MAU for selected month: {year}-{month}")
+                monthly_active_users = calculate_monthly_active_users(year, month)
+            except ValueError as ve:
+                current_app.logger.warning(f"Invalid selected_month format: {selected_month}, error: {str(ve)}")
+        else:
+            # Default to current month
+            current_year, current_month = get_current_year_month()
+            current_app.logger.info(f"Calculating MAU for current month: {current_year}-{current_month}")
+            monthly_active_users = calculate_monthly_active_users(current_year, current_month)
 
-        set_cache_data(cache_key, data)
-        return jsonify({"status": "success", "data": data, "cached": False, "cache_expires_in": CACHE_TTL}), 200
+        if monthly_active_users:
+            current_app.logger.info(f"MAU calculation successful: {monthly_active_users.get('total', 0)} users")
+        else:
+            current_app.logger.warning("MAU calculation returned None")
+    except Exception as mau_error:
+        current_app.logger.error(f"Error in MAU calculation wrapper: {str(mau_error)}")
+        import traceback
+        current_app.logger.error(f"Traceback: {traceback.format_exc()}")
 
-    except Exception as e:
-        current_app.logger.error(f"Error fetching reports: {str(e)}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+    data = {
+        'userActivity': user_activity,
+        'facilityStats': facility_stats,
+        'systemUsage': system_usage,
+        'userRoleDistribution': user_role_distribution,
+        'summaryMetrics': summary_metrics,
+        'userActivityMetrics': user_activity_metrics,
+        'facilityMetrics': facility_metrics,
+        'systemMetrics': system_metrics,
+        'monthlyActiveUsers': monthly_active_users
+    }
+
+    # Final verification log
+    current_app.logger.info(f"=== Final Response Data ===")
+    current_app.logger.info(f"userActivityMetrics keys: {list(user_activity_metrics.keys())}")
+    current_app.logger.info(f"facilityMetrics keys: {list(facility_metrics.keys())}")
+    current_app.logger.info(f"systemMetrics keys: {list(system_metrics.keys())}")
+    current_app.logger.info(f"MAU data present: {monthly_active_users is not None}")
+
+    return data
 
 @reports_bp.route('/admin/reports/user-activity', methods=['GET'])
 @require_auth
@@ -574,58 +736,8 @@ def get_user_activity_report():
                 "cache_expires_in": cached_result["cache_expires_in"]
             }), 200
 
-        # Query users table
-        query = admin_supabase.table('users').select('user_id, created_at, last_sign_in_at, is_active, role')
-
-        # Apply date filters
-        if start_date:
-            query = query.gte('created_at', start_date)
-        if end_date:
-            # Add one day to include the end_date
-            end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.lt('created_at', end_datetime.strftime('%Y-%m-%d'))
-
-        response = query.execute()
-
-        if getattr(response, 'error', None):
-            current_app.logger.error(f"Failed to fetch user activity: {response.error}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch user activity data"
-            }), 500
-
-        users = response.data or []
-
-        # Group by date and calculate metrics
-        activity_by_date = {}
-
-        for user in users:
-            if user.get('created_at'):
-                date_str = user['created_at'][:10]  # Extract YYYY-MM-DD
-
-                if date_str not in activity_by_date:
-                    activity_by_date[date_str] = {
-                        'date': date_str,
-                        'logins': 0,
-                        'registrations': 0,
-                        'active_users': 0
-                    }
-
-                # Count registrations (users created on this date)
-                activity_by_date[date_str]['registrations'] += 1
-
-                # Count active users
-                if user.get('is_active'):
-                    activity_by_date[date_str]['active_users'] += 1
-
-                # Count logins (users who signed in on this date)
-                if user.get('last_sign_in_at'):
-                    login_date = user['last_sign_in_at'][:10]
-                    if login_date == date_str:
-                        activity_by_date[date_str]['logins'] += 1
-
-        # Convert to list and sort by date
-        data = sorted(activity_by_date.values(), key=lambda x: x['date'])
+        # Daily buckets computed in the database; a login counts on the user's creation day
+        data = fetch_user_activity_by_day(start_date, end_date, same_day_logins=True)
 
         # Cache the results
         set_cache_data(cache_key, data)
@@ -764,40 +876,17 @@ def get_system_usage_report():
                 "cache_expires_in": cached_result["cache_expires_in"]
             }), 200
 
-        # Query audit logs for system usage
-        query = admin_supabase.table('audit_logs').select('action_type, table_name, action_timestamp')
+        # Aggregate by category in the database
+        audit_usage = fetch_audit_usage(start_date, end_date)
 
-        # Apply date filters
-        if start_date:
-            query = query.gte('action_timestamp', start_date)
-        if end_date:
-            end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.lt('action_timestamp', end_datetime.strftime('%Y-%m-%d'))
-
-        response = query.execute()
-        audit_logs = response.data or []
-
-        # Aggregate by category
         usage_stats = {
-            'Dashboard Views': 0,
-            'Reports Generated': 0,
-            'Data Exports': 0,
+            'Dashboard Views': audit_usage['views'],
+            'Reports Generated': audit_usage['reports_generated'],
+            'Data Exports': audit_usage['data_exports'],
             'User Logins': 0,
-            'API Calls': len(audit_logs)
+            'API Calls': audit_usage['total']
         }
 
-        for log in audit_logs:
-            action_type = log.get('action_type', '')
-            table_name = log.get('table_name', '')
-
-            # Categorize based on action type and table
-            if action_type == 'VIEW':
-                usage_stats['Dashboard Views'] += 1
-            elif action_type == 'CREATE' and 'report' in table_name.lower():
-                usage_stats['Reports Generated'] += 1
-            elif 'export' in table_name.lower():
-                usage_stats['Data Exports'] += 1
-
         # Convert to list format for charts
         data = [
             {'category': key, 'value': value}
@@ -849,55 +938,23 @@ def get_user_role_distribution():
                 "cache_expires_in": cached_result["cache_expires_in"]
             }), 200
 
-        # Query users
-        query = admin_supabase.table('users').select('role, is_active, is_subscribed')
-
-        # Apply filters
-        if is_active is not None:
-            active_bool = is_active.lower() == 'true'
-            query = query.eq('is_active', active_bool)
-
-        response = query.execute()
-        users = response.data or []
+        # Count by role in the database
+        active_bool = is_active.lower() == 'true' if is_active is not None else None
 
-        # Count by role
         role_counts = {}
-
-        for user in users:
-            role = user.get('role', 'unknown')
+        for role, count in fetch_role_counts(active_bool).items():
+            role = role or 'unknown'
 
             # Map role names to display names
-            role_display = {
-                'doctor': 'Doctors',
-                'nurse': 'Nurses',
-                'admin': 'Admins',
-                'parent': 'Parents',
-                'guardian': 'Parents',  # Group guardians with parents
-                'facility_admin': 'Facility Admins',
-                'staff': 'Staff'
-            }.get(role, role.title())
-
-            if role_display not in role_counts:
-                role_counts[role_display] = 0
-
-            role_counts[role_display] += 1
-
-        # Color mapping for pie chart
-        color_map = {
-            'Doctors': '#3B82F6',
-            'Nurses': '#10B981',
-            'Admins': '#F59E0B',
-            'Parents': '#8B5CF6',
-            'Facility Admins': '#EF4444',
-            'Staff': '#6366F1'
-        }
+            role_display = ROLE_DISPLAY_NAMES.get(role, role.title())
+            role_counts[role_display] = role_counts.get(role_display, 0) + count
 
         # Convert to list format
         data = [
             {
                 'name': name,
                 'value': count,
-                'color': color_map.get(name, '#6B7280')
+                'color': ROLE_COLORS.get(name, '#6B7280')
             }
             for name, count in role_counts.items()
         ]
@@ -941,59 +998,24 @@ def get_summary_metrics():
                 "cache_expires_in": cached_result["cache_expires_in"]
             }), 200
 
-        # Get ALL facilities data (to match dashboard logic)
-        all_facilities_response = admin_supabase.table('healthcare_facilities').select('facility_id, deleted_at').execute()
-        all_facilities = all_facilities_response.data or []
-
-        # Count non-deleted facilities (active facilities)
-        active_facilities = len([f for f in all_facilities if not f.get('deleted_at')])
-        total_facilities = len(all_facilities)
-
-        # Get ALL users (to match dashboard logic - includes admin role)
-        users_response = admin_supabase.table('users').select('user_id, is_active').execute()
-        all_users = users_response.data or []
-
-        # Count active users
-        active_users = len([u for u in all_users if u.get('is_active')])
-        total_users = len(all_users)
-
-        # Get total appointments
-        appointments_response = admin_supabase.table('appointments').select('appointment_id', count='exact').execute()
-        total_appointments = appointments_response.count if hasattr(appointments_response, 'count') else len(appointments_response.data or [])
-
-        # Get recent activity (users signed in in last 7 days)
-        seven_days_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        recent_activity_response = admin_supabase.table('users').select('user_id', count='exact').gte('last_sign_in_at', seven_days_ago).execute()
-        recent_activity = recent_activity_response.count if hasattr(recent_activity_response, 'count') else len(recent_activity_response.data or [])
-
-        # Get API calls (audit log entries in last 30 days)
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        api_calls_response = admin_supabase.table('audit_logs').select('log_id', count='exact').gte('action_timestamp', thirty_days_ago).execute()
-        api_calls = api_calls_response.count if hasattr(api_calls_response, 'count') else len(api_calls_response.data or [])
+        # ALL users (includes admin role) and facilities, to match dashboard logic
+        counts = fetch_summary_counts()
 
         # Get Supabase infrastructure health
         infrastructure_health = get_supabase_infrastructure_health()
 
         current_app.logger.info(f"Reports Infrastructure Health: {infrastructure_health}")
 
-        # Calculate system health: combined business metrics (40%) + infrastructure health (60%)
-        # 20% from user activity + 20% from facility activity + 60% from infrastructure
-        # Match dashboard calculation exactly
-        user_health = (active_users / total_users * 20) if total_users > 0 else 0
-        facility_health = (active_facilities / total_facilities * 20) if total_facilities > 0 else 0
-        infrastructure_score = (infrastructure_health['overall'] * 0.6)
-        system_health = round(user_health + facility_health + infrastructure_score, 1)
-
-        current_app.logger.info(f"Reports System Health Calculation: user_health={user_health}, facility_health={facility_health}, infrastructure_score={infrastructure_score}, total={system_health}")
+        system_health = calculate_system_health(counts, infrastructure_health)
 
         data = {
-            'totalUsers': total_users,
-            'activeFacilities': active_facilities,
-            'totalAppointments': total_appointments,
+            'totalUsers': counts['total_users'],
+            'activeFacilities': counts['active_facilities'],
+            'totalAppointments': counts['total_appointments'],
             'systemHealth': system_health,
             'infrastructureHealth': infrastructure_health,
-            'recentActivity': recent_activity,
-            'apiCalls': api_calls
+            'recentActivity': counts['recent_logins'],
+            'apiCalls': counts['api_calls']
         }
 
         # Cache the results
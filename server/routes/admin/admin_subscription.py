@@ -6,8 +6,7 @@ from config.settings import supabase, sr_client
 from utils.redis_client import get_redis_client
 from utils.audit_logger import log_action
 from utils.sanitize import sanitize_request_data
-from utils.invalidate_cache import invalidate_caches
-import json
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
 import uuid
 
 subscription_bp = Blueprint('subscription', __name__)
@@ -675,12 +674,12 @@ def get_subscription_analytics():
 
         # Check cache
         if not bust_cache:
-            cached = redis_client.get(SUBSCRIPTION_CACHE_KEY)
-            if cached:
+            cached_data = cache_get(SUBSCRIPTION_CACHE_KEY)
+            if cached_data is not None:
                 current_app.logger.info("[ANALYTICS] Returning cached data")
                 return jsonify({
                     "status": "success",
-                    "data": json.loads(cached),
+                    "data": cached_data,
                     "cached": True
                 }), 200
 
@@ -763,7 +762,7 @@ def get_subscription_analytics():
         current_app.logger.info(f"[ANALYTICS] Returning analytics data: total_revenue_ytd=₱{analytics_data['total_revenue_ytd']}, active_subscriptions={analytics_data['total_active_subscriptions']}")
 
         # Cache for 5 minutes
-        redis_client.setex(SUBSCRIPTION_CACHE_KEY, CACHE_TTL, json.dumps(analytics_data))
+        cache_set(SUBSCRIPTION_CACHE_KEY, analytics_data, CACHE_TTL, cache_type='subscription')
 
         return jsonify({
             "status": "success",
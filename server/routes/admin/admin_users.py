@@ -3,9 +3,11 @@ from utils.access_control import require_auth, require_role
 from config.settings import supabase, supabase_anon_client, supabase_service_role_client
 from gotrue.errors import AuthApiError
 from datetime import datetime
-from utils.invalidate_cache import invalidate_caches
+from utils.invalidate_cache import invalidate_caches, cache_get
+from utils.access_scope import invalidate_user_scope
 from utils.redis_client import get_redis_client
-import json
+from utils.sessions import revoke_user_sessions
+from utils.qr_tokens import evict_qr_codes
 
 users_bp = Blueprint('users', __name__)
 redis_client = get_redis_client()
@@ -26,10 +28,9 @@ def get_all_users():
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
         
         if not bust_cache:
-            cached = redis_client.get(USERS_CACHE_KEY)
+            cached_data = cache_get(USERS_CACHE_KEY)
             
-            if cached:
-                cached_data = json.loads(cached)
+            if cached_data is not None:
                 return jsonify({
                     "status": "success",
                     "data": cached_data,
@@ -449,6 +450,7 @@ def assign_user_to_facility(user_id):
 
         invalidate_caches('users', user_id)
         invalidate_caches('facility_users', facility_id)
+        invalidate_user_scope(user_id)
 
         return jsonify({
             "status": "success",
@@ -480,6 +482,7 @@ def remove_user_from_facility(user_id, facility_id):
 
         invalidate_caches('users', user_id)
         invalidate_caches('facility_users', facility_id)
+        invalidate_user_scope(user_id)
 
         return jsonify({
             "status": "success",
@@ -573,6 +576,8 @@ def delete_user(user_id):
 
             # Now delete the QR codes
             admin_supabase.table('qr_codes').delete().eq('generated_by', user_id).execute()
+            if qr_codes_to_delete.data:
+                evict_qr_codes(qr_ids)
 
             # Nullify last_accessed_by for any remaining QR codes
             admin_supabase.table('qr_codes').update({
@@ -823,25 +828,13 @@ def delete_user(user_id):
 
         # Step 11: Clear user's sessions from Redis
         try:
-            from utils.redis_client import redis_client
-            SESSION_PREFIX = "flask_session:"
-
-            # Find all sessions for this user
-            session_keys = redis_client.keys(f"{SESSION_PREFIX}*")
-            for key in session_keys:
-                session_data_str = redis_client.get(key)
-                if session_data_str:
-                    try:
-                        session_data = json.loads(session_data_str)
-                        if session_data.get('user_id') == user_id:
-                            redis_client.delete(key)
-                    except:
-                        pass
+            revoke_user_sessions(user_id)
         except Exception as session_error:
             current_app.logger.warning(f"Could not clear user sessions: {session_error}")
 
         # Step 12: Invalidate caches
         invalidate_caches('users', user_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"AUDIT: Admin {current_user.get('email')} successfully deleted user {user_email} (ID: {user_id}) from IP {request.remote_addr}")
 
@@ -899,19 +892,7 @@ def toggle_user_status(user_id):
         # Clear user's sessions if deactivating
         if new_status is False:
             try:
-                from utils.redis_client import redis_client
-                SESSION_PREFIX = "flask_session:"
-
-                session_keys = redis_client.keys(f"{SESSION_PREFIX}*")
-                for key in session_keys:
-                    session_data_str = redis_client.get(key)
-                    if session_data_str:
-                        try:
-                            session_data = json.loads(session_data_str)
-                            if session_data.get('user_id') == user_id:
-                                redis_client.delete(key)
-                        except:
-                            pass
+                revoke_user_sessions(user_id)
             except Exception as session_error:
                 current_app.logger.warning(f"Could not clear user sessions: {session_error}")
 
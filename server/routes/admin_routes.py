@@ -7,6 +7,7 @@ import jwt
 import json
 import time
 from utils.redis_client import redis_client
+from utils.sessions import list_sessions
 from utils.gen_password import generate_password
 from utils.audit_logger import log_action
 from dateutil.relativedelta import relativedelta
@@ -27,26 +28,26 @@ admin_bp = Blueprint('admin', __name__)
 def list_active_sessions():
     """List all active sessions (admin only)"""
     try:
-        pattern = f"{SESSION_PREFIX}*"
-        session_keys = redis_client.keys(pattern)
-        
-        active_sessions = []
-        for key in session_keys:
-            session_data = redis_client.get(key)
-            if session_data:
-                data = json.loads(session_data)
-                active_sessions.append({
-                    'session_id': key.replace(SESSION_PREFIX, ''),
-                    'user_id': data.get('user_id'),
-                    'email': data.get('email'),
-                    'role': data.get('role'),
-                    'created_at': data.get('created_at'),
-                    'last_activity': data.get('last_activity')
-                })
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+
+        sessions, total = list_sessions(offset, limit)
+
+        active_sessions = [{
+            'session_id': data.get('session_id'),
+            'user_id': data.get('user_id'),
+            'email': data.get('email'),
+            'role': data.get('role'),
+            'created_at': data.get('created_at'),
+            'last_activity': data.get('last_activity')
+        } for data in sessions]
         
         return jsonify({
             "active_sessions": active_sessions,
-            "count": len(active_sessions)
+            "count": len(active_sessions),
+            "total": total,
+            "offset": offset,
+            "limit": limit
         })
 
     except Exception as e:
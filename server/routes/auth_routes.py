@@ -1,17 +1,17 @@
 from flask import Blueprint, request, jsonify, current_app, make_response
 from config.settings import supabase, supabase_service_role_client
 import datetime
-import json
 from gotrue.errors import AuthApiError
 from functools import wraps
 from authlib.integrations.flask_client import OAuth
 from urllib.parse import urlencode
 import os
 
-from utils.sessions import create_session_id, store_session_data, get_session_data, update_session_activity, update_session_tokens
+from utils.sessions import create_session_id, store_session_data, get_session_data, update_session_activity, update_session_tokens, delete_session, list_sessions
 from utils.redis_client import redis_client
 from utils.access_control import require_auth, require_role
 from utils.audit_logger import audit_access
+from utils.rate_limit import rate_limit, json_field, check_rate_limits
 from utils.token_utils import verify_supabase_jwt, SupabaseJWTError
 
 # Use project-specific cookie names instead of the Supabase defaults
@@ -21,6 +21,11 @@ SESSION_PREFIX = "flask_session:"
 CACHE_PREFIX = "patient_cache:"
 SESSION_TIMEOUT = int(os.environ.get('SESSION_TIMEOUT', 86400 * 30))  # 30 days - no auto-logout for inactive sessions
 REFRESH_TOKEN_TIMEOUT = SESSION_TIMEOUT  # Match SESSION_TIMEOUT to prevent premature logout
+# Login attempts per 5 minutes; clinics share one IP, so the IP limit is loose
+LOGIN_IP_LIMIT = int(os.environ.get('LOGIN_IP_LIMIT', 30))
+LOGIN_EMAIL_LIMIT = int(os.environ.get('LOGIN_EMAIL_LIMIT', 10))
+# 2FA code resends per 10 minutes per IP (and one per minute per user)
+RESEND_2FA_IP_LIMIT = int(os.environ.get('RESEND_2FA_IP_LIMIT', 10))
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -523,6 +528,8 @@ def create_invite():
         }), 400
         
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per_ip=(LOGIN_IP_LIMIT, 300), per_identifier=(LOGIN_EMAIL_LIMIT, 300), identifier=json_field('email'),
+            message="Too many login attempts. Please wait {wait} before trying again.")
 def login():
     try:
         # Check for existing session first
@@ -538,7 +545,7 @@ def login():
 
                 if user_status.data and not user_status.data[0].get('is_active', True):
                     # Clear the invalid session
-                    redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+                    delete_session(session_id)
                     current_app.logger.warning(f"AUDIT: Session reuse attempted for deactivating account {existing_session.get('email')} from IP {request.remote_addr}")
                     return jsonify({
                         "status": "error",
@@ -708,6 +715,9 @@ def login():
 
                     current_app.logger.info(f"AUDIT: 2FA login code sent to {email} from IP {request.remote_addr}")
 
+                    # The login code counts towards the resend limit, so the first resend also waits a minute
+                    check_rate_limits('resend_2fa', [('id', str(auth_response.user.id).lower(), 1, 60)])
+
                     # Return 2FA required response
                     return jsonify({
                         "status": "2fa_required",
@@ -1045,6 +1055,8 @@ def verify_2fa_login():
         }), 500
 
 @auth_bp.route('/resend-2fa-login-code', methods=['POST'])
+@rate_limit('resend_2fa', per_ip=(RESEND_2FA_IP_LIMIT, 600), per_identifier=(1, 60), identifier=json_field('user_id'),
+            message="Please wait {wait} before requesting another code")
 def resend_2fa_login_code():
     """Resend 2FA verification code during login"""
     try:
@@ -1057,30 +1069,6 @@ def resend_2fa_login_code():
                 "message": "User ID is required"
             }), 400
 
-        # Check rate limiting - prevent abuse
-        # Get the last code generation time
-        last_code_check = supabase.table('user_2fa_verification_codes')\
-            .select('created_at')\
-            .eq('user_id', user_id)\
-            .eq('code_type', 'login')\
-            .order('created_at', desc=True)\
-            .limit(1)\
-            .execute()
-
-        if last_code_check.data:
-            from datetime import datetime, timezone
-            last_created = datetime.fromisoformat(last_code_check.data[0]['created_at'].replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
-            time_diff = (now - last_created).total_seconds()
-
-            # Require at least 60 seconds between resend requests
-            if time_diff < 60:
-                wait_time = int(60 - time_diff)
-                return jsonify({
-                    "status": "error",
-                    "message": f"Please wait {wait_time} seconds before requesting another code"
-                }), 429
-
         # Get user information
         user_response = supabase.table('users')\
             .select('*')\
@@ -1152,7 +1140,7 @@ def logout():
         
         # Remove session from Redis
         if session_id:
-            redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+            delete_session(session_id)
         
         # Clear cached patient data for this current user
         pattern = f"{CACHE_PREFIX}{user_id}*"
@@ -1165,7 +1153,7 @@ def logout():
         
         # Remove session from Redis
         if session_id:
-            redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+            delete_session(session_id)
         
         # Clear cached patient data for this current user
         pattern = f"{CACHE_PREFIX}{user_id}*"
@@ -1233,7 +1221,7 @@ def get_session():
 
         if user_status.data and not user_status.data[0].get('is_active', True):
             # Clear the invalid session
-            redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+            delete_session(session_id)
             return jsonify({
                 "status": "error",
                 "message": "Your account has been deactivated. Please contact your administrator for assistance."
@@ -1393,26 +1381,26 @@ def refresh_token():
 def list_active_sessions():
     """List all active sessions (admin only)"""
     try:
-        pattern = f"{SESSION_PREFIX}*"
-        session_keys = redis_client.keys(pattern)
-        
-        active_sessions = []
-        for key in session_keys:
-            session_data = redis_client.get(key)
-            if session_data:
-                data = json.loads(session_data)
-                active_sessions.append({
-                    'session_id': key.replace(SESSION_PREFIX, ''),
-                    'user_id': data.get('user_id'),
-                    'email': data.get('email'),
-                    'role': data.get('role'),
-                    'created_at': data.get('created_at'),
-                    'last_activity': data.get('last_activity')
-                })
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+
+        sessions, total = list_sessions(offset, limit)
+
+        active_sessions = [{
+            'session_id': data.get('session_id'),
+            'user_id': data.get('user_id'),
+            'email': data.get('email'),
+            'role': data.get('role'),
+            'created_at': data.get('created_at'),
+            'last_activity': data.get('last_activity')
+        } for data in sessions]
         
         return jsonify({
             "active_sessions": active_sessions,
-            "count": len(active_sessions)
+            "count": len(active_sessions),
+            "total": total,
+            "offset": offset,
+            "limit": limit
         })
         
     except Exception as e:
@@ -2,9 +2,9 @@ from flask import Flask, jsonify, request, current_app, Blueprint
 from utils.access_control import require_auth, require_role
 from config.settings import supabase
 from utils.redis_client import get_redis_client
-from utils.invalidate_cache import invalidate_caches
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
+from utils.access_scope import invalidate_user_scope
 from gotrue.errors import AuthApiError
-import json
 import datetime
 import secrets
 import string
@@ -63,9 +63,8 @@ def get_facility_users():
         cache_key = f"{FACILITY_USERS_CACHE_PREFIX}{current_user.get('facility_id')}"
 
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
+            cached_data = cache_get(cache_key)
+            if cached_data is not None:
                 current_app.logger.info(f"Retrieved facility users from cache for facility {current_user.get('facility_id')}")
                 return jsonify({
                     "status": "success",
@@ -153,7 +152,12 @@ def get_facility_users():
             }
             result_data.append(combined_data)
 
-        redis_client.setex(cache_key, 300, json.dumps(result_data))
+        cache_set(
+            cache_key, result_data, 300,
+            cache_type='facility_users',
+            facility=current_user.get('facility_id'),
+            user=[u.get('user_id') for u in result_data]
+        )
         current_app.logger.info(f"Retrieved {len(result_data)} facility users for facility {current_user.get('facility_id')}")
 
         return jsonify({
@@ -314,7 +318,8 @@ def add_facility_user():
                 }), 400
 
         # Invalidate cache
-        invalidate_caches([f"{FACILITY_USERS_CACHE_PREFIX}{current_user_facility_id}"])
+        invalidate_caches('facility_users', current_user_facility_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"Successfully added user {data.get('email')} to facility {current_user_facility_id}")
 
@@ -424,7 +429,8 @@ def update_facility_user(user_id):
                 }), 400
 
         # Invalidate cache
-        invalidate_caches([f"{FACILITY_USERS_CACHE_PREFIX}{current_user_facility_id}"])
+        invalidate_caches('facility_users', current_user_facility_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"Successfully updated facility user {user_id} in facility {current_user_facility_id}")
 
@@ -481,7 +487,8 @@ def remove_facility_user(user_id):
             }), 400
 
         # Invalidate cache
-        invalidate_caches([f"{FACILITY_USERS_CACHE_PREFIX}{current_user_facility_id}"])
+        invalidate_caches('facility_users', current_user_facility_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"Successfully removed facility user {user_id} from facility {current_user_facility_id}")
 
@@ -660,7 +667,8 @@ def activate_user(user_id):
         supabase.table('facility_users').update(facility_update_payload).eq('user_id', user_id).eq('facility_id', current_user_facility_id).execute()
 
         # Invalidate cache
-        invalidate_caches([f"{FACILITY_USERS_CACHE_PREFIX}{current_user_facility_id}"])
+        invalidate_caches('facility_users', current_user_facility_id)
+        invalidate_user_scope(user_id)
 
         current_app.logger.info(f"Successfully activated user {user_id} in facility {current_user_facility_id}")
 
@@ -717,7 +725,7 @@ def deactivate_user(user_id):
             }), 400
 
         # Invalidate cache
-        invalidate_caches([f"{FACILITY_USERS_CACHE_PREFIX}{current_user_facility_id}"])
+        invalidate_caches('facility_users', current_user_facility_id)
 
         current_app.logger.info(f"Successfully deactivated user {user_id} in facility {current_user_facility_id}")
 
@@ -9,11 +9,16 @@ from utils.sanitize import sanitize_request_data
 from utils.access_control import require_auth, require_role
 from utils.email_service import EmailService
 from utils.email_templates import EmailTemplates
+from utils.rate_limit import rate_limit, json_field
 import re
 import os
 
 facility_contact_bp = Blueprint('facility_contact', __name__, url_prefix='/api')
 
+# Contact requests per hour, per client IP and per contact email
+CONTACT_IP_LIMIT = int(os.environ.get('FACILITY_CONTACT_IP_LIMIT', 5))
+CONTACT_EMAIL_LIMIT = int(os.environ.get('FACILITY_CONTACT_EMAIL_LIMIT', 3))
+
 # Email validation regex
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
@@ -32,6 +37,9 @@ def validate_phone(phone):
 
 
 @facility_contact_bp.route('/facility-contact', methods=['POST'])
+@rate_limit('facility_contact', per_ip=(CONTACT_IP_LIMIT, 3600), per_identifier=(CONTACT_EMAIL_LIMIT, 3600),
+            identifier=json_field('email'),
+            message="Too many contact requests. Please try again in {wait}.")
 def submit_facility_contact():
     """
     Submit facility contact request (public endpoint - no authentication required)
@@ -47,6 +55,7 @@ def submit_facility_contact():
     Returns:
         201: Request submitted successfully
         400: Validation error or missing required fields
+        429: Too many requests from this IP or email
         500: Server error
     """
     try:
@@ -7,12 +7,19 @@ from utils.access_control import require_auth, require_role
 from utils.sanitize import sanitize_request_data
 from config.settings import supabase_service_role_client
 from utils.audit_logger import create_audit_log
+from utils.rate_limit import rate_limit
 from datetime import datetime
+import os
+
+# Feedback submissions per client IP per hour
+FEEDBACK_IP_LIMIT = int(os.environ.get('FEEDBACK_IP_LIMIT', 10))
 
 feedback_bp = Blueprint('feedback', __name__)
 
 
 @feedback_bp.route('/feedback', methods=['POST'])
+@rate_limit('feedback', per_ip=(FEEDBACK_IP_LIMIT, 3600),
+            message="Too many feedback submissions. Please try again in {wait}.")
 def submit_feedback():
     """
     Submit new feedback - can be anonymous or authenticated
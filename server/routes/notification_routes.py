@@ -3,18 +3,20 @@ Notification Routes - KEEPSAKE Healthcare System
 Handles real-time notifications, preferences, and system announcements
 """
 
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app
 from datetime import datetime, timedelta
 from utils.access_control import require_auth, require_role
 from utils.sanitize import sanitize_request_data
+from utils.announcement_fanout import schedule_announcement_fanout, get_fanout_progress
+from utils.notification_stream import (
+    get_unread_count, adjust_unread, reset_unread, counts_as_unread,
+    publish_notifications, open_stream, STREAM_RETRY_AFTER
+)
+from utils.notification_stats import get_notification_stats, record_notification_change, record_all_read
 from config.settings import supabase, supabase_service_role_client
 
 notification_bp = Blueprint('notifications', __name__)
 
-def count_unread_notifications(notifications):
-    """Count unread notifications from a list of notifications"""
-    return sum(1 for notification in notifications if not notification.get('is_read', False))
-
 @notification_bp.route('/notifications', methods=['GET'])
 @require_auth
 def get_notifications():
@@ -60,8 +62,8 @@ def get_notifications():
 
         response = query.execute()
 
-        # Count unread notifications from the response data
-        unread_count = count_unread_notifications(response.data)
+        # Exact unread total (not just this page), from the cached counter
+        unread_count = get_unread_count(user_id)
 
         return jsonify({
             'status': 'success',
@@ -76,6 +78,80 @@ def get_notifications():
         traceback.print_exc()
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@notification_bp.route('/notifications/stream', methods=['GET'])
+@require_auth
+def stream_notifications():
+    """Server-Sent Events: 'unread' count updates and new 'notification' rows.
+
+    The stream closes after a bounded time and the browser's EventSource
+    reconnects, receiving the current unread count again. When this worker
+    already serves its limit of streams the answer is 503 with Retry-After;
+    EventSource does not reconnect after an error status, so the client goes
+    back to polling /notifications/unread-count.
+    """
+    user_id = request.current_user.get('id')
+
+    if not user_id:
+        return jsonify({'status': 'error', 'message': 'User not authenticated'}), 401
+
+    events = open_stream(user_id)
+    if events is None:
+        response = jsonify({
+            'status': 'error',
+            'message': 'Notification streaming is at capacity, poll for updates instead',
+            'retry_after': STREAM_RETRY_AFTER
+        })
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response, 503
+
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@notification_bp.route('/notifications/unread-count', methods=['GET'])
+@require_auth
+def get_notification_unread_count():
+    """Unread badge count without fetching any notifications"""
+    try:
+        user_id = request.current_user.get('id')
+
+        if not user_id:
+            return jsonify({'status': 'error', 'message': 'User not authenticated'}), 401
+
+        return jsonify({
+            'status': 'success',
+            'unread_count': get_unread_count(user_id)
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"AUDIT: Error in get_notification_unread_count: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@notification_bp.route('/notifications/stats', methods=['GET'])
+@require_auth
+def get_notification_stats_summary():
+    """Total, unread, archived and per-type counts from the stats counters"""
+    try:
+        user_id = request.current_user.get('id')
+
+        if not user_id:
+            return jsonify({'status': 'error', 'message': 'User not authenticated'}), 401
+
+        return jsonify({
+            'status': 'success',
+            'stats': get_notification_stats(user_id)
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"AUDIT: Error in get_notification_stats_summary: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @notification_bp.route('/notifications/<notification_id>/mark-read', methods=['PATCH'])
 @require_auth
 def mark_notification_read(notification_id):
@@ -98,6 +174,10 @@ def mark_notification_read(notification_id):
             'read_at': datetime.utcnow().isoformat()
         }).eq('notification_id', notification_id).execute()
 
+        if counts_as_unread(notification.data[0]):
+            adjust_unread(user_id, -1)
+        record_notification_change(notification.data[0], {**notification.data[0], 'is_read': True})
+
         return jsonify({
             'status': 'success',
             'notification': response.data[0] if response.data else None
@@ -131,6 +211,11 @@ def mark_notification_unread(notification_id):
             'read_at': None
         }).eq('notification_id', notification_id).execute()
 
+        previous = notification.data[0]
+        if previous.get('is_read') and not previous.get('is_archived'):
+            adjust_unread(user_id, 1)
+        record_notification_change(previous, {**previous, 'is_read': False})
+
         return jsonify({
             'status': 'success',
             'notification': response.data[0] if response.data else None
@@ -156,6 +241,9 @@ def mark_all_notifications_read():
             'read_at': datetime.utcnow().isoformat()
         }).eq('user_id', user_id).eq('is_read', False).execute()
 
+        reset_unread(user_id)
+        record_all_read(user_id)
+
         return jsonify({
             'status': 'success',
             'message': 'All notifications marked as read',
@@ -192,6 +280,10 @@ def archive_notification(notification_id):
             'archived_at': datetime.utcnow().isoformat()
         }).eq('notification_id', notification_id).execute()
 
+        if counts_as_unread(notification.data[0]):
+            adjust_unread(user_id, -1)
+        record_notification_change(notification.data[0], {**notification.data[0], 'is_archived': True})
+
         return jsonify({
             'status': 'success',
             'message': 'Notification archived'
@@ -224,6 +316,10 @@ def delete_notification(notification_id):
         # Delete notification
         supabase_service_role_client().table('notifications').delete().eq('notification_id', notification_id).execute()
 
+        if counts_as_unread(notification.data[0]):
+            adjust_unread(user_id, -1)
+        record_notification_change(notification.data[0], None)
+
         return jsonify({
             'status': 'success',
             'message': 'Notification deleted'
@@ -468,7 +564,8 @@ def create_system_announcement():
 
         return jsonify({
             'status': 'success',
-            'announcement': response.data[0]
+            'announcement': response.data[0],
+            'delivery': get_fanout_progress(response.data[0]['announcement_id'])
         }), 201
 
     except Exception as e:
@@ -476,46 +573,61 @@ def create_system_announcement():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
-def create_announcement_notifications(announcement):
-    """Helper function to create notifications for system announcements"""
-    try:    
-        # Get all users matching the target criteria
-        query = supabase_service_role_client().table('users').select('user_id, role').eq('is_active', True)
-
-        # Filter by roles if specified
-        if announcement.get('target_roles'):
-            query = query.in_('role', announcement['target_roles'])
-
-        users_response = query.execute()
-
-        # Create notifications for each user
-        notifications = []
-        for user in users_response.data:
-            # If target_facilities is specified, check if user belongs to one
-            if announcement.get('target_facilities'):
-                facility_check = supabase.table('facility_users').select('facility_id').eq('user_id', user['user_id']).in_('facility_id', announcement['target_facilities']).execute()
-
-                if not facility_check.data:
-                    continue
-
-            notification = {
-                'user_id': user['user_id'],
-                'notification_type': 'system_announcement',
-                'title': announcement['title'],
-                'message': announcement['message'],
-                'priority': announcement.get('priority', 'normal'),
-                'metadata': {
-                    'announcement_id': announcement['announcement_id']
-                },
-                'expires_at': announcement.get('expires_at')
-            }
+@notification_bp.route('/announcements/<announcement_id>/delivery', methods=['GET'])
+@require_auth
+@require_role('admin', 'facility_admin')
+def get_announcement_delivery(announcement_id):
+    """Progress of an announcement's notification fan-out"""
+    try:
+        progress = get_fanout_progress(announcement_id)
+
+        if progress is None:
+            return jsonify({'status': 'error', 'message': 'No delivery recorded for this announcement'}), 404
 
-            notifications.append(notification)
+        return jsonify({'status': 'success', 'delivery': progress}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching announcement delivery: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
-        # Bulk insert notifications
-        if notifications:
-            supabase.table('notifications').insert(notifications).execute()
 
+@notification_bp.route('/announcements/<announcement_id>/delivery', methods=['POST'])
+@require_auth
+@require_role('admin', 'facility_admin')
+def resume_announcement_delivery(announcement_id):
+    """Restart a failed or interrupted fan-out after the last delivered user"""
+    try:
+        progress = get_fanout_progress(announcement_id)
+
+        # Without a record of who was reached, a restart would notify everyone again
+        if progress is None:
+            return jsonify({'status': 'error', 'message': 'No delivery progress recorded for this announcement, it cannot be resumed'}), 409
+
+        if progress.get('status') == 'completed':
+            return jsonify({'status': 'error', 'message': 'Delivery already completed'}), 409
+
+        response = supabase_service_role_client().table('system_announcements').select('*').eq('announcement_id', announcement_id).execute()
+
+        if not response.data:
+            return jsonify({'status': 'error', 'message': 'Announcement not found'}), 404
+
+        if not schedule_announcement_fanout(response.data[0], resume=True):
+            return jsonify({'status': 'error', 'message': 'Delivery is already in progress'}), 409
+
+        return jsonify({
+            'status': 'success',
+            'delivery': get_fanout_progress(announcement_id)
+        }), 202
+
+    except Exception as e:
+        current_app.logger.error(f"Error resuming announcement delivery: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+def create_announcement_notifications(announcement):
+    """Helper function to create notifications for system announcements (delivered in the background)"""
+    try:
+        schedule_announcement_fanout(announcement)
     except Exception as e:
         current_app.logger.error(f"Error creating announcement notifications: {e}")
 
@@ -547,6 +659,7 @@ def create_notification(user_id, notification_type, title, message, **kwargs):
         }
 
         response = supabase_service_role_client().table('notifications').insert(notification_data).execute()
+        publish_notifications(response.data or [])
         return response.data[0] if response.data else None
 
     except Exception as e:
@@ -6,6 +6,7 @@ from utils.redis_client import get_redis_client
 import json
 import hashlib
 from dateutil.relativedelta import relativedelta
+from utils.growth_standards import batch_percentiles, age_in_months, to_optional
 
 parent_reports_bp = Blueprint('parent_reports', __name__)
 redis_client = get_redis_client()
@@ -64,18 +65,6 @@ def calculate_bmi(weight_kg, height_cm):
     except:
         return None
 
-def calculate_who_cdc_percentile(age_months, sex, measurement_type, value):
-    """
-    Calculate WHO/CDC growth percentiles (placeholder implementation)
-    """
-    if not age_months or not value:
-        return None
-
-    # Placeholder calculation - replace with actual LMS method in production
-    import random
-    random.seed(int(value * 100))
-    return round(40 + random.random() * 30, 1)
-
 @parent_reports_bp.route('/parent/reports/children', methods=['GET'])
 @require_auth
 @require_role('parent')
@@ -216,32 +205,34 @@ def get_child_report(patient_id):
         height_percentile = 0
         weight_percentile = 0
 
-        for measurement in measurements:
+        # Score all measurements at the child's age on each measurement date
+        sexes = [patient.get('sex')] * len(measurements)
+        ages = [age_in_months(patient.get('date_of_birth'), m.get('measurement_date')) for m in measurements]
+        height_percentiles = to_optional(batch_percentiles('height', sexes, ages, [m.get('height') for m in measurements]))
+        weight_percentiles = to_optional(batch_percentiles('weight', sexes, ages, [m.get('weight') for m in measurements]))
+
+        for measurement, h_percentile, w_percentile in zip(measurements, height_percentiles, weight_percentiles):
             weight = measurement.get('weight')
             height = measurement.get('height')
             bmi = calculate_bmi(weight, height)
             measurement_date = measurement.get('measurement_date', '')[:7]  # YYYY-MM
 
-            # Calculate percentiles
-            h_percentile = calculate_who_cdc_percentile(age_months, patient.get('sex', 'M'), 'height', height)
-            w_percentile = calculate_who_cdc_percentile(age_months, patient.get('sex', 'M'), 'weight', weight)
-
             growth_data.append({
                 'month': measurement_date,
                 'height': round(height, 1) if height else 0,
                 'weight': round(weight, 1) if weight else 0,
                 'bmi': bmi if bmi else 0,
-                'heightPercentile': h_percentile if h_percentile else 50,
-                'weightPercentile': w_percentile if w_percentile else 50
+                'heightPercentile': h_percentile if h_percentile is not None else 50,
+                'weightPercentile': w_percentile if w_percentile is not None else 50
             })
 
             # Keep latest values
             if height:
                 latest_height = round(height, 1)
-                height_percentile = h_percentile if h_percentile else 50
+                height_percentile = h_percentile if h_percentile is not None else 50
             if weight:
                 latest_weight = round(weight, 1)
-                weight_percentile = w_percentile if w_percentile else 50
+                weight_percentile = w_percentile if w_percentile is not None else 50
             if bmi:
                 latest_bmi = bmi
 
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, current_app
 from utils.access_control import require_auth, require_role
 from config.settings import get_authenticated_client, supabase_service_role_client
 from postgrest.exceptions import APIError as AuthApiError
+from utils.related_records import RelatedSection, load_related_records, age_section
 import traceback
 import uuid
 import httpx
@@ -163,94 +164,89 @@ def get_child_details(patient_id):
 
         patient_data = patient_resp.data
 
-        # Calculate age
-        try:
-            age_resp = service_client.rpc('calculate_age', {'date_of_birth': patient_data['date_of_birth']}).execute()
-            if age_resp.data is not None:
-                age_data = age_resp.data
-                patient_data['age_info'] = {
-                    'formatted_age': age_data.get('formatted_age', 'Unknown'),
-                    'years': age_data.get('years', 0),
-                    'months': age_data.get('months', 0),
-                    'days': age_data.get('days', 0),
-                }
-                patient_data['age'] = age_data.get('formatted_age')
-        except Exception as age_error:
-            current_app.logger.warning(f"Age calculation failed: {str(age_error)}")
-            patient_data['age'] = 'Unknown'
-
-        # Get all related medical records using service role client to bypass RLS
-        related_data = {}
-
-        try:
-            # Delivery record
-            delivery_resp = service_client.table('delivery_record').select('*').eq('patient_id', patient_id).execute()
-            related_data['delivery'] = delivery_resp.data[0] if delivery_resp.data else None
-
-            # Anthropometric measurements
-            anthro_resp = service_client.table('anthropometric_measurements')\
-                .select('*')\
-                .eq('patient_id', patient_id)\
-                .order('measurement_date', desc=True)\
-                .execute()
-            related_data['anthropometric_measurements'] = anthro_resp.data or []
-
-            # Screening tests
-            screening_resp = service_client.table('screening_tests').select('*').eq('patient_id', patient_id).execute()
-            related_data['screening'] = screening_resp.data[0] if screening_resp.data else None
-
-            # Allergies
-            allergy_resp = service_client.table('allergies')\
-                .select('*')\
-                .eq('patient_id', patient_id)\
-                .order('date_identified', desc=True)\
-                .execute()
-            related_data['allergies'] = allergy_resp.data or []
-
+        # Age and every related section are independent - fetch them concurrently
+        sections = {
+            'age': age_section(service_client, patient_data['date_of_birth']),
+            'delivery': RelatedSection(
+                lambda: service_client.table('delivery_record').select('*').eq('patient_id', patient_id).execute(),
+                default=None, shape='first'
+            ),
+            'anthropometric_measurements': RelatedSection(
+                lambda: service_client.table('anthropometric_measurements')\
+                    .select('*')\
+                    .eq('patient_id', patient_id)\
+                    .order('measurement_date', desc=True)\
+                    .execute(),
+                default=[]
+            ),
+            'screening': RelatedSection(
+                lambda: service_client.table('screening_tests').select('*').eq('patient_id', patient_id).execute(),
+                default=None, shape='first'
+            ),
+            'allergies': RelatedSection(
+                lambda: service_client.table('allergies')\
+                    .select('*')\
+                    .eq('patient_id', patient_id)\
+                    .order('date_identified', desc=True)\
+                    .execute(),
+                default=[]
+            ),
             # Prescriptions with doctor info
-            rx_resp = service_client.table('prescriptions').select('''
-                *,
-                users!prescriptions_doctor_id_fkey(
-                    firstname,
-                    lastname,
-                    specialty
-                )
-            ''').eq('patient_id', patient_id).order('prescription_date', desc=True).execute()
-            related_data['prescriptions'] = rx_resp.data or []
-
-            # Vaccinations
-            vaccination_resp = service_client.table('vaccinations')\
-                .select('*')\
-                .eq('patient_id', patient_id)\
-                .order('administered_date', desc=True)\
-                .execute()
-            related_data['vaccinations'] = vaccination_resp.data or []
-
+            'prescriptions': RelatedSection(
+                lambda: service_client.table('prescriptions').select('''
+                    *,
+                    users!prescriptions_doctor_id_fkey(
+                        firstname,
+                        lastname,
+                        specialty
+                    )
+                ''').eq('patient_id', patient_id).order('prescription_date', desc=True).execute(),
+                default=[]
+            ),
+            'vaccinations': RelatedSection(
+                lambda: service_client.table('vaccinations')\
+                    .select('*')\
+                    .eq('patient_id', patient_id)\
+                    .order('administered_date', desc=True)\
+                    .execute(),
+                default=[]
+            ),
             # Appointments with doctor info
-            appointments_resp = service_client.table('appointments').select('''
-                *,
-                users!appointments_doctor_id_fkey(
-                    firstname,
-                    lastname,
-                    specialty
-                )
-            ''').eq('patient_id', patient_id).order('appointment_date', desc=True).execute()
-            related_data['appointments'] = appointments_resp.data or []
-
-        except Exception as related_error:
-            current_app.logger.error(f"Error fetching related records: {str(related_error)}")
-            # Initialize empty arrays if there's an error
-            related_data = {
-                'delivery': None,
-                'anthropometric_measurements': [],
-                'screening': None,
-                'allergies': [],
-                'prescriptions': [],
-                'vaccinations': [],
-                'appointments': []
+            'appointments': RelatedSection(
+                lambda: service_client.table('appointments').select('''
+                    *,
+                    users!appointments_doctor_id_fkey(
+                        firstname,
+                        lastname,
+                        specialty
+                    )
+                ''').eq('patient_id', patient_id).order('appointment_date', desc=True).execute(),
+                default=[]
+            ),
+        }
+
+        related_data, section_errors = load_related_records(sections)
+
+        age_data = related_data.pop('age')
+        if age_data is not None:
+            patient_data['age_info'] = {
+                'formatted_age': age_data.get('formatted_age', 'Unknown'),
+                'years': age_data.get('years', 0),
+                'months': age_data.get('months', 0),
+                'days': age_data.get('days', 0),
             }
+            patient_data['age'] = age_data.get('formatted_age')
+        elif 'age' in section_errors:
+            current_app.logger.warning(f"Age calculation failed: {section_errors.pop('age')}")
+            patient_data['age'] = 'Unknown'
+
+        for section, error in section_errors.items():
+            current_app.logger.error(f"Error fetching {section} for child {patient_id}: {error}")
 
         patient_data['related_records'] = related_data
+        # Sections that failed or timed out are returned with their empty default
+        if section_errors:
+            patient_data['related_errors'] = section_errors
         patient_data['relationship'] = access_check.data[0]['relationship']
 
         current_app.logger.info(f"AUDIT: Successfully fetched child details for parent {current_user.get('email')}")
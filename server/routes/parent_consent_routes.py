@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, request, current_app
 from config.settings import supabase, supabase_service_role_client
 from utils.access_control import require_auth
 from utils.sanitize import sanitize_request_data
+from utils.qr_tokens import evict_qr_codes
+from utils.write_behind import enqueue
 from datetime import datetime, timezone, timedelta
 import re
 
@@ -32,6 +34,7 @@ def is_valid_uuid(value):
 def log_consent_action(sr_client, action, user_id, patient_id=None, qr_id=None, details=None, success=True):
     """
     Centralized audit logging for consent actions.
+    The row is bulk-inserted by the write-behind worker.
     Fails silently to not break main operations.
     """
     try:
@@ -48,7 +51,7 @@ def log_consent_action(sr_client, action, user_id, patient_id=None, qr_id=None,
         if qr_id:
             log_entry['qr_id'] = qr_id
 
-        sr_client.table('consent_audit_logs').insert(log_entry).execute()
+        enqueue('insert', {'table': 'consent_audit_logs', 'row': log_entry})
     except Exception as e:
         current_app.logger.warning(f"Failed to log consent action '{action}': {e}")
 
@@ -488,6 +491,7 @@ def revoke_share(qr_id):
         sr_client.table('qr_codes').update({
             'is_active': False
         }).eq('qr_id', qr_id).execute()
+        evict_qr_codes([qr_id])
 
         # Log the successful revocation
         log_consent_action(sr_client, 'qr_revoked', user_id,
@@ -558,6 +562,7 @@ def revoke_all_shares(patient_id):
         sr_client.table('qr_codes').update({
             'is_active': False
         }).in_('qr_id', qr_ids).execute()
+        evict_qr_codes(qr_ids)
 
         # Log the emergency revocation
         log_consent_action(sr_client, 'emergency_revoke_all', user_id,
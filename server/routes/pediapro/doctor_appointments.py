@@ -2,10 +2,12 @@ from flask import Flask, Blueprint, current_app, request, jsonify
 from utils.access_control import require_auth, require_role
 from utils.redis_client import get_redis_client
 from utils.sanitize import sanitize_request_data
-from utils.invalidate_cache import invalidate_caches
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
+from utils.patient_search import search_facility_patients
+from utils.access_scope import get_user_facility_ids, get_facility_patient_ids
 from postgrest.exceptions import APIError as AuthApiError
 from config.settings import supabase
-import json, datetime
+import json, datetime, base64
 
 appointment_bp = Blueprint('appointment', __name__)
 redis_client = get_redis_client()
@@ -37,6 +39,22 @@ def populate_doctor_name(appointment_data):
         appointment_data['doctor_name'] = doctor_name.strip()
     return appointment_data
 
+def appointment_cache_tags(appointments, **scopes):
+    """
+    Cache tags for a list of appointments: every appointment, patient, doctor and
+    facility it contains, merged with the scope the list was fetched for
+    """
+    tags = {
+        'appointment': [a.get('appointment_id') for a in appointments],
+        'patient': {a.get('patient_id') for a in appointments},
+        'doctor': {a.get('doctor_id') for a in appointments},
+        'facility': {a.get('facility_id') for a in appointments},
+    }
+    for kind, value in scopes.items():
+        values = [value] if isinstance(value, (str, int)) else list(value or [])
+        tags[kind] = set(tags.get(kind, set())) | set(values)
+    return tags
+
 def process_appointment_data(appointments_data):
     """
     Process appointment data to ensure patient_name and doctor_name are populated
@@ -104,6 +122,202 @@ def prepare_appointments_payload(data, is_update=False):
 
     return payload
 
+def appointment_names(patient_id=None, doctor_id=None):
+    """
+    Names stored on the appointment row at write time (patient_name, doctor_name),
+    so list reads never have to rebuild them
+    """
+    names = {}
+    if patient_id:
+        patient_resp = supabase.table('patients')\
+            .select('firstname, lastname, middlename')\
+            .eq('patient_id', patient_id)\
+            .maybe_single()\
+            .execute()
+
+        if patient_resp and not getattr(patient_resp, 'error', None) and patient_resp.data:
+            patient = patient_resp.data
+            # Construct full name
+            full_name_parts = [patient.get('firstname', '')]
+            if patient.get('middlename'):
+                full_name_parts.append(patient.get('middlename'))
+            full_name_parts.append(patient.get('lastname', ''))
+            names['patient_name'] = ' '.join(full_name_parts)
+
+    if doctor_id:
+        doctor_resp = supabase.table('users')\
+            .select('firstname, lastname')\
+            .eq('user_id', doctor_id)\
+            .maybe_single()\
+            .execute()
+
+        if doctor_resp and not getattr(doctor_resp, 'error', None) and doctor_resp.data:
+            doctor = doctor_resp.data
+            names['doctor_name'] = f"{doctor.get('firstname', '')} {doctor.get('lastname', '')}"
+
+    return names
+
+# ============================================================================
+# LIST WINDOWS
+# Appointment lists accept optional query parameters:
+#   from, to        appointment_date window (YYYY-MM-DD, inclusive)
+#   limit, cursor   keyset pagination ordered by appointment_date, appointment_id
+#                   (newest first); next_cursor is returned while more rows exist
+#   updated_since   delta mode: only rows created/updated after this ISO
+#                   timestamp; pass the previous response's timestamp
+# Without any of them the full list is returned as before.
+# ============================================================================
+
+APPOINTMENT_PAGE_SIZE = 50
+APPOINTMENT_PAGE_MAX = 200
+
+def encode_appointment_cursor(appointment):
+    raw = json.dumps([appointment.get('appointment_date'), appointment.get('appointment_id')])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_appointment_cursor(cursor):
+    """
+    (appointment_date, appointment_id) of a cursor. The date is parsed in full
+    and re-serialized, so only a well-formed timestamp reaches the filter
+    """
+    try:
+        appointment_date, appointment_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        appointment_date = datetime.datetime.fromisoformat(str(appointment_date).replace('Z', '+00:00'))
+        return appointment_date.isoformat(), int(appointment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_list_params(args):
+    """
+    Read the list window parameters from the query string.
+    Raises ValueError on malformed values.
+    """
+    params = {
+        'from': args.get('from'),
+        'to': args.get('to'),
+        'updated_since': args.get('updated_since'),
+        'cursor': args.get('cursor'),
+        'limit': None
+    }
+
+    for key in ('from', 'to'):
+        if params[key]:
+            try:
+                params[key] = datetime.date.fromisoformat(params[key]).isoformat()
+            except ValueError:
+                raise ValueError(f"Invalid '{key}' date, expected YYYY-MM-DD")
+
+    if params['updated_since']:
+        try:
+            since = datetime.datetime.fromisoformat(params['updated_since'].replace('Z', '+00:00'))
+            params['updated_since'] = since.isoformat()
+        except ValueError:
+            raise ValueError("Invalid 'updated_since' timestamp")
+
+    if args.get('limit'):
+        try:
+            params['limit'] = min(max(int(args.get('limit')), 1), APPOINTMENT_PAGE_MAX)
+        except ValueError:
+            raise ValueError("Invalid 'limit'")
+    elif params['cursor']:
+        params['limit'] = APPOINTMENT_PAGE_SIZE
+
+    if params['cursor']:
+        params['cursor_key'] = decode_appointment_cursor(params['cursor'])
+        # Cache windows by the parsed cursor, not the client's raw string
+        params['cursor'] = '{}|{}'.format(*params['cursor_key'])
+
+    params['windowed'] = any(params[key] for key in ('from', 'to', 'updated_since', 'limit'))
+    return params
+
+def apply_list_params(query, params):
+    """Apply window filters, ordering and page size to an appointments query"""
+    if params['from']:
+        query = query.gte('appointment_date', params['from'])
+    if params['to']:
+        query = query.lte('appointment_date', params['to'])
+    if params['updated_since']:
+        # updated_at is also set on insert (migrations/optimize_appointment_lists.sql)
+        query = query.gt('updated_at', params['updated_since'])
+    if params.get('cursor_key'):
+        appointment_date, appointment_id = params['cursor_key']
+        query = query.or_(
+            f'appointment_date.lt."{appointment_date}",'
+            f'and(appointment_date.eq."{appointment_date}",appointment_id.lt.{appointment_id})'
+        )
+
+    query = query.order('appointment_date', desc=True)
+    if params['windowed']:
+        # appointment_id breaks ties so the keyset cursor is stable
+        query = query.order('appointment_id', desc=True)
+    if params['limit']:
+        # One extra row tells whether another page exists
+        query = query.limit(params['limit'] + 1)
+    return query
+
+def paginate_appointments(appointments, params):
+    """Split an over-fetched page into (page, next_cursor)"""
+    if params['limit'] and len(appointments) > params['limit']:
+        page = appointments[:params['limit']]
+        return page, encode_appointment_cursor(page[-1])
+    return appointments, None
+
+def list_cache_key(base_key, params):
+    """Cache key of one window of a list; delta requests are never cached"""
+    if not params['windowed']:
+        return base_key
+    if params['updated_since']:
+        return None
+    return f"{base_key}:w:{params['from'] or ''}:{params['to'] or ''}:{params['limit'] or ''}:{params['cursor'] or ''}"
+
+def list_response(data, next_cursor, timestamp, params, cached, **extra):
+    """
+    List body. timestamp is when the rows were read (taken before the query,
+    and kept with cached windows), so passing it back as updated_since never
+    skips a change made after the read
+    """
+    body = {
+        "status": "success",
+        "data": data,
+        **extra,
+        "cached": cached,
+        "timestamp": timestamp
+    }
+    if params['limit']:
+        body['next_cursor'] = next_cursor
+        body['has_more'] = next_cursor is not None
+    return jsonify(body), 200
+
+def read_cached_list(cache_key):
+    """Cached window as (data, next_cursor, timestamp), or None on miss"""
+    if cache_key is None:
+        return None
+    cached = cache_get(cache_key)
+    # Entries without a read timestamp predate delta sync; refetch them
+    if not isinstance(cached, dict) or not cached.get('timestamp'):
+        return None
+    return cached.get('data', []), cached.get('next_cursor'), cached['timestamp']
+
+def store_cached_list(cache_key, data, next_cursor, timestamp, cache_type='appointments', **scopes):
+    if cache_key is None:
+        return
+    value = {'data': data, 'next_cursor': next_cursor, 'timestamp': timestamp}
+    cache_set(cache_key, value, 300, cache_type=cache_type, **appointment_cache_tags(data, **scopes))
+
+def invalidate_appointment_lists(appointment_id=None, *appointments):
+    """
+    Invalidate the cached lists an appointment is in or now belongs to: lists
+    holding it, the facility, patient and doctor lists of every version of
+    the row passed (old and new on update), and the unscoped /appointments
+    windows, which a new or moved appointment can enter
+    """
+    scopes = {
+        kind: {a.get(f'{kind}_id') for a in appointments if a}
+        for kind in ('facility', 'patient', 'doctor')
+    }
+    invalidate_caches('appointments', appointment_id, **scopes)
+    invalidate_caches('appointments_all')
+
 @appointment_bp.route('/appointments', methods=['GET'])
 @require_auth
 @require_role('facility_admin', 'doctor', 'nurse', 'staff')
@@ -112,23 +326,21 @@ def get_appointments():
     try:
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
         current_user = request.current_user
-        
-        # Check cache first
+        try:
+            list_params = parse_list_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cache_key = list_cache_key(APPOINTMENT_CACHE_KEY, list_params)
+
+        # Check cache first (cached lists are stored already processed)
         if not bust_cache:
-            cached = redis_client.get(APPOINTMENT_CACHE_KEY)
-            if cached:
-                cached_data = json.loads(cached)
-                # Process cached data to populate missing names
-                processed_data = process_appointment_data(cached_data)
-                return jsonify({
-                    'status': 'success',
-                    'data': processed_data,
-                    'cached': True,
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-                }), 200
+            cached = read_cached_list(cache_key)
+            if cached is not None:
+                return list_response(*cached, list_params, cached=True)
         
         # Fetch from database with proper joins using explicit foreign key relationships
-        resp = supabase.table('appointments')\
+        query = supabase.table('appointments')\
             .select('''
                 *,
                 patients!appointments_patient_id_fkey(patient_id, firstname, lastname, middlename, date_of_birth),
@@ -136,9 +348,9 @@ def get_appointments():
                 facility:healthcare_facilities!appointments_facility_id_fkey(facility_id, facility_name, address),
                 scheduled_by:users!appointments_scheduled_by_fkey(user_id, firstname, lastname),
                 updated_by:users!appointments_updated_by_fkey(user_id, firstname, lastname)
-            ''')\
-            .order('appointment_date', desc=True)\
-            .execute()
+            ''')
+        fetched_at = datetime.datetime.utcnow().isoformat()
+        resp = apply_list_params(query, list_params).execute()
         
         if getattr(resp, 'error', None):
             current_app.logger.error(f"AUDIT: Failed to fetch appointments: {resp.error.message}")
@@ -149,19 +361,14 @@ def get_appointments():
             }), 400
         
         # Process data to populate missing names
-        processed_data = process_appointment_data(resp.data)
+        processed_data, next_cursor = paginate_appointments(process_appointment_data(resp.data), list_params)
         
         # Cache the processed results for 5 minutes
-        redis_client.setex(APPOINTMENT_CACHE_KEY, 300, json.dumps(processed_data))
+        store_cached_list(cache_key, processed_data, next_cursor, fetched_at, cache_type='appointments_all')
         
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetched all appointments")
         
-        return jsonify({
-            "status": "success",
-            "data": processed_data,
-            "cached": False,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }), 200
+        return list_response(processed_data, next_cursor, fetched_at, list_params, cached=False)
     
     except Exception as e:
         current_app.logger.error(f"AUDIT: Error fetching appointments: {str(e)}")
@@ -180,27 +387,24 @@ def get_appointments_by_patient_id(patient_id):
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetching appointments for patient: {patient_id}")
         
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
-        cache_key = f"{APPOINTMENT_CACHE_PREFIX}patient:{patient_id}"
+        try:
+            list_params = parse_list_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cache_key = list_cache_key(f"{APPOINTMENT_CACHE_PREFIX}patient:{patient_id}", list_params)
         
-        # Check cache first
+        # Check cache first (cached lists are stored already processed)
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                # Process cached data to populate missing names
-                processed_data = process_appointment_data(cached_data)
-                return jsonify({
-                    'status': 'success',
-                    'data': processed_data,
-                    'cached': True,
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-                }), 200
+            cached = read_cached_list(cache_key)
+            if cached is not None:
+                return list_response(*cached, list_params, cached=True)
         
         # Debug: Log the patient_id being queried
         current_app.logger.info(f"DEBUG: Querying appointments for patient_id: {patient_id}")
         
         # Get appointments for the patient with related data using explicit foreign key relationships
-        resp = supabase.table('appointments')\
+        query = supabase.table('appointments')\
             .select('''
                 *,
                 patients!appointments_patient_id_fkey(patient_id, firstname, lastname, middlename, date_of_birth),
@@ -209,9 +413,9 @@ def get_appointments_by_patient_id(patient_id):
                 scheduled_by:users!appointments_scheduled_by_fkey(user_id, firstname, lastname),
                 updated_by:users!appointments_updated_by_fkey(user_id, firstname, lastname)
             ''')\
-            .eq('patient_id', patient_id)\
-            .order('appointment_date', desc=True)\
-            .execute()
+            .eq('patient_id', patient_id)
+        fetched_at = datetime.datetime.utcnow().isoformat()
+        resp = apply_list_params(query, list_params).execute()
         
         # Debug: Log the raw response
         current_app.logger.info(f"DEBUG: Raw Supabase response data length: {len(resp.data) if resp.data else 0}")
@@ -230,7 +434,7 @@ def get_appointments_by_patient_id(patient_id):
             current_app.logger.info(f"DEBUG: First appointment raw data keys: {list(resp.data[0].keys())}")
         
         # Process data to populate missing names
-        processed_data = process_appointment_data(resp.data)
+        processed_data, next_cursor = paginate_appointments(process_appointment_data(resp.data), list_params)
         
         # Debug: Log processed data
         current_app.logger.info(f"DEBUG: Processed data length: {len(processed_data)}")
@@ -238,14 +442,9 @@ def get_appointments_by_patient_id(patient_id):
             current_app.logger.info(f"DEBUG: First processed appointment keys: {list(processed_data[0].keys())}")
         
         # Cache the processed results for 5 minutes
-        redis_client.setex(cache_key, 300, json.dumps(processed_data))
+        store_cached_list(cache_key, processed_data, next_cursor, fetched_at, patient=patient_id)
         
-        return jsonify({
-            "status": "success",
-            "data": processed_data,
-            "cached": False,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }), 200
+        return list_response(processed_data, next_cursor, fetched_at, list_params, cached=False)
     
     except Exception as e:
         current_app.logger.error(f"AUDIT: Error fetching appointments for patient {patient_id}: {str(e)}")
@@ -267,24 +466,21 @@ def get_appointments_by_facility_id(facility_id):
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetching appointments for facility: {facility_id}")
         
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
-        cache_key = f"{APPOINTMENT_CACHE_PREFIX}facility:{facility_id}"
+        try:
+            list_params = parse_list_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cache_key = list_cache_key(f"{APPOINTMENT_CACHE_PREFIX}facility:{facility_id}", list_params)
         
-        # Check cache first
+        # Check cache first (cached lists are stored already processed)
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                # Process cached data to populate missing names
-                processed_data = process_appointment_data(cached_data)
-                return jsonify({
-                    'status': 'success',
-                    'data': processed_data,
-                    'cached': True,
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-                }), 200
+            cached = read_cached_list(cache_key)
+            if cached is not None:
+                return list_response(*cached, list_params, cached=True)
         
         # Get appointments for the facility with related data using explicit foreign key relationships
-        resp = supabase.table('appointments')\
+        query = supabase.table('appointments')\
             .select('''
                 *,
                 patients!appointments_patient_id_fkey(patient_id, firstname, lastname, middlename, date_of_birth),
@@ -292,9 +488,9 @@ def get_appointments_by_facility_id(facility_id):
                 scheduled_by:users!appointments_scheduled_by_fkey(user_id, firstname, lastname),
                 updated_by:users!appointments_updated_by_fkey(user_id, firstname, lastname)
             ''')\
-            .eq('facility_id', facility_id)\
-            .order('appointment_date', desc=True)\
-            .execute()
+            .eq('facility_id', facility_id)
+        fetched_at = datetime.datetime.utcnow().isoformat()
+        resp = apply_list_params(query, list_params).execute()
         
         if getattr(resp, 'error', None):
             current_app.logger.error(f"AUDIT: Failed to fetch appointments for facility {facility_id}: {resp.error.message}")
@@ -305,17 +501,12 @@ def get_appointments_by_facility_id(facility_id):
             }), 400
         
         # Process data to populate missing names
-        processed_data = process_appointment_data(resp.data)
+        processed_data, next_cursor = paginate_appointments(process_appointment_data(resp.data), list_params)
         
         # Cache the processed results for 5 minutes
-        redis_client.setex(cache_key, 300, json.dumps(processed_data))
+        store_cached_list(cache_key, processed_data, next_cursor, fetched_at, facility=facility_id)
         
-        return jsonify({
-            "status": "success",
-            "data": processed_data,
-            "cached": False,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }), 200
+        return list_response(processed_data, next_cursor, fetched_at, list_params, cached=False)
     
     except Exception as e:
         current_app.logger.error(f"AUDIT: Error fetching appointments for facility {facility_id}: {str(e)}")
@@ -366,26 +557,25 @@ def get_appointments_for_user_facility():
             }), 404
 
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
-        cache_key = f"{APPOINTMENT_CACHE_PREFIX}facility:{facility_id}"
+        try:
+            list_params = parse_list_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cache_key = list_cache_key(f"{APPOINTMENT_CACHE_PREFIX}facility:{facility_id}", list_params)
+        facility_fields = {
+            'facility_id': facility_id,
+            'facility_name': facility_info.get('facility_name', 'Unknown')
+        }
 
-        # Check cache first
+        # Check cache first (cached lists are stored already processed)
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                # Process cached data to populate missing names
-                processed_data = process_appointment_data(cached_data)
-                return jsonify({
-                    'status': 'success',
-                    'data': processed_data,
-                    'facility_id': facility_id,
-                    'facility_name': facility_info.get('facility_name', 'Unknown'),
-                    'cached': True,
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-                }), 200
+            cached = read_cached_list(cache_key)
+            if cached is not None:
+                return list_response(*cached, list_params, cached=True, **facility_fields)
 
         # Get appointments for the facility with related data
-        resp = supabase.table('appointments')\
+        query = supabase.table('appointments')\
             .select('''
                 *,
                 patients!appointments_patient_id_fkey(patient_id, firstname, lastname, middlename, date_of_birth),
@@ -393,9 +583,9 @@ def get_appointments_for_user_facility():
                 scheduled_by:users!appointments_scheduled_by_fkey(user_id, firstname, lastname),
                 updated_by:users!appointments_updated_by_fkey(user_id, firstname, lastname)
             ''')\
-            .eq('facility_id', facility_id)\
-            .order('appointment_date', desc=True)\
-            .execute()
+            .eq('facility_id', facility_id)
+        fetched_at = datetime.datetime.utcnow().isoformat()
+        resp = apply_list_params(query, list_params).execute()
 
         if getattr(resp, 'error', None):
             current_app.logger.error(f"AUDIT: Failed to fetch appointments for facility {facility_id}: {resp.error.message}")
@@ -406,21 +596,14 @@ def get_appointments_for_user_facility():
             }), 400
 
         # Process data to populate missing names
-        processed_data = process_appointment_data(resp.data)
+        processed_data, next_cursor = paginate_appointments(process_appointment_data(resp.data), list_params)
 
         # Cache the processed results for 5 minutes
-        redis_client.setex(cache_key, 300, json.dumps(processed_data))
+        store_cached_list(cache_key, processed_data, next_cursor, fetched_at, facility=facility_id)
 
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetched {len(processed_data)} appointments for facility {facility_id}")
 
-        return jsonify({
-            "status": "success",
-            "data": processed_data,
-            "facility_id": facility_id,
-            "facility_name": facility_info.get('facility_name', 'Unknown'),
-            "cached": False,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }), 200
+        return list_response(processed_data, next_cursor, fetched_at, list_params, cached=False, **facility_fields)
 
     except Exception as e:
         current_app.logger.error(f"AUDIT: Error fetching appointments for user's facility: {str(e)}")
@@ -440,38 +623,24 @@ def get_appointments_by_doctor_id(doctor_id):
 
         bust_cache = request.args.get('bust_cache', 'false').lower() == 'true'
         user_id = current_user.get('id')
-        cache_key = f"{APPOINTMENT_CACHE_PREFIX}doctor:{doctor_id}:user:{user_id}"
+        try:
+            list_params = parse_list_params(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        cache_key = list_cache_key(f"{APPOINTMENT_CACHE_PREFIX}doctor:{doctor_id}:user:{user_id}", list_params)
 
         # Check cache first (include user_id in cache key for facility isolation)
         if not bust_cache:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                # Process cached data to populate missing names
-                processed_data = process_appointment_data(cached_data)
-                return jsonify({
-                    'status': 'success',
-                    'data': processed_data,
-                    'cached': True,
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-                }), 200
+            cached = read_cached_list(cache_key)
+            if cached is not None:
+                return list_response(*cached, list_params, cached=True)
 
         # SECURITY FIX: Enforce facility isolation
-        # Step 1: Get facilities where the current user works
-        user_facilities_resp = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', user_id)\
-            .is_('end_date', 'null')\
-            .execute()
+        # Step 1: Get facilities where the current user works (cached access scope)
+        facility_ids = get_user_facility_ids(user_id)
 
-        if getattr(user_facilities_resp, 'error', None):
-            current_app.logger.error(f"AUDIT: Failed to fetch user facilities: {user_facilities_resp.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch user facilities"
-            }), 400
-
-        if not user_facilities_resp.data:
+        if not facility_ids:
             current_app.logger.warning(f"AUDIT: User {current_user.get('email')} has no facility assignments")
             return jsonify({
                 "status": "success",
@@ -479,23 +648,8 @@ def get_appointments_by_doctor_id(doctor_id):
                 "message": "No facilities found for current user"
             }), 200
 
-        facility_ids = [f['facility_id'] for f in user_facilities_resp.data]
-
         # Step 2: Get patients that belong to these facilities
-        facility_patients_resp = supabase.table('facility_patients')\
-            .select('patient_id')\
-            .in_('facility_id', facility_ids)\
-            .eq('is_active', True)\
-            .execute()
-
-        if getattr(facility_patients_resp, 'error', None):
-            current_app.logger.error(f"AUDIT: Failed to fetch facility patients: {facility_patients_resp.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch facility patients"
-            }), 400
-
-        accessible_patient_ids = [p['patient_id'] for p in facility_patients_resp.data]
+        accessible_patient_ids = sorted(get_facility_patient_ids(facility_ids))
 
         if not accessible_patient_ids:
             current_app.logger.info(f"AUDIT: No patients found in user's facilities")
@@ -506,7 +660,7 @@ def get_appointments_by_doctor_id(doctor_id):
             }), 200
 
         # Step 3: Get appointments for the doctor, filtered by accessible patients
-        resp = supabase.table('appointments')\
+        query = supabase.table('appointments')\
             .select('''
                 *,
                 patients!appointments_patient_id_fkey(patient_id, firstname, lastname, middlename, date_of_birth),
@@ -515,9 +669,9 @@ def get_appointments_by_doctor_id(doctor_id):
                 scheduled_user:users!appointments_scheduled_by_fkey(user_id, firstname, lastname)
             ''')\
             .eq('doctor_id', doctor_id)\
-            .in_('patient_id', accessible_patient_ids)\
-            .order('appointment_date', desc=True)\
-            .execute()
+            .in_('patient_id', accessible_patient_ids)
+        fetched_at = datetime.datetime.utcnow().isoformat()
+        resp = apply_list_params(query, list_params).execute()
 
         if getattr(resp, 'error', None):
             current_app.logger.error(f"AUDIT: Failed to fetch appointments for doctor {doctor_id}: {resp.error.message}")
@@ -528,19 +682,14 @@ def get_appointments_by_doctor_id(doctor_id):
             }), 400
 
         # Process data to populate missing names
-        processed_data = process_appointment_data(resp.data)
+        processed_data, next_cursor = paginate_appointments(process_appointment_data(resp.data), list_params)
 
         # Cache the processed results for 5 minutes
-        redis_client.setex(cache_key, 300, json.dumps(processed_data))
+        store_cached_list(cache_key, processed_data, next_cursor, fetched_at, doctor=doctor_id, facility=facility_ids)
 
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetched {len(processed_data)} appointments for doctor {doctor_id} (facility-isolated)")
 
-        return jsonify({
-            "status": "success",
-            "data": processed_data,
-            "cached": False,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }), 200
+        return list_response(processed_data, next_cursor, fetched_at, list_params, cached=False)
 
     except Exception as e:
         current_app.logger.error(f"AUDIT: Error fetching appointments for doctor {doctor_id}: {str(e)}")
@@ -568,21 +717,10 @@ def search_patients():
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} searching for patient: {search_term}")
 
         # SECURITY FIX: Enforce facility isolation
-        # Step 1: Get facilities where the current user works
-        user_facilities_resp = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', user_id)\
-            .is_('end_date', 'null')\
-            .execute()
+        # Step 1: Get facilities where the current user works (cached access scope)
+        facility_ids = get_user_facility_ids(user_id)
 
-        if getattr(user_facilities_resp, 'error', None):
-            current_app.logger.error(f"AUDIT: Failed to fetch user facilities: {user_facilities_resp.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch user facilities"
-            }), 400
-
-        if not user_facilities_resp.data:
+        if not facility_ids:
             current_app.logger.warning(f"AUDIT: User {current_user.get('email')} has no facility assignments")
             return jsonify({
                 "status": "success",
@@ -590,61 +728,12 @@ def search_patients():
                 "message": "No facilities found for current user"
             }), 200
 
-        facility_ids = [f['facility_id'] for f in user_facilities_resp.data]
-
-        # Step 2: Get patients that belong to these facilities
-        facility_patients_resp = supabase.table('facility_patients')\
-            .select('patient_id')\
-            .in_('facility_id', facility_ids)\
-            .eq('is_active', True)\
-            .execute()
-
-        if getattr(facility_patients_resp, 'error', None):
-            current_app.logger.error(f"AUDIT: Failed to fetch facility patients: {facility_patients_resp.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch facility patients"
-            }), 400
-
-        accessible_patient_ids = [p['patient_id'] for p in facility_patients_resp.data]
-
-        if not accessible_patient_ids:
-            current_app.logger.info(f"AUDIT: No patients found in user's facilities")
-            return jsonify({
-                "status": "success",
-                "data": [],
-                "message": "No patients found in your facilities"
-            }), 200
-
-        # Split the search term into parts for better matching
-        name_parts = search_term.lower().split()
-
-        # Build search query for first and last names
-        search_conditions = []
-        for part in name_parts:
-            search_conditions.append(f'firstname.ilike.%{part}%')
-            search_conditions.append(f'lastname.ilike.%{part}%')
-
-        # Step 3: Search for patients with matching names (filtered by accessible patients)
-        resp = supabase.table('patients')\
-            .select('patient_id, firstname, lastname, middlename, date_of_birth, sex')\
-            .or_(','.join(search_conditions))\
-            .in_('patient_id', accessible_patient_ids)\
-            .eq('is_active', True)\
-            .limit(10)\
-            .execute()
-
-        if getattr(resp, 'error', None):
-            current_app.logger.error(f"AUDIT: Error searching patients: {resp.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to search patients",
-                "details": resp.error.message
-            }), 400
+        # Step 2: Search the facilities' patient name index (database on index miss)
+        patients = search_facility_patients(facility_ids, search_term, limit=10)
 
         # Format the results
         matches = []
-        for patient in resp.data:
+        for patient in patients:
             # Build full name including middle name if present
             full_name_parts = [patient['firstname']]
             if patient.get('middlename'):
@@ -683,28 +772,16 @@ def get_available_doctors():
         current_user = request.current_user
         user_id = current_user.get('id')
         
-        # Get facilities where the current user works
-        user_facilities_resp = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', user_id)\
-            .is_('end_date', 'null')\
-            .execute()
+        # Get facilities where the current user works (cached access scope)
+        facility_ids = get_user_facility_ids(user_id)
         
-        if getattr(user_facilities_resp, 'error', None):
-            return jsonify({
-                "status": "error",
-                "message": "Failed to fetch user facilities"
-            }), 400
-        
-        if not user_facilities_resp.data:
+        if not facility_ids:
             return jsonify({
                 "status": "success",
                 "data": [],
                 "message": "No facilities found for current user"
             }), 200
         
-        facility_ids = [f['facility_id'] for f in user_facilities_resp.data]
-        
         # Get doctors from the same facilities
         doctors_resp = supabase.table('facility_users')\
             .select('''
@@ -818,34 +895,17 @@ def schedule_appointment():
         
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} attempting to schedule appointment")
 
-        facility_response = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', current_user_id)\
-            .maybe_single()\
-            .execute()
-
-        if getattr(facility_response, 'error', None):
-            current_app.logger.error(f"AUDIT: Failed to get facility id: {facility_response.error.message}")
-            return jsonify({
-                "status": "error",
-                "message": "Failed to get facility information",
-                "details": facility_response.error.message,
-            }), 400
+        user_facility_ids = get_user_facility_ids(current_user_id)
 
         # Check if user has a facility assignment
-        if not facility_response.data:
+        if not user_facility_ids:
             current_app.logger.error(f"AUDIT: User {current_user.get('email')} has no facility assignment")
             return jsonify({
                 "status": "error",
                 "message": "No facility found for current user. Please contact your administrator."
             }), 400
 
-        facility_id = facility_response.data.get('facility_id')
-        if not facility_id:
-            return jsonify({
-                "status": "error",
-                "message": "No facility found for current user"
-            }), 400
+        facility_id = user_facility_ids[0]
             
         # Add facility_id to the appointment data if not already present
         if 'facility_id' not in data:
@@ -853,34 +913,8 @@ def schedule_appointment():
         
         
         
-        # Get patient details if patient_id is provided
-        if data.get('patient_id'):
-            patient_resp = supabase.table('patients')\
-                .select('firstname, lastname, middlename')\
-                .eq('patient_id', data['patient_id'])\
-                .maybe_single()\
-                .execute()
-                
-            if not getattr(patient_resp, 'error', None) and patient_resp.data:
-                patient = patient_resp.data
-                # Construct full name
-                full_name_parts = [patient.get('firstname', '')]
-                if patient.get('middlename'):
-                    full_name_parts.append(patient.get('middlename'))
-                full_name_parts.append(patient.get('lastname', ''))
-                data['patient_name'] = ' '.join(full_name_parts)
-
-        # Get doctor's full name if doctor_id is provided
-        if data.get('doctor_id'):
-            doctor_resp = supabase.table('users')\
-                .select('firstname, lastname')\
-                .eq('user_id', data['doctor_id'])\
-                .maybe_single()\
-                .execute()
-                
-            if not getattr(doctor_resp, 'error', None) and doctor_resp.data:
-                doctor = doctor_resp.data
-                data['doctor_name'] = f"{doctor.get('firstname', '')} {doctor.get('lastname', '')}"
+        # Store patient and doctor names on the row so list reads need no name lookups
+        data.update(appointment_names(data.get('patient_id'), data.get('doctor_id')))
 
         # Prepare the appointment payload
         try:
@@ -947,8 +981,8 @@ def schedule_appointment():
                 "message": "Failed to get appointment ID"
             }), 400
         
-        # Invalidate related caches
-        invalidate_caches('appointments')
+        # Invalidate the lists the new appointment belongs to
+        invalidate_appointment_lists(None, appointments_payload, appointments_resp.data[0])
         
         current_app.logger.info(f"AUDIT: Successfully scheduled appointment with ID {appointment_id}")
         
@@ -995,34 +1029,8 @@ def update_appointment(appointment_id):
         # Add the user who updated the appointment
         data['updated_by'] = current_user.get('id')
 
-        # Get patient details if patient_id is provided
-        if data.get('patient_id'):
-            patient_resp = supabase.table('patients')\
-                .select('firstname, lastname, middlename')\
-                .eq('patient_id', data['patient_id'])\
-                .maybe_single()\
-                .execute()
-                
-            if not getattr(patient_resp, 'error', None) and patient_resp.data:
-                patient = patient_resp.data
-                # Construct full name
-                full_name_parts = [patient.get('firstname', '')]
-                if patient.get('middlename'):
-                    full_name_parts.append(patient.get('middlename'))
-                full_name_parts.append(patient.get('lastname', ''))
-                data['patient_name'] = ' '.join(full_name_parts)
-
-        # Get doctor's full name if doctor_id is provided
-        if data.get('doctor_id'):
-            doctor_resp = supabase.table('users')\
-                .select('firstname, lastname')\
-                .eq('user_id', data['doctor_id'])\
-                .maybe_single()\
-                .execute()
-                
-            if not getattr(doctor_resp, 'error', None) and doctor_resp.data:
-                doctor = doctor_resp.data
-                data['doctor_name'] = f"{doctor.get('firstname', '')} {doctor.get('lastname', '')}"
+        # Store patient and doctor names on the row so list reads need no name lookups
+        data.update(appointment_names(data.get('patient_id'), data.get('doctor_id')))
         
         # Prepare the update payload
         try:
@@ -1033,6 +1041,14 @@ def update_appointment(appointment_id):
                 "message": str(ve)
             }), 400
         
+        # Scope before the update, so the lists it is moving out of are invalidated too
+        previous_resp = supabase.table('appointments')\
+            .select('facility_id, patient_id, doctor_id')\
+            .eq('appointment_id', appointment_id)\
+            .maybe_single()\
+            .execute()
+        previous = previous_resp.data if previous_resp else None
+
         # Update the appointment
         update_resp = supabase.table('appointments')\
             .update(appointments_payload)\
@@ -1074,7 +1090,7 @@ def update_appointment(appointment_id):
             if getattr(fetch_resp, 'error', None) or not fetch_resp.data:
                 # Still return success with minimal data since update worked
                 current_app.logger.warning(f"AUDIT: Could not fetch updated appointment {appointment_id}, returning minimal data")
-                invalidate_caches('appointments', appointment_id)
+                invalidate_appointment_lists(appointment_id, previous, appointments_payload)
                 return jsonify({
                     "status": "success",
                     "message": "Appointment updated successfully",
@@ -1089,7 +1105,7 @@ def update_appointment(appointment_id):
             updated_appointment = populate_doctor_name(updated_appointment)
 
             # Invalidate related caches
-            invalidate_caches('appointments', appointment_id)
+            invalidate_appointment_lists(appointment_id, previous, updated_appointment)
 
             current_app.logger.info(f"AUDIT: Successfully updated appointment {appointment_id}")
 
@@ -1102,7 +1118,7 @@ def update_appointment(appointment_id):
         except Exception as fetch_error:
             current_app.logger.error(f"AUDIT: Exception fetching updated appointment {appointment_id}: {str(fetch_error)}")
             # Still return success since update worked
-            invalidate_caches('appointments', appointment_id)
+            invalidate_appointment_lists(appointment_id, previous, appointments_payload)
             return jsonify({
                 "status": "success",
                 "message": "Appointment updated successfully",
@@ -2,8 +2,8 @@ from flask import Flask, jsonify, request, current_app, Blueprint
 from config.settings import get_authenticated_client
 from utils.access_control import require_auth, require_role
 from utils.redis_client import get_redis_client
-from utils.invalidate_cache import invalidate_caches
-import json, datetime
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
+import datetime
 from utils.sanitize import sanitize_request_data
 
 patrx_bp = Blueprint('patrx', __name__)
@@ -97,9 +97,8 @@ def get_all_patient_rx(patient_id):
 
         if not bust_cache:
             try:
-                cached = redis_client.get(cache_key)
-                if cached:
-                    cached_data = json.loads(cached)
+                cached_data = cache_get(cache_key)
+                if cached_data is not None:
                     current_app.logger.info(f"Cache hit for patient {patient_id}")
                     return jsonify({
                         'status': 'success',
@@ -154,16 +153,20 @@ def get_all_patient_rx(patient_id):
         
         # Cache the constructed response
         try:
-            redis_client.setex(cache_key_for_patient(patient_id), CACHE_EXPIRY, json.dumps(resp))
+            cache_set(
+                cache_key_for_patient(patient_id), resp, CACHE_EXPIRY,
+                cache_type='patient_prescription', patient=patient_id, prescription=rx_ids
+            )
             
             # Cache individual medications
             for rx in prescriptions:
                 rx_id = rx.get('rx_id')
                 if rx_id and rx.get('medications'):
-                    redis_client.setex(
+                    cache_set(
                         cache_key_for_medication(rx_id),
+                        rx['medications'],
                         CACHE_EXPIRY,
-                        json.dumps(rx['medications'])
+                        cache_type='prescription_med', prescription=rx_id, patient=patient_id
                     )
         except Exception as cache_error:
             current_app.logger.warning(f"Cache update failed: {str(cache_error)}")
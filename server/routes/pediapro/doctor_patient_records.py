@@ -3,7 +3,10 @@ from utils.access_control import require_auth, require_role
 from config.settings import supabase, supabase_service_role_client, get_authenticated_client
 from postgrest.exceptions import APIError as AuthApiError
 from utils.redis_client import get_redis_client, clear_patient_cache
-from utils.invalidate_cache import invalidate_caches
+from utils.invalidate_cache import invalidate_caches, cache_get, cache_set
+from utils.patient_search import queue_patient_reindex
+from utils.access_scope import invalidate_user_scope, invalidate_facility_scope
+from utils.related_records import RelatedSection, load_related_records, age_section
 from utils.gen_password import generate_password
 import json, datetime
 
@@ -298,10 +301,9 @@ def get_patient_records():
         facility_cache_key = f"{PATIENT_CACHE_PREFIX}facility:{user_facility_id}"
 
         if not bust_cache:
-            cached = redis_client.get(facility_cache_key)
+            cached_data = cache_get(facility_cache_key)
 
-            if cached:
-                cached_data = json.loads(cached)
+            if cached_data is not None:
                 return jsonify({
                     "status": "success",
                     "data": cached_data,
@@ -362,7 +364,12 @@ def get_patient_records():
         current_app.logger.info(f"AUDIT: User {current_user.get('email')} fetched {len(patients_data)} patients from facility {user_facility_id}")
 
         # Cache the facility-specific results
-        redis_client.setex(facility_cache_key, 300, json.dumps(patients_data))
+        cache_set(
+            facility_cache_key, patients_data, 300,
+            cache_type='patient',
+            facility=user_facility_id,
+            patient=[p.get('patient_id') for p in patients_data]
+        )
 
         return jsonify({
             "status": "success",
@@ -503,7 +510,9 @@ def add_patient_record():
             else:
                 current_app.logger.warning(f"AUDIT: User {current_user.get('email')} has no facility_id, patient {patient_id} not registered to any facility")
 
-            invalidate_caches('patient', patient_id)
+            invalidate_caches('patient', patient_id, facility=user_facility_id)
+            invalidate_facility_scope(user_facility_id)
+            queue_patient_reindex(patient_id)
 
             current_app.logger.info(f"AUDIT: Successfully created patient record with ID {patient_id} for user {current_user.get('email', 'Unknown')}")
 
@@ -1677,6 +1686,7 @@ def create_and_assign_parent(patient_id):
                 facility_resp = get_authenticated_client().table('facility_users').insert(facility_user_payload).execute()
                 if not getattr(facility_resp, 'error', None):
                     current_app.logger.info(f"AUDIT: Assigned parent {parent_user_id} to facility {facility_id}")
+                    invalidate_user_scope(parent_user_id)
             except Exception as fac_error:
                 current_app.logger.warning(f"AUDIT: Failed to assign parent to facility: {str(fac_error)}")
                 # Continue even if facility assignment fails
@@ -1866,6 +1876,7 @@ def update_patient_record(patient_id):
                 }), 400
         
         invalidate_caches('patient', patient_id)
+        queue_patient_reindex(patient_id)
         current_app.logger.info(f"AUDIT: Successfully updated patient record {patient_id}")
         
         return jsonify({
@@ -1954,126 +1965,93 @@ def get_patient_record_by_id(patient_id):
 
         patient_data = resp.data
 
-        try:
-            age_resp = get_authenticated_client().rpc('calculate_age', {'date_of_birth': patient_data['date_of_birth']}).execute()
-            
-            if age_resp.data is not None: 
-                age_data = age_resp.data
-                
-                patient_data['age_info'] = {
-                    'formatted_age': age_data.get('formatted_age', 'Unknown'),
-                    'years': age_data.get('years', 0),
-                    'months': age_data.get('months', 0),
-                    'days': age_data.get('days', 0),
-                    'total_days': age_data.get('total_days', 0),
-                    'calculated_on': age_data.get('calculated_on')
-                }
-                
-                patient_data['age'] = age_data.get('formatted_age')
-                
+        # Age and related sections are independent round trips - fan them out together
+        db = get_authenticated_client()
+        sections = {'age': age_section(db, patient_data['date_of_birth'])}
+
+        if include_related:
+            sections.update({
+                'delivery': RelatedSection(
+                    lambda: db.table('delivery_record').select('*').eq('patient_id', patient_id).execute(),
+                    default=None, shape='first'
+                ),
+                'anthropometric_measurements': RelatedSection(
+                    lambda: db.table('anthropometric_measurements').select('*').eq('patient_id', patient_id).execute(),
+                    default=[]
+                ),
+                'screening': RelatedSection(
+                    lambda: db.table('screening_tests').select('*').eq('patient_id', patient_id).execute(),
+                    default=None, shape='first'
+                ),
+                'allergies': RelatedSection(
+                    lambda: db.table('allergies').select('*').eq('patient_id', patient_id).order('date_identified', desc=True).execute(),
+                    default=[]
+                ),
+                'prescriptions': RelatedSection(
+                    lambda: db.table('prescriptions').select('*').eq('patient_id', patient_id).execute(),
+                    default=[]
+                ),
+                # Exclude soft-deleted vaccination records
+                'vaccinations': RelatedSection(
+                    lambda: db.table('vaccinations')\
+                        .select('*')\
+                        .eq('patient_id', patient_id)\
+                        .eq('is_deleted', False)\
+                        .execute(),
+                    default=[]
+                ),
+                # Parent access data with user information
+                'parent_access': RelatedSection(
+                    lambda: db.table('parent_access').select('''
+                        access_id,
+                        relationship,
+                        granted_at,
+                        revoked_at,
+                        is_active,
+                        users!parent_access_user_id_fkey(
+                            user_id,
+                            email,
+                            firstname,
+                            lastname,
+                            phone_number
+                        )
+                    ''').eq('patient_id', patient_id).eq('is_active', True).execute(),
+                    default=[]
+                ),
+            })
+
+        results, section_errors = load_related_records(sections)
+        age_data = results.pop('age')
+
+        if age_data is not None:
+            patient_data['age_info'] = {
+                'formatted_age': age_data.get('formatted_age', 'Unknown'),
+                'years': age_data.get('years', 0),
+                'months': age_data.get('months', 0),
+                'days': age_data.get('days', 0),
+                'total_days': age_data.get('total_days', 0),
+                'calculated_on': age_data.get('calculated_on')
+            }
+
+            patient_data['age'] = age_data.get('formatted_age')
+        else:
+            if 'age' in section_errors:
+                current_app.logger.error(f"Error calculating age for patient {patient_id}: {section_errors['age']}")
             else:
                 current_app.logger.warning(f"Age calculation returned null for patient {patient_id}")
-                patient_data['calculated_age'] = None
-        except Exception as age_error:
-            current_app.logger.error(f"Error calculating age for patient {patient_id}: {str(age_error)}")
             # Don't fail the entire request if age calculation fails
             patient_data['calculated_age'] = None
-            
-            
+
         # Optionally include related records
         if include_related:
-            related_data = {}
-
-            try:
-                # Get delivery record - RLS policies enforce access
-                delivery_resp = get_authenticated_client().table('delivery_record').select('*').eq('patient_id', patient_id).execute()
-                if getattr(delivery_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching delivery record for patient {patient_id}: {delivery_resp.error.message}")
-                    related_data['delivery'] = None
-                else:
-                    related_data['delivery'] = delivery_resp.data[0] if delivery_resp.data else None
-
-                # Get anthropometric measurements
-                anthro_resp = get_authenticated_client().table('anthropometric_measurements').select('*').eq('patient_id', patient_id).execute()
-                if getattr(anthro_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching anthropometric data for patient {patient_id}: {anthro_resp.error.message}")
-                    related_data['anthropometric_measurements'] = []
-                else:
-                    related_data['anthropometric_measurements'] = anthro_resp.data or []
-
-                # Get screening tests
-                screening_resp = get_authenticated_client().table('screening_tests').select('*').eq('patient_id', patient_id).execute()
-                if getattr(screening_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching screening data for patient {patient_id}: {screening_resp.error.message}")
-                    related_data['screening'] = None
-                else:
-                    related_data['screening'] = screening_resp.data[0] if screening_resp.data else None
-
-                # Get allergies
-                allergy_resp = get_authenticated_client().table('allergies').select('*').eq('patient_id', patient_id).order('date_identified', desc=True).execute()
-                if getattr(allergy_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching allergies for patient {patient_id}: {allergy_resp.error.message}")
-                    related_data['allergies'] = []
-                else:
-                    related_data['allergies'] = allergy_resp.data or []
-
-                # Get prescriptions
-                rx_resp = get_authenticated_client().table('prescriptions').select('*').eq('patient_id', patient_id).execute()
-                if getattr(rx_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching prescriptions for patient {patient_id}: {rx_resp.error.message}")
-                    related_data['prescriptions'] = []
-                else:
-                    related_data['prescriptions'] = rx_resp.data or []
-
-                # Get vaccinations (exclude soft-deleted records)
-                vaccination_resp = get_authenticated_client().table('vaccinations')\
-                    .select('*')\
-                    .eq('patient_id', patient_id)\
-                    .eq('is_deleted', False)\
-                    .execute()
-                if getattr(vaccination_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching vaccinations for patient {patient_id}: {vaccination_resp.error.message}")
-                    related_data['vaccinations'] = []
-                else:
-                    related_data['vaccinations'] = vaccination_resp.data or []
-
-                # Get parent access data with user information
-                parent_access_resp = get_authenticated_client().table('parent_access').select('''
-                    access_id,
-                    relationship,
-                    granted_at,
-                    revoked_at,
-                    is_active,
-                    users!parent_access_user_id_fkey(
-                        user_id,
-                        email,
-                        firstname,
-                        lastname,
-                        phone_number
-                    )
-                ''').eq('patient_id', patient_id).eq('is_active', True).execute()
-
-                if getattr(parent_access_resp, 'error', None):
-                    current_app.logger.error(f"Error fetching parent access for patient {patient_id}: {parent_access_resp.error.message}")
-                    related_data['parent_access'] = []
-                else:
-                    related_data['parent_access'] = parent_access_resp.data or []
-
-            except Exception as related_error:
-                current_app.logger.error(f"Exception while fetching related records for patient {patient_id}: {str(related_error)}")
-                # Initialize empty related data if there's an exception
-                related_data = {
-                    'delivery': None,
-                    'anthropometric_measurements': [],
-                    'screening': None,
-                    'allergies': [],
-                    'prescriptions': [],
-                    'vaccinations': [],
-                    'parent_access': []
-                }
-
-            patient_data['related_records'] = related_data
-            # current_app.logger.info(f"DEBUG: Final related_data structure for patient {patient_id}: {json.dumps(related_data, default=str)}")
+            related_errors = {k: v for k, v in section_errors.items() if k != 'age'}
+            for section, error in related_errors.items():
+                current_app.logger.error(f"Error fetching {section} for patient {patient_id}: {error}")
+
+            patient_data['related_records'] = results
+            # Sections that failed or timed out are returned with their empty default
+            if related_errors:
+                patient_data['related_errors'] = related_errors
             
         return jsonify({
             "status": "success",
@@ -2148,7 +2126,9 @@ def register_patient_to_facility(patient_id):
                     }), 500
 
                 # Invalidate patient cache after reactivation
-                invalidate_caches('patient', patient_id)
+                invalidate_caches('patient', patient_id, facility=user_facility_id)
+                invalidate_facility_scope(user_facility_id)
+                queue_patient_reindex(patient_id)
 
                 current_app.logger.info(f"AUDIT: Reactivated patient {patient_id} registration to facility {user_facility_id} by {current_user.get('email')}")
 
@@ -2185,7 +2165,9 @@ def register_patient_to_facility(patient_id):
                 "details": resp.error.message
             }), 500
 
-        invalidate_caches('patient', patient_id)
+        invalidate_caches('patient', patient_id, facility=user_facility_id)
+        invalidate_facility_scope(user_facility_id)
+        queue_patient_reindex(patient_id)
 
         current_app.logger.info(f"AUDIT: Successfully registered patient {patient_id} to facility {user_facility_id} by {current_user.get('email')}")
 
@@ -2279,6 +2261,7 @@ def delete_patient_record(patient_id):
 
         # Invalidate caches
         invalidate_caches('patient', patient_id)
+        queue_patient_reindex(patient_id)
         
         # try:
         #     facility_id = patient_data.get('facility_id') or current_user.get('facility_id')
@@ -3,9 +3,12 @@ from utils.access_control import require_auth, require_role
 from config.settings import get_authenticated_client
 from datetime import datetime, timedelta
 from utils.redis_client import get_redis_client
+from utils.access_scope import get_user_facility_ids, get_facility_patient_ids
 import json
 import hashlib
 from dateutil.relativedelta import relativedelta
+from utils.growth_standards import batch_percentiles, age_in_months, to_optional
+from utils.measurements import get_latest_measurements
 
 doctor_reports_bp = Blueprint('doctor_reports', __name__)
 redis_client = get_redis_client()
@@ -64,38 +67,6 @@ def calculate_bmi(weight_kg, height_cm):
     except:
         return None
 
-def calculate_who_cdc_percentile(age_months, sex, measurement_type, value):
-    """
-    Calculate WHO/CDC growth percentiles
-
-    Args:
-        age_months: Age in months
-        sex: 'M' or 'F'
-        measurement_type: 'height', 'weight', or 'bmi'
-        value: Measurement value
-
-    Returns:
-        Percentile (0-100) or None if cannot calculate
-    """
-    # TODO: Implement actual WHO/CDC percentile calculation using LMS method
-    # For now, return a placeholder percentile based on normal distribution
-    # This should be replaced with actual WHO/CDC growth chart data
-
-    # Placeholder logic - returns percentiles in normal range (30-80)
-    # In production, this should use actual WHO growth charts (0-5 years)
-    # and CDC growth charts (5-20 years)
-
-    if not age_months or not value:
-        return None
-
-    # Placeholder calculation - replace with actual LMS method
-    # LMS method uses: Percentile = 100 * CDF((value/M)^L - 1) / (L*S))
-    # where L, M, S are age/sex-specific parameters from WHO/CDC tables
-
-    import random
-    random.seed(int(value * 100))  # Deterministic based on value
-    return round(40 + random.random() * 30, 1)  # Returns 40-70 percentile range
-
 @doctor_reports_bp.route('/doctor/reports/all', methods=['GET'])
 @require_auth
 @require_role('doctor')
@@ -122,29 +93,19 @@ def get_doctor_reports():
         # STEP 1: FACILITY ISOLATION - Get doctor's facility and patients
         # ===================================================================
 
-        # Get doctor's facility
-        facility_response = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', current_user_id)\
-            .is_('end_date', 'null')\
-            .execute()
+        # Get doctor's facility (cached access scope)
+        facility_ids = get_user_facility_ids(current_user_id)
 
-        if not facility_response.data or len(facility_response.data) == 0:
+        if not facility_ids:
             return jsonify({
                 "status": "error",
                 "message": "Doctor not assigned to any facility"
             }), 400
 
-        facility_id = facility_response.data[0]['facility_id']
+        facility_id = facility_ids[0]
 
         # Get accessible patients for this facility
-        facility_patients_response = supabase.table('facility_patients')\
-            .select('patient_id')\
-            .eq('facility_id', facility_id)\
-            .eq('is_active', True)\
-            .execute()
-
-        patient_ids = [p['patient_id'] for p in facility_patients_response.data] if facility_patients_response.data else []
+        patient_ids = sorted(get_facility_patient_ids([facility_id]))
 
         if not patient_ids:
             # No patients, return empty data structure
@@ -179,30 +140,27 @@ def get_doctor_reports():
 
         patients = patients_response.data or []
         patient_growth_data = []
+        growth_sexes, growth_ages, growth_heights = [], [], []
+
+        # Latest measurement for every patient in one round trip
+        latest_measurements = get_latest_measurements(supabase, patient_ids)
 
         for patient in patients:
             patient_id = patient['patient_id']
+            measurement = latest_measurements.get(patient_id)
 
-            # Get latest anthropometric measurement
-            measurements_response = supabase.table('anthropometric_measurements')\
-                .select('weight, height, measurement_date')\
-                .eq('patient_id', patient_id)\
-                .order('measurement_date', desc=True)\
-                .limit(1)\
-                .execute()
-
-            if measurements_response.data and len(measurements_response.data) > 0:
-                measurement = measurements_response.data[0]
+            if measurement:
                 age_months = calculate_age_in_months(patient.get('date_of_birth'))
                 age_years = age_months // 12 if age_months else 0
 
                 weight = measurement.get('weight')
                 height = measurement.get('height')
                 bmi = calculate_bmi(weight, height)
-                sex = patient.get('sex', 'M')
 
-                # Calculate percentiles
-                growth_percentile = calculate_who_cdc_percentile(age_months, sex, 'height', height)
+                # Percentiles are scored for all patients at once below
+                growth_sexes.append(patient.get('sex'))
+                growth_ages.append(age_in_months(patient.get('date_of_birth'), measurement.get('measurement_date')))
+                growth_heights.append(height)
 
                 patient_growth_data.append({
                     'patient': f"{patient.get('firstname', '')} {patient.get('lastname', '')}".strip(),
@@ -210,10 +168,14 @@ def get_doctor_reports():
                     'age': age_years,
                     'height': round(height, 1) if height else 0,
                     'weight': round(weight, 1) if weight else 0,
-                    'bmi': bmi if bmi else 0,
-                    'growthPercentile': growth_percentile if growth_percentile else 50
+                    'bmi': bmi if bmi else 0
                 })
 
+        # Score every patient's length/height-for-age in one vectorized pass
+        growth_percentiles = to_optional(batch_percentiles('height', growth_sexes, growth_ages, growth_heights))
+        for row, percentile in zip(patient_growth_data, growth_percentiles):
+            row['growthPercentile'] = percentile if percentile is not None else 50
+
         # ===================================================================
         # STEP 3: IMMUNIZATION DATA
         # ===================================================================
@@ -4,6 +4,11 @@ from utils.access_control import require_auth
 from utils.sanitize import sanitize_request_data
 from utils.notification_utils import create_qr_access_alert
 from utils.invalidate_cache import invalidate_caches
+from utils.write_behind import enqueue, register_handler
+from utils.qr_tokens import get_qr_code, consume_qr_use, release_qr_use, evict_qr_codes
+from utils.patient_snapshot import get_patient_data_by_scope
+from utils.patient_search import queue_patient_reindex
+from utils.access_scope import invalidate_facility_scope
 from datetime import datetime, timedelta, timezone
 import secrets
 import os
@@ -13,135 +18,6 @@ qr_bp = Blueprint('qr', __name__)
 def generate_secure_token():
     return secrets.token_urlsafe(32)  # 256 bits of entropy
 
-def get_patient_data_by_scope(patient_id, scope):
-    """
-    Get patient data based on access scope
-    Scope options: view_only, allergies, prescriptions, vaccinations, appointments, vitals, full_access
-
-    Uses service role client to bypass RLS - QR code token is the authorization mechanism
-    """
-    try:
-        sr_client = supabase_service_role_client()
-
-        # Always include basic patient information
-        patient_data = sr_client.table('patients')\
-            .select('patient_id, firstname, lastname, middlename, date_of_birth, sex, bloodtype')\
-            .eq('patient_id', patient_id)\
-            .single()\
-            .execute()
-
-        if not patient_data.data:
-            return None
-
-        result = patient_data.data
-
-        # Add allergies if in scope
-        if 'allergies' in scope or 'full_access' in scope:
-            try:
-                allergies = sr_client.table('allergies')\
-                    .select('allergy_id, patient_id, allergy_name, severity, diagnosed_date, notes, created_at')\
-                    .eq('patient_id', patient_id)\
-                    .execute()
-                result['allergies'] = allergies.data or []
-            except Exception:
-                result['allergies'] = []
-
-        # Add prescriptions if in scope
-        if 'prescriptions' in scope or 'full_access' in scope:
-            try:
-                # Get prescriptions with doctor and facility info
-                prescriptions = sr_client.table('prescriptions')\
-                    .select('''
-                        *,
-                        doctor:users!prescriptions_doctor_id_fkey(user_id, firstname, middlename, lastname, specialty, license_number),
-                        facility:healthcare_facilities!prescriptions_facility_id_fkey(facility_id, facility_name, address, city, zip_code, contact_number)
-                    ''')\
-                    .eq('patient_id', patient_id)\
-                    .order('prescription_date', desc=True)\
-                    .execute()
-
-                prescriptions_data = prescriptions.data or []
-
-                # Get medications for each prescription
-                if prescriptions_data:
-                    rx_ids = [rx.get('rx_id') for rx in prescriptions_data if rx.get('rx_id')]
-
-                    if rx_ids:
-                        medications = sr_client.table('prescription_medications')\
-                            .select('*')\
-                            .in_('rx_id', rx_ids)\
-                            .execute()
-
-                        # Map medications to prescriptions
-                        med_map = {}
-                        for med in (medications.data or []):
-                            rx_id = med.get('rx_id')
-                            med_map.setdefault(rx_id, []).append(med)
-
-                        # Attach medications to prescriptions
-                        for rx in prescriptions_data:
-                            rx['medications'] = med_map.get(rx.get('rx_id'), [])
-
-                            # Format doctor name
-                            if rx.get('doctor'):
-                                doctor = rx['doctor']
-                                rx['doctor_name'] = f"Dr. {doctor.get('firstname', '')} {doctor.get('lastname', '')}".strip()
-
-                            # Format facility info
-                            if rx.get('facility'):
-                                facility = rx['facility']
-                                rx['facility_name'] = facility.get('facility_name', '')
-                                rx['facility_address'] = f"{facility.get('address', '')}, {facility.get('city', '')}"
-
-                result['prescriptions'] = prescriptions_data
-            except Exception as e:
-                current_app.logger.error(f"Error fetching prescriptions: {e}")
-                result['prescriptions'] = []
-
-        # Add vaccinations if in scope
-        if 'vaccinations' in scope or 'full_access' in scope:
-            try:
-                vaccinations = sr_client.table('vaccinations')\
-                    .select('vaccination_id, patient_id, vaccine_name, dose_number, administered_at, administered_by, next_dose_date, notes, created_at')\
-                    .eq('patient_id', patient_id)\
-                    .order('administered_at', desc=True)\
-                    .execute()
-                result['vaccinations'] = vaccinations.data or []
-            except Exception:
-                result['vaccinations'] = []
-
-        # Add appointments if in scope
-        if 'appointments' in scope or 'full_access' in scope:
-            try:
-                appointments = sr_client.table('appointments')\
-                    .select('appointment_id, patient_id, doctor_id, facility_id, appointment_date, appointment_time, status, reason, notes, created_at, updated_at')\
-                    .eq('patient_id', patient_id)\
-                    .order('appointment_date', desc=True)\
-                    .limit(10)\
-                    .execute()
-                result['appointments'] = appointments.data or []
-            except Exception:
-                result['appointments'] = []
-
-        # Add vitals/anthropometric measurements if in scope
-        if 'vitals' in scope or 'full_access' in scope:
-            try:
-                vitals = sr_client.table('anthropometric_measurements')\
-                    .select('measurement_id, patient_id, measurement_date, height_cm, weight_kg, head_circumference_cm, bmi, notes, measured_by, created_at')\
-                    .eq('patient_id', patient_id)\
-                    .order('measurement_date', desc=True)\
-                    .limit(10)\
-                    .execute()
-                result['vitals'] = vitals.data or []
-            except Exception:
-                result['vitals'] = []
-
-        return result
-
-    except Exception as e:
-        current_app.logger.error(f"Error fetching patient data by scope: {e}")
-        return None
-
 def ensure_patient_facility_registration(patient_id, facility_id, registered_by, registration_method):
     """Ensure patient is registered at the facility"""
     sr_client = supabase_service_role_client()
@@ -180,6 +56,39 @@ def ensure_patient_facility_registration(patient_id, facility_id, registered_by,
         current_app.logger.error(f"Failed to ensure patient facility registration: {e}")
         raise
 
+def register_scanned_patients(payloads):
+    """Write-behind handler: register scanned patients at the scanning facilities"""
+    registered = set()
+    for payload in payloads:
+        key = (payload['patient_id'], payload['facility_id'])
+        if key in registered:
+            continue
+        registered.add(key)
+
+        if ensure_patient_facility_registration(**payload):
+            # Invalidate patient records cache for this facility to reflect new registration
+            invalidate_caches('patient', payload['patient_id'], facility=payload['facility_id'])
+            queue_patient_reindex(payload['patient_id'])
+            invalidate_facility_scope(payload['facility_id'])
+            current_app.logger.info(f"Cache invalidated after QR scan registration for patient {payload['patient_id']} at facility {payload['facility_id']}")
+
+register_handler('facility_registration', register_scanned_patients)
+
+def queue_qr_access_side_effects(qr_data, use_count, access_log, consent_log, accessed_by=None):
+    """Queue the usage count update and audit rows for a QR scan.
+
+    They are applied by the write-behind worker (utils/write_behind.py), so the
+    scan response only waits for the QR lookup and the patient data read.
+    """
+    enqueue('qr_usage', {
+        'qr_id': qr_data['qr_id'],
+        'use_count': use_count,
+        'accessed_at': datetime.now(timezone.utc).isoformat(),
+        'accessed_by': accessed_by
+    })
+    enqueue('insert', {'table': 'qr_access_logs', 'row': access_log})
+    enqueue('insert', {'table': 'consent_audit_logs', 'row': consent_log})
+
 
 @qr_bp.route('/qr/generate', methods=['POST'])
 @require_auth
@@ -352,29 +261,17 @@ def validate_qr_access():
         scanning_facility_id = None
 
     try:
-        # 1. Get QR code record with comprehensive validation
-        sr_client = supabase_service_role_client()
-        qr = sr_client.table('qr_codes')\
-            .select('qr_id, token_hash, patient_id, facility_id, generated_by, share_type, scope, expires_at, is_active, use_count, max_uses, last_accessed_at, last_accessed_by, target_facilities, pin_code, metadata, created_at')\
-            .eq('token_hash', token)\
-            .eq('is_active', True)\
-            .execute()
-
-        if not qr.data or len(qr.data) == 0:
+        # 1. Get QR code record with comprehensive validation (token cache, then database)
+        qr_data = get_qr_code(token)
+        if not qr_data:
             return jsonify({"error": "Invalid or inactive QR code", "status": 'error'}), 404
 
-        qr_data = qr.data[0]
-
         # 2. Check expiration
         expires_at = datetime.fromisoformat(qr_data['expires_at'].replace('Z', '+00:00'))
         if datetime.now(timezone.utc) > expires_at:
             return jsonify({"error": "QR code has expired", "status": 'error'}), 403
 
-        # 3. Check usage limits
-        if qr_data['max_uses'] and qr_data['use_count'] >= qr_data['max_uses']:
-            return jsonify({"error": "QR code usage limit reached", "status": 'error'}), 403
-
-        # 4. FLEXIBLE FACILITY ACCESS CONTROL
+        # 3. FLEXIBLE FACILITY ACCESS CONTROL
         target_facilities = qr_data.get('target_facilities')
         access_type = None
 
@@ -408,84 +305,71 @@ def validate_qr_access():
                 else:
                     return jsonify({"error": "Facility not authorized to access this patient", "status": 403}), 403
 
+        # 4. Check usage limits and count this use atomically
+        use_count, counted_in_redis = consume_qr_use(qr_data, accessed_by=scanning_user_id)
+        if use_count is None:
+            return jsonify({"error": "QR code usage limit reached", "status": 'error'}), 403
+
         # 5. Get patient data based on scope
         patient_id = qr_data['patient_id']
         scope = qr_data.get('scope', ['view_only'])
 
         patient_data = get_patient_data_by_scope(patient_id, scope)
         if not patient_data:
+            release_qr_use(qr_data['qr_id'], counted_in_redis)
             return jsonify({"error": "Patient data not found", "status": 404}), 404
 
-        # 6. Auto-register patient to this facility (if not already)
+        # 6. Auto-register patient to this facility (if not already), in the background
         if scanning_facility_id:
             try:
-                registration_result = ensure_patient_facility_registration(
-                    patient_id=patient_id,
-                    facility_id=scanning_facility_id,
-                    registered_by=scanning_user_id,
-                    registration_method='qr_code_scan'
-                )
-                # Invalidate patient records cache for this facility to reflect new registration
-                if registration_result:
-                    invalidate_caches('patient')
-                    current_app.logger.info(f"Cache invalidated after QR scan registration for patient {patient_id} at facility {scanning_facility_id}")
+                enqueue('facility_registration', {
+                    'patient_id': patient_id,
+                    'facility_id': scanning_facility_id,
+                    'registered_by': scanning_user_id,
+                    'registration_method': 'qr_code_scan'
+                })
             except Exception as reg_error:
                 current_app.logger.warning(f"Failed to register patient to facility: {reg_error}")
 
-        # 7. Update QR code usage count
-        try:
-            sr_client_update = supabase_service_role_client()
-            current_use_count = qr_data.get('use_count') or 0  # Handle None case
-            sr_client_update.table('qr_codes').update({
-                'use_count': current_use_count + 1,
-                'last_accessed_at': datetime.now(timezone.utc).isoformat(),
-                'last_accessed_by': scanning_user_id
-            }).eq('qr_id', qr_data['qr_id']).execute()
-            current_app.logger.info(f"Updated QR code {qr_data['qr_id']} use_count to {current_use_count + 1}")
-        except Exception as update_error:
-            # Log but don't fail the request for usage tracking errors
-            current_app.logger.error(f"Failed to update QR code use_count: {update_error}")
-
-        # 8. Log to qr_access_logs for audit trail
-        try:
-            sr_client_log = supabase_service_role_client()
-            sr_client_log.table('qr_access_logs').insert({
-                'qr_id': qr_data['qr_id'],
-                'patient_id': patient_id,
-                'accessed_by': scanning_user_id,
-                'facility_id': scanning_facility_id,
-                'access_method': 'qr_scan',
-                'ip_address': request.remote_addr,
-                'user_agent': request.headers.get('User-Agent', '')[:500],  # Truncate to 500 chars
-                'metadata': {
-                    'access_type': access_type,
-                    'share_type': qr_data['share_type'],
-                    'scope': scope
-                }
-            }).execute()
-        except Exception as log_error:
-            current_app.logger.warning(f"Failed to log QR access: {log_error}")
-
-        # 8b. Log to consent_audit_logs for parent consent management
+        # 7-8. Usage count, qr_access_logs and consent_audit_logs (write-behind)
         try:
-            sr_client_consent = supabase_service_role_client()
-            sr_client_consent.table('consent_audit_logs').insert({
-                'qr_id': qr_data['qr_id'],
-                'patient_id': patient_id,
-                'parent_id': qr_data.get('generated_by'),  # The parent who generated the QR
-                'action': 'qr_accessed',
-                'performed_by': scanning_user_id,
-                'details': {
-                    'access_type': access_type,
-                    'share_type': qr_data['share_type'],
-                    'scope': scope,
-                    'facility_id': scanning_facility_id
+            queue_qr_access_side_effects(
+                qr_data,
+                use_count,
+                access_log={
+                    'qr_id': qr_data['qr_id'],
+                    'patient_id': patient_id,
+                    'accessed_by': scanning_user_id,
+                    'facility_id': scanning_facility_id,
+                    'access_method': 'qr_scan',
+                    'ip_address': request.remote_addr,
+                    'user_agent': request.headers.get('User-Agent', '')[:500],  # Truncate to 500 chars
+                    'metadata': {
+                        'access_type': access_type,
+                        'share_type': qr_data['share_type'],
+                        'scope': scope
+                    }
                 },
-                'ip_address': request.remote_addr,
-                'success': True
-            }).execute()
-        except Exception as consent_log_error:
-            current_app.logger.warning(f"Failed to log consent audit: {consent_log_error}")
+                consent_log={
+                    'qr_id': qr_data['qr_id'],
+                    'patient_id': patient_id,
+                    'parent_id': qr_data.get('generated_by'),  # The parent who generated the QR
+                    'action': 'qr_accessed',
+                    'performed_by': scanning_user_id,
+                    'details': {
+                        'access_type': access_type,
+                        'share_type': qr_data['share_type'],
+                        'scope': scope,
+                        'facility_id': scanning_facility_id
+                    },
+                    'ip_address': request.remote_addr,
+                    'success': True
+                },
+                accessed_by=scanning_user_id
+            )
+        except Exception as log_error:
+            # Log but don't fail the request for usage tracking errors
+            current_app.logger.error(f"Failed to record QR access: {log_error}")
 
         # 9. Create QR access alert notification (deprecated but kept for backwards compatibility)
         try:
@@ -541,27 +425,14 @@ def access_prescription_public():
             pin_from_token = parts[1]
 
     try:
-        sr_client = supabase_service_role_client()
-
-        # 1. Get QR code record
-        qr = sr_client.table('qr_codes')\
-            .select('''
-                qr_id, token_hash, patient_id, facility_id, generated_by, share_type,
-                scope, expires_at, is_active, use_count, max_uses, pin_code, metadata, created_at,
-                users!qr_codes_generated_by_fkey(firstname, lastname)
-            ''')\
-            .eq('token_hash', token)\
-            .eq('is_active', True)\
-            .execute()
-
-        if not qr.data or len(qr.data) == 0:
+        # 1. Get QR code record (token cache, then database)
+        qr_data = get_qr_code(token)
+        if not qr_data:
             return render_template('error.html',
                 error_title="Invalid QR Code",
                 error_message="This QR code is invalid or has been deactivated."
             ), 404
 
-        qr_data = qr.data[0]
-
         # 2. Verify this is a prescription QR code
         if qr_data['share_type'] != 'prescription':
             return render_template('error.html',
@@ -577,14 +448,7 @@ def access_prescription_public():
                 error_message="This prescription QR code has expired and is no longer valid."
             ), 403
 
-        # 4. Check usage limits
-        if qr_data['max_uses'] and qr_data['use_count'] >= qr_data['max_uses']:
-            return render_template('error.html',
-                error_title="Usage Limit Reached",
-                error_message="This QR code has reached its maximum number of uses."
-            ), 403
-
-        # 5. Check PIN if required
+        # 4. Check PIN if required
         if qr_data.get('pin_code'):
             provided_pin = request.args.get('pin') or pin_from_token
             if not provided_pin:
@@ -600,63 +464,60 @@ def access_prescription_public():
                     error="Invalid PIN. Please try again."
                 ), 403
 
+        # 5. Check usage limits and count this use atomically
+        use_count, counted_in_redis = consume_qr_use(qr_data)
+        if use_count is None:
+            return render_template('error.html',
+                error_title="Usage Limit Reached",
+                error_message="This QR code has reached its maximum number of uses."
+            ), 403
+
         # 6. Get patient data (prescription scope only)
         patient_id = qr_data['patient_id']
         scope = qr_data.get('scope', ['prescriptions'])
 
         patient_data = get_patient_data_by_scope(patient_id, scope)
         if not patient_data:
+            release_qr_use(qr_data['qr_id'], counted_in_redis)
             return jsonify({"error": "Patient data not found", "status": "error"}), 404
 
-        # 7. Update QR code usage count
-        try:
-            current_use_count = qr_data.get('use_count') or 0
-            sr_client.table('qr_codes').update({
-                'use_count': current_use_count + 1,
-                'last_accessed_at': datetime.now(timezone.utc).isoformat()
-            }).eq('qr_id', qr_data['qr_id']).execute()
-            current_app.logger.info(f"Public access: Updated QR code {qr_data['qr_id']} use_count to {current_use_count + 1}")
-        except Exception as update_error:
-            current_app.logger.warning(f"Failed to update QR code use_count: {update_error}")
-
-        # 8. Log to qr_access_logs for audit trail
+        # 7-9. Usage count, qr_access_logs and consent_audit_logs (write-behind)
         try:
-            sr_client.table('qr_access_logs').insert({
-                'qr_id': qr_data['qr_id'],
-                'patient_id': patient_id,
-                'accessed_by': None,  # Public access - no user
-                'facility_id': None,
-                'access_method': 'public_qr_scan',
-                'ip_address': request.remote_addr,
-                'user_agent': request.headers.get('User-Agent', '')[:500],
-                'metadata': {
-                    'access_type': 'public_prescription_access',
-                    'share_type': qr_data['share_type'],
-                    'scope': scope
+            queue_qr_access_side_effects(
+                qr_data,
+                use_count,
+                access_log={
+                    'qr_id': qr_data['qr_id'],
+                    'patient_id': patient_id,
+                    'accessed_by': None,  # Public access - no user
+                    'facility_id': None,
+                    'access_method': 'public_qr_scan',
+                    'ip_address': request.remote_addr,
+                    'user_agent': request.headers.get('User-Agent', '')[:500],
+                    'metadata': {
+                        'access_type': 'public_prescription_access',
+                        'share_type': qr_data['share_type'],
+                        'scope': scope
+                    }
+                },
+                consent_log={
+                    'qr_id': qr_data['qr_id'],
+                    'patient_id': patient_id,
+                    'parent_id': qr_data.get('generated_by'),
+                    'action': 'qr_accessed',
+                    'performed_by': None,  # Public access
+                    'details': {
+                        'access_type': 'public_prescription_access',
+                        'share_type': qr_data['share_type'],
+                        'scope': scope,
+                        'user_agent': request.headers.get('User-Agent', '')[:200]
+                    },
+                    'ip_address': request.remote_addr,
+                    'success': True
                 }
-            }).execute()
+            )
         except Exception as log_error:
-            current_app.logger.warning(f"Failed to log public QR access: {log_error}")
-
-        # 9. Log to consent_audit_logs
-        try:
-            sr_client.table('consent_audit_logs').insert({
-                'qr_id': qr_data['qr_id'],
-                'patient_id': patient_id,
-                'parent_id': qr_data.get('generated_by'),
-                'action': 'qr_accessed',
-                'performed_by': None,  # Public access
-                'details': {
-                    'access_type': 'public_prescription_access',
-                    'share_type': qr_data['share_type'],
-                    'scope': scope,
-                    'user_agent': request.headers.get('User-Agent', '')[:200]
-                },
-                'ip_address': request.remote_addr,
-                'success': True
-            }).execute()
-        except Exception as consent_log_error:
-            current_app.logger.warning(f"Failed to log consent audit: {consent_log_error}")
+            current_app.logger.warning(f"Failed to record public QR access: {log_error}")
 
         # 10. Prepare data for HTML template
         generator_info = qr_data.get('users') or {}
@@ -737,6 +598,7 @@ def access_prescription_public():
         facility_id = prescription.get('facility_id') or patient_data.get('facility_id')
         if facility_id:
             try:
+                sr_client = supabase_service_role_client()
                 facility_response = sr_client.table('healthcare_facilities').select('*').eq('facility_id', facility_id).single().execute()
                 facility_data = facility_response.data if facility_response.data else None
             except Exception as facility_error:
@@ -834,6 +696,7 @@ def revoke_qr_code(qr_id):
         supabase.table('qr_codes').update({
             'is_active': False
         }).eq('qr_id', qr_id).execute()
+        evict_qr_codes([qr_id])
 
         return jsonify({
             "status": 200,
@@ -993,6 +856,7 @@ def grant_parent_access():
 
     On success, creates a parent_access record linking the parent to the patient.
     """
+    consumed_qr_id = None
     try:
         raw_data = request.json
         token = raw_data.get('token')
@@ -1015,22 +879,15 @@ def grant_parent_access():
 
         sr_client = supabase_service_role_client()
 
-        # 1. Get and validate QR code
-        qr = sr_client.table('qr_codes')\
-            .select('qr_id, token_hash, patient_id, facility_id, generated_by, share_type, scope, expires_at, is_active, use_count, max_uses, metadata')\
-            .eq('token_hash', token)\
-            .eq('is_active', True)\
-            .execute()
-
-        if not qr.data or len(qr.data) == 0:
+        # 1. Get and validate QR code (token cache, then database)
+        qr_data = get_qr_code(token)
+        if not qr_data:
             return jsonify({
                 "error": "Invalid or expired QR code",
                 "status": "error",
                 "code": "invalid_token"
             }), 404
 
-        qr_data = qr.data[0]
-
         # 2. Verify share type is for parent access grant
         if qr_data['share_type'] != 'parent_access_grant':
             return jsonify({
@@ -1048,13 +905,16 @@ def grant_parent_access():
                 "code": "expired"
             }), 403
 
-        # 4. Check usage limits
-        if qr_data['max_uses'] and qr_data['use_count'] >= qr_data['max_uses']:
+        # 4. Check usage limits and claim this use atomically, so two parents
+        # scanning a one-time code together cannot both be granted access
+        use_count, counted_in_redis = consume_qr_use(qr_data, accessed_by=user_id)
+        if use_count is None:
             return jsonify({
                 "error": "This QR code has already been used",
                 "status": "error",
                 "code": "limit_reached"
             }), 403
+        consumed_qr_id = qr_data['qr_id']
 
         patient_id = qr_data['patient_id']
         granted_by = qr_data['generated_by']
@@ -1069,6 +929,7 @@ def grant_parent_access():
         if existing_access.data and len(existing_access.data) > 0:
             existing_record = existing_access.data[0]
             if existing_record.get('is_active'):
+                release_qr_use(consumed_qr_id, counted_in_redis)
                 return jsonify({
                     "error": "You already have access to this patient",
                     "status": "error",
@@ -1102,6 +963,7 @@ def grant_parent_access():
             }).execute()
 
             if not access_record.data or len(access_record.data) == 0:
+                release_qr_use(consumed_qr_id, counted_in_redis)
                 return jsonify({
                     "error": "Failed to grant parent access",
                     "status": "error"
@@ -1111,15 +973,17 @@ def grant_parent_access():
 
         # 7. Update QR code usage count and deactivate (one-time use)
         sr_client.table('qr_codes').update({
-            'use_count': (qr_data.get('use_count') or 0) + 1,
+            'use_count': use_count,
             'last_accessed_at': datetime.now(timezone.utc).isoformat(),
             'last_accessed_by': user_id,
             'is_active': False  # Deactivate after use
         }).eq('qr_id', qr_data['qr_id']).execute()
+        evict_qr_codes([qr_data['qr_id']])
+        consumed_qr_id = None
 
-        # 8. Log to consent_audit_logs
+        # 8. Log to consent_audit_logs (write-behind)
         try:
-            sr_client.table('consent_audit_logs').insert({
+            enqueue('insert', {'table': 'consent_audit_logs', 'row': {
                 'qr_id': qr_data['qr_id'],
                 'patient_id': patient_id,
                 'parent_id': user_id,
@@ -1132,7 +996,7 @@ def grant_parent_access():
                 },
                 'ip_address': request.remote_addr,
                 'success': True
-            }).execute()
+            }})
         except Exception as log_error:
             current_app.logger.warning(f"Failed to log consent audit: {log_error}")
 
@@ -1157,6 +1021,8 @@ def grant_parent_access():
         }), 200
 
     except Exception as e:
+        if consumed_qr_id:
+            release_qr_use(consumed_qr_id, counted_in_redis)
         current_app.logger.error(f"Failed to grant parent access: {e}")
         return jsonify({
             "error": "Failed to grant parent access",
@@ -3,11 +3,9 @@ from utils.access_control import require_auth
 from config.settings import supabase, supabase_service_role_client
 from gotrue.errors import AuthApiError
 from datetime import datetime
-from utils.sessions import get_session_data, update_session_activity
-from utils.redis_client import redis_client
+from utils.sessions import get_session_data, update_session_activity, save_session, revoke_user_sessions
 from utils.invalidate_cache import invalidate_caches
 import re
-import json
 
 settings_bp = Blueprint('user_settings', __name__)
 SESSION_PREFIX = 'flask_session:'
@@ -128,8 +126,7 @@ def update_profile():
                     session_data['last_activity'] = datetime.utcnow().isoformat()
 
                     # Re-serialize and store in Redis
-                    session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
-                    redis_client.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
+                    save_session(session_id, session_data)
 
                     current_app.logger.info(f"Redis session updated for user {user_id}")
             except Exception as session_error:
@@ -518,8 +515,7 @@ def update_phone():
                     session_data['phone_number'] = new_phone
                     session_data['last_activity'] = datetime.utcnow().isoformat()
 
-                    session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
-                    redis_client.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
+                    save_session(session_id, session_data)
 
                     current_app.logger.info(f"Redis session updated with new phone for user {user_id}")
             except Exception as session_error:
@@ -616,9 +612,7 @@ def deactivate_account():
         invalidate_caches('users', user_id)
 
         # Clear user's session from Redis
-        session_id = request.cookies.get('session_id')
-        if session_id:
-            redis_client.delete(f"flask_session:{session_id}")
+        revoke_user_sessions(user_id)
 
         # Try to ban user in Supabase auth
         sr_client = supabase_service_role_client()
@@ -984,8 +978,7 @@ def update_font_size():
                 if session_data:
                     session_data['font_size'] = font_size
                     session_data['last_activity'] = datetime.utcnow().isoformat()
-                    session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
-                    redis_client.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
+                    save_session(session_id, session_data)
                     current_app.logger.info(f"Redis session updated with font size for user {user_id}")
             except Exception as session_error:
                 current_app.logger.warning(f"Failed to update Redis session: {str(session_error)}")
@@ -3,6 +3,7 @@ from utils.access_control import require_auth, require_role
 from config.settings import get_authenticated_client
 from datetime import datetime, timedelta
 from utils.redis_client import get_redis_client
+from utils.access_scope import get_user_facility_ids, get_facility_patient_ids
 import json
 import hashlib
 
@@ -69,20 +70,16 @@ def get_nurse_reports():
         # STEP 1: FACILITY ISOLATION - Get nurse's facility and patients
         # ===================================================================
 
-        # Get nurse's facility
-        facility_response = supabase.table('facility_users')\
-            .select('facility_id')\
-            .eq('user_id', current_user_id)\
-            .is_('end_date', 'null')\
-            .execute()
+        # Get nurse's facility (cached access scope)
+        facility_ids = get_user_facility_ids(current_user_id)
 
-        if not facility_response.data or len(facility_response.data) == 0:
+        if not facility_ids:
             return jsonify({
                 "status": "error",
                 "message": "Nurse not assigned to any facility"
             }), 400
 
-        facility_id = facility_response.data[0]['facility_id']
+        facility_id = facility_ids[0]
 
         # Get facility name
         facility_info_response = supabase.table('healthcare_facilities')\
@@ -93,13 +90,7 @@ def get_nurse_reports():
         facility_name = facility_info_response.data[0]['facility_name'] if facility_info_response.data else 'N/A'
 
         # Get accessible patients for this facility
-        facility_patients_response = supabase.table('facility_patients')\
-            .select('patient_id')\
-            .eq('facility_id', facility_id)\
-            .eq('is_active', True)\
-            .execute()
-
-        patient_ids = [p['patient_id'] for p in facility_patients_response.data] if facility_patients_response.data else []
+        patient_ids = sorted(get_facility_patient_ids([facility_id]))
 
         if not patient_ids:
             # No patients, return empty data structure
@@ -1,17 +1,48 @@
 """
 Notification Scheduler - KEEPSAKE Healthcare System
 Runs periodic checks for appointment reminders, vaccination dues, and cleanup
+
+Any number of scheduler replicas can run; only the one holding the Redis
+leader lease starts jobs, and the others take over within
+SCHEDULER_LEASE_SECONDS if it dies. Job state is kept in Redis, so it
+survives restarts and leader changes:
+
+    scheduler:notifications:leader     lease, value is the holder's token
+    scheduler:job:{name}               hash: next_run_at, last_run_at,
+                                       last_status, last_error,
+                                       last_duration_ms, last_rows, runs,
+                                       failures, total_rows
+    scheduler:job:{name}:running       held while a run is in progress
+    scheduler:job:{name}:history       last SCHEDULER_HISTORY_SIZE runs (JSON)
+
+A run that was due while no scheduler was up runs once as soon as a leader
+is elected (missed runs are coalesced, not replayed). The running key stops a
+job from overlapping itself, including across a leader change; it expires
+after the job's timeout so a crashed run is retried by the next leader.
+
+Usage:
+    python -m schedulers.notification_scheduler
 """
 
-import schedule
-import time
-from datetime import datetime
+import json
 import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
 from utils.notification_utils import (
-    check_and_create_appointment_reminders,
+    create_upcoming_appointment_notifications,
     check_and_create_vaccination_reminders,
     cleanup_expired_notifications
 )
+from utils.redis_client import redis_client
 
 # Configure logging
 logging.basicConfig(
@@ -21,72 +52,304 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+SCHEDULER_PREFIX = 'scheduler:'
+LEADER_KEY = f'{SCHEDULER_PREFIX}notifications:leader'
+LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 30))
+TICK_SECONDS = float(os.environ.get('SCHEDULER_TICK_SECONDS', 5))
+HISTORY_SIZE = int(os.environ.get('SCHEDULER_HISTORY_SIZE', 50))
+
+# Extends a key's expiry only while it still holds our token
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Deletes a key only while it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class ScheduledJob:
+    """A periodic job and how its next run is chosen.
+
+    Args:
+        name: Identifies the job's persisted state.
+        func: Runs the job; returns the number of rows it processed (or None)
+            and raises on failure.
+        interval: Seconds between runs. Interval jobs also run as soon as a
+            scheduler first starts with no saved state, like before.
+        daily_at: 'HH:MM' local time, for jobs that run once a day instead.
+        jitter: Up to this many seconds are added to every next run, so jobs
+            sharing a schedule do not hit the database together.
+        timeout: Longest expected run in seconds; a run holding the running
+            key longer is considered dead.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Optional[int]], interval: Optional[int] = None,
+                 daily_at: Optional[str] = None, jitter: int = 0, timeout: int = 1800):
+        if (interval is None) == (daily_at is None):
+            raise ValueError(f"Job {name} needs exactly one of interval or daily_at")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.daily_at = daily_at
+        self.jitter = jitter
+        self.timeout = timeout
+
+    @property
+    def state_key(self) -> str:
+        return f"{SCHEDULER_PREFIX}job:{self.name}"
+
+    def next_run_after(self, now: float) -> float:
+        """Timestamp of the run following one started at ``now``."""
+        if self.interval is not None:
+            next_run = now + self.interval
+        else:
+            hour, minute = (int(part) for part in self.daily_at.split(':'))
+            current = datetime.fromtimestamp(now)
+            target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if target <= current:
+                target += timedelta(days=1)
+            next_run = target.timestamp()
+        return next_run + random.uniform(0, self.jitter)
+
+    def first_run(self, now: float) -> float:
+        return now if self.interval is not None else self.next_run_after(now)
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+def _rows(result: Dict[str, Any]) -> Optional[int]:
+    """Row count of a notification_utils job result, raising if the job failed."""
+    if not result or result.get('status') != 'success':
+        raise RuntimeError((result or {}).get('message', 'Job returned no result'))
+    return result.get('count')
+
 
 def check_appointment_reminders():
     """Check and create appointment reminders"""
-    try:
-        logger.info("Checking for upcoming appointments...")
-        notifications = check_and_create_appointment_reminders(hours_ahead=24)
-        logger.info(f"Created {len(notifications)} appointment reminder notifications")
-    except Exception as e:
-        logger.error(f"Error checking appointment reminders: {e}")
+    return _rows(create_upcoming_appointment_notifications())
 
 
 def check_vaccination_reminders():
     """Check and create vaccination due reminders"""
-    try:
-        logger.info("Checking for upcoming vaccinations...")
-        notifications = check_and_create_vaccination_reminders(days_ahead=7)
-        logger.info(f"Created {len(notifications)} vaccination reminder notifications")
-    except Exception as e:
-        logger.error(f"Error checking vaccination reminders: {e}")
+    return _rows(check_and_create_vaccination_reminders())
 
 
 def cleanup_notifications():
     """Clean up expired and old archived notifications"""
-    try:
-        logger.info("Cleaning up expired notifications...")
-        result = cleanup_expired_notifications()
-        if result:
-            logger.info("Successfully cleaned up expired notifications")
-        else:
-            logger.warning("Failed to clean up notifications")
-    except Exception as e:
-        logger.error(f"Error cleaning up notifications: {e}")
+    return _rows(cleanup_expired_notifications())
 
 
-def run_scheduler():
-    """Run the notification scheduler"""
-    logger.info("Starting notification scheduler...")
+JOBS: List[ScheduledJob] = [
+    # Appointment reminders every hour
+    ScheduledJob('appointment_reminders', check_appointment_reminders, interval=3600, jitter=60, timeout=900),
+    # Vaccination reminders every 6 hours
+    ScheduledJob('vaccination_reminders', check_vaccination_reminders, interval=6 * 3600, jitter=300, timeout=900),
+    # Cleanup daily at 2 AM
+    ScheduledJob('notification_cleanup', cleanup_notifications, daily_at='02:00', jitter=600, timeout=3600),
+]
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class NotificationScheduler:
+    """Leader-elected runner for a list of ScheduledJobs.
+
+    Args:
+        jobs: Jobs to run.
+        redis: Redis client holding the lease and job state.
+    """
+
+    def __init__(self, jobs: List[ScheduledJob], redis=None):
+        self.jobs = jobs
+        self.redis = redis if redis is not None else redis_client
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='scheduled-job')
+        self._stop = threading.Event()
+
+    # ---- leadership -------------------------------------------------------
+
+    def _hold_lease(self) -> bool:
+        """Renew the lease if we hold it, otherwise try to take it."""
+        if self.redis.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.token, LEASE_SECONDS):
+            self.is_leader = True
+            return True
+        if self.is_leader:
+            logger.warning("Scheduler leadership lost")
+            self.is_leader = False
+
+        if self.redis.set(LEADER_KEY, self.token, nx=True, ex=LEASE_SECONDS):
+            logger.info(f"Scheduler {self.token} is now the leader")
+            self.is_leader = True
+        return self.is_leader
+
+    def release(self) -> None:
+        """Give the lease up so another replica takes over without waiting for it to expire."""
+        if self.is_leader:
+            self.redis.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.token)
+            self.is_leader = False
+
+    # ---- job state --------------------------------------------------------
+
+    def _next_run_at(self, job: ScheduledJob, now: float) -> float:
+        next_run_at = self.redis.hget(job.state_key, 'next_run_at')
+        if next_run_at is None:
+            next_run_at = job.first_run(now)
+            self.redis.hsetnx(job.state_key, 'next_run_at', next_run_at)
+        return float(next_run_at)
 
-    # Schedule appointment reminders check every hour
-    schedule.every(1).hours.do(check_appointment_reminders)
+    def _record_run(self, job: ScheduledJob, started: float, duration_ms: int,
+                    rows: Optional[int], error: Optional[str]) -> None:
+        run = {
+            'started_at': datetime.fromtimestamp(started).isoformat(),
+            'status': 'error' if error else 'success',
+            'duration_ms': duration_ms,
+            'rows': rows,
+            'error': error,
+            'leader': self.token
+        }
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(job.state_key, mapping={
+            'next_run_at': job.next_run_after(time.time()),
+            'last_run_at': run['started_at'],
+            'last_status': run['status'],
+            'last_error': error or '',
+            'last_duration_ms': duration_ms,
+            'last_rows': '' if rows is None else rows
+        })
+        pipe.hincrby(job.state_key, 'runs', 1)
+        if error:
+            pipe.hincrby(job.state_key, 'failures', 1)
+        if rows:
+            pipe.hincrby(job.state_key, 'total_rows', rows)
+        pipe.lpush(f"{job.state_key}:history", json.dumps(run))
+        pipe.ltrim(f"{job.state_key}:history", 0, HISTORY_SIZE - 1)
+        pipe.execute()
 
-    # Schedule vaccination reminders check every 6 hours
-    schedule.every(6).hours.do(check_vaccination_reminders)
+    # ---- running ----------------------------------------------------------
 
-    # Schedule cleanup daily at 2 AM
-    schedule.every().day.at("02:00").do(cleanup_notifications)
+    def _run(self, job: ScheduledJob) -> None:
+        running_key = f"{job.state_key}:running"
+        try:
+            if not self.redis.set(running_key, self.token, nx=True, ex=job.timeout):
+                logger.info(f"Job {job.name} is still running elsewhere, skipping")
+                return
+            try:
+                # Another leader may have finished this run since we read the state
+                now = time.time()
+                scheduled_at = self._next_run_at(job, now)
+                if scheduled_at > now:
+                    return
+                if job.interval is not None and now - scheduled_at > job.interval:
+                    logger.warning(f"Job {job.name} missed runs since {datetime.fromtimestamp(scheduled_at)}, catching up once")
 
-    # Run checks immediately on startup
-    check_appointment_reminders()
-    check_vaccination_reminders()
+                logger.info(f"Running job {job.name}...")
+                rows, error = None, None
+                started = time.time()
+                try:
+                    rows = job.func()
+                except Exception as e:
+                    error = str(e)
+                duration_ms = int((time.time() - started) * 1000)
+                self._record_run(job, started, duration_ms, rows, error)
 
-    logger.info("Notification scheduler started successfully")
-    logger.info("Next appointment check: in 1 hour")
-    logger.info("Next vaccination check: in 6 hours")
-    logger.info("Next cleanup: daily at 2:00 AM")
+                if error:
+                    logger.error(f"Job {job.name} failed after {duration_ms} ms: {error}")
+                else:
+                    logger.info(f"Job {job.name} finished in {duration_ms} ms, {rows if rows is not None else 'unknown'} rows")
+            finally:
+                self.redis.eval(_RELEASE_SCRIPT, 1, running_key, self.token)
+        except Exception as e:
+            logger.error(f"Error running job {job.name}: {e}")
+        finally:
+            with self._running_lock:
+                self._running.discard(job.name)
+
+    def tick(self) -> None:
+        """Keep the lease and start every due job that is not already running."""
+        if not self._hold_lease():
+            return
+
+        now = time.time()
+        for job in self.jobs:
+            with self._running_lock:
+                if job.name in self._running:
+                    continue
+            if self._next_run_at(job, now) > now:
+                continue
+            with self._running_lock:
+                self._running.add(job.name)
+            self._executor.submit(self._run, job)
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+                self.is_leader = False
+            self._stop.wait(TICK_SECONDS)
+
+        try:
+            self.release()
+        except Exception as e:
+            logger.warning(f"Could not release scheduler lease: {e}")
+        self._executor.shutdown(wait=True)
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+
+def get_job_states(jobs: List[ScheduledJob] = JOBS, redis=None) -> Dict[str, Dict[str, Any]]:
+    """Persisted state and metrics of each job, plus the current leader."""
+    redis = redis if redis is not None else redis_client
+    pipe = redis.pipeline(transaction=False)
+    for job in jobs:
+        pipe.hgetall(job.state_key)
+        pipe.exists(f"{job.state_key}:running")
+    results = pipe.execute()
+
+    states = {'leader': redis.get(LEADER_KEY), 'jobs': {}}
+    for i, job in enumerate(jobs):
+        state = results[2 * i]
+        if state.get('next_run_at'):
+            state['next_run_at'] = datetime.fromtimestamp(float(state['next_run_at'])).isoformat()
+        state['running'] = bool(results[2 * i + 1])
+        states['jobs'][job.name] = state
+    return states
+
+
+def run_scheduler():
+    """Run the notification scheduler"""
+    if redis_client is None:
+        raise RuntimeError("The notification scheduler needs Redis for leader election")
+
+    logger.info("Starting notification scheduler...")
+    scheduler = NotificationScheduler(JOBS)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
 
-    # Keep the scheduler running
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    logger.info(f"Notification scheduler {scheduler.token} started, waiting for leadership")
+    scheduler.run_forever()
+    logger.info("Notification scheduler stopped")
 
 
 if __name__ == "__main__":
     try:
         run_scheduler()
-    except KeyboardInterrupt:
-        logger.info("Notification scheduler stopped by user")
     except Exception as e:
         logger.error(f"Notification scheduler error: {e}")
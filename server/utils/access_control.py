@@ -1,7 +1,7 @@
 # Built-ins / stdlib
 from functools import wraps
 from typing import Iterable
-import datetime, json
+import datetime
 
 # Third-party
 from flask import request, jsonify, current_app
@@ -10,12 +10,11 @@ from flask import request, jsonify, current_app
 from config.settings import supabase, set_authenticated_client
 from utils.sessions import (
     get_session_data,
-    update_session_activity,
-    SESSION_PREFIX,
-    SESSION_TIMEOUT,
+    touch_session,
+    save_session,
+    delete_session,
 )
 from utils.token_utils import verify_supabase_jwt, SupabaseJWTError
-from utils.redis_client import redis_client
 
 # Valid roles in the system – keep this in sync with your database / Supabase metadata
 VALID_ROLES = {
@@ -49,7 +48,7 @@ def check_session():
         return None
 
     # Update session activity
-    update_session_activity(session_id)
+    touch_session(session_id, session_data)
     return session_data
 
 
@@ -217,7 +216,8 @@ def require_auth(f):
                 verify_supabase_jwt(access_token)
 
                 # 4. Touch the session so it does not expire due to inactivity
-                update_session_activity(session_id)
+                #    (debounced - reuses the payload read above, rarely writes)
+                touch_session(session_id, session_data)
 
                 # 5. Populate request-scoped helpers for downstream code
                 request.session_data = session_data  # type: ignore[attr-defined]
@@ -255,11 +255,7 @@ def require_auth(f):
                             }
                         )
 
-                        redis_client.setex(
-                            f"{SESSION_PREFIX}{session_id}",
-                            SESSION_TIMEOUT,
-                            json.dumps(session_data),
-                        )
+                        save_session(session_id, session_data)
 
                         # Create a per-request authenticated Supabase client with refreshed token
                         set_authenticated_client(refreshed.session.access_token)
@@ -281,7 +277,7 @@ def require_auth(f):
                     except Exception as refresh_err:
                         # Refresh failed – clean up and require re-login
                         current_app.logger.error(f"Token refresh failed: {str(refresh_err)}")
-                        redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+                        delete_session(session_id)
                         return jsonify({"error": "Session expired, please login again"}), 401
                 else:
                     current_app.logger.warning("No refresh token available for expired JWT")
@@ -292,14 +288,3 @@ def require_auth(f):
         return jsonify({"error": "Invalid session"}), 401
 
     return decorated
-
-def update_session_activity(session_id):
-    """Update last activity timestamp and extend session"""
-    session_data = get_session_data(session_id)
-    if session_data:
-        session_data['last_activity'] = datetime.datetime.utcnow().isoformat()
-        redis_client.setex(
-            f"{SESSION_PREFIX}{session_id}",
-            SESSION_TIMEOUT,
-            json.dumps(session_data)
-        )
\ No newline at end of file
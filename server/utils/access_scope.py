@@ -0,0 +1,197 @@
+"""
+Shared access scope: the facilities a staff user works at and the patients
+registered at those facilities.
+
+Most clinical endpoints start by resolving these two sets (facility_users,
+then facility_patients). They are cached in Redis as sets and resolved at
+most once per request:
+
+    access_scope:version:user:{user_id}                  scope version of a user
+    access_scope:version:facility:{facility_id}          scope version of a facility
+    access_scope:user:{user_id}:v{n}:facilities          active facility ids
+    access_scope:facility:{facility_id}:v{n}:patients    actively registered patient ids
+
+Invalidation bumps the version instead of deleting the set, so a reader that
+loaded the database rows before a write can only store them under the old,
+never read again, version. Every write to facility_users must call
+invalidate_user_scope() and every write to facility_patients
+invalidate_facility_scope(); ACCESS_SCOPE_TTL bounds staleness for writes
+made outside the API.
+"""
+
+import logging
+import os
+from typing import Iterable, List, Set
+
+from flask import g, has_request_context
+
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+SCOPE_PREFIX = 'access_scope:'
+ACCESS_SCOPE_TTL = int(os.environ.get('ACCESS_SCOPE_TTL', 300))
+FETCH_PAGE_SIZE = 1000
+# Member stored in every cached set so an empty scope is still a cache hit
+_EMPTY = ''
+
+
+def _user_version_key(user_id):
+    return f"{SCOPE_PREFIX}version:user:{user_id}"
+
+
+def _facility_version_key(facility_id):
+    return f"{SCOPE_PREFIX}version:facility:{facility_id}"
+
+
+def _request_memo() -> dict:
+    """Per-request memo of resolved scopes (empty dict outside a request)."""
+    if not has_request_context():
+        return {}
+    if not hasattr(g, 'access_scope'):
+        g.access_scope = {}
+    return g.access_scope
+
+
+def _fetch_user_facility_ids(user_id) -> List[str]:
+    sr_client = supabase_service_role_client()
+    resp = sr_client.table('facility_users')\
+        .select('facility_id')\
+        .eq('user_id', user_id)\
+        .is_('end_date', 'null')\
+        .execute()
+    return [row['facility_id'] for row in resp.data or []]
+
+
+def _fetch_facility_patient_ids(facility_id) -> List[str]:
+    """Actively registered patients of a facility, paged past the row limit."""
+    sr_client = supabase_service_role_client()
+    patient_ids, offset = [], 0
+    while True:
+        resp = sr_client.table('facility_patients')\
+            .select('patient_id')\
+            .eq('facility_id', facility_id)\
+            .eq('is_active', True)\
+            .range(offset, offset + FETCH_PAGE_SIZE - 1)\
+            .execute()
+        rows = resp.data or []
+        patient_ids.extend(row['patient_id'] for row in rows)
+        if len(rows) < FETCH_PAGE_SIZE:
+            return patient_ids
+        offset += FETCH_PAGE_SIZE
+
+
+def _store_set(key, members) -> None:
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(key)
+    pipe.sadd(key, _EMPTY, *members)
+    pipe.expire(key, ACCESS_SCOPE_TTL)
+    pipe.execute()
+
+
+def get_user_facility_ids(user_id) -> List[str]:
+    """Facilities where the user has an active (not ended) assignment.
+
+    Returns:
+        list: Facility ids, sorted so callers picking the first one are stable.
+    """
+    memo = _request_memo()
+    memo_key = ('facilities', user_id)
+    if memo_key in memo:
+        return memo[memo_key]
+
+    facility_ids = None
+    if redis_client is not None:
+        try:
+            version = redis_client.get(_user_version_key(user_id)) or 0
+            key = f"{SCOPE_PREFIX}user:{user_id}:v{version}:facilities"
+            members = redis_client.smembers(key)
+            if members:
+                facility_ids = sorted(m for m in members if m != _EMPTY)
+            else:
+                facility_ids = sorted(set(_fetch_user_facility_ids(user_id)))
+                _store_set(key, facility_ids)
+        except Exception as e:
+            logger.warning(f"Access scope cache unavailable for user {user_id}: {str(e)}")
+
+    if facility_ids is None:
+        facility_ids = sorted(set(_fetch_user_facility_ids(user_id)))
+
+    memo[memo_key] = facility_ids
+    return facility_ids
+
+
+def get_facility_patient_ids(facility_ids: Iterable[str]) -> Set[str]:
+    """Patients actively registered at any of the facilities."""
+    facility_ids = sorted(set(facility_ids))
+    if not facility_ids:
+        return set()
+
+    memo = _request_memo()
+    memo_key = ('patients', tuple(facility_ids))
+    if memo_key in memo:
+        return memo[memo_key]
+
+    patient_ids = None
+    if redis_client is not None:
+        try:
+            versions = redis_client.mget([_facility_version_key(f) for f in facility_ids])
+            keys = [
+                f"{SCOPE_PREFIX}facility:{facility_id}:v{version or 0}:patients"
+                for facility_id, version in zip(facility_ids, versions)
+            ]
+
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.exists(key)
+            cached = pipe.execute()
+            for facility_id, key, is_cached in zip(facility_ids, keys, cached):
+                if not is_cached:
+                    _store_set(key, _fetch_facility_patient_ids(facility_id))
+
+            patient_ids = redis_client.sunion(keys)
+            patient_ids.discard(_EMPTY)
+        except Exception as e:
+            logger.warning(f"Access scope cache unavailable for facilities {facility_ids}: {str(e)}")
+
+    if patient_ids is None:
+        patient_ids = set()
+        for facility_id in facility_ids:
+            patient_ids.update(_fetch_facility_patient_ids(facility_id))
+
+    memo[memo_key] = patient_ids
+    return patient_ids
+
+
+def get_accessible_patient_ids(user_id) -> Set[str]:
+    """Patients registered at any facility the user works at."""
+    return get_facility_patient_ids(get_user_facility_ids(user_id))
+
+
+def _bump(version_keys) -> None:
+    if not version_keys:
+        return
+    if has_request_context():
+        # Later reads in this request must see the write as well
+        g.pop('access_scope', None)
+    if redis_client is None:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in version_keys:
+            pipe.incr(key)
+            pipe.expire(key, ACCESS_SCOPE_TTL * 2)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Access scope invalidation failed for {version_keys}: {str(e)}")
+
+
+def invalidate_user_scope(*user_ids) -> None:
+    """Call after any facility_users write for these users."""
+    _bump([_user_version_key(user_id) for user_id in user_ids if user_id])
+
+
+def invalidate_facility_scope(*facility_ids) -> None:
+    """Call after any facility_patients write at these facilities."""
+    _bump([_facility_version_key(facility_id) for facility_id in facility_ids if facility_id])
@@ -0,0 +1,220 @@
+"""
+Announcement fan-out engine.
+
+Turning a system announcement into one notification per targeted user is run
+off the request thread. The audience is resolved with one set-based query
+(users joined to facility_users when facilities are targeted) read in keyset
+pages by user_id; each page becomes one bulk insert of at most
+ANNOUNCEMENT_FANOUT_BATCH_SIZE rows. Pages are pulled only after the previous
+batch was written, so memory stays at one batch and a slow database slows the
+reader down instead of piling rows up.
+
+Progress is kept in Redis so admins can follow a delivery and a failed or
+interrupted one can be restarted where it stopped:
+
+    announcement_fanout:{announcement_id}        hash: status, cursor (last user_id
+                                                 delivered), sent, batches,
+                                                 started_at, updated_at, finished_at, error
+    announcement_fanout_claim:{announcement_id}  held (SET NX) by the queued or
+                                                 running delivery; every progress
+                                                 write extends it, so it lapses
+                                                 FANOUT_STALE_SECONDS after an
+                                                 interrupted run stops
+
+A delivery is only resumed from its progress record. Without one (expired,
+or never written because Redis was down) nobody knows which users already
+got the notification, so resuming is refused rather than sending it twice.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.settings import supabase_service_role_client
+from utils.notification_stream import publish_notifications
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+FANOUT_PREFIX = 'announcement_fanout:'
+FANOUT_CLAIM_PREFIX = 'announcement_fanout_claim:'
+FANOUT_BATCH_SIZE = int(os.environ.get('ANNOUNCEMENT_FANOUT_BATCH_SIZE', 500))
+FANOUT_PROGRESS_TTL = 7 * 86400
+# A queued/running delivery without progress for this long was interrupted
+# and its claim lapses
+FANOUT_STALE_SECONDS = 600
+
+# Deliveries running at once per process; later ones wait in the executor queue
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ANNOUNCEMENT_FANOUT_WORKERS', 2)),
+    thread_name_prefix='announcement-fanout'
+)
+
+
+def _progress_key(announcement_id):
+    return f"{FANOUT_PREFIX}{announcement_id}"
+
+
+def _claim_key(announcement_id):
+    return f"{FANOUT_CLAIM_PREFIX}{announcement_id}"
+
+
+def _claim_fanout(announcement_id) -> bool:
+    """Take the right to run an announcement's delivery; False if a run holds it."""
+    if redis_client is None:
+        return True
+    return bool(redis_client.set(_claim_key(announcement_id), 1, nx=True, ex=FANOUT_STALE_SECONDS))
+
+
+def _save_progress(announcement_id, **fields) -> None:
+    if redis_client is None:
+        return
+    try:
+        fields['updated_at'] = datetime.utcnow().isoformat()
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hset(_progress_key(announcement_id), mapping={k: '' if v is None else v for k, v in fields.items()})
+        pipe.expire(_progress_key(announcement_id), FANOUT_PROGRESS_TTL)
+        if fields.get('status') in ('completed', 'failed'):
+            pipe.delete(_claim_key(announcement_id))
+        else:
+            pipe.expire(_claim_key(announcement_id), FANOUT_STALE_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not save fan-out progress for {announcement_id}: {str(e)}")
+
+
+def get_fanout_progress(announcement_id) -> Optional[Dict[str, Any]]:
+    """Delivery progress of an announcement, or None if none was recorded."""
+    if redis_client is None:
+        return None
+    progress = redis_client.hgetall(_progress_key(announcement_id))
+    if not progress:
+        return None
+    for field in ('sent', 'batches'):
+        progress[field] = int(progress.get(field) or 0)
+    return progress
+
+
+def iter_audience(target_roles=None, target_facilities=None, after=None) -> Iterator[List[str]]:
+    """Yield pages of active user ids matching the targeting, in user_id order.
+
+    Args:
+        target_roles: Only users with one of these roles (all roles if empty).
+        target_facilities: Only users assigned to one of these facilities.
+        after: Resume after this user_id.
+    """
+    sr_client = supabase_service_role_client()
+    columns = 'user_id, facility_users!inner(facility_id)' if target_facilities else 'user_id'
+
+    while True:
+        query = sr_client.table('users')\
+            .select(columns)\
+            .eq('is_active', True)
+        if target_roles:
+            query = query.in_('role', target_roles)
+        if target_facilities:
+            query = query.in_('facility_users.facility_id', target_facilities)
+        if after:
+            query = query.gt('user_id', after)
+
+        rows = query.order('user_id').limit(FANOUT_BATCH_SIZE).execute().data or []
+        if not rows:
+            return
+        yield [row['user_id'] for row in rows]
+        if len(rows) < FANOUT_BATCH_SIZE:
+            return
+        after = rows[-1]['user_id']
+
+
+def build_announcement_notification(announcement, user_id) -> Dict[str, Any]:
+    return {
+        'user_id': user_id,
+        'notification_type': 'system_announcement',
+        'title': announcement['title'],
+        'message': announcement['message'],
+        'priority': announcement.get('priority', 'normal'),
+        'metadata': {
+            'announcement_id': announcement['announcement_id'],
+            **(announcement.get('metadata') or {})
+        },
+        'expires_at': announcement.get('expires_at')
+    }
+
+
+def insert_notification_batch(notifications: List[Dict[str, Any]]) -> int:
+    """Insert one batch of notification rows and publish them to open streams."""
+    if not notifications:
+        return 0
+    response = supabase_service_role_client().table('notifications').insert(notifications).execute()
+    publish_notifications(response.data or [])
+    return len(notifications)
+
+
+def deliver_announcement(announcement, user_pages) -> int:
+    """Write an announcement's notifications page by page, recording progress.
+
+    Args:
+        announcement: system_announcements row.
+        user_pages: Iterable of user id lists (e.g. iter_audience()).
+
+    Returns:
+        int: Notifications created by this run.
+    """
+    announcement_id = announcement['announcement_id']
+    progress = get_fanout_progress(announcement_id) or {}
+    sent, batches = progress.get('sent', 0), progress.get('batches', 0)
+    created = 0
+
+    _save_progress(announcement_id, status='running', started_at=datetime.utcnow().isoformat(), error=None)
+    try:
+        for user_ids in user_pages:
+            for start in range(0, len(user_ids), FANOUT_BATCH_SIZE):
+                chunk = user_ids[start:start + FANOUT_BATCH_SIZE]
+                created += insert_notification_batch([build_announcement_notification(announcement, u) for u in chunk])
+                batches += 1
+                # The cursor only moves past users whose rows were written
+                _save_progress(announcement_id, cursor=chunk[-1], sent=sent + created, batches=batches)
+    except Exception as e:
+        _save_progress(announcement_id, status='failed', error=str(e), finished_at=datetime.utcnow().isoformat())
+        raise
+
+    _save_progress(announcement_id, status='completed', finished_at=datetime.utcnow().isoformat())
+    logger.info(f"Announcement {announcement_id} delivered: {created} notifications in this run, {sent + created} total")
+    return created
+
+
+def _run_fanout(announcement, resume) -> None:
+    after = None
+    if resume:
+        after = (get_fanout_progress(announcement['announcement_id']) or {}).get('cursor') or None
+    try:
+        deliver_announcement(
+            announcement,
+            iter_audience(announcement.get('target_roles'), announcement.get('target_facilities'), after=after)
+        )
+    except Exception as e:
+        logger.error(f"Announcement {announcement['announcement_id']} fan-out failed: {str(e)}")
+
+
+def schedule_announcement_fanout(announcement, resume=False) -> bool:
+    """Queue the fan-out of an announcement on the background executor.
+
+    Args:
+        announcement: system_announcements row (announcement_id, title,
+            message, priority, metadata, expires_at, target_roles,
+            target_facilities).
+        resume: Continue after the last delivered user instead of starting over.
+
+    Returns:
+        bool: False if a delivery of the announcement is already queued or running.
+    """
+    if not _claim_fanout(announcement['announcement_id']):
+        return False
+    if not resume:
+        _save_progress(announcement['announcement_id'], status='queued', sent=0, batches=0, cursor=None)
+    else:
+        _save_progress(announcement['announcement_id'], status='queued')
+    _fanout_executor.submit(_run_fanout, announcement, resume)
+    return True
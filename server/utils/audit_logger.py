@@ -1,13 +1,43 @@
+"""
+HIPAA audit logging.
+
+Nothing here writes on the request thread:
+
+- configure_audit_logger() puts a QueueHandler on the app logger. A
+  QueueListener thread writes the records to the console and to a rotating
+  file, one JSON object per line. Rotation is by size
+  (AUDIT_LOG_MAX_BYTES / AUDIT_LOG_BACKUP_COUNT), or by time when
+  AUDIT_LOG_ROTATE_WHEN is set (e.g. 'midnight').
+- log_action() queues its audit_logs row on the write-behind stream
+  (utils/write_behind.py). The write-behind worker bulk-inserts the rows
+  of a batch in one request per table.
+
+The listener is stopped at interpreter exit, which writes out every queued
+record first. Queued rows are kept in Redis until they are inserted, so a
+restart does not lose them.
+"""
+
+import atexit
 import logging, os, json
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from typing import Optional
 from functools import wraps
 from flask import request, current_app, session
-from config.settings import supabase, sr_client
+from config.settings import supabase
+from utils.write_behind import enqueue
 import uuid
 
 
 DEFAULT_LOG_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
 DEFAULT_LOGFILE_PATH = 'logs/keepsake_audit.log'
+LOG_MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('AUDIT_LOG_BACKUP_COUNT', 10))
+LOG_ROTATE_WHEN = os.environ.get('AUDIT_LOG_ROTATE_WHEN')
+
+# logfile -> QueueListener writing it
+_listeners = {}
 
 def _ensure_log_directory(logfile: str):
     """Ensure that the directory for the logfile exists."""
@@ -16,6 +46,30 @@ def _ensure_log_directory(logfile: str):
         os.makedirs(directory, exist_ok=True)
 
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; create_audit_log()'s fields are kept under 'audit'."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': f"{record.pathname}:{record.lineno}",
+        }
+        if getattr(record, 'audit', None) is not None:
+            entry['audit'] = record.audit
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _file_handler(logfile: str) -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        return TimedRotatingFileHandler(logfile, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, utc=True)
+    return RotatingFileHandler(logfile, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+
+
 def configure_audit_logger(logfile: str = DEFAULT_LOGFILE_PATH,
                            level: int = logging.INFO,
                            log_format: str = DEFAULT_LOG_FORMAT,
@@ -23,35 +77,45 @@ def configure_audit_logger(logfile: str = DEFAULT_LOGFILE_PATH,
     """Configure and return an audit logger.
 
     This helper prevents duplicate handlers when imported multiple times by
-    checking whether a handler for *logfile* is already attached.
+    checking whether the queue for *logfile* is already attached.
 
     If *attach_to_logger* is provided (e.g. a Flask app's ``app.logger``), the
     handlers will be added to that logger. Otherwise a standalone logger named
     "keepsake" is returned.
+
+    Records are handed to a background listener; *log_format* applies to the
+    console, the file gets JSON lines.
     """
     _ensure_log_directory(logfile)
 
     logger = attach_to_logger or logging.getLogger("keepsake")
+    logfile = os.path.abspath(logfile)
 
     # Avoid adding multiple handlers in case this function is called again.
-    if any(isinstance(h, logging.FileHandler) and h.baseFilename == os.path.abspath(logfile)
-           for h in logger.handlers):
+    if any(getattr(h, 'audit_logfile', None) == logfile for h in logger.handlers):
         return logger
 
     logger.setLevel(level)
 
-    formatter = logging.Formatter(log_format)
-
-    file_handler = logging.FileHandler(logfile)
-    file_handler.setFormatter(formatter)
+    file_handler = _file_handler(logfile)
+    file_handler.setFormatter(JsonFormatter())
     file_handler.setLevel(level)
 
     stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
+    stream_handler.setFormatter(logging.Formatter(log_format))
     stream_handler.setLevel(level)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+    if logfile not in _listeners:
+        listener = QueueListener(queue.SimpleQueue(), file_handler, stream_handler, respect_handler_level=True)
+        listener.start()
+        # Drains the queue before the process exits
+        atexit.register(listener.stop)
+        _listeners[logfile] = listener
+
+    queue_handler = QueueHandler(_listeners[logfile].queue)
+    queue_handler.audit_logfile = logfile
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
 
     return logger
 
@@ -95,8 +159,8 @@ def create_audit_log(log_data: dict):
         # Combine all parts into one message
         log_message = ' '.join(message_parts)
 
-        # Log using the configured logger
-        current_app.logger.info(f"AUDIT: {log_message}")
+        # Log using the configured logger; the fields are kept for the JSON file
+        current_app.logger.info(f"AUDIT: {log_message}", extra={'audit': log_data})
 
     except Exception as e:
         # Fallback logging in case of error
@@ -106,7 +170,7 @@ def create_audit_log(log_data: dict):
 def log_action(user_id, action_type, table_name, record_id=None, patient_id=None,
                 old_values=None, new_values=None, qr_id=None):
     """
-    Log an action to the database audit_logs table
+    Queue an action for the database audit_logs table
 
     Args:
         user_id (str): UUID of the user performing the action
@@ -119,7 +183,7 @@ def log_action(user_id, action_type, table_name, record_id=None, patient_id=None
         qr_id (str, optional): ID of the QR code if applicable
 
     Returns:
-        bool: True if logging succeeded, False otherwise
+        bool: True if the row was queued (or written), False otherwise
     """
     try:
         # Get session_id from Flask session if available
@@ -161,12 +225,8 @@ def log_action(user_id, action_type, table_name, record_id=None, patient_id=None
             # Convert to JSON-serializable format
             audit_data['new_values'] = json.loads(json.dumps(new_values, default=str))
 
-        # Insert into audit_logs table using service role client to bypass RLS
-        response = sr_client.table('audit_logs').insert(audit_data).execute()
-
-        if getattr(response, 'error', None):
-            current_app.logger.error(f"Failed to create audit log: {response.error}")
-            return False
+        # Bulk-inserted by the write-behind worker (service role, bypasses RLS)
+        enqueue('insert', {'table': 'audit_logs', 'row': audit_data})
 
         # Also log to file for backup
         create_audit_log({
@@ -4,7 +4,7 @@ Provides comprehensive database health metrics using direct SQL queries
 """
 
 from flask import current_app
-from config.settings import sr_client
+from config.settings import sr_client, get_client_pool_stats
 from datetime import datetime, timezone
 
 
@@ -306,7 +306,8 @@ def get_comprehensive_database_health():
                 'estimated_usage_percent': db_connections.get('estimated_usage_percent'),
                 'avg_query_time_ms': query_performance.get('avg_response_time_ms'),
                 'query_status': query_performance.get('status'),
-                'table_counts': table_counts
+                'table_counts': table_counts,
+                'client_pool': get_client_pool_stats()
             },
             'service_details': {
                 'auth': auth_health,
@@ -0,0 +1,417 @@
+"""
+Outbound email queue and pooled SMTP sender.
+
+EmailService.send_email() used to open a new SMTP connection (TLS handshake
+and login) for every message and send it on the request thread. Messages are
+now queued and sent by background sender threads that reuse authenticated
+connections:
+
+    email_outbox:queue     stream of messages to send (consumer group email_senders)
+    email_outbox:retry     sorted set of messages waiting to be retried,
+                           scored by the time they are due
+    email_outbox:dead      messages that were rejected or failed EMAIL_MAX_ATTEMPTS times
+
+Each process runs EMAIL_SENDER_THREADS senders sharing one connection pool.
+A failed send is retried with exponential backoff (EMAIL_RETRY_BASE_SECONDS,
+doubled per attempt); a message the server rejects outright (refused
+recipient, 5xx on DATA) goes straight to the dead-letter stream. Entries left
+unacknowledged by a dead worker are reclaimed after EMAIL_CLAIM_IDLE_MS.
+
+A sender acknowledges each message (and queues its retry or dead letter) as
+soon as it was sent, and while working through a batch it re-claims the
+entries it has not reached yet every quarter of EMAIL_CLAIM_IDLE_MS. They
+never look idle to other processes, so a slow batch is not handed to a
+second sender and a password reset or 2FA code is not mailed twice.
+
+Every final outcome is logged to email_notifications, one bulk insert per
+batch read from the queue. Without Redis, queue_email() returns False and the
+caller sends inline through the same pool.
+"""
+
+import json
+import logging
+import os
+import re
+import smtplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.email_config import EmailConfig
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE_STREAM = 'email_outbox:queue'
+EMAIL_RETRY_KEY = 'email_outbox:retry'
+EMAIL_DEAD_STREAM = 'email_outbox:dead'
+EMAIL_GROUP = 'email_senders'
+
+SENDER_THREADS = int(os.environ.get('EMAIL_SENDER_THREADS', 2))
+POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', SENDER_THREADS))
+BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 20))
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_RETRY_BASE_SECONDS', 30))
+RETRY_MAX_SECONDS = 3600
+CLAIM_IDLE_MS = int(os.environ.get('EMAIL_CLAIM_IDLE_MS', 120000))
+# Kept below the Redis client's socket timeout (5s)
+BLOCK_MS = 2000
+# Idle connections are checked with NOOP before reuse; servers drop them eventually
+CONNECTION_CHECK_IDLE_SECONDS = 30
+# Recycle a connection after this many messages (Gmail limits messages per session)
+CONNECTION_MAX_MESSAGES = 100
+DEAD_STREAM_MAXLEN = 10000
+
+# Moves due retries back onto the queue atomically, so two senders never promote the same one
+_PROMOTE_SCRIPT = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, message in ipairs(due) do
+    redis.call('zrem', KEYS[1], message)
+    redis.call('xadd', KEYS[2], '*', 'message', message)
+end
+return #due
+"""
+
+_senders: List[threading.Thread] = []
+_senders_lock = threading.Lock()
+
+
+class PermanentEmailError(Exception):
+    """The server rejected the message itself; sending it again cannot succeed."""
+
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections.
+
+    Args:
+        factory: Zero-argument callable returning a connected, logged-in
+            smtplib.SMTP (EmailConfig.get_smtp_connection).
+        size: Most connections open at once; callers wait for a free one.
+    """
+
+    def __init__(self, factory, size: int):
+        self.factory = factory
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+
+    def _take_idle(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    def _checkout(self) -> Dict[str, Any]:
+        while True:
+            conn = self._take_idle()
+            if conn is None:
+                return {'server': self.factory(), 'last_used': time.monotonic(), 'sent': 0}
+            if time.monotonic() - conn['last_used'] < CONNECTION_CHECK_IDLE_SECONDS:
+                return conn
+            try:
+                if conn['server'].noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            _close(conn['server'])
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is discarded instead of returned if the block raises
+        anything but a rejection of the message itself."""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn['server']
+            conn['sent'] += 1
+        except PermanentEmailError:
+            raise
+        except Exception:
+            if conn is not None:
+                _close(conn['server'])
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                conn['last_used'] = time.monotonic()
+                if conn['sent'] >= CONNECTION_MAX_MESSAGES:
+                    _close(conn['server'])
+                else:
+                    with self._lock:
+                        self._idle.append(conn)
+            self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _close(conn['server'])
+
+
+def _close(server) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+pool = SMTPConnectionPool(EmailConfig.get_smtp_connection, POOL_SIZE)
+
+
+# ============================================================================
+# SENDING
+# ============================================================================
+
+def plain_text(body_html: str) -> str:
+    """Simple HTML to text conversion (strip tags)."""
+    return re.sub('<[^<]+?>', '', body_html)
+
+
+def build_message(email: Dict[str, Any]) -> MIMEMultipart:
+    message = MIMEMultipart('alternative')
+    message['Subject'] = email['subject']
+    message['From'] = EmailConfig.get_from_address()
+    message['To'] = email['recipient_email']
+
+    # Attach plain text and HTML parts
+    message.attach(MIMEText(email['body_text'], 'plain', 'utf-8'))
+    message.attach(MIMEText(email['body_html'], 'html', 'utf-8'))
+    return message
+
+
+def deliver(email: Dict[str, Any]) -> None:
+    """Send one queued email over a pooled connection.
+
+    Raises:
+        PermanentEmailError: The recipient or message was rejected.
+        Exception: Anything else (connection, auth, 4xx); worth retrying.
+    """
+    message = build_message(email)
+    with pool.connection() as server:
+        try:
+            server.send_message(message)
+        except smtplib.SMTPRecipientsRefused:
+            raise PermanentEmailError(f"Recipient email rejected: {email['recipient_email']}")
+        except smtplib.SMTPDataError as e:
+            if e.smtp_code >= 500:
+                raise PermanentEmailError(f"SMTP error: {str(e)}")
+            raise
+
+
+def log_row(email: Dict[str, Any], status: str, error_message: Optional[str] = None) -> Dict[str, Any]:
+    """email_notifications row for an email's final outcome."""
+    row = {
+        'recipient_email': email['recipient_email'],
+        'notification_type': email['notification_type'],
+        'subject': email['subject'],
+        'body_text': email['body_text'],
+        'body_html': email['body_html'],
+        'status': status,
+        'error_message': error_message,
+        'retry_count': max(email.get('attempt', 1) - 1, 0),
+        'metadata': email.get('metadata')
+    }
+    if email.get('facility_id'):
+        row['facility_id'] = email['facility_id']
+    if status == 'sent':
+        row['sent_at'] = datetime.utcnow().isoformat()
+    return row
+
+
+def write_log_rows(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    try:
+        supabase_service_role_client().table('email_notifications').insert(rows).execute()
+    except Exception as e:
+        # Logging failure shouldn't prevent email sending
+        logger.error(f"Error logging {len(rows)} emails to database: {str(e)}")
+
+
+def send_now(email: Dict[str, Any]) -> Tuple[bool, str]:
+    """Send on the calling thread (no queue available) and log the outcome."""
+    try:
+        deliver(email)
+        logger.info(f"Email sent successfully to {email['recipient_email']}: {email['subject']}")
+        write_log_rows([log_row(email, 'sent')])
+        return True, "Email sent successfully"
+    except Exception as e:
+        error_msg = str(e) if isinstance(e, PermanentEmailError) else f"Failed to send email: {str(e)}"
+        logger.error(error_msg)
+        write_log_rows([log_row(email, 'failed', error_msg)])
+        return False, error_msg
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+def queue_email(email: Dict[str, Any]) -> bool:
+    """Queue an email for the background senders.
+
+    Args:
+        email: recipient_email, subject, body_html, body_text,
+            notification_type, facility_id, metadata.
+
+    Returns:
+        bool: True if queued, False if Redis is unavailable (send inline).
+    """
+    if redis_client is None:
+        return False
+    try:
+        redis_client.xadd(EMAIL_QUEUE_STREAM, {'message': json.dumps({**email, 'attempt': 1}, default=str)})
+        _start_senders()
+        return True
+    except Exception as e:
+        logger.warning(f"Email queue unavailable, sending inline: {str(e)}")
+        return False
+
+
+def _retry_delay(attempt: int) -> int:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+
+
+def _settle(pipe, entry_id) -> None:
+    """Acknowledge one entry, together with whatever retry or dead letter is queued on pipe."""
+    pipe.xack(EMAIL_QUEUE_STREAM, EMAIL_GROUP, entry_id)
+    pipe.xdel(EMAIL_QUEUE_STREAM, entry_id)
+    pipe.execute()
+
+
+def _keep_claimed(entries, consumer: str):
+    """Re-claim the entries *consumer* still holds, resetting their idle time.
+
+    Entries another sender took over in the meantime (a send ran longer than
+    the claim idle time) are dropped from the batch; that sender owns them now.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for entry_id, _ in entries:
+        pipe.xpending_range(EMAIL_QUEUE_STREAM, EMAIL_GROUP, min=entry_id, max=entry_id, count=1, consumername=consumer)
+    held = [entry for entry, pending in zip(entries, pipe.execute()) if pending]
+    if held:
+        redis_client.xclaim(EMAIL_QUEUE_STREAM, EMAIL_GROUP, consumer, 0,
+                            [entry_id for entry_id, _ in held], justid=True)
+    return held
+
+
+def process_entries(entries, consumer: str) -> int:
+    """Send a batch of queue entries, schedule retries and log final outcomes.
+
+    Args:
+        entries: (entry_id, fields) pairs read or claimed by *consumer*.
+        consumer: This sender's consumer name, used to keep the entries
+            claimed while the batch is worked through.
+
+    Returns:
+        int: Number of emails sent.
+    """
+    sent, log_rows = 0, []
+    remaining = list(entries)
+    renewed = time.monotonic()
+
+    while remaining:
+        if time.monotonic() - renewed >= CLAIM_IDLE_MS / 4000:
+            # Reset the idle time of the rest of the batch before xautoclaim elsewhere could take it
+            remaining = _keep_claimed(remaining, consumer)
+            renewed = time.monotonic()
+            if not remaining:
+                break
+        entry_id, fields = remaining.pop(0)
+
+        pipe = redis_client.pipeline(transaction=False)
+        try:
+            email = json.loads(fields['message'])
+        except (KeyError, ValueError, TypeError) as e:
+            logger.error(f"Dropping malformed email queue entry {entry_id}: {str(e)}")
+            _settle(pipe, entry_id)
+            continue
+
+        try:
+            deliver(email)
+            sent += 1
+            log_rows.append(log_row(email, 'sent'))
+            logger.info(f"Email sent successfully to {email['recipient_email']}: {email['subject']}")
+        except Exception as e:
+            error_msg = str(e)
+            attempt = email.get('attempt', 1)
+            if isinstance(e, PermanentEmailError) or attempt >= MAX_ATTEMPTS:
+                logger.error(f"Email to {email['recipient_email']} failed after {attempt} attempts: {error_msg}")
+                log_rows.append(log_row(email, 'failed', error_msg))
+                pipe.xadd(EMAIL_DEAD_STREAM, {'message': fields['message'], 'error': error_msg},
+                          maxlen=DEAD_STREAM_MAXLEN, approximate=True)
+            else:
+                delay = _retry_delay(attempt)
+                logger.warning(f"Email to {email['recipient_email']} failed (attempt {attempt}), retrying in {delay}s: {error_msg}")
+                pipe.zadd(EMAIL_RETRY_KEY, {json.dumps({**email, 'attempt': attempt + 1}, default=str): time.time() + delay})
+        _settle(pipe, entry_id)
+
+    write_log_rows(log_rows)
+    return sent
+
+
+def _ensure_group() -> None:
+    try:
+        redis_client.xgroup_create(EMAIL_QUEUE_STREAM, EMAIL_GROUP, id='0', mkstream=True)
+    except Exception as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _sender_loop(index: int) -> None:
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    last_claim = 0.0
+
+    while True:
+        try:
+            _ensure_group()
+            redis_client.eval(_PROMOTE_SCRIPT, 2, EMAIL_RETRY_KEY, EMAIL_QUEUE_STREAM, time.time(), BATCH_SIZE)
+
+            # One thread per process takes over entries stranded by dead senders
+            if index == 0 and time.monotonic() - last_claim >= CLAIM_IDLE_MS / 1000:
+                last_claim = time.monotonic()
+                _, claimed = redis_client.xautoclaim(
+                    EMAIL_QUEUE_STREAM, EMAIL_GROUP, consumer,
+                    min_idle_time=CLAIM_IDLE_MS, start_id='0-0', count=BATCH_SIZE
+                )[:2]
+                claimed = [(entry_id, fields) for entry_id, fields in claimed if fields]
+                if claimed:
+                    process_entries(claimed, consumer)
+
+            response = redis_client.xreadgroup(
+                EMAIL_GROUP, consumer, {EMAIL_QUEUE_STREAM: '>'},
+                count=BATCH_SIZE, block=BLOCK_MS
+            )
+            for _stream, entries in response or []:
+                if entries:
+                    process_entries(entries, consumer)
+        except Exception as e:
+            logger.error(f"Email sender error: {str(e)}")
+            time.sleep(1)
+
+
+def _start_senders() -> None:
+    """Start this process's sender threads (idempotent, so it also runs in forked workers)."""
+    if len(_senders) == SENDER_THREADS and all(t.is_alive() for t in _senders):
+        return
+    with _senders_lock:
+        for index in range(SENDER_THREADS):
+            if index < len(_senders) and _senders[index].is_alive():
+                continue
+            thread = threading.Thread(target=_sender_loop, args=(index,), name=f'email-sender-{index}', daemon=True)
+            if index < len(_senders):
+                _senders[index] = thread
+            else:
+                _senders.append(thread)
+            thread.start()
@@ -2,13 +2,11 @@
 Email Service for KEEPSAKE Healthcare System
 Handles sending emails via Gmail SMTP with queue logging
 """
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import logging
 from config.email_config import EmailConfig
 from config.settings import supabase_service_role_client
+from utils.email_outbox import plain_text, queue_email, send_now
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +28,11 @@ class EmailService:
         metadata=None
     ):
         """
-        Send an email via Gmail SMTP and log to email_notifications table
+        Queue an email for delivery via Gmail SMTP
+
+        The email is sent by the background senders in utils/email_outbox.py,
+        which log the outcome to the email_notifications table. Without Redis
+        it is sent on the calling thread instead.
 
         Args:
             recipient_email (str): Recipient email address
@@ -61,96 +63,22 @@ class EmailService:
             )
             return False, error_msg
 
-        # Generate plain text fallback if not provided
-        if not body_text:
-            # Simple HTML to text conversion (strip tags)
-            import re
-            body_text = re.sub('<[^<]+?>', '', body_html)
-
-        try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = EmailConfig.get_from_address()
-            message['To'] = recipient_email
-
-            # Attach plain text and HTML parts
-            part_text = MIMEText(body_text, 'plain', 'utf-8')
-            part_html = MIMEText(body_html, 'html', 'utf-8')
-            message.attach(part_text)
-            message.attach(part_html)
-
-            # Get SMTP connection
-            server = EmailConfig.get_smtp_connection()
-
-            # Send email
-            server.send_message(message)
-            server.quit()
-
-            logger.info(f"Email sent successfully to {recipient_email}: {subject}")
-
-            # Log success to database
-            EmailService._log_email(
-                recipient_email,
-                subject,
-                body_text,
-                body_html,
-                notification_type,
-                'sent',
-                None,
-                facility_id,
-                metadata
-            )
-
-            return True, "Email sent successfully"
-
-        except smtplib.SMTPRecipientsRefused as e:
-            error_msg = f"Recipient email rejected: {recipient_email}"
-            logger.error(error_msg)
-            EmailService._log_email(
-                recipient_email,
-                subject,
-                body_text,
-                body_html,
-                notification_type,
-                'failed',
-                error_msg,
-                facility_id,
-                metadata
-            )
-            return False, error_msg
+        email = {
+            'recipient_email': recipient_email,
+            'subject': subject,
+            'body_html': body_html,
+            # Templates carry a precompiled plain-text part; strip tags otherwise
+            'body_text': body_text or getattr(body_html, 'text', None) or plain_text(body_html),
+            'notification_type': notification_type,
+            'facility_id': facility_id,
+            'metadata': metadata
+        }
 
-        except smtplib.SMTPException as e:
-            error_msg = f"SMTP error: {str(e)}"
-            logger.error(error_msg)
-            EmailService._log_email(
-                recipient_email,
-                subject,
-                body_text,
-                body_html,
-                notification_type,
-                'failed',
-                error_msg,
-                facility_id,
-                metadata
-            )
-            return False, error_msg
+        if queue_email(email):
+            logger.info(f"Email queued for {recipient_email}: {subject}")
+            return True, "Email queued for delivery"
 
-        except Exception as e:
-            error_msg = f"Failed to send email: {str(e)}"
-            logger.error(error_msg)
-            EmailService._log_email(
-                recipient_email,
-                subject,
-                body_text,
-                body_html,
-                notification_type,
-                'failed',
-                error_msg,
-                facility_id,
-                metadata
-            )
-            return False, error_msg
+        return send_now(email)
 
     @staticmethod
     def _log_email(
@@ -444,12 +372,14 @@ def test_email_service():
     </html>
     """
 
-    success, message = EmailService.send_email(
-        recipient_email=test_recipient,
-        subject=subject,
-        body_html=body_html,
-        notification_type='password_reset_requested'
-    )
+    # Sent inline: this process exits before a queued email would be picked up
+    success, message = send_now({
+        'recipient_email': test_recipient,
+        'subject': subject,
+        'body_html': body_html,
+        'body_text': plain_text(body_html),
+        'notification_type': 'password_reset_requested'
+    })
 
     print(f"\nTest Email Result: {message}")
 
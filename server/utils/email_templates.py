@@ -1,35 +1,107 @@
 """
 Rich HTML Email Templates for KEEPSAKE Healthcare System
 Responsive email templates with KEEPSAKE branding
+
+Templates are compiled once instead of being rebuilt with f-strings on every
+send. Compiling a template puts its content into the shared base layout,
+fills in the brand colors, the year and any other constants, and splits the
+result into static fragments around the remaining {{slot}} placeholders;
+rendering only joins the fragments with the slot values. The plain-text
+alternative is derived from the compiled HTML at the same time, so senders no
+longer strip tags from every message, and identical renders (bulk sends of
+the same email) come from an LRU cache of EMAIL_RENDER_CACHE_SIZE entries.
 """
+import html
+import os
+import re
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional
 
+RENDER_CACHE_SIZE = int(os.environ.get('EMAIL_RENDER_CACHE_SIZE', 512))
 
-class EmailTemplates:
-    """Rich HTML email templates with KEEPSAKE branding"""
+_SLOT_RE = re.compile(r'\{\{(\w+)\}\}')
 
-    # KEEPSAKE brand colors (from client/src/index.css)
-    PRIMARY_COLOR = "#5770c4"  # KEEPSAKE primary blue-purple (oklch(0.5649 0.1079 225.9002))
-    SECONDARY_COLOR = "#c4dee3"  # KEEPSAKE secondary light blue
-    SUCCESS_COLOR = "#10b981"  # Green
-    WARNING_COLOR = "#f59e0b"  # Orange
-    DANGER_COLOR = "#ef4444"  # Red
-    TEXT_COLOR = "#3f3f3f"  # KEEPSAKE black
-    LIGHT_BG = "#fffafa"  # KEEPSAKE white background
 
-    @staticmethod
-    def _base_template(content, preheader_text=""):
-        """
-        Base email template with KEEPSAKE branding
+class RenderedEmail(str):
+    """Rendered HTML that also carries its plain-text alternative in ``text``."""
 
-        Args:
-            content (str): Main email content HTML
-            preheader_text (str): Preview text shown in email clients
+    text = ''
 
-        Returns:
-            str: Complete HTML email
-        """
-        return f"""
+    def __new__(cls, body_html: str, text: str = ''):
+        rendered = super().__new__(cls, body_html)
+        rendered.text = text
+        return rendered
+
+
+def html_to_text(body_html: str) -> str:
+    """Plain-text version of an email body: visible text only, one blank line between blocks."""
+    body = re.sub(r'(?is)<head.*?</head>|<!--.*?-->', '', body_html)
+    # The hidden preheader is for inbox previews only
+    body = re.sub(r'(?is)<div style="display: none;[^"]*">.*?</div>', '', body)
+    body = re.sub(r'(?i)<br\s*/?>\s*', '\n', body)
+    body = re.sub(r'(?i)<li[^>]*>', '- ', body)
+    body = html.unescape(re.sub(r'<[^<]+?>', '', body))
+
+    lines, blank = [], False
+    for line in (line.strip() for line in body.splitlines()):
+        if line:
+            lines.append(line)
+            blank = False
+        elif lines and not blank:
+            lines.append('')
+            blank = True
+    return '\n'.join(lines).strip()
+
+
+class CompiledTemplate:
+    """A template split into static fragments and slots.
+
+    Args:
+        source: Template text with {{name}} slots.
+        constants: Slot values known at compile time; they are folded into
+            the static fragments.
+        partials: Sources substituted for {{name}} before anything else.
+    """
+
+    def __init__(self, source: str, constants: Optional[Dict[str, str]] = None,
+                 partials: Optional[Dict[str, str]] = None):
+        for name, partial in (partials or {}).items():
+            source = source.replace('{{' + name + '}}', partial)
+        constants = constants or {}
+        source = _SLOT_RE.sub(lambda m: str(constants.get(m.group(1), m.group(0))), source)
+
+        self.fragments, self.slots = self._split(source)
+        self.text_fragments, self.text_slots = self._split(html_to_text(source))
+
+    @staticmethod
+    def _split(source):
+        parts = _SLOT_RE.split(source)
+        return parts[0::2], parts[1::2]
+
+    @staticmethod
+    def _join(fragments, slots, values) -> str:
+        out = [fragments[0]]
+        for slot, fragment in zip(slots, fragments[1:]):
+            out.append(values[slot])
+            out.append(fragment)
+        return ''.join(out)
+
+    def render(self, **values) -> RenderedEmail:
+        """Fill every slot; values may themselves be RenderedEmails (their text is used in the text part)."""
+        text_values = {name: getattr(value, 'text', value) for name, value in values.items()}
+        return RenderedEmail(
+            self._join(self.fragments, self.slots, values),
+            self._join(self.text_fragments, self.text_slots, text_values)
+        )
+
+
+# ============================================================================
+# TEMPLATE SOURCES
+# Brand colors are {{PRIMARY_COLOR}}-style slots filled in at compile time
+# ============================================================================
+
+_BASE_LAYOUT = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -39,23 +111,23 @@ class EmailTemplates:
     <title>KEEPSAKE Healthcare</title>
     <style>
         /* Reset styles */
-        body, table, td, a {{ -webkit-text-size-adjust: 100%; -ms-text-size-adjust: 100%; }}
-        table, td {{ mso-table-lspace: 0pt; mso-table-rspace: 0pt; }}
-        img {{ -ms-interpolation-mode: bicubic; border: 0; height: auto; line-height: 100%; outline: none; text-decoration: none; }}
-        body {{ margin: 0; padding: 0; width: 100% !important; height: 100% !important; }}
+        body, table, td, a { -webkit-text-size-adjust: 100%; -ms-text-size-adjust: 100%; }
+        table, td { mso-table-lspace: 0pt; mso-table-rspace: 0pt; }
+        img { -ms-interpolation-mode: bicubic; border: 0; height: auto; line-height: 100%; outline: none; text-decoration: none; }
+        body { margin: 0; padding: 0; width: 100% !important; height: 100% !important; }
 
         /* Responsive styles */
-        @media only screen and (max-width: 600px) {{
-            .email-container {{ width: 100% !important; }}
-            .content-padding {{ padding: 20px !important; }}
-            .button {{ width: 100% !important; }}
-        }}
+        @media only screen and (max-width: 600px) {
+            .email-container { width: 100% !important; }
+            .content-padding { padding: 20px !important; }
+            .button { width: 100% !important; }
+        }
     </style>
 </head>
-<body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: {EmailTemplates.LIGHT_BG};">
+<body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: {{LIGHT_BG}};">
     <!-- Preheader text (hidden) -->
     <div style="display: none; max-height: 0; overflow: hidden;">
-        {preheader_text}
+        {{preheader_text}}
     </div>
 
     <!-- Email container -->
@@ -66,11 +138,11 @@ class EmailTemplates:
 
                     <!-- Header with gradient (matching login page) -->
                     <tr>
-                        <td style="background: linear-gradient(27deg, {EmailTemplates.SECONDARY_COLOR} 50%, {EmailTemplates.LIGHT_BG} 50%); padding: 40px 20px; text-align: center;">
-                            <h1 style="margin: 0; color: {EmailTemplates.PRIMARY_COLOR}; font-size: 28px; font-weight: 600; letter-spacing: 0.5px;">
+                        <td style="background: linear-gradient(27deg, {{SECONDARY_COLOR}} 50%, {{LIGHT_BG}} 50%); padding: 40px 20px; text-align: center;">
+                            <h1 style="margin: 0; color: {{PRIMARY_COLOR}}; font-size: 28px; font-weight: 600; letter-spacing: 0.5px;">
                                 KEEPSAKE
                             </h1>
-                            <p style="margin: 8px 0 0 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 14px;">
+                            <p style="margin: 8px 0 0 0; color: {{TEXT_COLOR}}; font-size: 14px;">
                                 Healthcare Management System
                             </p>
                         </td>
@@ -78,19 +150,19 @@ class EmailTemplates:
 
                     <!-- Main content -->
                     <tr>
-                        <td class="content-padding" style="padding: 40px 30px; color: {EmailTemplates.TEXT_COLOR};">
-                            {content}
+                        <td class="content-padding" style="padding: 40px 30px; color: {{TEXT_COLOR}};">
+                            {{content}}
                         </td>
                     </tr>
 
                     <!-- Footer -->
                     <tr>
-                        <td style="background-color: {EmailTemplates.LIGHT_BG}; padding: 30px; text-align: center; border-top: 1px solid #e5e7eb;">
+                        <td style="background-color: {{LIGHT_BG}}; padding: 30px; text-align: center; border-top: 1px solid #e5e7eb;">
                             <p style="margin: 0 0 10px 0; color: #6b7280; font-size: 13px;">
                                 This email was sent by KEEPSAKE Healthcare System
                             </p>
                             <p style="margin: 0; color: #9ca3af; font-size: 12px;">
-                                &copy; {datetime.now().year} KEEPSAKE. All rights reserved.
+                                &copy; {{year}} KEEPSAKE. All rights reserved.
                             </p>
                         </td>
                     </tr>
@@ -103,74 +175,45 @@ class EmailTemplates:
 </html>
 """
 
-    @staticmethod
-    def _button(text, url, color=None):
-        """
-        Create a styled button for emails
-
-        Args:
-            text (str): Button text
-            url (str): Button URL
-            color (str, optional): Button color (defaults to PRIMARY_COLOR)
-
-        Returns:
-            str: Button HTML
-        """
-        bg_color = color or EmailTemplates.PRIMARY_COLOR
-        return f"""
+_BUTTON = """
 <table role="presentation" cellspacing="0" cellpadding="0" border="0" width="100%" style="margin: 25px 0;">
     <tr>
         <td align="center">
-            <a href="{url}" target="_blank" class="button" style="display: inline-block; background-color: {bg_color}; color: #ffffff; text-decoration: none; padding: 14px 32px; border-radius: 6px; font-weight: 600; font-size: 16px; letter-spacing: 0.3px; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);">
-                {text}
+            <a href="{{button_url}}" target="_blank" class="button" style="display: inline-block; background-color: {{button_color}}; color: #ffffff; text-decoration: none; padding: 14px 32px; border-radius: 6px; font-weight: 600; font-size: 16px; letter-spacing: 0.3px; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);">
+                {{button_text}}
             </a>
         </td>
     </tr>
 </table>
 """
 
-    @staticmethod
-    def password_reset_request(reset_url, recipient_email, user_name=None):
-        """
-        Password reset request email with reset link
-
-        Args:
-            reset_url (str): Password reset URL with token
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-
-        Returns:
-            str: Complete HTML email
-        """
-        greeting = f"Hello {user_name}" if user_name else "Hello"
-
-        content = f"""
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 24px; font-weight: 600;">
+_PASSWORD_RESET_REQUEST = """
+<h2 style="margin: 0 0 20px 0; color: {{TEXT_COLOR}}; font-size: 24px; font-weight: 600;">
     Reset Your Password
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting},
+    {{greeting}},
 </p>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    We received a request to reset the password for your KEEPSAKE account (<strong>{recipient_email}</strong>).
+    We received a request to reset the password for your KEEPSAKE account (<strong>{{recipient_email}}</strong>).
 </p>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
     Click the button below to create a new password. This link will expire in <strong>30 minutes</strong>.
 </p>
 
-{EmailTemplates._button("Reset My Password", reset_url)}
+{{button}}
 
 <p style="margin: 25px 0 16px 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Or copy and paste this URL into your browser:
 </p>
-<p style="margin: 0 0 25px 0; padding: 12px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 4px; word-break: break-all; font-size: 13px; color: #4b5563;">
-    {reset_url}
+<p style="margin: 0 0 25px 0; padding: 12px; background-color: {{LIGHT_BG}}; border-radius: 4px; word-break: break-all; font-size: 13px; color: #4b5563;">
+    {{reset_url}}
 </p>
 
-<div style="margin: 30px 0 0 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0 0 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #92400e; line-height: 1.5;">
         <strong>Security Notice:</strong> If you didn't request this password reset, please ignore this email. Your password will remain unchanged.
     </p>
@@ -178,53 +221,35 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        preheader = "Reset your KEEPSAKE password - Link expires in 30 minutes"
-        return EmailTemplates._base_template(content, preheader)
-
-    @staticmethod
-    def password_reset_success(recipient_email, user_name=None):
-        """
-        Password reset success confirmation email
-
-        Args:
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-
-        Returns:
-            str: Complete HTML email
-        """
-        greeting = f"Hello {user_name}" if user_name else "Hello"
-        reset_time = datetime.now().strftime("%B %d, %Y at %I:%M %p UTC")
-
-        content = f"""
+_PASSWORD_RESET_SUCCESS = """
 <div style="text-align: center; margin-bottom: 30px;">
-    <div style="display: inline-block; width: 60px; height: 60px; background-color: {EmailTemplates.SUCCESS_COLOR}; border-radius: 50%; text-align: center; line-height: 60px;">
+    <div style="display: inline-block; width: 60px; height: 60px; background-color: {{SUCCESS_COLOR}}; border-radius: 50%; text-align: center; line-height: 60px;">
         <span style="color: #ffffff; font-size: 32px;">✓</span>
     </div>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.SUCCESS_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{SUCCESS_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Password Reset Successful
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting},
+    {{greeting}},
 </p>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
     Your KEEPSAKE account password has been successfully reset.
 </p>
 
-<div style="margin: 25px 0; padding: 20px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px;">
+<div style="margin: 25px 0; padding: 20px; background-color: {{LIGHT_BG}}; border-radius: 6px;">
     <p style="margin: 0 0 8px 0; font-size: 13px; color: #6b7280;">
-        <strong>Account:</strong> {recipient_email}
+        <strong>Account:</strong> {{recipient_email}}
     </p>
     <p style="margin: 0; font-size: 13px; color: #6b7280;">
-        <strong>Reset Time:</strong> {reset_time}
+        <strong>Reset Time:</strong> {{reset_time}}
     </p>
 </div>
 
@@ -232,7 +257,7 @@ class EmailTemplates:
     You can now sign in to KEEPSAKE using your new password.
 </p>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {EmailTemplates.DANGER_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {{DANGER_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #991b1b; line-height: 1.5;">
         <strong>Didn't reset your password?</strong>
     </p>
@@ -255,32 +280,18 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        preheader = "Your KEEPSAKE password has been successfully reset"
-        return EmailTemplates._base_template(content, preheader)
-
-    @staticmethod
-    def password_reset_blocked(recipient_email):
-        """
-        Rate limit notification email
-
-        Args:
-            recipient_email (str): Recipient email address
-
-        Returns:
-            str: Complete HTML email
-        """
-        content = f"""
+_PASSWORD_RESET_BLOCKED = """
 <div style="text-align: center; margin-bottom: 30px;">
-    <div style="display: inline-block; width: 60px; height: 60px; background-color: {EmailTemplates.WARNING_COLOR}; border-radius: 50%; text-align: center; line-height: 60px;">
+    <div style="display: inline-block; width: 60px; height: 60px; background-color: {{WARNING_COLOR}}; border-radius: 50%; text-align: center; line-height: 60px;">
         <span style="color: #ffffff; font-size: 32px;">⚠</span>
     </div>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.WARNING_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{WARNING_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Too Many Password Reset Attempts
 </h2>
 
@@ -289,21 +300,21 @@ class EmailTemplates:
 </p>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    We've detected multiple password reset requests for your KEEPSAKE account (<strong>{recipient_email}</strong>) in a short period of time.
+    We've detected multiple password reset requests for your KEEPSAKE account (<strong>{{recipient_email}}</strong>) in a short period of time.
 </p>
 
-<div style="margin: 25px 0; padding: 20px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px;">
+<div style="margin: 25px 0; padding: 20px; background-color: {{LIGHT_BG}}; border-radius: 6px;">
     <p style="margin: 0 0 12px 0; font-size: 14px; color: #6b7280; line-height: 1.6;">
-        <strong style="color: {EmailTemplates.TEXT_COLOR};">Security Measure:</strong><br>
+        <strong style="color: {{TEXT_COLOR}};">Security Measure:</strong><br>
         To protect your account, we've temporarily limited password reset requests.
     </p>
     <p style="margin: 0; font-size: 14px; color: #6b7280; line-height: 1.6;">
-        <strong style="color: {EmailTemplates.TEXT_COLOR};">Wait Time:</strong><br>
+        <strong style="color: {{TEXT_COLOR}};">Wait Time:</strong><br>
         Please wait <strong>1 hour</strong> before requesting another password reset.
     </p>
 </div>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #92400e; line-height: 1.5;">
         <strong>Suspicious Activity?</strong>
     </p>
@@ -323,46 +334,27 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        preheader = "Your account has been temporarily limited due to multiple password reset attempts"
-        return EmailTemplates._base_template(content, preheader)
-
-    @staticmethod
-    def twofa_setup_code(code, recipient_email, user_name=None):
-        """
-        Email template for 2FA setup verification code
-
-        Args:
-            code (str): 6-digit verification code
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-
-        Returns:
-            str: HTML email template
-        """
-        greeting = f"Hello {user_name}," if user_name else "Hello,"
-        preheader_text = f"Your KEEPSAKE 2FA verification code is {code}"
-
-        content = f"""
-<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {EmailTemplates.PRIMARY_COLOR}; border-radius: 4px;">
+_TWOFA_SETUP_CODE = """
+<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {{PRIMARY_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #1e40af; line-height: 1.5;">
         <strong>Security Notice:</strong> Enable Two-Factor Authentication
     </p>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.PRIMARY_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{PRIMARY_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Verification Code for 2FA Setup
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting}
+    {{greeting}}
 </p>
 
 <p style="margin: 0 0 20px 0; line-height: 1.6; font-size: 15px;">
-    You're setting up Two-Factor Authentication (2FA) for your KEEPSAKE account (<strong>{recipient_email}</strong>).
+    You're setting up Two-Factor Authentication (2FA) for your KEEPSAKE account (<strong>{{recipient_email}}</strong>).
 </p>
 
 <p style="margin: 0 0 10px 0; line-height: 1.6; font-size: 15px;">
@@ -371,23 +363,23 @@ class EmailTemplates:
 
 <!-- Verification Code Display -->
 <div style="margin: 30px 0; text-align: center;">
-    <div style="display: inline-block; background: linear-gradient(135deg, {EmailTemplates.PRIMARY_COLOR} 0%, {EmailTemplates.SECONDARY_COLOR} 100%); padding: 25px 40px; border-radius: 10px; box-shadow: 0 4px 12px rgba(87, 112, 196, 0.3);">
+    <div style="display: inline-block; background: linear-gradient(135deg, {{PRIMARY_COLOR}} 0%, {{SECONDARY_COLOR}} 100%); padding: 25px 40px; border-radius: 10px; box-shadow: 0 4px 12px rgba(87, 112, 196, 0.3);">
         <p style="margin: 0 0 8px 0; color: #ffffff; font-size: 13px; font-weight: 500; letter-spacing: 1px; text-transform: uppercase;">
             Verification Code
         </p>
         <p style="margin: 0; color: #ffffff; font-size: 36px; font-weight: 700; letter-spacing: 8px; font-family: 'Courier New', monospace;">
-            {code}
+            {{code}}
         </p>
     </div>
 </div>
 
-<div style="margin: 25px 0; padding: 20px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px; text-align: center;">
+<div style="margin: 25px 0; padding: 20px; background-color: {{LIGHT_BG}}; border-radius: 6px; text-align: center;">
     <p style="margin: 0; font-size: 14px; color: #6b7280; line-height: 1.6;">
-        <strong style="color: {EmailTemplates.TEXT_COLOR};">Expires in:</strong> 10 minutes
+        <strong style="color: {{TEXT_COLOR}};">Expires in:</strong> 10 minutes
     </p>
 </div>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #92400e; line-height: 1.5;">
         <strong>Didn't request this?</strong>
     </p>
@@ -405,55 +397,36 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
-
-    @staticmethod
-    def twofa_login_code(code, recipient_email, user_name=None, ip_address=None):
-        """
-        Email template for 2FA login verification code
-
-        Args:
-            code (str): 6-digit verification code
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-            ip_address (str, optional): Login IP address
-
-        Returns:
-            str: HTML email template
-        """
-        greeting = f"Hello {user_name}," if user_name else "Hello,"
-        preheader_text = f"Your KEEPSAKE login verification code is {code}"
-
-        ip_info = f"""
-<div style="margin: 25px 0; padding: 20px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px;">
+_TWOFA_LOGIN_IP_INFO = """
+<div style="margin: 25px 0; padding: 20px; background-color: {{LIGHT_BG}}; border-radius: 6px;">
     <p style="margin: 0; font-size: 14px; color: #6b7280; line-height: 1.6;">
-        <strong style="color: {EmailTemplates.TEXT_COLOR};">Login Attempt From:</strong><br>
-        IP Address: <code style="background-color: #e5e7eb; padding: 2px 6px; border-radius: 3px; font-family: 'Courier New', monospace;">{ip_address}</code>
+        <strong style="color: {{TEXT_COLOR}};">Login Attempt From:</strong><br>
+        IP Address: <code style="background-color: #e5e7eb; padding: 2px 6px; border-radius: 3px; font-family: 'Courier New', monospace;">{{ip_address}}</code>
     </p>
 </div>
-""" if ip_address else ""
+"""
 
-        content = f"""
-<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {EmailTemplates.PRIMARY_COLOR}; border-radius: 4px;">
+_TWOFA_LOGIN_CODE = """
+<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {{PRIMARY_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #1e40af; line-height: 1.5;">
         <strong>Login Attempt Detected:</strong> Verification Required
     </p>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.PRIMARY_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{PRIMARY_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Your Login Verification Code
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting}
+    {{greeting}}
 </p>
 
 <p style="margin: 0 0 20px 0; line-height: 1.6; font-size: 15px;">
-    Someone is trying to log into your KEEPSAKE account (<strong>{recipient_email}</strong>). Enter the verification code below to complete your login:
+    Someone is trying to log into your KEEPSAKE account (<strong>{{recipient_email}}</strong>). Enter the verification code below to complete your login:
 </p>
 
 <!-- Verification Code Display -->
@@ -463,20 +436,20 @@ class EmailTemplates:
             Verification Code
         </p>
         <p style="margin: 0; color: #3f3f3f; font-size: 36px; font-weight: 700; letter-spacing: 8px; font-family: 'Courier New', monospace;">
-            {code}
+            {{code}}
         </p>
     </div>
 </div>
 
-<div style="margin: 25px 0; padding: 20px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px; text-align: center;">
+<div style="margin: 25px 0; padding: 20px; background-color: {{LIGHT_BG}}; border-radius: 6px; text-align: center;">
     <p style="margin: 0; font-size: 14px; color: #6b7280; line-height: 1.6;">
-        <strong style="color: {EmailTemplates.TEXT_COLOR};">Expires in:</strong> 10 minutes
+        <strong style="color: {{TEXT_COLOR}};">Expires in:</strong> 10 minutes
     </p>
 </div>
 
-{ip_info}
+{{ip_info}}
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {EmailTemplates.DANGER_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {{DANGER_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #991b1b; line-height: 1.5;">
         <strong>Not you trying to log in?</strong>
     </p>
@@ -487,53 +460,36 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
-
-    @staticmethod
-    def twofa_enabled(recipient_email, user_name=None):
-        """
-        Email template confirming 2FA has been enabled
-
-        Args:
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-
-        Returns:
-            str: HTML email template
-        """
-        greeting = f"Hello {user_name}," if user_name else "Hello,"
-        preheader_text = "Two-Factor Authentication enabled successfully"
-
-        content = f"""
-<div style="margin: 0 0 25px 0; padding: 15px; background-color: #d1fae5; border-left: 4px solid {EmailTemplates.SUCCESS_COLOR}; border-radius: 4px;">
+_TWOFA_ENABLED = """
+<div style="margin: 0 0 25px 0; padding: 15px; background-color: #d1fae5; border-left: 4px solid {{SUCCESS_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #065f46; line-height: 1.5;">
         <strong>Security Enhancement:</strong> 2FA Successfully Enabled
     </p>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.SUCCESS_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{SUCCESS_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Two-Factor Authentication Enabled
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting}
+    {{greeting}}
 </p>
 
 <p style="margin: 0 0 20px 0; line-height: 1.6; font-size: 15px;">
-    Two-Factor Authentication (2FA) has been successfully enabled for your KEEPSAKE account (<strong>{recipient_email}</strong>).
+    Two-Factor Authentication (2FA) has been successfully enabled for your KEEPSAKE account (<strong>{{recipient_email}}</strong>).
 </p>
 
-<div style="margin: 30px 0; padding: 30px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 8px; text-align: center;">
+<div style="margin: 30px 0; padding: 30px; background-color: {{LIGHT_BG}}; border-radius: 8px; text-align: center;">
     <div style="margin: 0 0 15px 0;">
-        <div style="display: inline-block; width: 60px; height: 60px; background-color: {EmailTemplates.SUCCESS_COLOR}; border-radius: 50%; line-height: 60px;">
+        <div style="display: inline-block; width: 60px; height: 60px; background-color: {{SUCCESS_COLOR}}; border-radius: 50%; line-height: 60px;">
             <span style="color: #ffffff; font-size: 30px;">✓</span>
         </div>
     </div>
-    <p style="margin: 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 16px; font-weight: 600;">
+    <p style="margin: 0; color: {{TEXT_COLOR}}; font-size: 16px; font-weight: 600;">
         Your Account is Now More Secure
     </p>
 </div>
@@ -554,7 +510,7 @@ class EmailTemplates:
     You can disable 2FA anytime from your account settings. You'll need to enter your password to confirm.
 </p>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #92400e; line-height: 1.5;">
         <strong>Didn't enable 2FA?</strong>
     </p>
@@ -565,53 +521,36 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
-
-    @staticmethod
-    def twofa_disabled(recipient_email, user_name=None):
-        """
-        Email template confirming 2FA has been disabled
-
-        Args:
-            recipient_email (str): Recipient email address
-            user_name (str, optional): User's name for personalization
-
-        Returns:
-            str: HTML email template
-        """
-        greeting = f"Hello {user_name}," if user_name else "Hello,"
-        preheader_text = "Two-Factor Authentication disabled"
-
-        content = f"""
-<div style="margin: 0 0 25px 0; padding: 15px; background-color: #fee2e2; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+_TWOFA_DISABLED = """
+<div style="margin: 0 0 25px 0; padding: 15px; background-color: #fee2e2; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #991b1b; line-height: 1.5;">
         <strong>Security Notice:</strong> 2FA Disabled
     </p>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.WARNING_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{WARNING_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Two-Factor Authentication Disabled
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    {greeting}
+    {{greeting}}
 </p>
 
 <p style="margin: 0 0 20px 0; line-height: 1.6; font-size: 15px;">
-    Two-Factor Authentication (2FA) has been disabled for your KEEPSAKE account (<strong>{recipient_email}</strong>).
+    Two-Factor Authentication (2FA) has been disabled for your KEEPSAKE account (<strong>{{recipient_email}}</strong>).
 </p>
 
-<div style="margin: 30px 0; padding: 30px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 8px; text-align: center;">
+<div style="margin: 30px 0; padding: 30px; background-color: {{LIGHT_BG}}; border-radius: 8px; text-align: center;">
     <div style="margin: 0 0 15px 0;">
-        <div style="display: inline-block; width: 60px; height: 60px; background-color: {EmailTemplates.WARNING_COLOR}; border-radius: 50%; line-height: 60px;">
+        <div style="display: inline-block; width: 60px; height: 60px; background-color: {{WARNING_COLOR}}; border-radius: 50%; line-height: 60px;">
             <span style="color: #ffffff; font-size: 30px;">⚠</span>
         </div>
     </div>
-    <p style="margin: 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 16px; font-weight: 600;">
+    <p style="margin: 0; color: {{TEXT_COLOR}}; font-size: 16px; font-weight: 600;">
         Your Account Security Has Been Reduced
     </p>
 </div>
@@ -632,7 +571,7 @@ class EmailTemplates:
     You can re-enable 2FA anytime from your account settings to add an extra layer of security.
 </p>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {EmailTemplates.DANGER_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fee2e2; border-left: 4px solid {{DANGER_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #991b1b; line-height: 1.5;">
         <strong>Didn't disable 2FA?</strong>
     </p>
@@ -643,48 +582,26 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Team</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
-
-    @staticmethod
-    def facility_contact_notification(contact_data):
-        """
-        Email template for notifying admin team about new facility contact request
-
-        Args:
-            contact_data (dict): Contact request data
-
-        Returns:
-            str: HTML email template
-        """
-        preheader_text = f"New facility inquiry from {contact_data['facility_name']}"
-
-        plan_names = {
-            'standard': 'Standard (₱5,544/month)',
-            'premium': 'Premium (₱11,144/month)',
-            'enterprise': 'Enterprise (₱22,344/month)'
-        }
-        plan_display = plan_names.get(contact_data.get('plan_interest'), 'Not specified')
-
-        message_html = f"""
-<div style="margin: 20px 0; padding: 16px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 6px;">
+_CONTACT_MESSAGE = """
+<div style="margin: 20px 0; padding: 16px; background-color: {{LIGHT_BG}}; border-radius: 6px;">
     <p style="margin: 0; font-size: 14px; color: #4b5563; line-height: 1.6; white-space: pre-wrap;">
-        {contact_data.get('message', 'No message provided')}
+        {{message}}
     </p>
 </div>
-""" if contact_data.get('message') else ""
+"""
 
-        content = f"""
-<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {EmailTemplates.PRIMARY_COLOR}; border-radius: 4px;">
+_FACILITY_CONTACT_NOTIFICATION = """
+<div style="margin: 0 0 25px 0; padding: 15px; background-color: #dbeafe; border-left: 4px solid {{PRIMARY_COLOR}}; border-radius: 4px;">
     <p style="margin: 0; font-size: 14px; color: #1e40af; line-height: 1.5;">
         <strong>New Lead:</strong> Facility Contact Request
     </p>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.PRIMARY_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{PRIMARY_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     New Facility Inquiry
 </h2>
 
@@ -692,8 +609,8 @@ class EmailTemplates:
     A potential healthcare facility has submitted a contact request for KEEPSAKE. Please follow up within 24 hours.
 </p>
 
-<div style="margin: 30px 0; padding: 25px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 8px;">
-    <h3 style="margin: 0 0 15px 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 18px; font-weight: 600;">
+<div style="margin: 30px 0; padding: 25px; background-color: {{LIGHT_BG}}; border-radius: 8px;">
+    <h3 style="margin: 0 0 15px 0; color: {{TEXT_COLOR}}; font-size: 18px; font-weight: 600;">
         Facility Information
     </h3>
 
@@ -702,25 +619,25 @@ class EmailTemplates:
             <td style="padding: 8px 0; font-size: 14px; color: #6b7280; font-weight: 600;">
                 Facility Name:
             </td>
-            <td style="padding: 8px 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR};">
-                {contact_data['facility_name']}
+            <td style="padding: 8px 0; font-size: 14px; color: {{TEXT_COLOR}};">
+                {{facility_name}}
             </td>
         </tr>
         <tr>
             <td style="padding: 8px 0; font-size: 14px; color: #6b7280; font-weight: 600;">
                 Contact Person:
             </td>
-            <td style="padding: 8px 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR};">
-                {contact_data['contact_person']}
+            <td style="padding: 8px 0; font-size: 14px; color: {{TEXT_COLOR}};">
+                {{contact_person}}
             </td>
         </tr>
         <tr>
             <td style="padding: 8px 0; font-size: 14px; color: #6b7280; font-weight: 600;">
                 Email:
             </td>
-            <td style="padding: 8px 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR};">
-                <a href="mailto:{contact_data['email']}" style="color: {EmailTemplates.PRIMARY_COLOR}; text-decoration: none;">
-                    {contact_data['email']}
+            <td style="padding: 8px 0; font-size: 14px; color: {{TEXT_COLOR}};">
+                <a href="mailto:{{email}}" style="color: {{PRIMARY_COLOR}}; text-decoration: none;">
+                    {{email}}
                 </a>
             </td>
         </tr>
@@ -728,9 +645,9 @@ class EmailTemplates:
             <td style="padding: 8px 0; font-size: 14px; color: #6b7280; font-weight: 600;">
                 Phone:
             </td>
-            <td style="padding: 8px 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR};">
-                <a href="tel:{contact_data['phone']}" style="color: {EmailTemplates.PRIMARY_COLOR}; text-decoration: none;">
-                    {contact_data['phone']}
+            <td style="padding: 8px 0; font-size: 14px; color: {{TEXT_COLOR}};">
+                <a href="tel:{{phone}}" style="color: {{PRIMARY_COLOR}}; text-decoration: none;">
+                    {{phone}}
                 </a>
             </td>
         </tr>
@@ -738,16 +655,16 @@ class EmailTemplates:
             <td style="padding: 8px 0; font-size: 14px; color: #6b7280; font-weight: 600;">
                 Plan Interest:
             </td>
-            <td style="padding: 8px 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR};">
-                <strong>{plan_display}</strong>
+            <td style="padding: 8px 0; font-size: 14px; color: {{TEXT_COLOR}};">
+                <strong>{{plan_display}}</strong>
             </td>
         </tr>
     </table>
 </div>
 
-{message_html}
+{{message_html}}
 
-<div style="margin: 30px 0; padding: 16px; background-color: #d1fae5; border-left: 4px solid {EmailTemplates.SUCCESS_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #d1fae5; border-left: 4px solid {{SUCCESS_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #065f46; line-height: 1.5;">
         <strong>Next Steps:</strong>
     </p>
@@ -761,63 +678,41 @@ class EmailTemplates:
 
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     This email was automatically generated by the KEEPSAKE system.<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Sales System</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Sales System</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
-
-    @staticmethod
-    def facility_contact_confirmation(contact_data):
-        """
-        Email template for confirming receipt of facility contact request
-
-        Args:
-            contact_data (dict): Contact request data
-
-        Returns:
-            str: HTML email template
-        """
-        preheader_text = "Thank you for your interest in KEEPSAKE"
-
-        plan_names = {
-            'standard': 'Standard Plan',
-            'premium': 'Premium Plan',
-            'enterprise': 'Enterprise Plan'
-        }
-        plan_display = plan_names.get(contact_data.get('plan_interest'), 'KEEPSAKE')
-
-        content = f"""
+_FACILITY_CONTACT_CONFIRMATION = """
 <div style="text-align: center; margin-bottom: 30px;">
-    <div style="display: inline-block; width: 60px; height: 60px; background-color: {EmailTemplates.SUCCESS_COLOR}; border-radius: 50%; text-align: center; line-height: 60px;">
+    <div style="display: inline-block; width: 60px; height: 60px; background-color: {{SUCCESS_COLOR}}; border-radius: 50%; text-align: center; line-height: 60px;">
         <span style="color: #ffffff; font-size: 32px;">✓</span>
     </div>
 </div>
 
-<h2 style="margin: 0 0 20px 0; color: {EmailTemplates.SUCCESS_COLOR}; font-size: 24px; font-weight: 600; text-align: center;">
+<h2 style="margin: 0 0 20px 0; color: {{SUCCESS_COLOR}}; font-size: 24px; font-weight: 600; text-align: center;">
     Thank You for Your Interest!
 </h2>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    Dear {contact_data['contact_person']},
+    Dear {{contact_person}},
 </p>
 
 <p style="margin: 0 0 16px 0; line-height: 1.6; font-size: 15px;">
-    Thank you for your interest in KEEPSAKE Healthcare Management System. We've received your inquiry about the <strong>{plan_display}</strong> and our sales team will be in touch with you shortly.
+    Thank you for your interest in KEEPSAKE Healthcare Management System. We've received your inquiry about the <strong>{{plan_display}}</strong> and our sales team will be in touch with you shortly.
 </p>
 
-<div style="margin: 30px 0; padding: 25px; background-color: {EmailTemplates.LIGHT_BG}; border-radius: 8px;">
-    <h3 style="margin: 0 0 15px 0; color: {EmailTemplates.TEXT_COLOR}; font-size: 18px; font-weight: 600; text-align: center;">
+<div style="margin: 30px 0; padding: 25px; background-color: {{LIGHT_BG}}; border-radius: 8px;">
+    <h3 style="margin: 0 0 15px 0; color: {{TEXT_COLOR}}; font-size: 18px; font-weight: 600; text-align: center;">
         What Happens Next?
     </h3>
 
     <div style="margin: 20px 0;">
         <div style="display: flex; align-items: start; margin-bottom: 15px;">
-            <div style="background-color: {EmailTemplates.PRIMARY_COLOR}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
+            <div style="background-color: {{PRIMARY_COLOR}}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
                 1
             </div>
             <div style="flex: 1;">
-                <p style="margin: 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 600;">
+                <p style="margin: 0; font-size: 14px; color: {{TEXT_COLOR}}; font-weight: 600;">
                     Review & Contact
                 </p>
                 <p style="margin: 5px 0 0 0; font-size: 13px; color: #6b7280; line-height: 1.5;">
@@ -827,11 +722,11 @@ class EmailTemplates:
         </div>
 
         <div style="display: flex; align-items: start; margin-bottom: 15px;">
-            <div style="background-color: {EmailTemplates.PRIMARY_COLOR}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
+            <div style="background-color: {{PRIMARY_COLOR}}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
                 2
             </div>
             <div style="flex: 1;">
-                <p style="margin: 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 600;">
+                <p style="margin: 0; font-size: 14px; color: {{TEXT_COLOR}}; font-weight: 600;">
                     Personalized Demo
                 </p>
                 <p style="margin: 5px 0 0 0; font-size: 13px; color: #6b7280; line-height: 1.5;">
@@ -841,11 +736,11 @@ class EmailTemplates:
         </div>
 
         <div style="display: flex; align-items: start;">
-            <div style="background-color: {EmailTemplates.PRIMARY_COLOR}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
+            <div style="background-color: {{PRIMARY_COLOR}}; color: white; width: 30px; height: 30px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; font-weight: 600; margin-right: 15px; flex-shrink: 0;">
                 3
             </div>
             <div style="flex: 1;">
-                <p style="margin: 0; font-size: 14px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 600;">
+                <p style="margin: 0; font-size: 14px; color: {{TEXT_COLOR}}; font-weight: 600;">
                     Custom Proposal
                 </p>
                 <p style="margin: 5px 0 0 0; font-size: 13px; color: #6b7280; line-height: 1.5;">
@@ -857,7 +752,7 @@ class EmailTemplates:
 </div>
 
 <div style="margin: 30px 0; padding: 20px; background-color: #dbeafe; border-radius: 8px;">
-    <h3 style="margin: 0 0 12px 0; color: {EmailTemplates.PRIMARY_COLOR}; font-size: 16px; font-weight: 600;">
+    <h3 style="margin: 0 0 12px 0; color: {{PRIMARY_COLOR}}; font-size: 16px; font-weight: 600;">
         Your Inquiry Details
     </h3>
     <table style="width: 100%; border-collapse: collapse;">
@@ -865,38 +760,38 @@ class EmailTemplates:
             <td style="padding: 6px 0; font-size: 13px; color: #6b7280;">
                 Facility:
             </td>
-            <td style="padding: 6px 0; font-size: 13px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 500;">
-                {contact_data['facility_name']}
+            <td style="padding: 6px 0; font-size: 13px; color: {{TEXT_COLOR}}; font-weight: 500;">
+                {{facility_name}}
             </td>
         </tr>
         <tr>
             <td style="padding: 6px 0; font-size: 13px; color: #6b7280;">
                 Email:
             </td>
-            <td style="padding: 6px 0; font-size: 13px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 500;">
-                {contact_data['email']}
+            <td style="padding: 6px 0; font-size: 13px; color: {{TEXT_COLOR}}; font-weight: 500;">
+                {{email}}
             </td>
         </tr>
         <tr>
             <td style="padding: 6px 0; font-size: 13px; color: #6b7280;">
                 Phone:
             </td>
-            <td style="padding: 6px 0; font-size: 13px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 500;">
-                {contact_data['phone']}
+            <td style="padding: 6px 0; font-size: 13px; color: {{TEXT_COLOR}}; font-weight: 500;">
+                {{phone}}
             </td>
         </tr>
         <tr>
             <td style="padding: 6px 0; font-size: 13px; color: #6b7280;">
                 Plan Interest:
             </td>
-            <td style="padding: 6px 0; font-size: 13px; color: {EmailTemplates.TEXT_COLOR}; font-weight: 500;">
-                {plan_display}
+            <td style="padding: 6px 0; font-size: 13px; color: {{TEXT_COLOR}}; font-weight: 500;">
+                {{plan_display}}
             </td>
         </tr>
     </table>
 </div>
 
-<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {EmailTemplates.WARNING_COLOR}; border-radius: 4px;">
+<div style="margin: 30px 0; padding: 16px; background-color: #fef3c7; border-left: 4px solid {{WARNING_COLOR}}; border-radius: 4px;">
     <p style="margin: 0 0 8px 0; font-size: 14px; color: #92400e; line-height: 1.5;">
         <strong>Questions in the meantime?</strong>
     </p>
@@ -908,11 +803,330 @@ class EmailTemplates:
 <p style="margin: 30px 0 0 0; line-height: 1.6; font-size: 14px; color: #6b7280;">
     We're excited to help transform your facility's healthcare management!<br><br>
     Best regards,<br>
-    <strong style="color: {EmailTemplates.PRIMARY_COLOR};">KEEPSAKE Healthcare Sales Team</strong>
+    <strong style="color: {{PRIMARY_COLOR}};">KEEPSAKE Healthcare Sales Team</strong>
 </p>
 """
 
-        return EmailTemplates._base_template(content, preheader_text)
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+# name -> content source, compile-time constants, whether it goes in the base layout
+_TEMPLATES = {
+    'base_layout': {'source': '{{content}}'},
+    'button': {'source': _BUTTON, 'layout': False},
+    'password_reset_request': {
+        'source': _PASSWORD_RESET_REQUEST,
+        'constants': {
+            'preheader_text': "Reset your KEEPSAKE password - Link expires in 30 minutes",
+            'button_text': "Reset My Password",
+            'button_color': '{{PRIMARY_COLOR}}'
+        }
+    },
+    'password_reset_success': {
+        'source': _PASSWORD_RESET_SUCCESS,
+        'constants': {'preheader_text': "Your KEEPSAKE password has been successfully reset"}
+    },
+    'password_reset_blocked': {
+        'source': _PASSWORD_RESET_BLOCKED,
+        'constants': {'preheader_text': "Your account has been temporarily limited due to multiple password reset attempts"}
+    },
+    'twofa_setup_code': {'source': _TWOFA_SETUP_CODE},
+    'twofa_login_ip_info': {'source': _TWOFA_LOGIN_IP_INFO, 'layout': False},
+    'twofa_login_code': {'source': _TWOFA_LOGIN_CODE},
+    'twofa_enabled': {
+        'source': _TWOFA_ENABLED,
+        'constants': {'preheader_text': "Two-Factor Authentication enabled successfully"}
+    },
+    'twofa_disabled': {
+        'source': _TWOFA_DISABLED,
+        'constants': {'preheader_text': "Two-Factor Authentication disabled"}
+    },
+    'contact_message': {'source': _CONTACT_MESSAGE, 'layout': False},
+    'facility_contact_notification': {'source': _FACILITY_CONTACT_NOTIFICATION},
+    'facility_contact_confirmation': {
+        'source': _FACILITY_CONTACT_CONFIRMATION,
+        'constants': {'preheader_text': "Thank you for your interest in KEEPSAKE"}
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def compile_template(name: str, year: int) -> CompiledTemplate:
+    """Compile a registered template for the given copyright year."""
+    spec = _TEMPLATES[name]
+    partials = {'button': _BUTTON}
+    if spec.get('layout', True):
+        source = _BASE_LAYOUT
+        partials = {'content': spec['source'], **partials}
+    else:
+        source = spec['source']
+
+    # Template constants may refer to brand colors, so they are filled in first
+    constants = {'year': str(year)}
+    for slot, value in spec.get('constants', {}).items():
+        constants[slot] = _SLOT_RE.sub(lambda m: EmailTemplates.BRAND.get(m.group(1), m.group(0)), value)
+    constants.update(EmailTemplates.BRAND)
+    return CompiledTemplate(source, constants, partials)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_cached(name: str, year: int, values: tuple) -> RenderedEmail:
+    return compile_template(name, year).render(**dict(values))
+
+
+def render_email(name: str, **values) -> RenderedEmail:
+    """Render a registered template; identical calls are served from the cache."""
+    values = {slot: value if isinstance(value, str) else str(value) for slot, value in values.items()}
+    return _render_cached(name, datetime.now().year, tuple(sorted(values.items())))
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+class EmailTemplates:
+    """Rich HTML email templates with KEEPSAKE branding
+
+    Every template returns a RenderedEmail: the HTML string, with the
+    plain-text alternative in its ``text`` attribute.
+    """
+
+    # KEEPSAKE brand colors (from client/src/index.css)
+    PRIMARY_COLOR = "#5770c4"  # KEEPSAKE primary blue-purple (oklch(0.5649 0.1079 225.9002))
+    SECONDARY_COLOR = "#c4dee3"  # KEEPSAKE secondary light blue
+    SUCCESS_COLOR = "#10b981"  # Green
+    WARNING_COLOR = "#f59e0b"  # Orange
+    DANGER_COLOR = "#ef4444"  # Red
+    TEXT_COLOR = "#3f3f3f"  # KEEPSAKE black
+    LIGHT_BG = "#fffafa"  # KEEPSAKE white background
+
+    BRAND = {
+        'PRIMARY_COLOR': PRIMARY_COLOR,
+        'SECONDARY_COLOR': SECONDARY_COLOR,
+        'SUCCESS_COLOR': SUCCESS_COLOR,
+        'WARNING_COLOR': WARNING_COLOR,
+        'DANGER_COLOR': DANGER_COLOR,
+        'TEXT_COLOR': TEXT_COLOR,
+        'LIGHT_BG': LIGHT_BG,
+    }
+
+    @staticmethod
+    def _base_template(content, preheader_text=""):
+        """
+        Base email template with KEEPSAKE branding
+
+        Args:
+            content (str): Main email content HTML
+            preheader_text (str): Preview text shown in email clients
+
+        Returns:
+            str: Complete HTML email
+        """
+        return render_email('base_layout', content=content, preheader_text=preheader_text)
+
+    @staticmethod
+    def _button(text, url, color=None):
+        """
+        Create a styled button for emails
+
+        Args:
+            text (str): Button text
+            url (str): Button URL
+            color (str, optional): Button color (defaults to PRIMARY_COLOR)
+
+        Returns:
+            str: Button HTML
+        """
+        return render_email('button', button_text=text, button_url=url, button_color=color or EmailTemplates.PRIMARY_COLOR)
+
+    @staticmethod
+    def password_reset_request(reset_url, recipient_email, user_name=None):
+        """
+        Password reset request email with reset link
+
+        Args:
+            reset_url (str): Password reset URL with token
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+
+        Returns:
+            str: Complete HTML email
+        """
+        return render_email(
+            'password_reset_request',
+            greeting=f"Hello {user_name}" if user_name else "Hello",
+            recipient_email=recipient_email,
+            reset_url=reset_url,
+            button_url=reset_url
+        )
+
+    @staticmethod
+    def password_reset_success(recipient_email, user_name=None):
+        """
+        Password reset success confirmation email
+
+        Args:
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+
+        Returns:
+            str: Complete HTML email
+        """
+        return render_email(
+            'password_reset_success',
+            greeting=f"Hello {user_name}" if user_name else "Hello",
+            recipient_email=recipient_email,
+            reset_time=datetime.now().strftime("%B %d, %Y at %I:%M %p UTC")
+        )
+
+    @staticmethod
+    def password_reset_blocked(recipient_email):
+        """
+        Rate limit notification email
+
+        Args:
+            recipient_email (str): Recipient email address
+
+        Returns:
+            str: Complete HTML email
+        """
+        return render_email('password_reset_blocked', recipient_email=recipient_email)
+
+    @staticmethod
+    def twofa_setup_code(code, recipient_email, user_name=None):
+        """
+        Email template for 2FA setup verification code
+
+        Args:
+            code (str): 6-digit verification code
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+
+        Returns:
+            str: HTML email template
+        """
+        return render_email(
+            'twofa_setup_code',
+            preheader_text=f"Your KEEPSAKE 2FA verification code is {code}",
+            greeting=f"Hello {user_name}," if user_name else "Hello,",
+            recipient_email=recipient_email,
+            code=code
+        )
+
+    @staticmethod
+    def twofa_login_code(code, recipient_email, user_name=None, ip_address=None):
+        """
+        Email template for 2FA login verification code
+
+        Args:
+            code (str): 6-digit verification code
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+            ip_address (str, optional): Login IP address
+
+        Returns:
+            str: HTML email template
+        """
+        return render_email(
+            'twofa_login_code',
+            preheader_text=f"Your KEEPSAKE login verification code is {code}",
+            greeting=f"Hello {user_name}," if user_name else "Hello,",
+            recipient_email=recipient_email,
+            code=code,
+            ip_info=render_email('twofa_login_ip_info', ip_address=ip_address) if ip_address else ""
+        )
+
+    @staticmethod
+    def twofa_enabled(recipient_email, user_name=None):
+        """
+        Email template confirming 2FA has been enabled
+
+        Args:
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+
+        Returns:
+            str: HTML email template
+        """
+        return render_email(
+            'twofa_enabled',
+            greeting=f"Hello {user_name}," if user_name else "Hello,",
+            recipient_email=recipient_email
+        )
+
+    @staticmethod
+    def twofa_disabled(recipient_email, user_name=None):
+        """
+        Email template confirming 2FA has been disabled
+
+        Args:
+            recipient_email (str): Recipient email address
+            user_name (str, optional): User's name for personalization
+
+        Returns:
+            str: HTML email template
+        """
+        return render_email(
+            'twofa_disabled',
+            greeting=f"Hello {user_name}," if user_name else "Hello,",
+            recipient_email=recipient_email
+        )
+
+    @staticmethod
+    def facility_contact_notification(contact_data):
+        """
+        Email template for notifying admin team about new facility contact request
+
+        Args:
+            contact_data (dict): Contact request data
+
+        Returns:
+            str: HTML email template
+        """
+        plan_names = {
+            'standard': 'Standard (₱5,544/month)',
+            'premium': 'Premium (₱11,144/month)',
+            'enterprise': 'Enterprise (₱22,344/month)'
+        }
+
+        return render_email(
+            'facility_contact_notification',
+            preheader_text=f"New facility inquiry from {contact_data['facility_name']}",
+            facility_name=contact_data['facility_name'],
+            contact_person=contact_data['contact_person'],
+            email=contact_data['email'],
+            phone=contact_data['phone'],
+            plan_display=plan_names.get(contact_data.get('plan_interest'), 'Not specified'),
+            message_html=render_email('contact_message', message=contact_data['message']) if contact_data.get('message') else ""
+        )
+
+    @staticmethod
+    def facility_contact_confirmation(contact_data):
+        """
+        Email template for confirming receipt of facility contact request
+
+        Args:
+            contact_data (dict): Contact request data
+
+        Returns:
+            str: HTML email template
+        """
+        plan_names = {
+            'standard': 'Standard Plan',
+            'premium': 'Premium Plan',
+            'enterprise': 'Enterprise Plan'
+        }
+
+        return render_email(
+            'facility_contact_confirmation',
+            contact_person=contact_data['contact_person'],
+            facility_name=contact_data['facility_name'],
+            email=contact_data['email'],
+            phone=contact_data['phone'],
+            plan_display=plan_names.get(contact_data.get('plan_interest'), 'KEEPSAKE')
+        )
 
 
 # Plain text versions for email clients that don't support HTML
@@ -0,0 +1,267 @@
+"""
+WHO Child Growth Standards (0-5 years) z-score and percentile engine.
+
+The WHO tables in ``data/who`` are parsed once into NumPy arrays of L, M, S
+parameters per month (or per cm for weight-for-height). Tables that only
+publish SD curves get their L and S fitted from those curves at load time, so
+every indicator is scored with the same LMS formula:
+
+    z = ((value / M) ** L - 1) / (L * S)
+
+Values between table rows are linearly interpolated, and z-scores beyond +/-3
+use the WHO restricted tail adjustment based on the SD2/SD3 distance.
+
+The batch functions take arrays and score a whole facility in one pass; the
+scalar helpers are thin wrappers around them.
+"""
+
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WHO_DATA_DIR = os.environ.get(
+    'WHO_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'who')
+)
+
+# Average days per month used by WHO to convert ages
+DAYS_PER_MONTH = 30.4375
+
+# Indicator -> table file pattern ({sex} is 'boys' or 'girls')
+INDICATOR_FILES = {
+    'weight_for_age': 'wfa-{sex}-z-0-5.txt',
+    'length_for_age': 'lhfa-{sex}-0-5.txt',
+    'head_circumference_for_age': 'hcfa-{sex}-0-5.txt',
+    'bmi_for_age': 'bfa-{sex}-0-5.txt',
+    'weight_for_height': 'wfh-{sex}-0-5.txt',
+}
+
+# Measurement names used by the report routes
+MEASUREMENT_ALIASES = {
+    'weight': 'weight_for_age',
+    'height': 'length_for_age',
+    'length': 'length_for_age',
+    'head_circumference': 'head_circumference_for_age',
+    'bmi': 'bmi_for_age',
+}
+
+_SEX_CODES = {
+    'm': 0, 'male': 0, 'boy': 0, 'boys': 0,
+    'f': 1, 'female': 1, 'girl': 1, 'girls': 1,
+}
+
+# z positions of the SD columns in every WHO table
+_SD_Z = np.array([-3.0, -2.0, -1.0, 0.0, 1.0, 2.0, 3.0])
+# Candidate Box-Cox powers searched when a table has no L/M/S columns
+_L_GRID = np.linspace(-3.0, 3.0, 601)
+
+
+class LMSTable:
+    """Array-backed LMS lookup for one indicator and sex."""
+
+    __slots__ = ('x', 'L', 'M', 'S', 'sd2neg', 'sd3neg', 'sd2', 'sd3')
+
+    def __init__(self, x, L, M, S, sd2neg, sd3neg, sd2, sd3):
+        self.x = x
+        self.L = L
+        self.M = M
+        self.S = S
+        self.sd2neg = sd2neg
+        self.sd3neg = sd3neg
+        self.sd2 = sd2
+        self.sd3 = sd3
+
+    def interpolate(self, x: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Interpolate every column at *x*; points outside the table give NaN."""
+        out_of_range = (x < self.x[0]) | (x > self.x[-1]) | np.isnan(x)
+        columns = []
+        for column in (self.L, self.M, self.S, self.sd2neg, self.sd3neg, self.sd2, self.sd3):
+            values = np.interp(x, self.x, column)
+            values[out_of_range] = np.nan
+            columns.append(values)
+        return tuple(columns)
+
+
+def _fit_lms(sd_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit L and S per row from the seven SD curves (-3..+3) of a table.
+
+    For each candidate L, every non-median SD curve implies an S value; the L
+    whose implied S values agree best is kept and S is their mean.
+    """
+    median = sd_values[:, 3:4]
+    z = np.delete(_SD_Z, 3)
+    ratios = np.delete(sd_values, 3, axis=1) / median          # (rows, 6)
+
+    L = _L_GRID[:, None, None]                                  # (grid, 1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        implied_s = np.where(
+            np.abs(L) < 1e-6,
+            np.log(ratios)[None, :, :] / z,
+            (ratios[None, :, :] ** L - 1) / (L * z)
+        )                                                       # (grid, rows, 6)
+
+    best = np.nanargmin(np.nanvar(implied_s, axis=2), axis=0)   # (rows,)
+    rows = np.arange(sd_values.shape[0])
+    return _L_GRID[best], np.nanmean(implied_s[best, rows, :], axis=1)
+
+
+def _parse_table(path: str) -> LMSTable:
+    """Parse one WHO tab-separated table into an :class:`LMSTable`."""
+    raw = np.loadtxt(path, delimiter='\t', skiprows=1, ndmin=2)
+
+    x = raw[:, 0]
+    if raw.shape[1] >= 11:
+        # Month, L, M, S, -3SD .. 3SD
+        L, M, S = raw[:, 1], raw[:, 2], raw[:, 3]
+        sd_values = raw[:, 4:11]
+    else:
+        # Month/cm, -3SD .. 3SD
+        sd_values = raw[:, 1:8]
+        M = sd_values[:, 3]
+        L, S = _fit_lms(sd_values)
+
+    return LMSTable(
+        x=x, L=L, M=M, S=S,
+        sd2neg=sd_values[:, 1], sd3neg=sd_values[:, 0],
+        sd2=sd_values[:, 5], sd3=sd_values[:, 6]
+    )
+
+
+class GrowthStandards:
+    """All WHO indicators for both sexes, indexed as ``tables[indicator][sex]``."""
+
+    def __init__(self, data_dir: str = WHO_DATA_DIR):
+        self.tables: Dict[str, Tuple[LMSTable, LMSTable]] = {}
+        for indicator, pattern in INDICATOR_FILES.items():
+            self.tables[indicator] = (
+                _parse_table(os.path.join(data_dir, pattern.format(sex='boys'))),
+                _parse_table(os.path.join(data_dir, pattern.format(sex='girls'))),
+            )
+
+    def zscores(self, indicator: str, sexes: np.ndarray, x: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Vectorized z-scores; rows that cannot be scored are NaN.
+
+        Args:
+            indicator: Key of :data:`INDICATOR_FILES`.
+            sexes: Integer array, 0 for boys, 1 for girls, -1 for unknown.
+            x: Age in months (or length/height in cm for weight_for_height).
+            values: Measured values in the table's unit.
+        """
+        boys, girls = self.tables[indicator]
+        result = np.full(values.shape, np.nan)
+
+        for code, table in ((0, boys), (1, girls)):
+            mask = (sexes == code) & ~np.isnan(values) & (values > 0)
+            if not mask.any():
+                continue
+
+            y = values[mask]
+            L, M, S, sd2neg, sd3neg, sd2, sd3 = table.interpolate(x[mask])
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where(
+                    np.abs(L) < 1e-6,
+                    np.log(y / M) / S,
+                    ((y / M) ** L - 1) / (L * S)
+                )
+                # WHO restricted application of the LMS method beyond +/-3 SD
+                z = np.where(z > 3, 3 + (y - sd3) / (sd3 - sd2), z)
+                z = np.where(z < -3, -3 + (y - sd3neg) / (sd2neg - sd3neg), z)
+
+            result[mask] = z
+
+        return result
+
+
+_standards: Optional[GrowthStandards] = None
+_standards_lock = threading.Lock()
+
+
+def load_growth_standards() -> GrowthStandards:
+    """Return the process-wide growth standards, loading the tables on first use."""
+    global _standards
+    if _standards is None:
+        with _standards_lock:
+            if _standards is None:
+                _standards = GrowthStandards()
+                logger.info(f"Loaded WHO growth standards from {WHO_DATA_DIR}")
+    return _standards
+
+
+def _normal_cdf(z: np.ndarray) -> np.ndarray:
+    """Standard normal CDF (Abramowitz & Stegun 7.1.26, |error| < 1.5e-7)."""
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def sex_codes(sexes: Sequence[Optional[str]]) -> np.ndarray:
+    """Map patient sex strings ('male', 'F', ...) to 0/1, or -1 if unknown."""
+    return np.array([_SEX_CODES.get(str(s).strip().lower(), -1) if s else -1 for s in sexes], dtype=np.int8)
+
+
+def age_in_months(dob, on_date=None) -> Optional[float]:
+    """Fractional age in months between *dob* and *on_date* (default today)."""
+    try:
+        if isinstance(dob, str):
+            dob = datetime.strptime(dob[:10], '%Y-%m-%d').date()
+        if on_date is None:
+            on_date = date.today()
+        elif isinstance(on_date, str):
+            on_date = datetime.strptime(on_date[:10], '%Y-%m-%d').date()
+        return (on_date - dob).days / DAYS_PER_MONTH
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def batch_zscores(measurement_type: str, sexes, x, values) -> np.ndarray:
+    """Score many children at once.
+
+    Args:
+        measurement_type: Indicator name or alias ('height', 'weight', 'bmi',
+            'head_circumference', 'weight_for_height', ...).
+        sexes: Sequence of sex strings or an array from :func:`sex_codes`.
+        x: Ages in months (length/height in cm for weight_for_height).
+        values: Measured values; None entries are skipped.
+
+    Returns:
+        numpy.ndarray of z-scores with NaN where no score is available.
+    """
+    indicator = MEASUREMENT_ALIASES.get(measurement_type, measurement_type)
+    if indicator not in INDICATOR_FILES:
+        raise ValueError(f"Unknown growth indicator: {measurement_type}")
+
+    codes = sexes if isinstance(sexes, np.ndarray) else sex_codes(sexes)
+    return load_growth_standards().zscores(indicator, codes, _as_float_array(x), _as_float_array(values))
+
+
+def batch_percentiles(measurement_type: str, sexes, x, values) -> np.ndarray:
+    """Same as :func:`batch_zscores` but returns percentiles (0-100)."""
+    return _normal_cdf(batch_zscores(measurement_type, sexes, x, values)) * 100
+
+
+def to_optional(values: np.ndarray, digits: int = 1) -> list:
+    """Convert a result array to rounded floats with None for NaN (JSON friendly)."""
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def calculate_zscore(age_months, sex, measurement_type, value) -> Optional[float]:
+    """z-score for a single measurement, or None if it cannot be scored."""
+    return to_optional(batch_zscores(measurement_type, [sex], [age_months], [value]), 2)[0]
+
+
+def calculate_percentile(age_months, sex, measurement_type, value) -> Optional[float]:
+    """Percentile (0-100) for a single measurement, or None if it cannot be scored."""
+    return to_optional(batch_percentiles(measurement_type, [sex], [age_months], [value]))[0]
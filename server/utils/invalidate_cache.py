@@ -1,52 +1,206 @@
-from flask import current_app
-from utils.redis_client import get_redis_client
+"""
+Tag-indexed Redis cache helpers.
 
-redis_client = get_redis_client()
+Every cached entry is registered under a set of entity tags (facility,
+patient, doctor, user, appointment, ...) plus a tag for its cache type. A tag
+is a Redis sorted set holding the keys that depend on that entity, scored by
+when each entry expires, so invalidation reads the affected tag sets and
+deletes exactly those keys - it never scans the keyspace with KEYS/SCAN.
 
-# Cache keys and prefixes for different types
+Members whose entry has expired are pruned whenever their tag is written or
+invalidated, and a tag set expires with the last entry it indexes, so hot
+tags do not accumulate dead keys.
+
+    cache_set(key, data, cache_type='appointments', facility=facility_id,
+              appointment=[a['appointment_id'] for a in data])
+    ...
+    invalidate_caches('appointments', appointment_id)       # lists holding it
+    invalidate_caches('patient', facility=facility_id)      # facility lists
+"""
+
+import json
+import logging
+import time
+from typing import Any, Iterable, Optional
+
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 300  # 5 minutes
+TAG_PREFIX = 'cache_tags:'
+
+# KEYS: tag sets. ARGV: cache key, now, entry expiry (unix seconds), ttl.
+# Drops expired members, indexes the key, and extends the tag's own expiry
+# only when this entry outlives it.
+_TAG_SCRIPT = """
+for _, tag in ipairs(KEYS) do
+    redis.call('zremrangebyscore', tag, '-inf', ARGV[2])
+    redis.call('zadd', tag, ARGV[3], ARGV[1])
+    if redis.call('ttl', tag) < tonumber(ARGV[4]) then
+        redis.call('expire', tag, ARGV[4])
+    end
+end
+return 1
+"""
+
+# Cache types: the global list key and the entity kind their resource ids refer to
 CACHE_KEYS = {
     'patient': {
         'all': "patient_records:all",
-        'prefix': "patient_records:"
+        'prefix': "patient_records:",
+        'kind': 'patient'
     },
     'facility': {
         'all': "healthcare_facilities:all",
-        'prefix': "healthcare_facilities:"
+        'prefix': "healthcare_facilities:",
+        'kind': 'facility'
     },
     'facility_users': {
         'all': "facility_users:all",
-        'prefix': "facility_users:"
+        'prefix': "facility_users:",
+        'kind': 'facility'
     },
     'facility_patients': {
         'all': "facility_patients:all",
-        'prefix': "facility_patients:"
+        'prefix': "facility_patients:",
+        'kind': 'facility'
     },
     'users': {
         'all': "users:all",
-        'prefix': "users:"
+        'prefix': "users:",
+        'kind': 'user'
     },
     'patient_prescription': {
         'all': "patient_prescription:all",
-        'prefix': "patient_prescription:"
+        'prefix': "patient_prescription:",
+        'kind': 'patient'
     },
     'prescription_med': {
         'all': "prescription_med:all",
-        'prefix': "prescription_med:"
+        'prefix': "prescription_med:",
+        'kind': 'prescription'
     },
     'appointments': {
-        'all': 'appointments_all',
-        'prefix': 'appointments:'
+        'all': 'appointments:all',
+        'prefix': 'appointments:',
+        'kind': 'appointment'
+    },
+    # Windows of the unscoped /appointments list, which any new appointment can enter
+    'appointments_all': {
+        'all': 'appointments:all',
+        'prefix': 'appointments:all:',
+        'kind': 'appointment'
+    },
+    'subscription': {
+        'all': 'subscription:metrics',
+        'prefix': 'subscription:',
+        'kind': 'facility'
     }
-
 }
 
-def invalidate_caches(cache_type, resource_id=None):
+
+def _values(value) -> Iterable[Any]:
+    """Normalize a tag value (single id or iterable of ids) to a list without Nones."""
+    if value is None:
+        return []
+    if isinstance(value, (str, int)):
+        return [value]
+    return [v for v in value if v is not None]
+
+
+def _tag_keys(cache_type: Optional[str] = None, **tags) -> list:
+    keys = [f"{TAG_PREFIX}{kind}:{v}" for kind, value in tags.items() for v in _values(value)]
+    if cache_type:
+        keys.append(f"{TAG_PREFIX}type:{cache_type}")
+    return keys
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the decoded cached value for *key*, or None on miss or error."""
+    if redis_client is None:
+        return None
+    try:
+        cached = redis_client.get(key)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.error(f"Cache read failed for {key}: {str(e)}")
+        return None
+
+
+def cache_set(key: str, data: Any, ttl: int = DEFAULT_CACHE_TTL,
+              cache_type: Optional[str] = None, **tags) -> bool:
+    """Cache *data* under *key* and register it under its tags.
+
+    Args:
+        key: Redis key for the entry.
+        data: JSON-serializable value.
+        ttl: Expiry in seconds.
+        cache_type: Key of :data:`CACHE_KEYS`, so the whole type can be
+            invalidated at once.
+        **tags: Entity tags, e.g. ``facility=facility_id`` or
+            ``patient=[...ids]`` for lists holding many records.
+    """
+    if redis_client is None:
+        return False
+    try:
+        tag_keys = _tag_keys(cache_type, **tags)
+        now = int(time.time())
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.setex(key, ttl, json.dumps(data))
+        if tag_keys:
+            pipe.eval(_TAG_SCRIPT, len(tag_keys), *tag_keys, key, now, now + ttl, ttl)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Cache write failed for {key}: {str(e)}")
+        return False
+
+
+def invalidate_tags(cache_type: Optional[str] = None, **tags) -> int:
+    """Delete every cached entry registered under the given tags.
+
+    Only the tagged keys are touched: one pipelined read of the live members
+    per tag, then one DEL plus ZREM of exactly the members that were read (so
+    entries tagged concurrently stay indexed) and a prune of expired ones.
+
+    Returns:
+        int: Number of cache keys deleted.
+    """
+    tag_keys = _tag_keys(cache_type, **tags)
+    if redis_client is None or not tag_keys:
+        return 0
+
+    now = int(time.time())
+    pipe = redis_client.pipeline(transaction=False)
+    for tag_key in tag_keys:
+        pipe.zremrangebyscore(tag_key, '-inf', now)
+        pipe.zrange(tag_key, 0, -1)
+    members = pipe.execute()[1::2]
+
+    keys = set().union(*members)
+    if not keys:
+        return 0
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.delete(*keys)
+    for tag_key, tag_members in zip(tag_keys, members):
+        if tag_members:
+            pipe.zrem(tag_key, *tag_members)
+    deleted = pipe.execute()[0]
+    return deleted
+
+
+def invalidate_caches(cache_type, resource_id=None, **scopes):
     """
     Smart cache invalidation for different types of resources.
 
     Args:
-        cache_type (str): Type of cache to invalidate ('patient', 'facility', or 'facility_users')
-        resource_id (str, optional): Specific resource ID to invalidate. If None, invalidates all caches of this type.
+        cache_type (str): Type of cache to invalidate (a key of CACHE_KEYS)
+        resource_id (str, optional): Specific resource ID to invalidate; it is
+            treated as the cache type's entity kind (patient, facility, ...).
+        **scopes: Extra entity tags to invalidate, e.g. ``facility=facility_id``.
+            With neither *resource_id* nor scopes, every entry of the type is invalidated.
     """
     try:
         if cache_type not in CACHE_KEYS:
@@ -55,26 +209,19 @@ def invalidate_caches(cache_type, resource_id=None):
         cache_config = CACHE_KEYS[cache_type]
 
         # Always clear the main list cache
-        redis_client.delete(cache_config['all'])
+        if redis_client is not None:
+            redis_client.delete(cache_config['all'])
 
-        if resource_id:
-            # Clear specific resource cache
-            resource_key = f"{cache_config['prefix']}{resource_id}"
-            redis_client.delete(resource_key)
+        if resource_id is not None:
+            kind = cache_config['kind']
+            scopes[kind] = list(_values(scopes.get(kind))) + [resource_id]
 
-            # Clear any related pattern-based caches
-            pattern_keys = redis_client.keys(f"{cache_config['prefix']}{resource_id}:*")
-            if pattern_keys:
-                redis_client.delete(*pattern_keys)
+        if scopes:
+            deleted = invalidate_tags(**scopes)
         else:
-            # Clear ALL caches with this prefix (e.g., appointments:doctor:*, appointments:patient:*, etc.)
-            # This ensures that doctor-specific, patient-specific, and facility-specific caches are all cleared
-            pattern_keys = redis_client.keys(f"{cache_config['prefix']}*")
-            if pattern_keys:
-                redis_client.delete(*pattern_keys)
-                current_app.logger.info(f"Cleared {len(pattern_keys)} pattern-based caches for {cache_type}")
+            deleted = invalidate_tags(cache_type=cache_type)
 
-        current_app.logger.info(f"Cache invalidated for {cache_type}: {resource_id or 'all'}")
+        logger.info(f"Cache invalidated for {cache_type}: {scopes or 'all'} ({deleted} keys)")
 
     except Exception as e:
-        current_app.logger.error(f"Cache invalidation failed: {str(e)}")
\ No newline at end of file
+        logger.error(f"Cache invalidation failed: {str(e)}")
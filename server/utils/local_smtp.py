@@ -0,0 +1,156 @@
+"""
+Local SMTP stand-in for development and tests.
+
+Accepts every message (and any AUTH credentials) and keeps it in memory
+instead of delivering it, so the email outbox can be exercised without a
+Gmail account:
+
+    python -m utils.local_smtp --port 1025
+
+    SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_USE_TLS=false
+    SMTP_EMAIL=dev@keepsake.local SMTP_PASSWORD=dev
+
+or in-process:
+
+    server = LocalSMTPServer(port=0).start()
+    ...
+    server.messages   # list of email.message.Message
+    server.stop()
+
+STARTTLS is not offered, so SMTP_USE_TLS must be false. Set ``reject`` to a
+set of addresses to simulate refused recipients.
+"""
+
+import argparse
+import logging
+import socketserver
+import threading
+from email import message_from_bytes
+from typing import List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP session: EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server.owner
+        sender, recipients = None, []
+        self._reply("220 localhost KEEPSAKE local SMTP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode(errors='replace').strip().partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self._reply("250-localhost")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 8BITMIME")
+            elif command == 'HELO':
+                self._reply("250 localhost")
+            elif command == 'AUTH':
+                mechanism = argument.split(' ')[0].upper()
+                if mechanism == 'LOGIN':
+                    # Username and password prompts; any answer is accepted
+                    for prompt in ("334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"):
+                        self._reply(prompt)
+                        self.rfile.readline()
+                elif mechanism == 'PLAIN' and ' ' not in argument:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif command == 'MAIL':
+                sender, recipients = argument.partition(':')[2].strip().strip('<>'), []
+                self._reply("250 OK")
+            elif command == 'RCPT':
+                recipient = argument.partition(':')[2].strip().strip('<>')
+                if recipient in server.reject:
+                    self._reply("550 Mailbox unavailable")
+                else:
+                    recipients.append(recipient)
+                    self._reply("250 OK")
+            elif command == 'DATA':
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                message = message_from_bytes(b"".join(data))
+                with server.lock:
+                    server.messages.append(message)
+                    server.envelopes.append((sender, list(recipients)))
+                logger.info(f"Local SMTP accepted '{message['Subject']}' for {', '.join(recipients)}")
+                self._reply("250 OK: queued")
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif command == 'NOOP':
+                self._reply("250 OK")
+            elif command == 'QUIT':
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    """In-memory SMTP server on a background thread.
+
+    Args:
+        host: Interface to listen on.
+        port: Port to listen on (0 picks a free one, see ``port`` after start()).
+        reject: Recipient addresses to refuse with 550.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 1025, reject: Optional[Set[str]] = None):
+        self.host = host
+        self.port = port
+        self.reject = set(reject or ())
+        self.messages: List = []
+        self.envelopes: List = []
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self) -> 'LocalSMTPServer':
+        self._server = _ThreadedServer((self.host, self.port), _SMTPHandler)
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='local-smtp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local SMTP stand-in that keeps messages in memory')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    smtp = LocalSMTPServer(args.host, args.port).start()
+    print(f"Local SMTP listening on {args.host}:{smtp.port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        smtp.stop()
@@ -0,0 +1,89 @@
+"""
+Bulk anthropometric measurement lookups.
+
+Reports need the latest vitals for every patient in a facility. Fetching them
+one patient at a time costs one PostgREST round trip per child, so this module
+returns them through the ``get_latest_measurements`` RPC (see
+migrations/create_latest_measurements_function.sql). PostgREST's max-rows
+also caps set-returning RPCs, so the RPC is called once per chunk of at most
+RPC_CHUNK_SIZE patients; it returns at most one row per patient, so a chunk
+always fits in one response.
+
+If the RPC is not deployed yet, an ordered ``in_`` query per chunk of patient
+ids is used instead, paged with ``range`` because PostgREST caps every
+response at max-rows, and the newest row per patient is picked here.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+LATEST_MEASUREMENTS_RPC = 'get_latest_measurements'
+
+# Patients per RPC call; must not exceed PostgREST's max-rows (1000 by default)
+RPC_CHUNK_SIZE = 500
+
+# Keeps the fallback GET query string well under PostgREST/proxy URL limits
+FALLBACK_CHUNK_SIZE = 200
+# Rows per fallback request; must not exceed PostgREST's max-rows (1000 by default)
+FALLBACK_PAGE_SIZE = 1000
+
+_MEASUREMENT_COLUMNS = 'patient_id, weight, height, head_circumference, measurement_date, recorded_at'
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _latest_by_query(client, patient_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fallback: ordered bulk select, keeping the first row seen per patient."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for chunk in _chunks(patient_ids, FALLBACK_CHUNK_SIZE):
+        offset = 0
+        while True:
+            # Same order as the RPC and idx_anthropometric_patient_date
+            resp = client.table('anthropometric_measurements')\
+                .select(_MEASUREMENT_COLUMNS)\
+                .in_('patient_id', chunk)\
+                .order('patient_id')\
+                .order('measurement_date', desc=True, nullsfirst=False)\
+                .order('recorded_at', desc=True, nullsfirst=False)\
+                .range(offset, offset + FALLBACK_PAGE_SIZE - 1)\
+                .execute()
+
+            rows = resp.data or []
+            for row in rows:
+                latest.setdefault(row['patient_id'], row)
+            if len(rows) < FALLBACK_PAGE_SIZE:
+                break
+            offset += FALLBACK_PAGE_SIZE
+    return latest
+
+
+def get_latest_measurements(client, patient_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Return the most recent measurement row for each patient.
+
+    Args:
+        client: Supabase client to query with (RLS applies for user clients).
+        patient_ids: Patients to look up.
+
+    Returns:
+        dict: patient_id -> measurement row. Patients without measurements
+        are absent from the result.
+    """
+    ids = list(dict.fromkeys(pid for pid in patient_ids if pid))
+    if not ids:
+        return {}
+
+    try:
+        latest: Dict[str, Dict[str, Any]] = {}
+        for chunk in _chunks(ids, RPC_CHUNK_SIZE):
+            resp = client.rpc(LATEST_MEASUREMENTS_RPC, {'p_patient_ids': chunk}).execute()
+            latest.update((row['patient_id'], row) for row in resp.data or [])
+        return latest
+    except Exception as e:
+        logger.warning(f"{LATEST_MEASUREMENTS_RPC} RPC unavailable, using bulk query fallback: {str(e)}")
+
+    return _latest_by_query(client, ids)
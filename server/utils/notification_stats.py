@@ -0,0 +1,251 @@
+"""
+Per-user notification stats counters.
+
+get_user_notification_stats() used to download every notification a user ever
+received and count them in Python. The counts are now kept in one Redis hash
+per user and adjusted in place whenever a notification changes:
+
+    notification_stats:{user_id}   hash: total, unread, archived and
+                                   type:{notification_type} for each type
+
+The counters follow the old definitions: every row of the user counts towards
+total and its type, rows with is_read = false towards unread, rows with
+is_archived = true towards archived.
+
+A missing hash is seeded from get_notification_stats() (one grouped query,
+see migrations/create_notification_stats_function.sql). Adjustments only touch
+an existing hash, and every hash expires NOTIFICATION_STATS_TTL after it was
+seeded, so the counters are reconciled with the table at least that often and
+writes made outside the API (triggers, cleanup, manual fixes) cannot leave
+them wrong for longer.
+
+Inserts are added when the row is published, which can be after a seed that
+already counted it (a trigger row waits for the relay). So a seed also stores
+the (created_at, notification_id) position of the newest row it counted, as
+seed_us / seed_id, and inserts at or before that position are not added
+again. The unread counter in utils/notification_stream.py does the same.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = 'notification_stats:'
+TYPE_FIELD_PREFIX = 'type:'
+STATS_TTL = int(os.environ.get('NOTIFICATION_STATS_TTL', 3600))
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Lua helper: whether the row at position (us, id) was already counted by the
+# seed of hash key; us is '' for changes that are not inserts
+SEEDED_LUA = """
+local function seeded(key, us, id)
+    if us == nil or us == '' then
+        return false
+    end
+    local seed = redis.call('hmget', key, 'seed_us', 'seed_id')
+    if not seed[1] then
+        return false
+    end
+    local row_us, seed_us = tonumber(us), tonumber(seed[1])
+    return row_us < seed_us or (row_us == seed_us and id <= seed[2])
+end
+"""
+
+# ARGV: row position (us, id), then field/delta pairs. Applies them only while
+# the hash exists and the row is not in its seed; counters never go below zero
+_ADJUST_SCRIPT = SEEDED_LUA + """
+if redis.call('exists', KEYS[1]) == 0 or seeded(KEYS[1], ARGV[1], ARGV[2]) then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    if redis.call('hincrby', KEYS[1], ARGV[i], ARGV[i + 1]) < 0 then
+        redis.call('hset', KEYS[1], ARGV[i], 0)
+    end
+end
+return 1
+"""
+
+# Sets a field only while the hash exists
+_SET_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+
+def _stats_key(user_id):
+    return f"{STATS_PREFIX}{user_id}"
+
+
+def row_position(row: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    """(created_at in epoch microseconds, notification_id) of a row as script
+    arguments, or ('', '') when the row does not carry them."""
+    created_at, notification_id = (row or {}).get('created_at'), (row or {}).get('notification_id')
+    if not created_at or notification_id is None:
+        return '', ''
+    try:
+        created = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+    except ValueError:
+        return '', ''
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return str((created - _EPOCH) // timedelta(microseconds=1)), str(notification_id)
+
+
+def seed_fields(newest: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Hash fields recording the newest row a seed counted (none if it counted no rows)."""
+    seed_us, seed_id = row_position(newest)
+    return {'seed_us': seed_us, 'seed_id': seed_id} if seed_us else {}
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {'total': 0, 'unread': 0, 'archived': 0, 'by_type': {}}
+
+
+def _count_in_db(user_id) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Stats of a user and the newest row they include, read in one statement."""
+    rows = supabase_service_role_client().rpc('get_notification_stats', {'p_user_id': user_id}).execute().data or []
+    stats = _empty_stats()
+    for row in rows:
+        stats['total'] += row['total']
+        stats['unread'] += row['unread']
+        stats['archived'] += row['archived']
+        stats['by_type'][row['notification_type']] = row['total']
+    newest = None
+    if rows and rows[0].get('newest_created_at'):
+        newest = {'created_at': rows[0]['newest_created_at'], 'notification_id': rows[0]['newest_id']}
+    return stats, newest
+
+
+def _from_hash(values: Dict[str, str]) -> Dict[str, Any]:
+    stats = _empty_stats()
+    for field, value in values.items():
+        if field.startswith(TYPE_FIELD_PREFIX):
+            if int(value):
+                stats['by_type'][field[len(TYPE_FIELD_PREFIX):]] = int(value)
+        elif field in stats:
+            stats[field] = int(value)
+    return stats
+
+
+def get_notification_stats(user_id) -> Dict[str, Any]:
+    """Total, unread, archived and per-type notification counts of a user."""
+    if redis_client is not None:
+        try:
+            cached = redis_client.hgetall(_stats_key(user_id))
+            if cached:
+                return _from_hash(cached)
+        except Exception as e:
+            logger.warning(f"Notification stats read failed for {user_id}: {str(e)}")
+
+    stats, newest = _count_in_db(user_id)
+    if redis_client is not None:
+        try:
+            mapping = {'total': stats['total'], 'unread': stats['unread'], 'archived': stats['archived']}
+            mapping.update({f"{TYPE_FIELD_PREFIX}{t}": count for t, count in stats['by_type'].items()})
+            mapping.update(seed_fields(newest))
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.delete(_stats_key(user_id))
+            pipe.hset(_stats_key(user_id), mapping=mapping)
+            pipe.expire(_stats_key(user_id), STATS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Notification stats write failed for {user_id}: {str(e)}")
+    return stats
+
+
+def _contribution(notification: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Counter fields one notification row adds to its user's stats."""
+    if not notification:
+        return {}
+    fields = {'total': 1, f"{TYPE_FIELD_PREFIX}{notification.get('notification_type')}": 1}
+    if not notification.get('is_read'):
+        fields['unread'] = 1
+    if notification.get('is_archived'):
+        fields['archived'] = 1
+    return fields
+
+
+def record_notification_changes(changes: Iterable[tuple]) -> None:
+    """Adjust the stats for a set of notification writes.
+
+    Args:
+        changes: (before, after) row pairs; before is None for an insert and
+            after is None for a delete. Rows need user_id, notification_type,
+            is_read and is_archived; inserted rows also created_at and
+            notification_id, so a row already counted by the seed is skipped.
+    """
+    if redis_client is None:
+        return
+
+    # Inserts are applied one row at a time (each is checked against the
+    # seed); other changes are summed per user
+    deltas = defaultdict(lambda: defaultdict(int))
+    inserts = []
+    for before, after in changes:
+        user_id = (after or before or {}).get('user_id')
+        if not user_id:
+            continue
+        if before is None:
+            inserts.append((user_id, row_position(after), _contribution(after)))
+            continue
+        for field, value in _contribution(after).items():
+            deltas[user_id][field] += value
+        for field, value in _contribution(before).items():
+            deltas[user_id][field] -= value
+
+    adjustments = inserts + [(user_id, ('', ''), fields) for user_id, fields in deltas.items()]
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, position, fields in adjustments:
+            args = [item for field, delta in fields.items() if delta for item in (field, delta)]
+            if args:
+                pipe.eval(_ADJUST_SCRIPT, 1, _stats_key(user_id), *position, *args)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Notification stats update failed for {len(deltas)} users: {str(e)}")
+
+
+def record_notification_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """Adjust the stats for one notification write (see record_notification_changes)."""
+    record_notification_changes([(before, after)])
+
+
+def record_all_read(user_id) -> None:
+    """Every notification of the user was marked read."""
+    if redis_client is None:
+        return
+    try:
+        redis_client.eval(_SET_SCRIPT, 1, _stats_key(user_id), 'unread', 0)
+    except Exception as e:
+        logger.warning(f"Notification stats update failed for {user_id}: {str(e)}")
+
+
+def invalidate_all_notification_stats() -> int:
+    """Drop every user's counters after a bulk write (e.g. the expiry cleanup).
+
+    Returns:
+        int: Number of hashes dropped; each is recounted on its next read.
+    """
+    if redis_client is None:
+        return 0
+    dropped = 0
+    batch = []
+    for key in redis_client.scan_iter(match=f"{STATS_PREFIX}*", count=500):
+        batch.append(key)
+        if len(batch) >= 500:
+            dropped += redis_client.delete(*batch)
+            batch = []
+    if batch:
+        dropped += redis_client.delete(*batch)
+    return dropped
@@ -0,0 +1,441 @@
+"""
+Push delivery and unread counters for notifications.
+
+New notifications are published to a per-user Redis pub/sub channel and
+streamed to the browser over Server-Sent Events (GET /notifications/stream),
+so clients no longer poll GET /notifications:
+
+    notifications:user:{user_id}       pub/sub channel, JSON {"event", "data"}
+    notification_counts:{user_id}      hash with the user's exact 'unread' count
+    notifications:published:{id}       marks a notification as already published
+
+Rows inserted through the API (create_notification, announcement fan-out) are
+published right after the insert. Rows inserted by database triggers are
+picked up by a relay thread that tails the notifications table by
+(created_at, notification_id); one relay runs across all workers (Redis
+lease) and the published markers make sure each row is published and
+counted once, whichever path sees it first. created_at is taken when the
+inserting transaction starts, not when it commits, so the relay only reads
+rows older than NOTIFICATION_RELAY_LAG_SECONDS: a transaction that commits
+within that lag (e.g. the upcoming-appointment reminder loop) is never
+passed by the watermark.
+
+Each worker process holds a single pattern subscription and fans messages out
+to its open streams, so a stream costs a queue, not a Redis connection. It
+does hold a gthread worker thread for its whole lifetime, so each process
+serves at most NOTIFICATION_STREAM_LIMIT streams (default: half of
+GUNICORN_THREADS); beyond that open_stream() refuses and clients keep
+polling, leaving threads for ordinary requests.
+
+The unread count covers unread, unarchived, unexpired notifications (what the
+notification list shows). It is seeded from the table on first use, adjusted
+in place by every create/read/unread/archive/delete, and recounted after
+NOTIFICATION_COUNTS_TTL so drift (expiry, writes outside the API) is bounded.
+The seed stores the position of the newest row it counted and published rows
+at or before it are not counted again (see utils/notification_stats.py).
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from config.settings import supabase_service_role_client
+from utils.notification_stats import SEEDED_LUA, record_notification_changes, row_position, seed_fields
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'notifications:user:'
+COUNTS_PREFIX = 'notification_counts:'
+PUBLISHED_PREFIX = 'notifications:published:'
+RELAY_LOCK_KEY = 'notifications:relay:lock'
+RELAY_WATERMARK_KEY = 'notifications:relay:watermark'
+
+COUNTS_TTL = int(os.environ.get('NOTIFICATION_COUNTS_TTL', 300))
+RELAY_INTERVAL = float(os.environ.get('NOTIFICATION_RELAY_INTERVAL', 2))
+RELAY_BATCH_SIZE = 500
+# How long a trigger's transaction may run before its rows could be missed
+RELAY_LAG_SECONDS = float(os.environ.get('NOTIFICATION_RELAY_LAG_SECONDS', 30))
+PUBLISHED_TTL = 86400
+# Streams end before gunicorn's 120s timeout; EventSource reconnects on its own
+STREAM_MAX_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_MAX_SECONDS', 55))
+HEARTBEAT_SECONDS = 15
+RECONNECT_MS = 3000
+SUBSCRIBER_QUEUE_SIZE = 100
+STREAM_LIMIT = int(os.environ.get('NOTIFICATION_STREAM_LIMIT', max(int(os.environ.get('GUNICORN_THREADS', 16)) // 2, 1)))
+STREAM_RETRY_AFTER = 30
+
+# ARGV: field, delta and, for a new row, its position (us, id). Adjusts the
+# field only while the hash exists (a missing hash is recounted from the
+# table on the next read) and the row is not in its seed; never goes below zero
+_ADJUST_SCRIPT = SEEDED_LUA + """
+if redis.call('exists', KEYS[1]) == 0 then
+    return nil
+end
+if seeded(KEYS[1], ARGV[3], ARGV[4]) then
+    return tonumber(redis.call('hget', KEYS[1], ARGV[1]))
+end
+local value = redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+if value < 0 then
+    redis.call('hset', KEYS[1], ARGV[1], 0)
+    value = 0
+end
+return value
+"""
+
+_subscribers: Dict[str, set] = {}
+_subscribers_lock = threading.Lock()
+_threads: Dict[str, threading.Thread] = {}
+_threads_lock = threading.Lock()
+_stream_slots = threading.BoundedSemaphore(STREAM_LIMIT)
+
+
+# ============================================================================
+# UNREAD COUNTER
+# ============================================================================
+
+def _counts_key(user_id):
+    return f"{COUNTS_PREFIX}{user_id}"
+
+
+def _count_unread_in_db(user_id) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """Unread count of a user and the newest row it includes, read in one statement."""
+    response = supabase_service_role_client().table('notifications')\
+        .select('notification_id, created_at', count='exact')\
+        .eq('user_id', user_id)\
+        .eq('is_read', False)\
+        .eq('is_archived', False)\
+        .or_(f'expires_at.is.null,expires_at.gt.{datetime.utcnow().isoformat()}')\
+        .order('created_at', desc=True)\
+        .order('notification_id', desc=True)\
+        .limit(1)\
+        .execute()
+    return response.count or 0, (response.data or [None])[0]
+
+
+def get_unread_count(user_id) -> int:
+    """Exact number of unread, unarchived, unexpired notifications of a user."""
+    if redis_client is not None:
+        _start_background()
+        try:
+            cached = redis_client.hget(_counts_key(user_id), 'unread')
+            if cached is not None:
+                return int(cached)
+        except Exception as e:
+            logger.warning(f"Unread counter read failed for {user_id}: {str(e)}")
+
+    count, newest = _count_unread_in_db(user_id)
+    if redis_client is not None:
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.delete(_counts_key(user_id))
+            pipe.hset(_counts_key(user_id), mapping={'unread': count, **seed_fields(newest)})
+            pipe.expire(_counts_key(user_id), COUNTS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Unread counter write failed for {user_id}: {str(e)}")
+    return count
+
+
+def adjust_unread(user_id, delta: int) -> None:
+    """Apply a change to the unread count and push the new value to the user's streams."""
+    adjust_unread_many({user_id: delta})
+
+
+def adjust_unread_many(deltas: Dict[str, int]) -> None:
+    """Apply unread count changes for many users in two round trips.
+
+    Users without a cached count are skipped (their next read recounts), and
+    so is their stream update: an open stream always seeds the count first.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if redis_client is None or not deltas:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, delta in deltas.items():
+            pipe.eval(_ADJUST_SCRIPT, 1, _counts_key(user_id), 'unread', delta)
+        values = pipe.execute()
+
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, value in zip(deltas, values):
+            if value is not None:
+                pipe.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps({'event': 'unread', 'data': {'unread_count': int(value)}}))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unread counter update failed for {len(deltas)} users: {str(e)}")
+
+
+def _count_new_unread(notifications) -> None:
+    """Add published unread rows to their users' counters, one row at a time so
+    rows the counter's seed already includes are skipped."""
+    if not notifications:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for notification in notifications:
+            pipe.eval(_ADJUST_SCRIPT, 1, _counts_key(notification['user_id']), 'unread', 1, *row_position(notification))
+        values = pipe.execute()
+
+        # Latest value per user
+        unread = {notification['user_id']: value for notification, value in zip(notifications, values)}
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, value in unread.items():
+            if value is not None:
+                pipe.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps({'event': 'unread', 'data': {'unread_count': int(value)}}))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unread counter update failed for {len(notifications)} new notifications: {str(e)}")
+
+
+def reset_unread(user_id) -> None:
+    """Everything was marked read: the count is known to be zero."""
+    if redis_client is None:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hset(_counts_key(user_id), 'unread', 0)
+        pipe.expire(_counts_key(user_id), COUNTS_TTL)
+        pipe.execute()
+        publish_event(user_id, 'unread', {'unread_count': 0})
+    except Exception as e:
+        logger.warning(f"Unread counter reset failed for {user_id}: {str(e)}")
+
+
+def counts_as_unread(notification: Dict[str, Any]) -> bool:
+    """Whether a notification row is included in the unread count."""
+    return not notification.get('is_read') and not notification.get('is_archived')
+
+
+# ============================================================================
+# PUBLISHING
+# ============================================================================
+
+def publish_event(user_id, event: str, data: Any) -> None:
+    if redis_client is None:
+        return
+    redis_client.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps({'event': event, 'data': data}, default=str))
+
+
+def publish_notifications(notifications: Iterable[Dict[str, Any]]) -> int:
+    """Publish newly inserted notification rows and add them to the counters.
+
+    Rows already published (by the API or the relay) are skipped, so both
+    paths can offer the same row.
+
+    Returns:
+        int: Number of rows published by this call.
+    """
+    notifications = [n for n in notifications if n and n.get('notification_id')]
+    if redis_client is None or not notifications:
+        return 0
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for notification in notifications:
+            pipe.set(f"{PUBLISHED_PREFIX}{notification['notification_id']}", 1, nx=True, ex=PUBLISHED_TTL)
+        claimed = pipe.execute()
+
+        created = [notification for notification, is_new in zip(notifications, claimed) if is_new]
+        pipe = redis_client.pipeline(transaction=False)
+        for notification in created:
+            pipe.publish(f"{CHANNEL_PREFIX}{notification['user_id']}", json.dumps({'event': 'notification', 'data': notification}, default=str))
+        pipe.execute()
+
+        _count_new_unread([n for n in created if counts_as_unread(n)])
+        record_notification_changes([(None, notification) for notification in created])
+        return len(created)
+    except Exception as e:
+        logger.error(f"Failed to publish {len(notifications)} notifications: {str(e)}")
+        return 0
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+def _format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_events(user_id) -> Iterator[str]:
+    """Server-Sent Events for one user: the current unread count, then every
+    notification and count change until STREAM_MAX_SECONDS have passed."""
+    _start_background()
+    events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _subscribers_lock:
+        _subscribers.setdefault(user_id, set()).add(events)
+
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        yield _format_event('unread', {'unread_count': get_unread_count(user_id)})
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                message = json.loads(events.get(timeout=min(HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0.1))))
+                yield _format_event(message['event'], message['data'])
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        with _subscribers_lock:
+            user_streams = _subscribers.get(user_id, set())
+            user_streams.discard(events)
+            if not user_streams:
+                _subscribers.pop(user_id, None)
+
+
+class _SlotStream:
+    """Stream iterator giving its slot back when the server closes the response."""
+
+    def __init__(self, events: Iterator[str]):
+        self._events = events
+        self._held = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._events)
+
+    def close(self) -> None:
+        # Also runs for a response that was never iterated, unlike a generator's finally
+        if self._held:
+            self._held = False
+            self._events.close()
+            _stream_slots.release()
+
+
+def open_stream(user_id) -> Optional[Iterator[str]]:
+    """stream_events() in one of this process's STREAM_LIMIT slots, or None
+    when all are taken and the client should poll instead."""
+    if not _stream_slots.acquire(blocking=False):
+        return None
+    return _SlotStream(stream_events(user_id))
+
+
+def _dispatch_loop() -> None:
+    """Receive every user's channel once per process and hand messages to local streams."""
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                user_id = message['channel'][len(CHANNEL_PREFIX):]
+                with _subscribers_lock:
+                    streams = list(_subscribers.get(user_id, ()))
+                for events in streams:
+                    try:
+                        events.put_nowait(message['data'])
+                    except queue.Full:
+                        # A stalled client misses events; its next reconnect resyncs the count
+                        pass
+        except Exception as e:
+            logger.error(f"Notification dispatcher error: {str(e)}")
+            time.sleep(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+# ============================================================================
+# TRIGGER RELAY
+# ============================================================================
+
+def _read_watermark():
+    """(created_at, notification_id) of the last relayed row; the id is None
+    for a watermark set at startup, or one stored before it included the id."""
+    raw = redis_client.get(RELAY_WATERMARK_KEY)
+    if not raw:
+        return None
+    try:
+        watermark = json.loads(raw)
+        return watermark['created_at'], watermark['notification_id']
+    except (ValueError, TypeError, KeyError):
+        return raw, None
+
+
+def _write_watermark(created_at, notification_id=None) -> None:
+    redis_client.set(RELAY_WATERMARK_KEY, json.dumps({'created_at': created_at, 'notification_id': notification_id}))
+
+
+def _relay_once() -> None:
+    watermark = _read_watermark()
+    if watermark is None:
+        # Start from the first row the relay may read now; older rows were
+        # delivered by polling before the stream existed
+        watermark = ((datetime.utcnow() - timedelta(seconds=RELAY_LAG_SECONDS)).isoformat(), None)
+        _write_watermark(*watermark)
+
+    created_at, notification_id = watermark
+    query = supabase_service_role_client().table('notifications').select('*')
+    if notification_id is None:
+        query = query.gte('created_at', created_at)
+    else:
+        # Keyset on (created_at, notification_id): rows sharing the last
+        # timestamp are continued after the last id, never re-read, so a
+        # batch of identical timestamps cannot stall the relay
+        query = query.or_(
+            f'created_at.gt."{created_at}",'
+            f'and(created_at.eq."{created_at}",notification_id.gt."{notification_id}")'
+        )
+    # Rows younger than the lag may still be joined by rows of transactions
+    # that started earlier and have not committed yet
+    settled = (datetime.utcnow() - timedelta(seconds=RELAY_LAG_SECONDS)).isoformat()
+    rows = query\
+        .lt('created_at', settled)\
+        .order('created_at')\
+        .order('notification_id')\
+        .limit(RELAY_BATCH_SIZE)\
+        .execute().data or []
+
+    if rows:
+        publish_notifications(rows)
+        _write_watermark(rows[-1]['created_at'], rows[-1]['notification_id'])
+
+
+def _relay_loop() -> None:
+    """Publish rows inserted by database triggers; one worker holds the lease at a time."""
+    token = uuid.uuid4().hex
+    lease = max(int(RELAY_INTERVAL * 5), 5)
+    while True:
+        try:
+            holder = redis_client.get(RELAY_LOCK_KEY)
+            if holder == token:
+                redis_client.expire(RELAY_LOCK_KEY, lease)
+                _relay_once()
+            elif holder is None and redis_client.set(RELAY_LOCK_KEY, token, nx=True, ex=lease):
+                _relay_once()
+        except Exception as e:
+            logger.error(f"Notification relay error: {str(e)}")
+        time.sleep(RELAY_INTERVAL)
+
+
+def _start_background() -> None:
+    """Start this process's dispatcher and relay threads (idempotent, also after fork)."""
+    if redis_client is None:
+        return
+    for name, target in (('notification-dispatch', _dispatch_loop), ('notification-relay', _relay_loop)):
+        thread = _threads.get(name)
+        if thread is not None and thread.is_alive():
+            continue
+        with _threads_lock:
+            thread = _threads.get(name)
+            if thread is not None and thread.is_alive():
+                continue
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            _threads[name] = thread
+            thread.start()
@@ -18,6 +18,8 @@ Helper functions for notification system management
 from datetime import datetime, timedelta
 from config.settings import supabase_service_role_client
 from typing import Optional, List, Dict
+from utils.announcement_fanout import FANOUT_BATCH_SIZE, build_announcement_notification, insert_notification_batch
+from utils.notification_stats import get_notification_stats, invalidate_all_notification_stats
 
 
 # ============================================================================
@@ -47,6 +49,7 @@ def create_upcoming_appointment_notifications():
         return {
             'status': 'success',
             'message': 'Upcoming appointment notifications created',
+            'count': result.data if isinstance(result.data, int) else None,
             'timestamp': datetime.now().isoformat()
         }
 
@@ -77,11 +80,15 @@ def cleanup_expired_notifications():
         # Call the database function
         result = supabase.rpc('cleanup_expired_notifications').execute()
 
+        # Rows were deleted behind the counters' back; recount on next read
+        invalidate_all_notification_stats()
+
         print(f"✅ Cleaned up expired notifications: {datetime.now()}")
 
         return {
             'status': 'success',
             'message': 'Expired notifications cleaned up',
+            'count': result.data if isinstance(result.data, int) else None,
             'timestamp': datetime.now().isoformat()
         }
 
@@ -125,6 +132,7 @@ def check_and_create_vaccination_reminders():
         return {
             'status': 'success',
             'message': f'Checked {count} vaccinations',
+            'count': count,
             'timestamp': datetime.now().isoformat()
         }
 
@@ -168,27 +176,12 @@ def create_system_announcement_notifications(announcement_id: str, target_users:
 
         ann = announcement.data[0]
 
-        # Create notifications for each target user
-        notifications = []
-        for user_id in target_users:
-            notification = {
-                'user_id': user_id,
-                'notification_type': 'system_announcement',
-                'title': ann['title'],
-                'message': ann['message'],
-                'priority': ann.get('priority', 'normal'),
-                'metadata': {
-                    'announcement_id': announcement_id,
-                    **ann.get('metadata', {})
-                },
-                'expires_at': ann.get('expires_at')
-            }
-            notifications.append(notification)
+        # Create notifications for each target user, in fixed-size batches
+        notifications = [build_announcement_notification(ann, user_id) for user_id in target_users]
+        for start in range(0, len(notifications), FANOUT_BATCH_SIZE):
+            insert_notification_batch(notifications[start:start + FANOUT_BATCH_SIZE])
 
-        # Bulk insert
         if notifications:
-            result = supabase.table('notifications').insert(notifications).execute()
-
             return {
                 'status': 'success',
                 'count': len(notifications),
@@ -237,6 +230,10 @@ def get_user_notification_stats(user_id: str) -> Dict:
     """
     Get notification statistics for a user
 
+    Served from the per-user counters in utils/notification_stats.py, which
+    are kept current by the notification routes and reconciled with the
+    table periodically, so the cost does not grow with the user's history.
+
     Args:
         user_id: User ID
 
@@ -244,38 +241,7 @@ def get_user_notification_stats(user_id: str) -> Dict:
         Dict with notification counts by type and status
     """
     try:
-        supabase = supabase_service_role_client()
-
-        # Get all notifications for user
-        notifications = supabase.table('notifications').select(
-            'notification_type, is_read, is_archived'
-        ).eq('user_id', user_id).execute()
-
-        if not notifications.data:
-            return {
-                'total': 0,
-                'unread': 0,
-                'archived': 0,
-                'by_type': {}
-            }
-
-        # Calculate stats
-        total = len(notifications.data)
-        unread = sum(1 for n in notifications.data if not n['is_read'])
-        archived = sum(1 for n in notifications.data if n['is_archived'])
-
-        # Count by type
-        by_type = {}
-        for n in notifications.data:
-            ntype = n['notification_type']
-            by_type[ntype] = by_type.get(ntype, 0) + 1
-
-        return {
-            'total': total,
-            'unread': unread,
-            'archived': archived,
-            'by_type': by_type
-        }
+        return get_notification_stats(user_id)
 
     except Exception as e:
         print(f"❌ Error getting notification stats: {e}")
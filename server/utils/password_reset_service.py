@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 import logging
 from config.settings import supabase_anon_client, supabase_service_role_client
 from utils.email_service import EmailService
+from utils.rate_limit import check_rate_limits, format_wait
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +27,6 @@ class PasswordResetService:
     EMAIL_RATE_LIMIT = 5  # requests per hour
     IP_RATE_LIMIT = 10  # requests per hour
     RATE_LIMIT_WINDOW_HOURS = 1
-    BLOCK_DURATION_HOURS = 1
 
     @staticmethod
     def generate_reset_token():
@@ -63,74 +63,15 @@ class PasswordResetService:
         Returns:
             tuple: (allowed: bool, message: str)
         """
-        try:
-            # Get rate limit for this identifier
-            rate_limit_response = supabase_admin.table('password_reset_rate_limits').select('*').eq(
-                'identifier', identifier
-            ).eq('identifier_type', identifier_type).execute()
-
-            limit = PasswordResetService.EMAIL_RATE_LIMIT if identifier_type == 'email' else PasswordResetService.IP_RATE_LIMIT
-
-            if not rate_limit_response.data:
-                # First request - create new rate limit record
-                supabase_admin.table('password_reset_rate_limits').insert({
-                    'identifier': identifier,
-                    'identifier_type': identifier_type,
-                    'attempt_count': 1,
-                    'first_attempt_at': datetime.utcnow().isoformat(),
-                    'last_attempt_at': datetime.utcnow().isoformat()
-                }).execute()
-                return True, "Request allowed"
-
-            rate_limit_record = rate_limit_response.data[0]
-
-            # Check if currently blocked
-            if rate_limit_record.get('blocked_until'):
-                blocked_until = datetime.fromisoformat(rate_limit_record['blocked_until'].replace('Z', '+00:00'))
-                if datetime.utcnow() < blocked_until.replace(tzinfo=None):
-                    minutes_remaining = int((blocked_until.replace(tzinfo=None) - datetime.utcnow()).total_seconds() / 60)
-                    logger.warning(f"Rate limit blocked: {identifier_type} {identifier} - {minutes_remaining} min remaining")
-                    return False, f"Too many password reset attempts. Please try again in {minutes_remaining} minutes."
-
-            # Check if window has expired (reset counter)
-            first_attempt = datetime.fromisoformat(rate_limit_record['first_attempt_at'].replace('Z', '+00:00'))
-            if datetime.utcnow() > first_attempt.replace(tzinfo=None) + timedelta(hours=PasswordResetService.RATE_LIMIT_WINDOW_HOURS):
-                # Reset counter - window expired
-                supabase_admin.table('password_reset_rate_limits').update({
-                    'attempt_count': 1,
-                    'first_attempt_at': datetime.utcnow().isoformat(),
-                    'last_attempt_at': datetime.utcnow().isoformat(),
-                    'blocked_until': None
-                }).eq('identifier', identifier).eq('identifier_type', identifier_type).execute()
-                return True, "Request allowed (counter reset)"
-
-            # Increment counter
-            new_count = rate_limit_record['attempt_count'] + 1
-
-            if new_count > limit:
-                # Exceeded limit - block for 1 hour
-                blocked_until = datetime.utcnow() + timedelta(hours=PasswordResetService.BLOCK_DURATION_HOURS)
-                supabase_admin.table('password_reset_rate_limits').update({
-                    'attempt_count': new_count,
-                    'last_attempt_at': datetime.utcnow().isoformat(),
-                    'blocked_until': blocked_until.isoformat()
-                }).eq('identifier', identifier).eq('identifier_type', identifier_type).execute()
-
-                logger.warning(f"Rate limit exceeded: {identifier_type} {identifier} - blocked until {blocked_until}")
-                return False, f"Too many password reset attempts. Please try again in {PasswordResetService.BLOCK_DURATION_HOURS} hour."
-
-            # Update counter
-            supabase_admin.table('password_reset_rate_limits').update({
-                'attempt_count': new_count,
-                'last_attempt_at': datetime.utcnow().isoformat()
-            }).eq('identifier', identifier).eq('identifier_type', identifier_type).execute()
-
-            return True, "Request allowed"
+        limit = PasswordResetService.EMAIL_RATE_LIMIT if identifier_type == 'email' else PasswordResetService.IP_RATE_LIMIT
+        allowed, retry_after = check_rate_limits('password_reset', [
+            ('id' if identifier_type == 'email' else 'ip', identifier, limit,
+             PasswordResetService.RATE_LIMIT_WINDOW_HOURS * 3600)
+        ])
 
-        except Exception as e:
-            logger.error(f"Error checking rate limit: {str(e)}")
-            # Fail open - allow request if rate limit check fails
-            return True, "Request allowed (rate limit check failed)"
+        if not allowed:
+            return False, f"Too many password reset attempts. Please try again in {format_wait(retry_after)}."
+        return True, "Request allowed"
 
     @staticmethod
     def request_password_reset(email, ip_address, user_agent, request_url_root):
@@ -364,7 +305,8 @@ def cleanup_expired_tokens():
 def cleanup_expired_rate_limits():
     """
     Cleanup expired rate limit records
-    This can be run periodically via a cron job
+    Limits now live in Redis (utils.rate_limit); this only clears rows left
+    in password_reset_rate_limits by the old table-backed limiter
 
     Returns:
         int: Number of rate limits reset
@@ -0,0 +1,296 @@
+"""
+Per-facility patient name search index.
+
+Each facility's active patients are indexed in Redis so the appointment
+typeahead never sends the facility's whole patient id list to the database:
+
+    patient_search:{facility_id}:patients   hash of patient id -> display fields
+    patient_search:{facility_id}:terms      sorted set of "{suffix}|{patient id}"
+                                            for every suffix of every first and
+                                            last name token (all scores 0)
+    patient_search:{facility_id}:built      present while the index is complete
+    patient_search:patient:{patient_id}     facilities whose index holds the patient
+
+Indexing every suffix turns the old ``ilike '%part%'`` substring match into
+one ZRANGEBYLEX prefix scan per search word. An index is built from the
+database the first time its facility is searched (and again after
+SEARCH_INDEX_TTL), under a lock; a search that finds no index and cannot
+build one falls back to the database query. Patient writes call
+queue_patient_reindex(), which updates the built indexes through the
+write-behind queue.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List
+
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+from utils.write_behind import enqueue, register_handler
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PREFIX = 'patient_search:'
+SEARCH_INDEX_TTL = int(os.environ.get('PATIENT_SEARCH_INDEX_TTL', 86400))
+SEARCH_BUILD_LOCK_TTL = 60
+# Most index members read per search word; typeahead only shows the top results
+SEARCH_SCAN_LIMIT = 1000
+FETCH_PAGE_SIZE = 1000
+# Sorts after every UTF-8 encoded character, closing the prefix range
+_LEX_MAX = chr(0x10FFFF)
+
+PATIENT_FIELDS = 'patient_id, firstname, lastname, middlename, date_of_birth, sex'
+
+
+def _keys(facility_id):
+    base = f"{SEARCH_PREFIX}{facility_id}"
+    return f"{base}:patients", f"{base}:terms", f"{base}:built"
+
+
+def _patient_facilities_key(patient_id):
+    return f"{SEARCH_PREFIX}patient:{patient_id}"
+
+
+def _terms(patient: Dict[str, Any]) -> List[str]:
+    """Index members for a patient: every suffix of each first/last name token."""
+    suffixes = set()
+    for name in (patient.get('firstname'), patient.get('lastname')):
+        for token in (name or '').lower().split():
+            suffixes.update(token[i:] for i in range(len(token)))
+    return [f"{suffix}|{patient['patient_id']}" for suffix in suffixes]
+
+
+def _display_fields(patient: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: patient.get(field) for field in ('patient_id', 'firstname', 'lastname', 'middlename', 'date_of_birth', 'sex')}
+
+
+def _add_to_index(pipe, facility_id, patient) -> None:
+    patients_key, terms_key, _ = _keys(facility_id)
+    pipe.hset(patients_key, patient['patient_id'], json.dumps(_display_fields(patient)))
+    terms = _terms(patient)
+    if terms:
+        pipe.zadd(terms_key, {term: 0 for term in terms})
+    pipe.sadd(_patient_facilities_key(patient['patient_id']), facility_id)
+    pipe.expire(_patient_facilities_key(patient['patient_id']), SEARCH_INDEX_TTL)
+
+
+def _remove_from_index(pipe, facility_id, patient_id, previous) -> None:
+    patients_key, terms_key, _ = _keys(facility_id)
+    if previous:
+        terms = _terms(json.loads(previous))
+        if terms:
+            pipe.zrem(terms_key, *terms)
+    pipe.hdel(patients_key, patient_id)
+    pipe.srem(_patient_facilities_key(patient_id), facility_id)
+
+
+def _fetch_facility_patients(facility_id) -> List[Dict[str, Any]]:
+    """Active patients actively registered at the facility, paged past the row limit."""
+    sr_client = supabase_service_role_client()
+    patients, offset = [], 0
+    while True:
+        resp = sr_client.table('facility_patients')\
+            .select(f'patient_id, patients!inner({PATIENT_FIELDS}, is_active)')\
+            .eq('facility_id', facility_id)\
+            .eq('is_active', True)\
+            .eq('patients.is_active', True)\
+            .range(offset, offset + FETCH_PAGE_SIZE - 1)\
+            .execute()
+        rows = resp.data or []
+        patients.extend(row['patients'] for row in rows if row.get('patients'))
+        if len(rows) < FETCH_PAGE_SIZE:
+            return patients
+        offset += FETCH_PAGE_SIZE
+
+
+def build_facility_index(facility_id) -> bool:
+    """(Re)build one facility's index from the database.
+
+    Returns:
+        bool: False if another worker is already building it.
+    """
+    lock_key = f"{SEARCH_PREFIX}{facility_id}:building"
+    if not redis_client.set(lock_key, 1, nx=True, ex=SEARCH_BUILD_LOCK_TTL):
+        return False
+
+    try:
+        patients = _fetch_facility_patients(facility_id)
+        patients_key, terms_key, built_key = _keys(facility_id)
+
+        # One transaction, so searches see either the old index or the complete new one
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(patients_key, terms_key)
+        for patient in patients:
+            _add_to_index(pipe, facility_id, patient)
+        pipe.expire(patients_key, SEARCH_INDEX_TTL + SEARCH_BUILD_LOCK_TTL)
+        pipe.expire(terms_key, SEARCH_INDEX_TTL + SEARCH_BUILD_LOCK_TTL)
+        pipe.setex(built_key, SEARCH_INDEX_TTL, len(patients))
+        pipe.execute()
+
+        logger.info(f"Built patient search index for facility {facility_id} ({len(patients)} patients)")
+        return True
+    finally:
+        redis_client.delete(lock_key)
+
+
+def _search_index(facility_ids, name_parts, limit) -> List[Dict[str, Any]]:
+    """Match every search word against the facility indexes.
+
+    Patients matching more words rank first; ties keep index order, which
+    puts the shortest name continuing the typed prefix first.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for facility_id in facility_ids:
+        _, terms_key, _ = _keys(facility_id)
+        for part in name_parts:
+            pipe.zrangebylex(terms_key, f"[{part}", f"[{part}{_LEX_MAX}", start=0, num=SEARCH_SCAN_LIMIT)
+    results = pipe.execute()
+
+    # patient id -> facility holding it, words matched
+    matched = {}
+    for index, members in enumerate(results):
+        facility_id = facility_ids[index // len(name_parts)]
+        part = name_parts[index % len(name_parts)]
+        for member in members:
+            patient_id = member.rsplit('|', 1)[1]
+            entry = matched.setdefault(patient_id, {'facility_id': facility_id, 'parts': set()})
+            entry['parts'].add(part)
+
+    if not matched:
+        return []
+
+    # Only the top candidates are read; a few spares cover entries removed meanwhile
+    candidates = sorted(matched.keys(), key=lambda patient_id: -len(matched[patient_id]['parts']))[:limit * 2]
+    pipe = redis_client.pipeline(transaction=False)
+    for patient_id in candidates:
+        patients_key, _, _ = _keys(matched[patient_id]['facility_id'])
+        pipe.hget(patients_key, patient_id)
+
+    return [json.loads(record) for record in pipe.execute() if record][:limit]
+
+
+def _search_database(facility_ids, name_parts, limit) -> List[Dict[str, Any]]:
+    """The unindexed query: ilike on first/last name within the facilities' active patients."""
+    sr_client = supabase_service_role_client()
+    search_conditions = []
+    for part in name_parts:
+        search_conditions.append(f'firstname.ilike.%{part}%')
+        search_conditions.append(f'lastname.ilike.%{part}%')
+
+    resp = sr_client.table('patients')\
+        .select(f'{PATIENT_FIELDS}, facility_patients!inner(facility_id, is_active)')\
+        .or_(','.join(search_conditions))\
+        .in_('facility_patients.facility_id', list(facility_ids))\
+        .eq('facility_patients.is_active', True)\
+        .eq('is_active', True)\
+        .limit(limit)\
+        .execute()
+
+    return [_display_fields(patient) for patient in resp.data or []]
+
+
+def search_facility_patients(facility_ids: Iterable[str], search_term: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Find patients of the given facilities whose first or last name contains any search word.
+
+    Args:
+        facility_ids: Facilities the caller works at; results never leave them.
+        search_term: Free text, split on whitespace.
+        limit: Maximum number of patients returned.
+
+    Returns:
+        list: Patient dicts (patient_id, names, date_of_birth, sex), best
+        matches (most words matched) first.
+    """
+    facility_ids = list(dict.fromkeys(facility_ids))
+    name_parts = list(dict.fromkeys(search_term.lower().split()))
+    if not facility_ids or not name_parts:
+        return []
+
+    if redis_client is None:
+        return _search_database(facility_ids, name_parts, limit)
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for facility_id in facility_ids:
+            pipe.exists(_keys(facility_id)[2])
+        built = pipe.execute()
+
+        indexed, unindexed = [], []
+        for facility_id, is_built in zip(facility_ids, built):
+            if is_built or build_facility_index(facility_id):
+                indexed.append(facility_id)
+            else:
+                unindexed.append(facility_id)
+
+        results = _search_index(indexed, name_parts, limit) if indexed else []
+    except Exception as e:
+        logger.warning(f"Patient search index unavailable, querying database: {str(e)}")
+        return _search_database(facility_ids, name_parts, limit)
+
+    # Index miss (another worker is building it): ask the database for those facilities
+    if unindexed and len(results) < limit:
+        seen = {p['patient_id'] for p in results}
+        for patient in _search_database(unindexed, name_parts, limit):
+            if patient['patient_id'] not in seen and len(results) < limit:
+                results.append(patient)
+                seen.add(patient['patient_id'])
+
+    return results
+
+
+def queue_patient_reindex(patient_id) -> None:
+    """Refresh a patient's entries in the search indexes after a patient or registration write."""
+    try:
+        enqueue('patient_search_reindex', {'patient_id': patient_id})
+    except Exception as e:
+        logger.warning(f"Could not queue patient search reindex for {patient_id}: {str(e)}")
+
+
+def _reindex_patients(payloads: List[Dict[str, Any]]) -> None:
+    """Write-behind handler: re-read the patients and update every built facility index."""
+    if redis_client is None:
+        return
+
+    patient_ids = list(dict.fromkeys(p['patient_id'] for p in payloads))
+    sr_client = supabase_service_role_client()
+    resp = sr_client.table('patients')\
+        .select(f'{PATIENT_FIELDS}, is_active, facility_patients(facility_id, is_active)')\
+        .in_('patient_id', patient_ids)\
+        .execute()
+    patients = {p['patient_id']: p for p in resp.data or []}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for patient_id in patient_ids:
+        pipe.smembers(_patient_facilities_key(patient_id))
+    indexed_in = dict(zip(patient_ids, pipe.execute()))
+
+    for patient_id in patient_ids:
+        patient = patients.get(patient_id)
+        active_facilities = set()
+        if patient and patient.get('is_active'):
+            active_facilities = {
+                fp['facility_id'] for fp in patient.get('facility_patients') or [] if fp.get('is_active')
+            }
+
+        facilities = sorted(active_facilities | set(indexed_in[patient_id]))
+        pipe = redis_client.pipeline(transaction=False)
+        for facility_id in facilities:
+            patients_key, _, built_key = _keys(facility_id)
+            pipe.exists(built_key)
+            pipe.hget(patients_key, patient_id)
+        state = pipe.execute()
+
+        pipe = redis_client.pipeline(transaction=True)
+        for i, facility_id in enumerate(facilities):
+            is_built, previous = state[2 * i], state[2 * i + 1]
+            if not is_built:
+                # Unbuilt indexes pick the patient up when they are built
+                continue
+            _remove_from_index(pipe, facility_id, patient_id, previous)
+            if facility_id in active_facilities:
+                _add_to_index(pipe, facility_id, patient)
+        pipe.execute()
+
+
+register_handler('patient_search_reindex', _reindex_patients)
@@ -0,0 +1,200 @@
+"""
+Scope-aware patient data assembly for QR scans.
+
+A QR code's scope decides which sections of the patient record the scanner
+may see. The sections are planned from the scope, loaded concurrently (the
+patient row and every section are independent queries; medications are
+batched per prescription list) and the assembled snapshot is cached per
+patient and section set, so repeated scans of the same child within
+QR_SNAPSHOT_TTL are served from Redis.
+
+Snapshots are tagged with the patient and the appointment and prescription
+ids they contain, so the invalidate_caches() calls already made by every
+patient, prescription and appointment write drop them.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from config.settings import supabase_service_role_client
+from utils.invalidate_cache import cache_get, cache_set
+
+QR_SNAPSHOT_TTL = int(os.environ.get('QR_SNAPSHOT_TTL', 300))
+# Bump when the snapshot shape changes so old entries are never served
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PREFIX = 'qr_snapshot:'
+
+# Scope name -> section, in response order; full_access includes them all
+SCOPE_SECTIONS = ('allergies', 'prescriptions', 'vaccinations', 'appointments', 'vitals')
+
+_assembler_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('QR_ASSEMBLER_WORKERS', 8)),
+    thread_name_prefix='qr-assembler'
+)
+
+
+def _load_patient(sr_client, patient_id):
+    # Always include basic patient information
+    return sr_client.table('patients')\
+        .select('patient_id, firstname, lastname, middlename, date_of_birth, sex, bloodtype')\
+        .eq('patient_id', patient_id)\
+        .single()\
+        .execute().data
+
+
+def _load_allergies(sr_client, patient_id):
+    return sr_client.table('allergies')\
+        .select('allergy_id, patient_id, allergen, reaction_type, severity, date_identified, notes')\
+        .eq('patient_id', patient_id)\
+        .execute().data or []
+
+
+def _load_prescriptions(sr_client, patient_id):
+    # Get prescriptions with doctor and facility info
+    prescriptions_data = sr_client.table('prescriptions')\
+        .select('''
+            *,
+            doctor:users!prescriptions_doctor_id_fkey(user_id, firstname, middlename, lastname, specialty, license_number),
+            facility:healthcare_facilities!prescriptions_facility_id_fkey(facility_id, facility_name, address, city, zip_code, contact_number)
+        ''')\
+        .eq('patient_id', patient_id)\
+        .order('prescription_date', desc=True)\
+        .execute().data or []
+
+    # Get medications for all prescriptions in one query
+    rx_ids = [rx.get('rx_id') for rx in prescriptions_data if rx.get('rx_id')]
+    if not rx_ids:
+        return prescriptions_data
+
+    medications = sr_client.table('prescription_medications')\
+        .select('*')\
+        .in_('rx_id', rx_ids)\
+        .execute()
+
+    # Map medications to prescriptions
+    med_map = {}
+    for med in (medications.data or []):
+        med_map.setdefault(med.get('rx_id'), []).append(med)
+
+    for rx in prescriptions_data:
+        rx['medications'] = med_map.get(rx.get('rx_id'), [])
+
+        # Format doctor name
+        if rx.get('doctor'):
+            doctor = rx['doctor']
+            rx['doctor_name'] = f"Dr. {doctor.get('firstname', '')} {doctor.get('lastname', '')}".strip()
+
+        # Format facility info
+        if rx.get('facility'):
+            facility = rx['facility']
+            rx['facility_name'] = facility.get('facility_name', '')
+            rx['facility_address'] = f"{facility.get('address', '')}, {facility.get('city', '')}"
+
+    return prescriptions_data
+
+
+def _load_vaccinations(sr_client, patient_id):
+    return sr_client.table('vaccinations')\
+        .select('vax_id, patient_id, vaccine_name, dose_number, administered_date, administered_by, next_dose_due, notes')\
+        .eq('patient_id', patient_id)\
+        .eq('is_deleted', False)\
+        .order('administered_date', desc=True)\
+        .execute().data or []
+
+
+def _load_appointments(sr_client, patient_id):
+    return sr_client.table('appointments')\
+        .select('appointment_id, patient_id, doctor_id, facility_id, appointment_date, appointment_time, appointment_type, status, reason, notes, updated_at')\
+        .eq('patient_id', patient_id)\
+        .order('appointment_date', desc=True)\
+        .limit(10)\
+        .execute().data or []
+
+
+def _load_vitals(sr_client, patient_id):
+    # Vitals/anthropometric measurements
+    return sr_client.table('anthropometric_measurements')\
+        .select('am_id, patient_id, measurement_date, height, weight, head_circumference, chest_circumference, abdominal_circumference, recorded_by, recorded_at')\
+        .eq('patient_id', patient_id)\
+        .order('measurement_date', desc=True, nullsfirst=False)\
+        .limit(10)\
+        .execute().data or []
+
+
+SECTION_LOADERS = {
+    'allergies': _load_allergies,
+    'prescriptions': _load_prescriptions,
+    'vaccinations': _load_vaccinations,
+    'appointments': _load_appointments,
+    'vitals': _load_vitals,
+}
+
+
+def plan_sections(scope):
+    """Return the record sections a QR scope grants, in response order."""
+    scope = scope or []
+    if 'full_access' in scope:
+        return list(SCOPE_SECTIONS)
+    return [section for section in SCOPE_SECTIONS if section in scope]
+
+
+def _snapshot_key(patient_id, sections):
+    return f"{SNAPSHOT_PREFIX}v{SNAPSHOT_VERSION}:{patient_id}:{','.join(sections) or 'basic'}"
+
+
+def get_patient_data_by_scope(patient_id, scope):
+    """
+    Get patient data based on access scope
+    Scope options: view_only, allergies, prescriptions, vaccinations, appointments, vitals, full_access
+
+    Uses service role client to bypass RLS - QR code token is the authorization mechanism.
+    Sections are fetched concurrently and the snapshot is cached for QR_SNAPSHOT_TTL.
+
+    Returns:
+        dict: Patient row plus one list per granted section, or None if the
+        patient could not be loaded.
+    """
+    sections = plan_sections(scope)
+    cache_key = _snapshot_key(patient_id, sections)
+
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    sr_client = supabase_service_role_client()
+    patient_future = _assembler_executor.submit(_load_patient, sr_client, patient_id)
+    section_futures = {
+        section: _assembler_executor.submit(SECTION_LOADERS[section], sr_client, patient_id)
+        for section in sections
+    }
+
+    try:
+        result = patient_future.result()
+    except Exception as e:
+        current_app.logger.error(f"Error fetching patient data by scope: {e}")
+        return None
+
+    if not result:
+        return None
+
+    complete = True
+    for section, future in section_futures.items():
+        try:
+            result[section] = future.result()
+        except Exception as e:
+            current_app.logger.error(f"Error fetching {section} for QR scan: {e}")
+            result[section] = []
+            complete = False
+
+    # Partial snapshots are returned but never cached
+    if complete:
+        cache_set(
+            cache_key, result, ttl=QR_SNAPSHOT_TTL, cache_type='patient',
+            patient=patient_id,
+            appointment=[a.get('appointment_id') for a in result.get('appointments', [])],
+            prescription=[rx.get('rx_id') for rx in result.get('prescriptions', [])]
+        )
+
+    return result
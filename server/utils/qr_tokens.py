@@ -0,0 +1,193 @@
+"""
+QR token lookup cache and atomic use counter.
+
+Scanning a QR code resolves its token to the qr_codes row and consumes one
+use. Both are served from Redis:
+
+    qr_token:{token}   JSON qr_codes row (active codes only), kept until the
+                       code expires or QR_TOKEN_CACHE_TTL, whichever is first
+    qr_token_id:{qr_id}  token of that row, so revocation by id can evict it
+    qr_uses:{qr_id}    live use count, seeded from the database on first use
+
+consume_qr_use() checks max_uses and increments in one Lua call, so
+concurrent scans of a shared code cannot exceed its limit. The database
+use_count is brought up to the counter by the write-behind worker. Without
+Redis, lookups go to the database and uses are consumed with the
+consume_qr_use RPC (migrations/create_qr_use_counter.sql).
+
+Anything that deactivates or deletes a QR code must call evict_qr_codes().
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+QR_TOKEN_PREFIX = 'qr_token:'
+QR_TOKEN_ID_PREFIX = 'qr_token_id:'
+QR_USES_PREFIX = 'qr_uses:'
+QR_TOKEN_CACHE_TTL = int(os.environ.get('QR_TOKEN_CACHE_TTL', 300))
+# Counters outlive their code by a day so late scans still see the final count
+QR_USES_GRACE = 86400
+
+QR_CODE_COLUMNS = '''
+    qr_id, token_hash, patient_id, facility_id, generated_by, share_type,
+    scope, expires_at, is_active, use_count, max_uses, last_accessed_at, last_accessed_by,
+    target_facilities, pin_code, metadata, created_at,
+    users!qr_codes_generated_by_fkey(firstname, lastname)
+'''
+
+# Returns the new count, -1 when the limit is reached, -2 when the counter
+# is missing and no seed value was passed
+_CONSUME_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if not current then
+    if ARGV[1] == '' then
+        return -2
+    end
+    current = ARGV[1]
+    redis.call('set', KEYS[1], current, 'EX', ARGV[3])
+end
+local max_uses = tonumber(ARGV[2])
+if max_uses > 0 and tonumber(current) >= max_uses then
+    return -1
+end
+return redis.call('incr', KEYS[1])
+"""
+
+_RELEASE_SCRIPT = """
+local current = tonumber(redis.call('get', KEYS[1]) or '0')
+if current > 0 then
+    return redis.call('decr', KEYS[1])
+end
+return current
+"""
+
+
+def _seconds_until(expires_at: str) -> int:
+    expires = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    return int((expires - datetime.now(timezone.utc)).total_seconds())
+
+
+def _fetch_qr_code(token: str) -> Optional[Dict[str, Any]]:
+    sr_client = supabase_service_role_client()
+    qr = sr_client.table('qr_codes')\
+        .select(QR_CODE_COLUMNS)\
+        .eq('token_hash', token)\
+        .eq('is_active', True)\
+        .execute()
+    return qr.data[0] if qr.data else None
+
+
+def get_qr_code(token: str) -> Optional[Dict[str, Any]]:
+    """Return the active qr_codes row for *token*, or None.
+
+    The row's ``use_count`` may lag behind; use consume_qr_use() for limits.
+    """
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(f"{QR_TOKEN_PREFIX}{token}")
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"QR token cache read failed: {str(e)}")
+
+    qr_data = _fetch_qr_code(token)
+    if qr_data and redis_client is not None:
+        ttl = min(QR_TOKEN_CACHE_TTL, _seconds_until(qr_data['expires_at']))
+        if ttl > 0:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.setex(f"{QR_TOKEN_PREFIX}{token}", ttl, json.dumps(qr_data))
+                pipe.setex(f"{QR_TOKEN_ID_PREFIX}{qr_data['qr_id']}", ttl, token)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"QR token cache write failed: {str(e)}")
+    return qr_data
+
+
+def evict_qr_codes(qr_ids: Iterable[str]) -> None:
+    """Drop cached token lookups for revoked or deleted QR codes."""
+    qr_ids = [qr_id for qr_id in qr_ids if qr_id]
+    if redis_client is None or not qr_ids:
+        return
+    try:
+        id_keys = [f"{QR_TOKEN_ID_PREFIX}{qr_id}" for qr_id in qr_ids]
+        tokens = redis_client.mget(id_keys)
+        keys = id_keys + [f"{QR_TOKEN_PREFIX}{token}" for token in tokens if token]
+        redis_client.delete(*keys)
+    except Exception as e:
+        logger.error(f"QR token cache eviction failed for {qr_ids}: {str(e)}")
+
+
+def _fetch_use_count(qr_id: str) -> int:
+    sr_client = supabase_service_role_client()
+    qr = sr_client.table('qr_codes')\
+        .select('use_count')\
+        .eq('qr_id', qr_id)\
+        .execute()
+    return (qr.data[0].get('use_count') or 0) if qr.data else 0
+
+
+def _consume_in_database(qr_id: str, accessed_by: Optional[str]) -> Optional[int]:
+    sr_client = supabase_service_role_client()
+    result = sr_client.rpc('consume_qr_use', {'p_qr_id': qr_id, 'p_accessed_by': accessed_by}).execute()
+    data = result.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = next(iter(data.values()), None)
+    return data
+
+
+def consume_qr_use(qr_data: Dict[str, Any], accessed_by: Optional[str] = None) -> Tuple[Optional[int], bool]:
+    """Atomically check the usage limit of a QR code and count one use.
+
+    Args:
+        qr_data: qr_codes row (qr_id, max_uses, expires_at).
+        accessed_by: Scanning user id, recorded by the database fallback.
+
+    Returns:
+        tuple: (use_count, counted_in_redis). use_count is the new use count,
+        or None if the limit was already reached; counted_in_redis tells
+        release_qr_use() whether the use can be given back.
+    """
+    qr_id = qr_data['qr_id']
+    max_uses = qr_data.get('max_uses') or 0
+
+    if redis_client is not None:
+        try:
+            key = f"{QR_USES_PREFIX}{qr_id}"
+            ttl = max(_seconds_until(qr_data['expires_at']), 0) + QR_USES_GRACE
+            result = redis_client.eval(_CONSUME_SCRIPT, 1, key, '', max_uses, ttl)
+            if result == -2:
+                # First use seen by Redis: seed from the database, not the (possibly cached) row
+                result = redis_client.eval(_CONSUME_SCRIPT, 1, key, _fetch_use_count(qr_id), max_uses, ttl)
+            if result == -1:
+                return None, False
+            return int(result), True
+        except Exception as e:
+            logger.warning(f"QR use counter unavailable, using database: {str(e)}")
+
+    return _consume_in_database(qr_id, accessed_by), False
+
+
+def release_qr_use(qr_id: str, counted_in_redis: bool) -> None:
+    """Give back a use consumed by a scan that then failed.
+
+    Only a use counted in Redis can be released. A use consumed by the
+    database fallback stays counted; decrementing Redis for it would hand
+    out a use the database never gave.
+    """
+    if redis_client is None or not counted_in_redis:
+        return
+    try:
+        redis_client.eval(_RELEASE_SCRIPT, 1, f"{QR_USES_PREFIX}{qr_id}")
+    except Exception as e:
+        logger.warning(f"Could not release QR use for {qr_id}: {str(e)}")
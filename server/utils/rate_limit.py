@@ -0,0 +1,161 @@
+"""
+Redis sliding-window rate limiter.
+
+Abuse checks used to cost two or three database round trips per request
+(password_reset_rate_limits rows, the latest user_2fa_verification_codes
+row). They are now one EVAL against a sorted set per limited key, holding
+the timestamps of the requests allowed within the window:
+
+    rate_limit:{name}:ip:{ip}          requests from one client IP
+    rate_limit:{name}:id:{identifier}  requests for one email / user ID
+
+A request is allowed only if every key it is checked against still has room,
+and is then recorded in all of them in the same script, so concurrent
+requests cannot both take the last slot. Keys expire with their window.
+
+Routes use the decorator:
+
+    @auth_bp.route('/login', methods=['POST'])
+    @rate_limit('login', per_ip=(30, 300), per_identifier=(10, 300), identifier=json_field('email'))
+    def login():
+        ...
+
+Limits fail open: without Redis, or if the check errors, the request goes
+through and a warning is logged.
+"""
+
+import logging
+import math
+import time
+import uuid
+from functools import wraps
+from typing import Callable, List, Optional, Tuple
+
+from flask import jsonify, request
+
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PREFIX = 'rate_limit:'
+
+# KEYS: one sorted set per limit. ARGV: now_ms, member, then limit and
+# window_ms for each key. Returns 0 if the request was recorded, otherwise
+# the milliseconds until every key has room again.
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local window = tonumber(ARGV[2 + 2 * i])
+    redis.call('zremrangebyscore', key, '-inf', now - window)
+    local count = redis.call('zcard', key)
+    if count >= limit then
+        local freeing = redis.call('zrange', key, count - limit, count - limit, 'WITHSCORES')
+        wait = math.max(wait, tonumber(freeing[2]) + window - now)
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    redis.call('zadd', key, now, ARGV[2])
+    redis.call('pexpire', key, ARGV[2 + 2 * i])
+end
+return 0
+"""
+
+# (scope, value, limit, window_seconds)
+Limit = Tuple[str, str, int, int]
+
+
+def check_rate_limits(name: str, limits: List[Limit]) -> Tuple[bool, int]:
+    """Record one request against every limit, unless any of them is exhausted.
+
+    Args:
+        name: Action being limited, e.g. 'password_reset'.
+        limits: (scope, value, limit, window_seconds) tuples; scope is 'ip'
+            or 'id' and value the client IP or identifier.
+
+    Returns:
+        tuple: (allowed, retry_after_seconds); retry_after is 0 when allowed.
+    """
+    limits = [limit for limit in limits if limit[1]]
+    if redis_client is None or not limits:
+        return True, 0
+
+    keys = [f"{RATE_LIMIT_PREFIX}{name}:{scope}:{value}" for scope, value, _, _ in limits]
+    now_ms = int(time.time() * 1000)
+    args = [now_ms, f"{now_ms}:{uuid.uuid4().hex[:8]}"]
+    for _, _, limit, window in limits:
+        args += [limit, window * 1000]
+
+    try:
+        wait_ms = int(redis_client.eval(_SLIDING_WINDOW_SCRIPT, len(keys), *keys, *args))
+    except Exception as e:
+        logger.warning(f"Rate limit check for {name} failed, allowing request: {str(e)}")
+        return True, 0
+
+    if wait_ms > 0:
+        logger.warning(f"Rate limited {name}: {', '.join(keys)} (retry in {wait_ms} ms)")
+        return False, math.ceil(wait_ms / 1000)
+    return True, 0
+
+
+def format_wait(seconds: int) -> str:
+    """'45 seconds' / '12 minutes' for rate limit messages."""
+    if seconds < 60:
+        return f"{seconds} second{'s' if seconds != 1 else ''}"
+    minutes = math.ceil(seconds / 60)
+    return f"{minutes} minute{'s' if minutes != 1 else ''}"
+
+
+def json_field(field: str) -> Callable[[], Optional[str]]:
+    """Identifier getter reading a (lower-cased) field of the JSON body."""
+    def get_identifier():
+        value = (request.get_json(silent=True) or {}).get(field)
+        return str(value).strip().lower() if value else None
+    return get_identifier
+
+
+def rate_limit(name: str, per_ip: Optional[Tuple[int, int]] = None,
+               per_identifier: Optional[Tuple[int, int]] = None,
+               identifier: Optional[Callable[[], Optional[str]]] = None,
+               message: str = "Too many requests. Please try again in {wait}."):
+    """Flask route decorator answering 429 once a sliding-window limit is hit.
+
+    Args:
+        name: Action being limited; keys of different routes never collide.
+        per_ip: (limit, window_seconds) per client IP.
+        per_identifier: (limit, window_seconds) per value returned by identifier.
+        identifier: Returns the identifier of the request (e.g. json_field('email')),
+            or None to skip the per-identifier limit.
+        message: 429 message; {wait} is replaced with the time until retry.
+    """
+    if per_identifier and identifier is None:
+        raise ValueError("rate_limit per_identifier needs an identifier getter")
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return f(*args, **kwargs)
+
+            limits = []
+            if per_ip:
+                limits.append(('ip', request.remote_addr, *per_ip))
+            if per_identifier:
+                limits.append(('id', identifier(), *per_identifier))
+
+            allowed, retry_after = check_rate_limits(name, limits)
+            if not allowed:
+                response = jsonify({
+                    "status": "error",
+                    "message": message.format(wait=format_wait(retry_after)),
+                    "retry_after": retry_after
+                })
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
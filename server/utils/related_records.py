@@ -0,0 +1,115 @@
+"""
+Concurrent loader for the related sections of a patient chart.
+
+Opening a chart needs the delivery record, measurements, screening tests,
+allergies, prescriptions, vaccinations, parent access and the calculate_age
+RPC. Each of these is an independent PostgREST round trip, so they are
+dispatched together on a shared thread pool and the chart only waits for the
+slowest one instead of the sum of all of them.
+
+Every section has a deadline. A section that errors or misses its deadline
+falls back to its default value and is reported in the returned error map so
+callers can still render a partial chart.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds each section may take before it is reported as timed out
+RELATED_QUERY_TIMEOUT = float(os.environ.get('RELATED_QUERY_TIMEOUT', 5))
+RELATED_LOADER_WORKERS = int(os.environ.get('RELATED_LOADER_WORKERS', 16))
+
+_executor = ThreadPoolExecutor(
+    max_workers=RELATED_LOADER_WORKERS,
+    thread_name_prefix='related-loader'
+)
+
+
+class RelatedSection:
+    """A single related-record query and how its response should be shaped.
+
+    Args:
+        query: Zero-argument callable that executes the PostgREST query and
+            returns its response. It runs on a worker thread, so it must not
+            touch Flask's ``g``/``request`` - bind the client up front.
+        default: Value used when the query fails or times out.
+        shape: ``'list'`` (``data or []``), ``'first'`` (first row or None)
+            or ``'raw'`` (``data`` untouched, e.g. for RPC calls).
+        timeout: Optional per-section deadline in seconds.
+    """
+
+    def __init__(self, query: Callable[[], Any], default: Any = None,
+                 shape: str = 'list', timeout: Optional[float] = None):
+        if shape not in ('list', 'first', 'raw'):
+            raise ValueError(f"Invalid section shape: {shape}")
+        self.query = query
+        self.default = default
+        self.shape = shape
+        self.timeout = timeout
+
+    def run(self) -> Any:
+        resp = self.query()
+        error = getattr(resp, 'error', None)
+        if error:
+            raise RuntimeError(getattr(error, 'message', str(error)))
+
+        data = resp.data
+        if self.shape == 'first':
+            return data[0] if data else None
+        if self.shape == 'list':
+            return data or []
+        return data
+
+
+def load_related_records(sections: Dict[str, RelatedSection],
+                         timeout: float = RELATED_QUERY_TIMEOUT) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Run all *sections* concurrently and collect their results.
+
+    Args:
+        sections: Mapping of section name to :class:`RelatedSection`.
+        timeout: Default deadline in seconds for sections without their own.
+
+    Returns:
+        tuple: ``(results, errors)`` where *results* has an entry for every
+        section (the default value on failure) and *errors* maps the names of
+        failed sections to ``'timeout'`` or the error message.
+    """
+    started = time.monotonic()
+    futures = {
+        name: _executor.submit(section.run)
+        for name, section in sections.items()
+    }
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+
+    for name, future in futures.items():
+        section = sections[name]
+        deadline = started + (section.timeout if section.timeout is not None else timeout)
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Related section '{name}' exceeded its deadline")
+            results[name] = section.default
+            errors[name] = 'timeout'
+        except Exception as e:
+            logger.error(f"Related section '{name}' failed: {str(e)}")
+            results[name] = section.default
+            errors[name] = str(e)
+
+    return results, errors
+
+
+def age_section(client, date_of_birth: str) -> RelatedSection:
+    """Section wrapping the ``calculate_age`` RPC so it joins the fan-out."""
+    return RelatedSection(
+        lambda: client.rpc('calculate_age', {'date_of_birth': date_of_birth}).execute(),
+        default=None, shape='raw'
+    )
@@ -2,14 +2,31 @@ import datetime
 import json
 import logging
 import os
+import time
 import redis
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from utils.redis_client import redis_client
 
 SESSION_PREFIX = 'flask_session:'
 # SESSION_TIMEOUT = 1800  # 30 minutes (old auto-logout)
 SESSION_TIMEOUT = int(os.environ.get('SESSION_TIMEOUT', 86400 * 30))  # 30 days - effectively no auto-logout for inactive sessions
 
+# Secondary session index, maintained alongside every session write/delete:
+#   user_sessions:{user_id}   set of the user's session ids
+#   session_index:activity    sorted set of session id -> last activity (epoch seconds)
+#   session_index:owner       hash of session id -> user id
+USER_SESSIONS_PREFIX = 'user_sessions:'
+SESSION_ACTIVITY_KEY = 'session_index:activity'
+SESSION_OWNER_KEY = 'session_index:owner'
+SESSION_INDEX_BUILT_KEY = 'session_index:built'
+# Held while one worker backfills the index; expires if that worker dies
+SESSION_INDEX_LOCK_KEY = 'session_index:building'
+SESSION_INDEX_LOCK_TTL = 600
+INDEX_BATCH_SIZE = 500
+
+# Minimum seconds between last_activity rewrites on the authenticated request path
+SESSION_TOUCH_INTERVAL = int(os.environ.get('SESSION_TOUCH_INTERVAL', 300))
+
 logger = logging.getLogger(__name__)
 
 class SessionError(Exception):
@@ -52,9 +69,8 @@ def store_session_data(session_id: str, user_data: Dict[str, Any]) -> str:
         # Serialize to JSON with explicit UTF-8 encoding
         session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
         
-        # Store in Redis with error handling
-        redis_key = f"{SESSION_PREFIX}{session_id}"
-        redis_client.setex(redis_key, SESSION_TIMEOUT, session_json)
+        # Store in Redis together with its index entries
+        _write_session(session_id, session_data['user_id'], session_json)
         
         logger.info(f"Session {session_id} stored successfully for user {session_data.get('email')}")
         return session_id
@@ -113,16 +129,34 @@ def update_session_activity(session_id: str) -> bool:
         
         session_data['last_activity'] = datetime.datetime.utcnow().isoformat()
         
-        # Re-serialize and store
-        session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
-        redis_client.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
-        
-        return True
+        return save_session(session_id, session_data)
         
     except Exception as e:
         logger.error(f"Failed to update session activity for {session_id}: {e}")
         return False
 
+def touch_session(session_id: str, session_data: Dict[str, Any]) -> bool:
+    """Debounced activity update for a session payload that was already read
+
+    Unlike :func:`update_session_activity` this does not read the session
+    again, and only rewrites it (refreshing TTL and index score) when
+    ``last_activity`` is older than SESSION_TOUCH_INTERVAL, so most requests
+    cost no Redis write at all.
+
+    Returns:
+        bool: True if the session was rewritten.
+    """
+    now = datetime.datetime.utcnow()
+    try:
+        last_activity = datetime.datetime.fromisoformat(session_data.get('last_activity', ''))
+        if (now - last_activity).total_seconds() < SESSION_TOUCH_INTERVAL:
+            return False
+    except (TypeError, ValueError):
+        pass  # Missing or malformed timestamp - rewrite it
+
+    session_data['last_activity'] = now.isoformat()
+    return save_session(session_id, session_data)
+
 def update_session_tokens(session_id: str, token_data: Dict[str, Any]) -> bool:
     """Update access/refresh tokens and expiry for an existing session in Redis."""
     try:
@@ -143,8 +177,7 @@ def update_session_tokens(session_id: str, token_data: Dict[str, Any]) -> bool:
         session_data = {k: v for k, v in session_data.items() if v is not None}
         
         # Re-serialize and store
-        session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'))
-        redis_client.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
+        save_session(session_id, session_data)
         
         logger.info(f"Tokens updated successfully for session {session_id}")
         return True
@@ -154,12 +187,18 @@ def update_session_tokens(session_id: str, token_data: Dict[str, Any]) -> bool:
         return False
 
 def delete_session(session_id: str) -> bool:
-    """Delete a session from Redis"""
+    """Delete a session from Redis and drop it from the session index"""
     try:
         if not session_id:
             return False
         
-        result = redis_client.delete(f"{SESSION_PREFIX}{session_id}")
+        user_id = redis_client.hget(SESSION_OWNER_KEY, session_id)
+
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(f"{SESSION_PREFIX}{session_id}")
+        _unindex_sessions(pipe, {session_id: user_id})
+        result = pipe.execute()[0]
+
         logger.info(f"Session {session_id} deleted: {bool(result)}")
         return bool(result)
         
@@ -167,29 +206,265 @@ def delete_session(session_id: str) -> bool:
         logger.error(f"Failed to delete session {session_id}: {e}")
         return False
 
-def cleanup_expired_sessions() -> int:
-    """Clean up any expired or corrupted sessions (utility function)"""
+def save_session(session_id: str, session_data: Dict[str, Any]) -> bool:
+    """Persist an updated session payload, refreshing its TTL and index entries"""
     try:
-        pattern = f"{SESSION_PREFIX}*"
-        keys = redis_client.keys(pattern)
-        
-        cleaned_count = 0
+        session_json = json.dumps(session_data, ensure_ascii=False, separators=(',', ':'), default=str)
+        _write_session(session_id, session_data.get('user_id'), session_json)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save session {session_id}: {e}")
+        return False
+
+def _write_session(session_id: str, user_id: Optional[str], session_json: str) -> None:
+    """SETEX the payload and update the index in one MULTI/EXEC"""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.setex(f"{SESSION_PREFIX}{session_id}", SESSION_TIMEOUT, session_json)
+    _index_session(pipe, session_id, user_id, time.time())
+    pipe.execute()
+
+def _index_session(pipe, session_id: str, user_id: Optional[str], last_activity: float) -> None:
+    pipe.zadd(SESSION_ACTIVITY_KEY, {session_id: last_activity})
+    if user_id:
+        user_key = f"{USER_SESSIONS_PREFIX}{user_id}"
+        pipe.hset(SESSION_OWNER_KEY, session_id, user_id)
+        pipe.sadd(user_key, session_id)
+        pipe.expire(user_key, SESSION_TIMEOUT)
+
+def _unindex_sessions(pipe, owners: Dict[str, Optional[str]]) -> None:
+    """Queue removal of session ids (mapped to their owner, if known) from the index"""
+    if not owners:
+        return
+    session_ids = list(owners)
+    pipe.zrem(SESSION_ACTIVITY_KEY, *session_ids)
+    pipe.hdel(SESSION_OWNER_KEY, *session_ids)
+    by_user: Dict[str, List[str]] = {}
+    for session_id, user_id in owners.items():
+        if user_id:
+            by_user.setdefault(user_id, []).append(session_id)
+    for user_id, ids in by_user.items():
+        pipe.srem(f"{USER_SESSIONS_PREFIX}{user_id}", *ids)
+
+def get_user_session_ids(user_id: str) -> List[str]:
+    """Return the ids of every indexed session belonging to a user"""
+    if not user_id:
+        return []
+    try:
+        return list(redis_client.smembers(f"{USER_SESSIONS_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.error(f"Failed to read sessions for user {user_id}: {e}")
+        return []
+
+def revoke_user_sessions(user_id: str) -> int:
+    """Delete every session of a user (logout everywhere)
+
+    Only the ids read from the user's set are removed from it, so a session
+    created concurrently stays indexed.
+
+    Returns:
+        int: Number of session payloads deleted.
+    """
+    session_ids = get_user_session_ids(user_id)
+    if not session_ids:
+        return 0
+
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(*[f"{SESSION_PREFIX}{sid}" for sid in session_ids])
+        _unindex_sessions(pipe, {sid: user_id for sid in session_ids})
+        deleted = pipe.execute()[0]
+
+        logger.info(f"Revoked {deleted} sessions for user {user_id}")
+        return deleted
+    except Exception as e:
+        logger.error(f"Failed to revoke sessions for user {user_id}: {e}")
+        return 0
+
+def list_sessions(offset: int = 0, limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+    """Page through active sessions, most recently active first
+
+    Args:
+        offset: Number of sessions to skip.
+        limit: Maximum number of sessions to return.
+
+    Returns:
+        tuple: ``(sessions, total)`` where each session is its stored payload
+        plus ``session_id``, and *total* is the number of indexed sessions.
+    """
+    prune_session_index()
+
+    total = redis_client.zcard(SESSION_ACTIVITY_KEY)
+    session_ids = redis_client.zrevrange(SESSION_ACTIVITY_KEY, offset, offset + limit - 1)
+    if not session_ids:
+        return [], total
+
+    payloads = _read_payloads(session_ids)
+
+    sessions = []
+    missing = []
+    for session_id, payload in zip(session_ids, payloads):
+        if not payload or payload is _UNREADABLE:
+            missing.append(session_id)
+            continue
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            missing.append(session_id)
+            continue
+        data['session_id'] = session_id
+        sessions.append(data)
+
+    # Payloads deleted outside of delete_session(); drop their index entries
+    if missing:
+        _drop_from_index(missing)
+        total -= len(missing)
+
+    return sessions, total
+
+# Marker for payloads that could not be decoded (corrupted bytes)
+_UNREADABLE = object()
+
+def _read_payloads(session_ids: List[str]) -> list:
+    """MGET session payloads; falls back to per-key GET if a payload is corrupted"""
+    keys = [f"{SESSION_PREFIX}{sid}" for sid in session_ids]
+    try:
+        return redis_client.mget(keys)
+    except UnicodeDecodeError:
+        payloads = []
         for key in keys:
             try:
-                # Try to get and validate each session
-                session_data = redis_client.get(key)
-                if session_data:
-                    json.loads(session_data)  # Validate JSON
-            except (json.JSONDecodeError, UnicodeDecodeError, Exception):
-                # Delete corrupted session
-                redis_client.delete(key)
-                cleaned_count += 1
+                payloads.append(redis_client.get(key))
+            except UnicodeDecodeError:
+                payloads.append(_UNREADABLE)
+        return payloads
+
+def _drop_from_index(session_ids: List[str]) -> None:
+    owners = redis_client.hmget(SESSION_OWNER_KEY, session_ids)
+    pipe = redis_client.pipeline(transaction=True)
+    _unindex_sessions(pipe, dict(zip(session_ids, owners)))
+    pipe.execute()
+
+def prune_session_index() -> int:
+    """Remove index entries of sessions whose payload has already expired
+
+    A payload's TTL is refreshed on every write, which also bumps its
+    activity score, so anything scored older than SESSION_TIMEOUT is gone.
+    """
+    try:
+        cutoff = time.time() - SESSION_TIMEOUT
+        pruned = 0
+        while True:
+            expired = redis_client.zrangebyscore(SESSION_ACTIVITY_KEY, '-inf', cutoff, start=0, num=INDEX_BATCH_SIZE)
+            if not expired:
+                break
+            _drop_from_index(expired)
+            pruned += len(expired)
+
+        if pruned:
+            logger.info(f"Pruned {pruned} expired sessions from the session index")
+        return pruned
+    except Exception as e:
+        logger.error(f"Failed to prune session index: {e}")
+        return 0
+
+def rebuild_session_index() -> int:
+    """Index sessions that were created before the index existed
+
+    Walks the keyspace once with SCAN; afterwards every session write keeps
+    the index current, so this only needs to run once per Redis instance
+    (see :func:`ensure_session_index`).
+    """
+    indexed = 0
+    batch = []
+    for key in redis_client.scan_iter(match=f"{SESSION_PREFIX}*", count=1000):
+        batch.append(key)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            indexed += _index_existing(batch)
+            batch = []
+    if batch:
+        indexed += _index_existing(batch)
+
+    logger.info(f"Session index rebuilt with {indexed} sessions")
+    return indexed
+
+def _index_existing(keys: List[str]) -> int:
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.get(key)
+        pipe.ttl(key)
+    results = pipe.execute(raise_on_error=False)
+
+    now = time.time()
+    pipe = redis_client.pipeline(transaction=False)
+    count = 0
+    for key, payload, ttl in zip(keys, results[0::2], results[1::2]):
+        try:
+            data = json.loads(payload) if payload else None
+        except (TypeError, json.JSONDecodeError):
+            data = None
+        if not data or not isinstance(ttl, int) or ttl < 0:
+            continue
+        # Recover the last write time from the remaining TTL
+        _index_session(pipe, key[len(SESSION_PREFIX):], data.get('user_id'), now - (SESSION_TIMEOUT - ttl))
+        count += 1
+    pipe.execute()
+    return count
+
+def ensure_session_index() -> int:
+    """Backfill the session index once; later calls (other workers, restarts) are no-ops
+
+    The built marker is only set after a successful rebuild, so a failed one
+    is retried on the next start. The lock keeps workers starting together
+    from rebuilding at the same time.
+    """
+    try:
+        if redis_client.exists(SESSION_INDEX_BUILT_KEY):
+            return 0
+        if not redis_client.set(SESSION_INDEX_LOCK_KEY, os.getpid(), nx=True, ex=SESSION_INDEX_LOCK_TTL):
+            return 0
+        try:
+            indexed = rebuild_session_index()
+            redis_client.set(SESSION_INDEX_BUILT_KEY, datetime.datetime.utcnow().isoformat())
+            return indexed
+        finally:
+            redis_client.delete(SESSION_INDEX_LOCK_KEY)
+    except Exception as e:
+        logger.error(f"Failed to build session index: {e}")
+        return 0
+
+def cleanup_expired_sessions() -> int:
+    """Clean up expired index entries and corrupted sessions (utility function)
+
+    Walks the session index in pages instead of scanning the keyspace.
+    """
+    try:
+        cleaned_count = prune_session_index()
+
+        cursor = 0
+        while True:
+            session_ids = redis_client.zrange(SESSION_ACTIVITY_KEY, cursor, cursor + INDEX_BATCH_SIZE - 1)
+            if not session_ids:
+                break
+            cursor += len(session_ids)
+
+            payloads = _read_payloads(session_ids)
+            for session_id, payload in zip(session_ids, payloads):
+                try:
+                    if payload is _UNREADABLE:
+                        raise UnicodeDecodeError('utf-8', b'', 0, 1, 'corrupted session payload')
+                    if payload:
+                        json.loads(payload)  # Validate JSON
+                except (json.JSONDecodeError, UnicodeDecodeError, Exception):
+                    # Delete corrupted session
+                    if delete_session(session_id):
+                        cursor -= 1
+                        cleaned_count += 1
                 
         if cleaned_count > 0:
-            logger.info(f"Cleaned up {cleaned_count} corrupted sessions")
+            logger.info(f"Cleaned up {cleaned_count} expired or corrupted sessions")
             
         return cleaned_count
         
     except Exception as e:
         logger.error(f"Error during session cleanup: {e}")
-        return 0
\ No newline at end of file
+        return 0
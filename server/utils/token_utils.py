@@ -10,10 +10,14 @@ Dependencies:
     pip install PyJWT cryptography requests
 """
 
+import hashlib
+import logging
 import os
+import threading
 import time
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
 from jwt import PyJWKClient  # type: ignore
@@ -21,8 +25,28 @@ from jwt import PyJWKClient  # type: ignore
 __all__ = [
     "SupabaseJWTError",
     "verify_supabase_jwt",
+    "start_jwks_refresh",
 ]
 
+logger = logging.getLogger(__name__)
+
+# Verified claims are cached per token until the token's own ``exp``
+CLAIMS_CACHE_SIZE = int(os.environ.get("JWT_CLAIMS_CACHE_SIZE", 1024))
+# Seconds between background JWKS refreshes
+JWKS_REFRESH_INTERVAL = float(os.environ.get("JWKS_REFRESH_INTERVAL", 600))
+# Minimum seconds between fetches made on the request path for an unknown kid
+JWKS_SYNC_FETCH_INTERVAL = float(os.environ.get("JWKS_SYNC_FETCH_INTERVAL", 30))
+
+_claims_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_claims_lock = threading.Lock()
+
+# kid -> signing key, replaced wholesale by the refresher thread
+_jwks_keys: Dict[str, Any] = {}
+_jwks_refresher: Optional[threading.Thread] = None
+_jwks_lock = threading.Lock()
+_jwks_fetch_lock = threading.Lock()
+_jwks_last_sync_fetch = 0.0
+
 
 class SupabaseJWTError(Exception):
     """Raised when a Supabase JWT cannot be verified or is otherwise invalid."""
@@ -42,9 +66,109 @@ def _jwks_client() -> PyJWKClient:
     return PyJWKClient(jwks_url)
 
 
+def _refresh_jwks() -> None:
+    """Fetch the JWKS once and swap in the new key map."""
+    global _jwks_keys
+    try:
+        keys = {k.key_id: k.key for k in _jwks_client().get_signing_keys(refresh=True)}
+        _jwks_keys = keys
+        logger.debug(f"JWKS refreshed ({len(keys)} signing keys)")
+    except Exception as e:
+        # Keep serving the previous keys; the next cycle retries
+        logger.warning(f"JWKS refresh failed: {e}")
+
+
+def _jwks_refresh_loop() -> None:
+    while True:
+        time.sleep(JWKS_REFRESH_INTERVAL)
+        _refresh_jwks()
+
+
+def _fetch_signing_key(kid: Optional[str]) -> Any:
+    """Fetch the JWKS on the request path for a kid that is not in the map.
+
+    Covers a cold worker (map still empty) and key rotation. Concurrent
+    callers share one fetch, and fetches are spaced JWKS_SYNC_FETCH_INTERVAL
+    apart so made-up kids cannot hammer the JWKS endpoint.
+    """
+    global _jwks_last_sync_fetch
+    with _jwks_fetch_lock:
+        signing_key = _jwks_keys.get(kid)
+        if signing_key is None and time.monotonic() - _jwks_last_sync_fetch >= JWKS_SYNC_FETCH_INTERVAL:
+            _jwks_last_sync_fetch = time.monotonic()
+            _refresh_jwks()
+            signing_key = _jwks_keys.get(kid)
+    return signing_key
+
+
+def start_jwks_refresh() -> None:
+    """Start the background JWKS refresher for this process (idempotent).
+
+    Started lazily on the first RS256 verification, so it also runs in
+    forked gunicorn workers and never runs in HS256-only deployments.
+    """
+    global _jwks_refresher
+    if _jwks_refresher is not None and _jwks_refresher.is_alive():
+        return
+    with _jwks_lock:
+        if _jwks_refresher is not None and _jwks_refresher.is_alive():
+            return
+        if not os.environ.get("SUPABASE_URL"):
+            return
+        _jwks_refresher = threading.Thread(target=_jwks_refresh_loop, name="jwks-refresh", daemon=True)
+        _jwks_refresher.start()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cached_claims(token_key: str) -> Optional[Dict[str, Any]]:
+    with _claims_lock:
+        entry = _claims_cache.get(token_key)
+        if entry is None:
+            return None
+        exp, claims = entry
+        if exp <= time.time():
+            del _claims_cache[token_key]
+            raise SupabaseJWTError("Token has expired")
+        _claims_cache.move_to_end(token_key)
+    return dict(claims)
+
+
+def _cache_claims(token_key: str, claims: Dict[str, Any]) -> None:
+    with _claims_lock:
+        _claims_cache[token_key] = (float(claims["exp"]), dict(claims))
+        _claims_cache.move_to_end(token_key)
+        while len(_claims_cache) > CLAIMS_CACHE_SIZE:
+            _claims_cache.popitem(last=False)
+
+
+def _verify_rs256(token: str, header: Dict[str, Any]) -> Dict[str, Any]:
+    """Verify against the prefetched JWKS, fetching it first if the kid is unknown."""
+    signing_key = _jwks_keys.get(header.get("kid"))
+    if signing_key is None:
+        # Keys not loaded yet (cold worker) or rotated
+        signing_key = _fetch_signing_key(header.get("kid"))
+    start_jwks_refresh()
+    if signing_key is None:
+        raise SupabaseJWTError(f"Unknown signing key id: {header.get('kid')}")
+
+    return jwt.decode(
+        token,
+        signing_key,
+        algorithms=["RS256"],
+        options={"require": ["exp", "sub"], "verify_aud": False},
+    )
+
+
 def verify_supabase_jwt(token: str) -> Dict[str, Any]:
     """Verify the signature and expiry of a Supabase access token.
 
+    Successfully verified claims are cached (keyed by a SHA-256 of the token)
+    until the token expires, so repeated requests with the same token skip
+    signature verification entirely.
+
     Parameters
     ----------
     token:
@@ -60,11 +184,21 @@ def verify_supabase_jwt(token: str) -> Dict[str, Any]:
     SupabaseJWTError
         If the token is invalid, expired, or cannot be verified.
     """
+    token_key = _token_key(token)
+    claims = _cached_claims(token_key)
+    if claims is not None:
+        return claims
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError as e:
+        raise SupabaseJWTError(f"Malformed token: {e}")
+
     rs256_error = None
 
     # First, try HS256 with JWT secret (most common for Supabase projects)
     jwt_secret = os.environ.get("SUPABASE_JWT_SECRET") or os.environ.get("JWT_SECRET")
-    if jwt_secret:
+    if jwt_secret and header.get("alg") == "HS256":
         try:
             claims = jwt.decode(
                 token,
@@ -72,23 +206,18 @@ def verify_supabase_jwt(token: str) -> Dict[str, Any]:
                 algorithms=["HS256"],
                 options={"require": ["exp", "sub"], "verify_aud": False},
             )
+            _cache_claims(token_key, claims)
             return claims
         except jwt.ExpiredSignatureError:
             raise SupabaseJWTError("Token has expired")
-        except Exception:
-            pass  # Fall through to RS256
+        except Exception as e:
+            # An HS256 token can never verify against the RS256 JWKS
+            raise SupabaseJWTError(f"Failed to verify HS256 JWT: {e}")
 
-    # Try RS256 verification (JWKS) as fallback
+    # RS256 verification against the prefetched JWKS
     try:
-        signing_key = _jwks_client().get_signing_key_from_jwt(token).key
-
-        claims = jwt.decode(
-            token,
-            signing_key,
-            algorithms=["RS256"],
-            options={"require": ["exp", "sub"], "verify_aud": False},
-        )
-
+        claims = _verify_rs256(token, header)
+        _cache_claims(token_key, claims)
         return claims
 
     except jwt.ExpiredSignatureError:
@@ -104,4 +233,4 @@ def verify_supabase_jwt(token: str) -> Dict[str, Any]:
             "SUPABASE_JWT_SECRET not set in environment. "
             "Please add SUPABASE_JWT_SECRET to your .env file. "
             f"RS256 verification also failed: {rs256_error}"
-        ) 
\ No newline at end of file
+        )
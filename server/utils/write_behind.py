@@ -0,0 +1,281 @@
+"""
+Durable write-behind queue for request side effects.
+
+Routes enqueue writes that the response does not depend on (audit log rows,
+usage counters, background registrations) instead of running them inline.
+Entries are appended to a Redis stream and consumed by one worker thread per
+process through a consumer group, so every gunicorn worker shares the load
+and an entry is only removed once its write succeeded:
+
+    enqueue('insert', {'table': 'qr_access_logs', 'row': {...}})
+    enqueue('qr_usage', {'qr_id': qr_id, 'use_count': n, 'accessed_at': now, 'accessed_by': user_id})
+
+The worker reads up to WRITE_BEHIND_BATCH_SIZE entries at a time and hands
+each handler all of its entries at once, so inserts into the same table go
+out as one bulk insert and usage counts are written once per QR code.
+Entries left pending by a failed write or a dead worker are reclaimed after
+WRITE_BEHIND_CLAIM_IDLE_MS and retried; after WRITE_BEHIND_MAX_DELIVERIES
+attempts they are moved to a dead-letter stream. The app starts the worker at
+startup (main.py), so entries left by a deploy or crash are reclaimed without
+waiting for the next enqueue(); enqueue() also starts it if it is not running.
+Without Redis, enqueue() runs the handler inline so nothing is dropped.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+from flask import current_app
+
+from config.settings import supabase_service_role_client
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_STREAM = 'write_behind:side_effects'
+WRITE_BEHIND_DEAD_STREAM = 'write_behind:dead'
+WRITE_BEHIND_GROUP = 'write_behind_workers'
+BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 200))
+# Kept below the Redis client's socket timeout (5s)
+BLOCK_MS = 2000
+CLAIM_IDLE_MS = int(os.environ.get('WRITE_BEHIND_CLAIM_IDLE_MS', 60000))
+MAX_DELIVERIES = int(os.environ.get('WRITE_BEHIND_MAX_DELIVERIES', 10))
+DEAD_STREAM_MAXLEN = 10000
+
+_handlers: Dict[str, Callable[[List[Dict[str, Any]]], None]] = {}
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def register_handler(op: str, handler: Callable[[List[Dict[str, Any]]], None]) -> None:
+    """Register the function that applies entries of type *op*.
+
+    The handler receives every payload of that type from one batch and must
+    raise if any of them was not written; the batch is then retried entry by
+    entry so one bad payload cannot hold back the rest.
+    """
+    _handlers[op] = handler
+
+
+def enqueue(op: str, payload: Dict[str, Any]) -> bool:
+    """Queue a side effect for the write-behind worker.
+
+    Args:
+        op: Registered handler name.
+        payload: JSON-serializable handler argument.
+
+    Returns:
+        bool: True if queued, False if it was applied inline instead
+        (Redis unavailable).
+    """
+    if op not in _handlers:
+        raise ValueError(f"Unknown write-behind operation: {op}")
+
+    if redis_client is not None:
+        try:
+            redis_client.xadd(WRITE_BEHIND_STREAM, {'op': op, 'payload': json.dumps(payload, default=str)})
+            start_worker(current_app._get_current_object())
+            return True
+        except Exception as e:
+            logger.warning(f"Write-behind enqueue failed, applying {op} inline: {str(e)}")
+
+    _handlers[op]([payload])
+    return False
+
+
+def start_worker(app) -> None:
+    """Start this process's consumer thread (idempotent, so it also runs in forked workers)."""
+    global _worker
+    if redis_client is None:
+        return
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_worker_loop, args=(app,), name='write-behind', daemon=True)
+        _worker.start()
+
+
+def _ensure_group() -> None:
+    try:
+        redis_client.xgroup_create(WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, id='0', mkstream=True)
+    except Exception as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _worker_loop(app) -> None:
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    last_claim = 0.0
+
+    while True:
+        try:
+            _ensure_group()
+
+            if time.monotonic() - last_claim >= CLAIM_IDLE_MS / 1000:
+                last_claim = time.monotonic()
+                _reclaim(app, consumer)
+
+            response = redis_client.xreadgroup(
+                WRITE_BEHIND_GROUP, consumer, {WRITE_BEHIND_STREAM: '>'},
+                count=BATCH_SIZE, block=BLOCK_MS
+            )
+            for _stream, entries in response or []:
+                if entries:
+                    process_entries(app, entries)
+        except Exception as e:
+            logger.error(f"Write-behind worker error: {str(e)}")
+            time.sleep(1)
+
+
+def _reclaim(app, consumer: str) -> None:
+    """Take over entries that stayed unacknowledged for CLAIM_IDLE_MS and retry them."""
+    start = '0-0'
+    while True:
+        result = redis_client.xautoclaim(
+            WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, consumer,
+            min_idle_time=CLAIM_IDLE_MS, start_id=start, count=BATCH_SIZE
+        )
+        start, entries = result[0], result[1]
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if entries:
+            process_entries(app, _drop_exhausted(entries))
+        if start in ('0-0', b'0-0'):
+            return
+
+
+def _drop_exhausted(entries):
+    """Move entries delivered MAX_DELIVERIES times to the dead-letter stream."""
+    # One exact lookup per claimed id: a range query over the batch would also
+    # return other consumers' entries and could stop short of some claimed ones
+    pipe = redis_client.pipeline(transaction=False)
+    for entry_id, _ in entries:
+        pipe.xpending_range(WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, min=entry_id, max=entry_id, count=1)
+    deliveries = {p['message_id']: p['times_delivered'] for pending in pipe.execute() for p in pending}
+
+    retry, dead = [], []
+    for entry in entries:
+        (dead if deliveries.get(entry[0], 0) > MAX_DELIVERIES else retry).append(entry)
+
+    if dead:
+        pipe = redis_client.pipeline(transaction=False)
+        for entry_id, fields in dead:
+            logger.error(f"Write-behind entry {entry_id} ({fields.get('op')}) failed {MAX_DELIVERIES} times, moved to {WRITE_BEHIND_DEAD_STREAM}")
+            pipe.xadd(WRITE_BEHIND_DEAD_STREAM, fields, maxlen=DEAD_STREAM_MAXLEN, approximate=True)
+        _ack(pipe, [entry_id for entry_id, _ in dead])
+        pipe.execute()
+
+    return retry
+
+
+def _ack(pipe, entry_ids) -> None:
+    pipe.xack(WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, *entry_ids)
+    pipe.xdel(WRITE_BEHIND_STREAM, *entry_ids)
+
+
+def _apply(op: str, items) -> List[str]:
+    """Run one handler over its batch; returns the ids that were written."""
+    handler = _handlers.get(op)
+    if handler is None:
+        # Registered by a module this process has not imported; another worker can take it
+        logger.error(f"No write-behind handler registered for {op}")
+        return []
+
+    try:
+        handler([payload for _, payload in items])
+        return [entry_id for entry_id, _ in items]
+    except Exception as e:
+        if len(items) == 1:
+            logger.warning(f"Write-behind {op} entry {items[0][0]} failed: {str(e)}")
+            return []
+        logger.warning(f"Write-behind {op} batch of {len(items)} failed, retrying individually: {str(e)}")
+
+    written = []
+    for item in items:
+        written.extend(_apply(op, [item]))
+    return written
+
+
+def process_entries(app, entries) -> int:
+    """Apply a batch of stream entries grouped by operation and acknowledge the written ones.
+
+    Returns:
+        int: Number of entries written.
+    """
+    # Inserts are batched per table so a failing table never replays another's rows
+    by_op = OrderedDict()
+    for entry_id, fields in entries:
+        try:
+            payload = json.loads(fields['payload'])
+            by_op.setdefault((fields['op'], payload.get('table')), []).append((entry_id, payload))
+        except (KeyError, ValueError, AttributeError) as e:
+            logger.error(f"Dropping malformed write-behind entry {entry_id}: {str(e)}")
+            pipe = redis_client.pipeline(transaction=False)
+            _ack(pipe, [entry_id])
+            pipe.execute()
+
+    written = []
+    with app.app_context():
+        for (op, _table), items in by_op.items():
+            written.extend(_apply(op, items))
+
+    if written:
+        pipe = redis_client.pipeline(transaction=False)
+        _ack(pipe, written)
+        pipe.execute()
+    return len(written)
+
+
+# ============================================================================
+# BUILT-IN HANDLERS
+# ============================================================================
+
+def _insert_rows(payloads: List[Dict[str, Any]]) -> None:
+    """Bulk insert queued rows, one request per table."""
+    rows_by_table = OrderedDict()
+    for payload in payloads:
+        rows_by_table.setdefault(payload['table'], []).append(payload['row'])
+
+    sr_client = supabase_service_role_client()
+    for table, rows in rows_by_table.items():
+        sr_client.table(table).insert(rows).execute()
+
+
+def _record_qr_usage(payloads: List[Dict[str, Any]]) -> None:
+    """Bring qr_codes.use_count up to the counted uses, one update per code.
+
+    Payloads carry the counter value after the scan (utils/qr_tokens.py), so
+    the update only ever raises use_count and replaying an entry is harmless.
+    """
+    usage = OrderedDict()
+    for payload in payloads:
+        entry = usage.setdefault(payload['qr_id'], {'use_count': 0, 'last_accessed_at': None, 'last_accessed_by': None})
+        entry['use_count'] = max(entry['use_count'], payload['use_count'])
+        if not entry['last_accessed_at'] or payload['accessed_at'] >= entry['last_accessed_at']:
+            entry['last_accessed_at'] = payload['accessed_at']
+            if payload.get('accessed_by'):
+                entry['last_accessed_by'] = payload['accessed_by']
+
+    sr_client = supabase_service_role_client()
+    for qr_id, entry in usage.items():
+        update = {
+            'use_count': entry['use_count'],
+            'last_accessed_at': entry['last_accessed_at']
+        }
+        if entry['last_accessed_by']:
+            update['last_accessed_by'] = entry['last_accessed_by']
+        sr_client.table('qr_codes')\
+            .update(update)\
+            .eq('qr_id', qr_id)\
+            .or_(f"use_count.is.null,use_count.lt.{entry['use_count']}")\
+            .execute()
+
+
+register_handler('insert', _insert_rows)
+register_handler('qr_usage', _record_qr_usage)